@@ -183,6 +183,10 @@ TARGET_DIRECTORY=${ROOT_DIR}/$(dirname etc/little-brother/master.config )
 mkdir -p ${TARGET_DIRECTORY}
 echo "Deploying extra file '$INSTALL_BASE_DIR/etc/master.config' to '${ROOT_DIR}/etc/little-brother/master.config'..."
 cp -f $INSTALL_BASE_DIR/etc/master.config ${ROOT_DIR}/etc/little-brother/master.config
+TARGET_DIRECTORY=${ROOT_DIR}/$(dirname usr/sbin/little-brother-kill-helper )
+mkdir -p ${TARGET_DIRECTORY}
+echo "Deploying extra file '$INSTALL_BASE_DIR/little_brother/kill_helper.py' to '${ROOT_DIR}/usr/sbin/little-brother-kill-helper'..."
+cp -f $INSTALL_BASE_DIR/little_brother/kill_helper.py ${ROOT_DIR}/usr/sbin/little-brother-kill-helper
 
 
 
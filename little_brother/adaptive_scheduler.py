@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Scheduler adapting the intervals of the process scan and the rule check to the current situation:
+#
+# * If a monitored user is approaching the end of the permitted play time the tasks are executed at the minimum
+#   interval so that the logout happens on time.
+# * If no monitored user is active the interval is doubled on every execution up to the maximum interval.
+# * Otherwise, the configured interval of the task is used.
+#
+# The state is reported by the ProcessHandlerManager (activity found by the process scans) and by the AppControl
+# (activity and minutes left according to the rules). A new interval takes effect when the task is scheduled the
+# next time.
+
+from python_base_app import base_app
+from python_base_app import configuration
+from python_base_app import log_handling
+
+SECTION_NAME = "AdaptiveScheduler"
+
+DEFAULT_MIN_CHECK_INTERVAL = 2  # seconds
+DEFAULT_MAX_CHECK_INTERVAL = 60  # seconds
+DEFAULT_APPROACHING_LIMIT_IN_MINUTES = 5  # minutes
+
+IDLE_BACKOFF_FACTOR = 2
+
+ACTIVITY_SOURCE_RULES = "rules"
+
+
+class AdaptiveSchedulerConfigModel(configuration.ConfigModel):
+
+    def __init__(self):
+        super().__init__(p_section_name=SECTION_NAME)
+
+        self.active = False
+        self.min_check_interval = DEFAULT_MIN_CHECK_INTERVAL
+        self.max_check_interval = DEFAULT_MAX_CHECK_INTERVAL
+        self.approaching_limit_in_minutes = DEFAULT_APPROACHING_LIMIT_IN_MINUTES
+
+    def is_active(self):
+        return self.active
+
+
+class AdaptiveScheduler(object):
+
+    def __init__(self, p_config: AdaptiveSchedulerConfigModel, p_prometheus_client=None):
+
+        self._logger = log_handling.get_logger(self.__class__.__name__)
+        self._config = p_config
+        self._prometheus_client = p_prometheus_client
+
+        if self._config.min_check_interval > self._config.max_check_interval:
+            msg = f"min_check_interval ({self._config.min_check_interval}) must not be larger than " \
+                  f"max_check_interval ({self._config.max_check_interval})"
+            raise configuration.ConfigurationException(msg)
+
+        # Activity reported per source (process handler id or rules)
+        self._activities: dict[str, bool] = {}
+        self._minutes_left = None
+        self._intervals: dict[str, float] = {}
+
+    @property
+    def intervals(self):
+        return self._intervals
+
+    def set_activity(self, p_source: str, p_active: bool):
+        self._activities[p_source] = p_active
+
+    def set_minutes_left(self, p_minutes_left):
+        self._minutes_left = p_minutes_left
+
+    def is_idle(self):
+        return not any(self._activities.values())
+
+    def is_approaching_limit(self):
+        return self._minutes_left is not None and self._minutes_left <= self._config.approaching_limit_in_minutes
+
+    def clamp(self, p_interval):
+        return max(self._config.min_check_interval, min(p_interval, self._config.max_check_interval))
+
+    def get_interval(self, p_task_name: str, p_base_interval) -> float:
+
+        if self.is_approaching_limit():
+            interval = self._config.min_check_interval
+
+        elif self.is_idle():
+            interval = self.clamp(self._intervals.get(p_task_name, p_base_interval) * IDLE_BACKOFF_FACTOR)
+
+        else:
+            interval = self.clamp(p_base_interval)
+
+        old_interval = self._intervals.get(p_task_name)
+
+        if old_interval != interval:
+            fmt = f"Changing interval of task '{p_task_name}' to {interval} seconds"
+            self._logger.debug(fmt)
+            self._intervals[p_task_name] = interval
+
+            if self._prometheus_client is not None:
+                self._prometheus_client.set_effective_check_interval(p_task_name=p_task_name, p_interval=interval)
+
+        return interval
+
+
+class AdaptiveRecurringTask(base_app.RecurringTask):
+
+    def __init__(self, p_name, p_handler_method, p_scheduler: AdaptiveScheduler,
+                 p_interval=base_app.DEFAULT_TASK_INTERVAL):
+        super().__init__(p_name=p_name, p_handler_method=p_handler_method, p_interval=p_interval)
+        self.base_interval = p_interval
+        self._scheduler = p_scheduler
+
+    def compute_next_execution_time(self):
+
+        if self.next_execution is not None:
+            self.interval = self._scheduler.get_interval(p_task_name=self.name, p_base_interval=self.base_interval)
+
+        super().compute_next_execution_time()
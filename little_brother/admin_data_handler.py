@@ -21,6 +21,7 @@ from little_brother import dependency_injection
 from little_brother import process_statistics
 from little_brother import rule_override
 from little_brother import rule_result_info
+from little_brother import usage_rollup_handler
 from little_brother.constants import LANGUAGES
 from little_brother.persistence.persistent_dependency_injection_mix_in import PersistenceDependencyInjectionMixIn
 from little_brother.persistence.persistent_rule_set import RuleSet
@@ -60,6 +61,8 @@ class AdminDataHandler(PersistenceDependencyInjectionMixIn):
         self._rule_handler = None
         self._user_locale_handler = UserLocaleHandler()
         self._rule_overrides = {}
+        self._process_statistics = None
+        self._usage_rollup_handler = usage_rollup_handler.UsageRollupHandler(p_config=p_config)
 
         self.history_labels = [(_('{days} days ago'), {"days": day}) for day in
                                range(0, self._config.process_lookback_in_days + 1)]
@@ -88,6 +91,57 @@ class AdminDataHandler(PersistenceDependencyInjectionMixIn):
 
         return self._user_locale_handler
 
+    @property
+    def usage_rollup_handler(self) -> usage_rollup_handler.UsageRollupHandler:
+        return self._usage_rollup_handler
+
+    def set_process_statistics(self, p_process_statistics):
+
+        # Statistics maintained by the process handler manager which are shared with the rule engine
+        self._process_statistics = p_process_statistics
+
+    def get_users_stat_infos(self, p_session_context, p_process_infos, p_reference_time, p_max_lookback_in_days,
+                             p_process_statistics=None):
+
+        if self._config.use_usage_rollups and p_max_lookback_in_days > 1:
+            # Only the recent days are computed, the closed days are taken from the rollups
+            users_stat_infos = self._usage_rollup_handler.add_rollups(
+                p_session_context=p_session_context,
+                p_users_stat_infos=self.compute_users_stat_infos(
+                    p_session_context=p_session_context, p_process_infos=p_process_infos,
+                    p_reference_time=p_reference_time, p_max_lookback_in_days=1,
+                    p_process_statistics=p_process_statistics),
+                p_reference_time=p_reference_time,
+                p_max_lookback_in_days=p_max_lookback_in_days)
+
+            if users_stat_infos is not None:
+                return users_stat_infos
+
+        return self.compute_users_stat_infos(
+            p_session_context=p_session_context, p_process_infos=p_process_infos,
+            p_reference_time=p_reference_time, p_max_lookback_in_days=p_max_lookback_in_days,
+            p_process_statistics=p_process_statistics)
+
+    def compute_users_stat_infos(self, p_session_context, p_process_infos, p_reference_time, p_max_lookback_in_days,
+                                 p_process_statistics=None):
+
+        if p_process_statistics is None:
+            p_process_statistics = self._process_statistics
+
+        if p_process_statistics is not None:
+            return p_process_statistics.get_process_statistics(
+                p_reference_time=p_reference_time,
+                p_user_map=self.user_entity_manager.user_map(p_session_context),
+                p_max_lookback_in_days=p_max_lookback_in_days,
+                p_min_activity_duration=self._config.min_activity_duration)
+
+        return process_statistics.get_process_statistics(
+            p_process_infos=p_process_infos,
+            p_reference_time=p_reference_time,
+            p_user_map=self.user_entity_manager.user_map(p_session_context),
+            p_max_lookback_in_days=p_max_lookback_in_days,
+            p_min_activity_duration=self._config.min_activity_duration)
+
     def get_admin_info(self, p_session_context, p_user_name, p_process_infos) -> ViewInfo | None:
 
         admin_infos = self.get_admin_infos(
@@ -172,10 +226,11 @@ class AdminDataHandler(PersistenceDependencyInjectionMixIn):
         admin_info.user_info = p_user_infos.get(p_username)
 
         if admin_info.user_info is not None:
-            for reference_date in sorted(p_days):
-                rule_set = self.rule_handler.get_active_ruleset(
-                    p_rule_sets=user.rulesets, p_reference_date=reference_date)
+            reference_dates = sorted(p_days)
+            rule_sets = self.rule_handler.get_active_rulesets(p_rule_sets=user.rulesets,
+                                                              p_reference_dates=reference_dates)
 
+            for reference_date, rule_set in zip(reference_dates, rule_sets):
                 day_info = self.get_day_info_for_user(p_admin_info=admin_info, p_username=p_username,
                                                       p_reference_date=reference_date, p_rule_set=rule_set)
 
@@ -361,12 +416,11 @@ class AdminDataHandler(PersistenceDependencyInjectionMixIn):
         active_time_extensions = self.time_extension_entity_manager.get_active_time_extensions(
             p_session_context=p_session_context, p_reference_datetime=reference_time)
 
-        users_stat_infos = process_statistics.get_process_statistics(
+        users_stat_infos = self.get_users_stat_infos(
+            p_session_context=p_session_context,
             p_process_infos=p_process_infos,
             p_reference_time=reference_time,
-            p_user_map=self.user_entity_manager.user_map(p_session_context),
-            p_max_lookback_in_days=self._config.process_lookback_in_days if p_include_history else 1,
-            p_min_activity_duration=self._config.min_activity_duration)
+            p_max_lookback_in_days=self._config.process_lookback_in_days if p_include_history else 1)
 
         for username in self.user_entity_manager.user_map(p_session_context).keys():
             user: User = self.user_entity_manager.user_map(p_session_context).get(username)
@@ -396,12 +450,11 @@ class AdminDataHandler(PersistenceDependencyInjectionMixIn):
         active_time_extensions = self.time_extension_entity_manager.get_active_time_extensions(
             p_session_context=p_session_context, p_reference_datetime=reference_time)
 
-        users_stat_infos = process_statistics.get_process_statistics(
+        users_stat_infos = self.get_users_stat_infos(
+            p_session_context=p_session_context,
             p_process_infos=p_process_infos,
             p_reference_time=reference_time,
-            p_user_map=self.user_entity_manager.user_map(p_session_context),
-            p_max_lookback_in_days=1,
-            p_min_activity_duration=self._config.min_activity_duration)
+            p_max_lookback_in_days=1)
 
         for username in self.user_entity_manager.user_map(p_session_context).keys():
             user: User = self.user_entity_manager.user_map(p_session_context).get(username)
@@ -430,12 +483,11 @@ class AdminDataHandler(PersistenceDependencyInjectionMixIn):
         active_time_extensions = self.time_extension_entity_manager.get_active_time_extensions(
             p_session_context=p_session_context, p_reference_datetime=reference_time)
 
-        users_stat_infos = process_statistics.get_process_statistics(
+        users_stat_infos = self.get_users_stat_infos(
+            p_session_context=p_session_context,
             p_process_infos=p_process_infos,
             p_reference_time=reference_time,
-            p_user_map=self.user_entity_manager.user_map(p_session_context),
-            p_max_lookback_in_days=self._config.process_lookback_in_days,
-            p_min_activity_duration=self._config.min_activity_duration)
+            p_max_lookback_in_days=self._config.process_lookback_in_days)
 
         user: User = self.user_entity_manager.get_by_id(p_session_context=p_session_context, p_id=p_user_id)
 
@@ -510,10 +562,11 @@ class AdminDataHandler(PersistenceDependencyInjectionMixIn):
         user_admin_details_tos = []
 
         if p_days:
-            for reference_date in sorted(p_days):
-                rule_set = self.rule_handler.get_active_ruleset(
-                    p_rule_sets=user.rulesets, p_reference_date=reference_date)
+            reference_dates = sorted(p_days)
+            rule_sets = self.rule_handler.get_active_rulesets(p_rule_sets=user.rulesets,
+                                                              p_reference_dates=reference_dates)
 
+            for reference_date, rule_set in zip(reference_dates, rule_sets):
                 if rule_set is not None:
                     key_rule_override = rule_override.get_key(p_username=p_username,
                                                               p_reference_date=reference_date)
@@ -625,12 +678,11 @@ class AdminDataHandler(PersistenceDependencyInjectionMixIn):
         active_time_extensions = self.time_extension_entity_manager.get_active_time_extensions(
             p_session_context=p_session_context, p_reference_datetime=reference_time)
 
-        users_stat_infos = process_statistics.get_process_statistics(
+        users_stat_infos = self.get_users_stat_infos(
+            p_session_context=p_session_context,
             p_process_infos=p_process_infos,
             p_reference_time=reference_time,
-            p_user_map=self.user_entity_manager.user_map(p_session_context),
-            p_max_lookback_in_days=self._config.process_lookback_in_days,
-            p_min_activity_duration=self._config.min_activity_duration)
+            p_max_lookback_in_days=self._config.process_lookback_in_days)
 
         user: User = self.user_entity_manager.get_by_id(p_session_context=p_session_context, p_id=p_user_id)
 
@@ -667,17 +719,17 @@ class AdminDataHandler(PersistenceDependencyInjectionMixIn):
             len(overrides), self._config.process_lookback_in_days)
         self._logger.info(fmt)
 
-    def get_current_rule_result_info(self, p_reference_time, p_process_infos, p_username):
+    def get_current_rule_result_info(self, p_reference_time, p_process_infos, p_username, p_process_statistics=None):
 
         a_rule_result_info = None
 
         with SessionContext(p_persistence=self.persistence) as session_context:
-            users_stat_infos = process_statistics.get_process_statistics(
+            users_stat_infos = self.get_users_stat_infos(
+                p_session_context=session_context,
                 p_process_infos=p_process_infos,
                 p_reference_time=p_reference_time,
                 p_max_lookback_in_days=1,
-                p_user_map=self.user_entity_manager.user_map(session_context),
-                p_min_activity_duration=self._config.min_activity_duration)
+                p_process_statistics=p_process_statistics)
 
             active_time_extensions = self.time_extension_entity_manager.get_active_time_extensions(
                 p_session_context=session_context, p_reference_datetime=tools.get_current_time())
@@ -6,6 +6,7 @@ from sqlalchemy import pool
 from little_brother.persistence import persistence_base, persistent_user_2_device, persistent_device, \
     persistent_process_info, \
     persistent_daily_user_status, persistent_user, persistent_rule_set, persistent_rule_override, \
+    persistent_daily_usage_rollup, \
     persistent_time_extension, \
     persistent_admin_event, \
     persistent_blacklisted_token, \
@@ -27,8 +27,11 @@ from little_brother import client_process_handler
 from little_brother import constants
 from little_brother import db_migrations
 from little_brother import dependency_injection
+from little_brother import german_vacation_context_rule_handler
 from little_brother import login_mapping
 from little_brother import rule_handler
+from little_brother.adaptive_scheduler import AdaptiveRecurringTask, AdaptiveScheduler, \
+    AdaptiveSchedulerConfigModel, SECTION_NAME as ADAPTIVE_SCHEDULER_SECTION_NAME
 from little_brother.admin_data_handler import AdminDataHandler
 from little_brother.alembic.versions import version_0_3_added_tables_for_configuration_gui as alembic_version_gui
 from little_brother.api.api_view_handler import ApiViewHandlerConfigModel
@@ -51,9 +54,12 @@ from little_brother.persistence.persistent_rule_set_entity_manager import RuleSe
 from little_brother.persistence.persistent_time_extension_entity_manager import TimeExtensionEntityManager
 from little_brother.persistence.persistent_user import User
 from little_brother.persistence.session_context import SessionContext
+from little_brother.proc_connector import ProcConnectorProcessIteratorFactory
+from little_brother.procfs_process_iterator import ProcFsProcessIteratorFactory
 from little_brother.prometheus import PrometheusClient, PrometheusClientConfigModel, \
     SECTION_NAME as PROMETHEUS_SECTION_NAME
 from little_brother.rule_handler import RuleHandler
+from little_brother.user_slice_process_iterator import UserSliceProcessIteratorFactory
 from little_brother.web import web_server
 from python_base_app import audio_handler
 from python_base_app import base_app
@@ -70,6 +76,7 @@ PACKAGE_NAME = 'little_brother'
 
 DEFAULT_USER_HANDLER = unix_user_handler.HANDLER_NAME
 DEFAULT_CLEAN_HISTORY_INTERVAL = 24 * 60 * 60  # seconds
+DEFAULT_PROCESS_INFO_EVICTION_INTERVAL = 60 * 60  # seconds
 
 LDAP_USER_HANDLER_SECTION_NAME = "LdapUserHandler"
 
@@ -81,6 +88,7 @@ class AppConfigModel(base_app.BaseAppConfigModel):
 
         self.check_interval = base_app.DEFAULT_TASK_INTERVAL
         self.clean_history_interval = DEFAULT_CLEAN_HISTORY_INTERVAL
+        self.process_info_eviction_interval = DEFAULT_PROCESS_INFO_EVICTION_INTERVAL
 
 
 def get_argument_parser(p_app_name):
@@ -129,6 +137,8 @@ class App(base_app.BaseApp):
         self._login_mapping = None
         self._admin_data_handler = None
         self._version_checker = None
+        self._proc_connector_process_iterator_factory: Optional[ProcConnectorProcessIteratorFactory] = None
+        self._adaptive_scheduler: Optional[AdaptiveScheduler] = None
 
         self._logger.info(f"class {self.__class__.__name__} is located at {__file__}")
 
@@ -148,6 +158,10 @@ class App(base_app.BaseApp):
         rule_handler_section = rule_handler.RuleHandlerConfigModel()
         p_configuration.add_section(rule_handler_section)
 
+        german_vacation_calendar_section = german_vacation_context_rule_handler.GermanVacationContextRuleHandlerConfig()
+        german_vacation_calendar_section.snapshot_dir = os.path.join("/var/spool", constants.DIR_NAME)
+        p_configuration.add_section(german_vacation_calendar_section)
+
         self._rule_set_section_handler = rule_handler.RuleSetSectionHandler()
         p_configuration.register_section_handler(p_section_handler=self._rule_set_section_handler)
 
@@ -169,6 +183,9 @@ class App(base_app.BaseApp):
         prometheus_client_section = PrometheusClientConfigModel()
         p_configuration.add_section(prometheus_client_section)
 
+        adaptive_scheduler_section = AdaptiveSchedulerConfigModel()
+        p_configuration.add_section(adaptive_scheduler_section)
+
         api_view_handler_section = ApiViewHandlerConfigModel()
         p_configuration.add_section(api_view_handler_section)
 
@@ -211,6 +228,14 @@ class App(base_app.BaseApp):
 
         return self._config[MASTER_CONNECTOR_SECTION_NAME].host_url is None
 
+    def create_recurring_task(self, p_name, p_handler_method, p_interval):
+
+        if self._adaptive_scheduler is None:
+            return base_app.RecurringTask(p_name=p_name, p_handler_method=p_handler_method, p_interval=p_interval)
+
+        return AdaptiveRecurringTask(p_name=p_name, p_handler_method=p_handler_method, p_interval=p_interval,
+                                     p_scheduler=self._adaptive_scheduler)
+
     def check_migrations(self):
 
         db_mig = db_migrations.DatabaseMigrations(p_logger=self._logger, p_persistence=self._persistence)
@@ -268,7 +293,8 @@ class App(base_app.BaseApp):
                 p_persistence=self._persistence)
 
             dependency_injection.container[RuleHandler] = self._rule_handler
-            self._rule_handler.register_rule_context_handlers()
+            self._rule_handler.register_rule_context_handlers(
+                p_german_vacation_calendar_config=self._config[german_vacation_context_rule_handler.SECTION_NAME])
 
         self._master_connector = MasterConnector(p_config=self._config[MASTER_CONNECTOR_SECTION_NAME])
 
@@ -281,9 +307,33 @@ class App(base_app.BaseApp):
 
         self.check_migrations()
 
+        client_process_handler_config = self._config[client_process_handler.SECTION_NAME]
+
+        if client_process_handler_config.scan_user_slices_only:
+            if client_process_handler_config.use_proc_connector:
+                msg = "Option use_proc_connector is ignored since scan_user_slices_only is active"
+                self._logger.warning(msg)
+
+            if client_process_handler_config.use_procfs_reader:
+                process_iterator_factory = UserSliceProcessIteratorFactory(
+                    p_process_iter=ProcFsProcessIteratorFactory().process_iter)
+
+            else:
+                process_iterator_factory = UserSliceProcessIteratorFactory()
+
+        elif client_process_handler_config.use_proc_connector:
+            self._proc_connector_process_iterator_factory = ProcConnectorProcessIteratorFactory()
+            process_iterator_factory = self._proc_connector_process_iterator_factory
+
+        elif client_process_handler_config.use_procfs_reader:
+            process_iterator_factory = ProcFsProcessIteratorFactory()
+
+        else:
+            process_iterator_factory = ProcessIteratorFactory()
+
         process_handler = client_process_handler.ClientProcessHandler(
-            p_config=self._config[client_process_handler.SECTION_NAME],
-            p_process_iterator_factory=ProcessIteratorFactory())
+            p_config=client_process_handler_config,
+            p_process_iterator_factory=process_iterator_factory)
 
         pinger_config = self._config[pinger.SECTION_NAME]
         self._pinger = pinger.Pinger(p_config=pinger_config)
@@ -306,6 +356,12 @@ class App(base_app.BaseApp):
 
         dependency_injection.container[PrometheusClient] = self._prometheus_client
 
+        adaptive_scheduler_config = self._config[ADAPTIVE_SCHEDULER_SECTION_NAME]
+
+        if adaptive_scheduler_config.is_active():
+            self._adaptive_scheduler = AdaptiveScheduler(p_config=adaptive_scheduler_config,
+                                                         p_prometheus_client=self._prometheus_client)
+
         unix_user_handler_config = self._config[unix_user_handler.SECTION_NAME]
         status_server_config = self._config[web_server.SECTION_NAME]
 
@@ -369,12 +425,18 @@ class App(base_app.BaseApp):
             p_device_handler=self._client_device_handler,
             p_notification_handlers=self._notification_handlers,
             p_locale_helper=self.locale_helper,
-            p_login_mapping=self._login_mapping)
+            p_login_mapping=self._login_mapping,
+            p_adaptive_scheduler=self._adaptive_scheduler,
+            p_prometheus_client=self._prometheus_client)
 
         dependency_injection.container[AppControl] = self._app_control
 
+        # The web views and the API share the statistics maintained by the process handler manager
+        self._admin_data_handler.set_process_statistics(
+            p_process_statistics=self._app_control._process_handler_manager.process_statistics)
+
         if self._config[APP_CONTROL_SECTION_NAME].scan_active:
-            task = base_app.RecurringTask(
+            task = self.create_recurring_task(
                 p_name="app_control.scan_processes(ProcessHandler)",
                 p_handler_method=lambda: self._app_control._process_handler_manager.scan_processes(
                     p_process_handler=process_handler),
@@ -400,6 +462,12 @@ class App(base_app.BaseApp):
                 p_interval=self._app_config.clean_history_interval)
             self.add_recurring_task(p_recurring_task=task)
 
+        task = base_app.RecurringTask(
+            p_name="app_control.evict_process_infos",
+            p_handler_method=lambda: self._app_control._process_handler_manager.evict_process_infos(),
+            p_interval=self._app_config.process_info_eviction_interval)
+        self.add_recurring_task(p_recurring_task=task)
+
         if status_server_config.is_active():
             self._status_server = web_server.StatusServer(
                 p_configs=self._config,
@@ -428,8 +496,8 @@ class App(base_app.BaseApp):
 
         dependency_injection.container[VersionChecker] = self._version_checker
 
-        task = base_app.RecurringTask(p_name="AppControl.check", p_handler_method=self._app_control.check,
-                                      p_interval=self._app_control.check_interval)
+        task = self.create_recurring_task(p_name="AppControl.check", p_handler_method=self._app_control.check,
+                                          p_interval=self._app_control.check_interval)
         self.add_recurring_task(p_recurring_task=task)
 
         device_activation_manager_config: DeviceActivationManagerConfigModel = \
@@ -487,6 +555,9 @@ class App(base_app.BaseApp):
 
     def start_services(self):
 
+        if self._proc_connector_process_iterator_factory is not None:
+            self._proc_connector_process_iterator_factory.start()
+
         if self._status_server is not None:
             self._status_server.start_server()
 
@@ -517,9 +588,19 @@ class App(base_app.BaseApp):
             self._prometheus_client.stop()
             self._prometheus_client = None
 
+        self._adaptive_scheduler = None
+
         for handler in self._notification_handlers:
             handler.stop_engine()
 
+        if self._process_handlers is not None:
+            for process_handler in self._process_handlers.values():
+                process_handler.shutdown()
+
+        if self._proc_connector_process_iterator_factory is not None:
+            self._proc_connector_process_iterator_factory.stop()
+            self._proc_connector_process_iterator_factory = None
+
         fmt = "Shutting down services -- END"
         self._logger.info(fmt)
 
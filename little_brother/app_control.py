@@ -23,11 +23,13 @@ import time
 import distro
 import prometheus_client
 
+from little_brother import adaptive_scheduler
 from little_brother import admin_event
+from little_brother import batch_rule_evaluation
 from little_brother import client_stats
 from little_brother import constants
 from little_brother import dependency_injection
-from little_brother import process_statistics
+from little_brother import rule_evaluation_scheduler
 from little_brother import rule_override
 from little_brother import settings
 from little_brother.admin_data_handler import AdminDataHandler
@@ -70,7 +72,9 @@ class AppControl(PersistenceDependencyInjectionMixIn):
                  p_device_handler=None,
                  p_notification_handlers=None,
                  p_login_mapping=None,
-                 p_locale_helper=None):
+                 p_locale_helper=None,
+                 p_adaptive_scheduler=None,
+                 p_prometheus_client=None):
 
         super().__init__()
 
@@ -84,12 +88,13 @@ class AppControl(PersistenceDependencyInjectionMixIn):
         self._rule_handler = None
         self._notification_handlers = p_notification_handlers
         self._master_connector = None
-        self._prometheus_client = None
+        self._prometheus_client = p_prometheus_client
         self._user_handler = None
         self._locale_helper = p_locale_helper
         self._time_last_successful_send_events = tools.get_current_time()
         self._user_locale_handler = UserLocaleHandler()
         self._admin_data_handler = None
+        self._adaptive_scheduler = p_adaptive_scheduler
 
         if self._config.hostname is None:
             self._host_name = socket.getfqdn()
@@ -107,11 +112,23 @@ class AppControl(PersistenceDependencyInjectionMixIn):
         self._event_handler.register_event_handler(
             p_event_type=admin_event.EVENT_TYPE_UPDATE_CONFIG, p_handler=self.handle_event_update_config)
 
-        self._language = Language()
+        self._language = Language(p_preload_locales=constants.LANGUAGES.keys())
+
+        # Rule results are kept until they may change
+        if self._config.use_rule_evaluation_scheduler:
+            self._rule_evaluation_scheduler = rule_evaluation_scheduler.RuleEvaluationScheduler()
+
+        else:
+            self._rule_evaluation_scheduler = None
+
+        # Created on demand since the configuration of the rule handler is required
+        self._batch_rule_evaluator = None
 
         self._process_handler_manager = ProcessHandlerManager(
             p_config=self._config, p_process_handlers=self._process_handlers, p_is_master=self.is_master(),
-            p_login_mapping=p_login_mapping, p_language=self._language)
+            p_login_mapping=p_login_mapping, p_language=self._language,
+            p_adaptive_scheduler=p_adaptive_scheduler, p_prometheus_client=p_prometheus_client,
+            p_rule_evaluation_scheduler=self._rule_evaluation_scheduler)
 
         dependency_injection.container[ProcessHandlerManager] = self._process_handler_manager
 
@@ -345,6 +362,9 @@ class AppControl(PersistenceDependencyInjectionMixIn):
         if not self.is_master():
             self.send_events()
 
+        if self._batch_rule_evaluator is not None:
+            self._batch_rule_evaluator.shutdown()
+
     def clean_history(self):
 
         history_length_in_days = self._config.history_length_in_days
@@ -361,6 +381,8 @@ class AppControl(PersistenceDependencyInjectionMixIn):
                 p_session_context=session_context, p_history_length_in_days=history_length_in_days)
             self.time_extension_entity_manager.delete_historic_entries(
                 p_session_context=session_context, p_history_length_in_days=history_length_in_days)
+            self.daily_usage_rollup_entity_manager.delete_historic_entries(
+                p_session_context=session_context, p_history_length_in_days=history_length_in_days)
 
     def handle_event_update_config(self, p_event):
 
@@ -442,9 +464,14 @@ class AppControl(PersistenceDependencyInjectionMixIn):
         fmt = "Processing rules for all users START..."
         self._logger.debug(fmt)
 
+        # Taken before the statistics so that changes arriving in between are rolled up in the next round
+        changed_days = None
+
+        if self._config.use_usage_rollups:
+            changed_days = self._process_handler_manager.pop_changed_statistics_days()
+
         with SessionContext(p_persistence=self.persistence) as session_context:
-            users_stat_infos = process_statistics.get_process_statistics(
-                p_process_infos=self._process_handler_manager.get_process_infos(),
+            users_stat_infos = self._process_handler_manager.get_process_statistics(
                 p_reference_time=p_reference_time,
                 p_max_lookback_in_days=self._config.process_lookback_in_days,
                 p_user_map=self.user_entity_manager.user_map(session_context),
@@ -453,50 +480,137 @@ class AppControl(PersistenceDependencyInjectionMixIn):
             active_time_extensions = self.time_extension_entity_manager.get_active_time_extensions(
                 p_session_context=session_context, p_reference_datetime=tools.get_current_time())
 
+            any_user_active = False
+            minimum_minutes_left = None
+
+            if self._rule_evaluation_scheduler is not None:
+                self._rule_evaluation_scheduler.update_due_users(p_reference_time=p_reference_time)
+
+            user_evaluations = []
+
             for user in self.user_entity_manager.users(session_context):
                 if user.active and user.username in self._user_manager.usernames:
+                    user_evaluations.append(self.get_user_rule_evaluation(
+                        p_session_context=session_context, p_user=user, p_users_stat_infos=users_stat_infos,
+                        p_active_time_extensions=active_time_extensions, p_reference_time=p_reference_time))
 
-                    user_active = False
+            self.evaluate_user_rules(p_user_evaluations=user_evaluations, p_reference_time=p_reference_time)
 
-                    user_locale = self._user_locale_handler.get_user_locale(
-                        p_username=user.username, p_session_context=session_context)
+            for user_evaluation in user_evaluations:
+                user = user_evaluation.user
+                stat_info = user_evaluation.stat_info
+                rule_result_info = user_evaluation.rule_result_info
+                user_active = False
 
-                    rule_set = self.rule_handler.get_active_ruleset(
-                        p_rule_sets=user.rulesets, p_reference_date=p_reference_time.date())
+                if rule_result_info is not None:
+                    if user_evaluation.evaluated:
+                        self.update_current_user_status(rule_result_info, session_context, stat_info, user)
+                        self._process_handler_manager.handle_rule_result_info(rule_result_info, stat_info, user)
 
-                    stat_infos = users_stat_infos.get(user.username)
+                        if self._rule_evaluation_scheduler is not None:
+                            self._rule_evaluation_scheduler.schedule(
+                                p_username=user.username, p_signature=user_evaluation.signature,
+                                p_result=rule_result_info,
+                                p_next_change_time=self.rule_handler.get_next_change_time(
+                                    p_rule_result_info=rule_result_info, p_stat_info=stat_info,
+                                    p_reference_time=p_reference_time))
 
-                    if stat_infos is not None:
-                        stat_info = stat_infos.get(rule_set.context)
+                    user_active = stat_info.current_activity is not None
 
-                        if stat_info is not None:
-                            self._logger.debug(str(stat_info))
+                    if user_active:
+                        minutes_left = rule_result_info.get_minutes_left()
 
-                            key_rule_override = rule_override.get_key(p_username=user.username,
-                                                                      p_reference_date=p_reference_time.date())
-                            override = self.admin_data_handler.rule_overrides.get(key_rule_override)
+                        if minutes_left is not None and \
+                                (minimum_minutes_left is None or minutes_left < minimum_minutes_left):
+                            minimum_minutes_left = minutes_left
 
-                            if override is not None:
-                                self._logger.debug(str(override))
+                any_user_active = any_user_active or user_active
 
-                            rule_result_info = self.rule_handler.process_rule_sets_for_user(
-                                p_rule_sets=user.rulesets,
-                                p_stat_info=stat_info,
-                                p_active_time_extension=active_time_extensions.get(user.username),
-                                p_reference_time=p_reference_time,
-                                p_rule_override=override,
-                                p_locale=user_locale)
+                if self.prometheus_client is not None:
+                    self.prometheus_client.set_user_active(p_username=user.username, p_is_active=user_active)
 
-                            self.update_current_user_status(rule_result_info, session_context, stat_info, user)
-                            self._process_handler_manager.handle_rule_result_info(rule_result_info, stat_info, user)
-                            user_active = stat_info.current_activity is not None
+            if self._config.use_usage_rollups:
+                self.admin_data_handler.usage_rollup_handler.write_rollups(
+                    p_session_context=session_context, p_users_stat_infos=users_stat_infos,
+                    p_reference_time=p_reference_time, p_changed_days=changed_days)
 
-                    if self.prometheus_client is not None:
-                        self.prometheus_client.set_user_active(p_username=user.username, p_is_active=user_active)
+            if self._adaptive_scheduler is not None:
+                self._adaptive_scheduler.set_activity(p_source=adaptive_scheduler.ACTIVITY_SOURCE_RULES,
+                                                      p_active=any_user_active)
+                self._adaptive_scheduler.set_minutes_left(p_minutes_left=minimum_minutes_left)
 
         fmt = "Processing rules for all users END..."
         self._logger.debug(fmt)
 
+    def get_user_rule_evaluation(self, p_session_context, p_user, p_users_stat_infos, p_active_time_extensions,
+                                 p_reference_time):
+
+        user_locale = self._user_locale_handler.get_user_locale(
+            p_username=p_user.username, p_session_context=p_session_context)
+
+        rule_set = self.rule_handler.get_active_ruleset(
+            p_rule_sets=p_user.rulesets, p_reference_date=p_reference_time.date())
+
+        stat_info = None
+        override = None
+        stat_infos = p_users_stat_infos.get(p_user.username)
+
+        if stat_infos is not None:
+            stat_info = stat_infos.get(rule_set.context)
+
+        if stat_info is not None:
+            self._logger.debug(str(stat_info))
+
+            key_rule_override = rule_override.get_key(p_username=p_user.username,
+                                                      p_reference_date=p_reference_time.date())
+            override = self.admin_data_handler.rule_overrides.get(key_rule_override)
+
+            if override is not None:
+                self._logger.debug(str(override))
+
+        user_evaluation = batch_rule_evaluation.UserRuleEvaluation(
+            p_user=p_user, p_stat_info=stat_info, p_rule_set=rule_set, p_rule_override=override,
+            p_active_time_extension=p_active_time_extensions.get(p_user.username), p_locale=user_locale)
+
+        if stat_info is not None and self._rule_evaluation_scheduler is not None:
+            user_evaluation.signature = rule_evaluation_scheduler.get_signature(
+                p_rule_sets=p_user.rulesets, p_active_rule_set=rule_set, p_rule_override=override,
+                p_active_time_extension=user_evaluation.active_time_extension, p_locale=user_locale)
+            user_evaluation.rule_result_info = self._rule_evaluation_scheduler.get_result(
+                p_username=p_user.username, p_signature=user_evaluation.signature)
+
+        return user_evaluation
+
+    def evaluate_user_rules(self, p_user_evaluations, p_reference_time):
+
+        # Evaluates the rules of all users without a valid result, either one by one or in a batch
+        due_evaluations = [user_evaluation for user_evaluation in p_user_evaluations
+                           if user_evaluation.stat_info is not None and user_evaluation.rule_result_info is None]
+
+        if self._config.rule_evaluation_workers > 0:
+            if self._batch_rule_evaluator is None:
+                self._batch_rule_evaluator = batch_rule_evaluation.BatchRuleEvaluator(
+                    p_config=self.rule_handler.config, p_max_workers=self._config.rule_evaluation_workers)
+
+            records = [user_evaluation.create_record(p_reference_time=p_reference_time)
+                       for user_evaluation in due_evaluations]
+
+            for user_evaluation, a_rule_result_info in zip(due_evaluations,
+                                                           self._batch_rule_evaluator.evaluate(p_records=records)):
+                user_evaluation.merge_result(p_rule_result_info=a_rule_result_info)
+
+            return
+
+        for user_evaluation in due_evaluations:
+            user_evaluation.rule_result_info = self.rule_handler.process_rule_sets_for_user(
+                p_rule_sets=user_evaluation.user.rulesets,
+                p_stat_info=user_evaluation.stat_info,
+                p_active_time_extension=user_evaluation.active_time_extension,
+                p_reference_time=p_reference_time,
+                p_rule_override=user_evaluation.rule_override,
+                p_locale=user_evaluation.locale)
+            user_evaluation.evaluated = True
+
     def update_current_user_status(self, p_rule_result_info, p_session_context, p_stat_info, p_user):
         current_user_status = self._user_manager.get_current_user_status(
             p_session_context=p_session_context, p_username=p_user.username)
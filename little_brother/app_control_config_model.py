@@ -34,6 +34,10 @@ DEFAULT_MAXIMUM_TIME_WITHOUT_SEND_EVENTS = 10 * DEFAULT_CHECK_INTERVAL  # minute
 DEFAULT_KILL_PROCESS_DELAY = 10  # seconds
 DEFAULT_TIME_EXTENSION_PERIODS = "-30,-15,-5,5,10,15,30,45,60"
 DEFAULT_UPDATE_CHANNEL = settings.MASTER_BRANCH_NAME
+DEFAULT_STATISTICS_CACHE_TIME_BUCKET = DEFAULT_CHECK_INTERVAL  # seconds
+DEFAULT_USE_USAGE_ROLLUPS = False
+DEFAULT_USE_RULE_EVALUATION_SCHEDULER = True
+DEFAULT_RULE_EVALUATION_WORKERS = 0
 
 SECTION_NAME = "AppControl"
 
@@ -60,6 +64,10 @@ class AppControlConfigModel(configuration.ConfigModel):
         self.kill_process_delay = DEFAULT_KILL_PROCESS_DELAY
         self.time_extension_periods = DEFAULT_TIME_EXTENSION_PERIODS
         self.update_channel = DEFAULT_UPDATE_CHANNEL
+        self.statistics_cache_time_bucket = DEFAULT_STATISTICS_CACHE_TIME_BUCKET
+        self.use_usage_rollups = DEFAULT_USE_USAGE_ROLLUPS
+        self.use_rule_evaluation_scheduler = DEFAULT_USE_RULE_EVALUATION_SCHEDULER
+        self.rule_evaluation_workers = DEFAULT_RULE_EVALUATION_WORKERS
         self._time_extension_periods_list = None
 
     @property
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Evaluation of the rules of many users in a pool of worker processes. The inputs of each user (effective rule set,
+# statistics, time extension) are turned into plain picklable records so that neither database entities nor the
+# process statistics have to be transferred to the workers. The rule result infos computed by the workers are merged
+# back by replacing the rule set records with the original rule sets.
+
+import concurrent.futures
+import multiprocessing
+
+from little_brother import rule_handler
+from little_brother import rule_result_info
+from python_base_app import log_handling
+
+# Below this number of records per worker the overhead of the pool exceeds the gain
+MIN_RECORDS_PER_WORKER = 32
+
+
+class RuleSetRecord(object):
+
+    __slots__ = ("min_time_of_day", "max_time_of_day", "max_time_per_day", "max_activity_duration", "min_break",
+                 "free_play")
+
+    def __init__(self, p_rule_set):
+        self.min_time_of_day = p_rule_set.min_time_of_day
+        self.max_time_of_day = p_rule_set.max_time_of_day
+        self.max_time_per_day = p_rule_set.max_time_per_day
+        self.max_activity_duration = p_rule_set.max_activity_duration
+        self.min_break = p_rule_set.min_break
+        self.free_play = p_rule_set.free_play
+
+
+class StatInfoRecord(object):
+
+    # Summary of the attributes of ProcessStatisticsInfo read by the rule checks
+    __slots__ = ("username", "notification_name", "reference_time", "todays_activity_duration",
+                 "current_activity_duration", "current_activity_start_time", "previous_activity_duration",
+                 "seconds_since_last_activity")
+
+    def __init__(self, p_stat_info):
+        self.username = p_stat_info.username
+        self.notification_name = p_stat_info.notification_name
+        self.reference_time = p_stat_info.reference_time
+        self.todays_activity_duration = p_stat_info.todays_activity_duration
+        self.current_activity_duration = p_stat_info.current_activity_duration
+        self.current_activity_start_time = p_stat_info.current_activity_start_time
+        self.previous_activity_duration = p_stat_info.previous_activity_duration
+        self.seconds_since_last_activity = p_stat_info.seconds_since_last_activity
+
+
+class TimeExtensionRecord(object):
+
+    __slots__ = ("start_datetime", "end_datetime")
+
+    def __init__(self, p_time_extension):
+        self.start_datetime = p_time_extension.start_datetime
+        self.end_datetime = p_time_extension.end_datetime
+
+
+class RuleEvaluationRecord(object):
+
+    __slots__ = ("rule_set", "stat_info", "time_extension", "reference_time", "locale")
+
+    def __init__(self, p_effective_rule_set, p_stat_info, p_active_time_extension, p_reference_time, p_locale):
+        self.rule_set = RuleSetRecord(p_effective_rule_set) if p_effective_rule_set is not None else None
+        self.stat_info = StatInfoRecord(p_stat_info)
+        self.time_extension = TimeExtensionRecord(p_active_time_extension) \
+            if p_active_time_extension is not None else None
+        self.reference_time = p_reference_time
+        self.locale = p_locale
+
+
+class UserRuleEvaluation(object):
+
+    # Inputs and result of the rule evaluation of a single user in the main process
+
+    def __init__(self, p_user, p_stat_info, p_rule_set, p_rule_override, p_active_time_extension, p_locale):
+        self.user = p_user
+        self.stat_info = p_stat_info
+        self.rule_set = p_rule_set
+        self.rule_override = p_rule_override
+        self.active_time_extension = p_active_time_extension
+        self.locale = p_locale
+        self.signature = None
+        self.rule_result_info = None
+        self.evaluated = False
+
+        if p_rule_set is None:
+            self.effective_rule_set = None
+
+        else:
+            self.effective_rule_set = rule_result_info.apply_override(p_rule_set=p_rule_set,
+                                                                      p_rule_override=p_rule_override)
+
+    def create_record(self, p_reference_time):
+
+        return RuleEvaluationRecord(p_effective_rule_set=self.effective_rule_set, p_stat_info=self.stat_info,
+                                    p_active_time_extension=self.active_time_extension,
+                                    p_reference_time=p_reference_time, p_locale=self.locale)
+
+    def merge_result(self, p_rule_result_info):
+
+        # The workers only know the rule set records
+        p_rule_result_info.default_rule_set = self.rule_set
+        p_rule_result_info.effective_rule_set = self.effective_rule_set
+        self.rule_result_info = p_rule_result_info
+        self.evaluated = True
+
+
+def evaluate_records(p_config, p_records):
+
+    # Entry point of the worker processes. Only the checks are run here, the active rule set has already been
+    # determined by the main process since the context rule handlers may need network access.
+    a_rule_handler = rule_handler.RuleHandler(p_config=p_config, p_persistence=None)
+    results = []
+
+    for record in p_records:
+        a_rule_result_info = rule_result_info.RuleResultInfo(p_default_rule_set=record.rule_set,
+                                                             p_user=record.stat_info.notification_name,
+                                                             p_locale=record.locale)
+        a_rule_handler.evaluate_rule_set(p_rule_result_info=a_rule_result_info, p_stat_info=record.stat_info,
+                                         p_active_time_extension=record.time_extension,
+                                         p_reference_time=record.reference_time)
+        results.append(a_rule_result_info)
+
+    return results
+
+
+class BatchRuleEvaluator(object):
+
+    def __init__(self, p_config, p_max_workers):
+
+        # p_config is the configuration of the rule handler
+        self._config = p_config
+        self._max_workers = p_max_workers
+        self._logger = log_handling.get_logger(self.__class__.__name__)
+        self._process_pool = None
+
+    @property
+    def max_workers(self):
+        return self._max_workers
+
+    def get_chunks(self, p_records):
+
+        chunk_count = min(self._max_workers, len(p_records) // MIN_RECORDS_PER_WORKER)
+
+        if chunk_count < 2:
+            return [p_records]
+
+        chunk_size = (len(p_records) + chunk_count - 1) // chunk_count
+        return [p_records[i:i + chunk_size] for i in range(0, len(p_records), chunk_size)]
+
+    def evaluate(self, p_records):
+
+        # Returns the rule result infos in the order of p_records
+        chunks = self.get_chunks(p_records=p_records)
+
+        if len(chunks) == 1:
+            return evaluate_records(p_config=self._config, p_records=p_records)
+
+        if self._process_pool is None:
+            fmt = "Starting pool of {count} worker processes for the rule evaluation"
+            self._logger.info(fmt.format(count=self._max_workers))
+
+            # The workers are spawned instead of forked since the application runs several threads
+            self._process_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self._max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+        futures = [self._process_pool.submit(evaluate_records, self._config, chunk) for chunk in chunks]
+        results = []
+
+        for future in futures:
+            results.extend(future.result())
+
+        return results
+
+    def shutdown(self):
+
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True)
+            self._process_pool = None
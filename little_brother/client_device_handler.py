@@ -17,6 +17,7 @@
 
 import little_brother.persistence.session_context
 from little_brother import admin_event
+from little_brother import process_info_store
 from little_brother.persistence.persistent_dependency_injection_mix_in import PersistenceDependencyInjectionMixIn
 from little_brother.process_handler import ProcessHandler
 from little_brother.process_handler import ProcessHandlerConfigModel
@@ -199,7 +200,7 @@ class ClientDeviceHandler(PersistenceDependencyInjectionMixIn, ProcessHandler):
 
         self._logger = log_handling.get_logger(self.__class__.__name__)
 
-        self._process_infos = {}
+        self._process_infos = process_info_store.ProcessInfoStore()
         self._device_infos = {}
 
     @property
@@ -15,16 +15,22 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+import contextlib
 import datetime
+import os
 import shlex
 import subprocess
+import time
 
 import psutil
 
 from little_brother import admin_event
 from little_brother import process_handler
 from little_brother import process_info
+from little_brother import process_info_store
 from little_brother.admin_event import AdminEvent
+from little_brother import kill_helper
+from little_brother.kill_executor import KillExecutor
 from little_brother.login_mapping import LoginMapping
 from little_brother.persistence.session_context import SessionContext
 from python_base_app import configuration
@@ -37,6 +43,20 @@ PROCESS_ID_PATTERN = "pid"
 USER_ID_PATTERN = "uid"
 SIGNAL_ID_PATTERN = "signal"
 DEFAULT_SCAN_COMMAND_LINE_OPTIONS = False
+DEFAULT_SCAN_INCREMENTALLY = False
+DEFAULT_USE_PROC_CONNECTOR = False
+DEFAULT_USE_PROCFS_READER = False
+DEFAULT_SCAN_USER_SLICES_ONLY = False
+DEFAULT_KILL_ASYNCHRONOUSLY = False
+DEFAULT_USE_KILL_HELPER = False
+DEFAULT_KILL_HELPER_SOCKET = kill_helper.DEFAULT_SOCKET_PATH
+DEFAULT_KILL_HELPER_COMMAND = kill_helper.INSTALLED_COMMAND
+DEFAULT_KILL_COMMAND_PATTERN = "/bin/kill -{signal} {pid}"
+KILL_HELPER_START_TIMEOUT = 5  # seconds
+
+VERDICT_IGNORED = 0
+VERDICT_MONITORED = 1
+VERDICT_PROHIBITED = 2
 
 
 class ClientProcessHandlerConfigModel(process_handler.ProcessHandlerConfigModel):
@@ -49,22 +69,91 @@ class ClientProcessHandlerConfigModel(process_handler.ProcessHandlerConfigModel)
         if tools.is_mac_os():
             self.terminate_session_command_pattern = "/bin/launchctl bootout gui/{uid}"
         else:
-            self.terminate_session_command_pattern = "/bin/kill -{signal} {pid}"
+            self.terminate_session_command_pattern = DEFAULT_KILL_COMMAND_PATTERN
 
-        self.kill_command_pattern = "/bin/kill -{signal} {pid}"
+        self.kill_command_pattern = DEFAULT_KILL_COMMAND_PATTERN
 
         self.kill_delay = 5  # seconds
+        self.kill_asynchronously = DEFAULT_KILL_ASYNCHRONOUSLY
+        self.use_kill_helper = DEFAULT_USE_KILL_HELPER
+        self.kill_helper_socket = DEFAULT_KILL_HELPER_SOCKET
+        self.kill_helper_command = DEFAULT_KILL_HELPER_COMMAND
         self.scan_command_line_options = DEFAULT_SCAN_COMMAND_LINE_OPTIONS
+        self.scan_incrementally = DEFAULT_SCAN_INCREMENTALLY
+        self.use_proc_connector = DEFAULT_USE_PROC_CONNECTOR
+        self.use_procfs_reader = DEFAULT_USE_PROCFS_READER
+        self.scan_user_slices_only = DEFAULT_SCAN_USER_SLICES_ONLY
+
+
+class ProcessVerdict(object):
+
+    def __init__(self, p_verdict, p_username=None, p_processname=None, p_pid=None, p_start_time=None, p_key=None):
+        self.verdict = p_verdict
+        self.username = p_username
+        self.processname = p_processname
+        self.pid = p_pid
+        self.start_time = p_start_time
+        self.key = p_key
+
+
+IGNORED_PROCESS_VERDICT = ProcessVerdict(p_verdict=VERDICT_IGNORED)
+
+
+class ProcessAttributePlan(object):
+    # Process attributes (besides uids, pid and create time) required by the matchers of a user.
+    # Reading /proc/<pid>/cmdline is comparatively expensive so that the command line is only read if the
+    # command line options are scanned or if the user has prohibited processes.
+
+    def __init__(self, p_need_name, p_need_cmdline, p_check_prohibited):
+        self.need_name = p_need_name
+        self.need_cmdline = p_need_cmdline
+        self.check_prohibited = p_check_prohibited
+
+    def __eq__(self, p_other):
+        return isinstance(p_other, ProcessAttributePlan) and \
+            (self.need_name, self.need_cmdline, self.check_prohibited) == \
+            (p_other.need_name, p_other.need_cmdline, p_other.check_prohibited)
+
+    def __repr__(self):
+        return f"ProcessAttributePlan(need_name={self.need_name}, need_cmdline={self.need_cmdline}, " \
+               f"check_prohibited={self.check_prohibited})"
+
+
+def get_oneshot_context(p_proc):
+    # psutil.Process.oneshot() caches the values read from /proc/<pid>/stat (name, create time, ...) so that
+    # they are read only once. Other process implementations do not provide it.
+    oneshot = getattr(p_proc, "oneshot", None)
+
+    if oneshot is None:
+        return contextlib.nullcontext()
+
+    return oneshot()
 
 
 class ClientProcessHandler(process_handler.ProcessHandler):
 
-    def __init__(self, p_config, p_process_iterator_factory):
+    def __init__(self, p_config, p_process_iterator_factory, p_kill_helper_client=None):
 
         super().__init__(p_config=p_config)
         self._process_iterator_factory = p_process_iterator_factory
         self._logger = log_handling.get_logger(self.__class__.__name__)
-        self._process_infos = {}
+        self._process_infos = process_info_store.ProcessInfoStore()
+
+        # Verdicts of the processes seen during the last scan keyed by (pid, create_time). Only used if the
+        # incremental scan is active.
+        self._verdicts: dict[tuple, ProcessVerdict] = {}
+        self._verdict_context = None
+
+        # The kill helper is started on demand. A given client (e.g. for testing) is used as is.
+        self._kill_helper_client = p_kill_helper_client
+        self._kill_helper_process = None
+        self._kill_helper_failed = False
+
+        self._kill_executor = None
+
+        if self._config.kill_asynchronously:
+            self._kill_executor = KillExecutor(p_execute_command=self.execute_kill_command,
+                                               p_kill_delay=self._config.kill_delay)
 
     @staticmethod
     def can_kill_processes():
@@ -80,6 +169,14 @@ class ClientProcessHandler(process_handler.ProcessHandler):
     def kill_process_or_session(self, p_session_context: SessionContext, p_event, p_command_pattern,
                                 p_server_group=None, p_login_mapping=None) -> list[AdminEvent]:
 
+        if self._kill_executor is not None:
+            pending_kill_key = (p_event.pid, p_event.process_start_time)
+
+            if self._kill_executor.is_pending(pending_kill_key):
+                fmt = f"Process {p_event.pid} of user '{p_event.username}' is already being killed -> ignoring event"
+                self._logger.debug(fmt)
+                return []
+
         fmt = "Kill process %d of user %s on host %s with signal SIGHUP" % (
             p_event.pid, p_event.username, p_event.hostname)
         self._logger.debug(fmt)
@@ -124,8 +221,125 @@ class ClientProcessHandler(process_handler.ProcessHandler):
 
         self._logger.info(fmt.format(**params))
 
+        if self._kill_executor is not None:
+            if not self._kill_executor.submit(p_key=pending_kill_key, p_proc=proc, p_params=params,
+                                              p_command_pattern=p_command_pattern):
+                fmt = f"Process {p_event.pid} of user '{p_event.username}' is already being killed -> ignoring event"
+                self._logger.debug(fmt)
+
+            return []
+
+        self.execute_kill_command(p_params=params, p_command_pattern=p_command_pattern)
+
+        _gone, alive = psutil.wait_procs([proc], timeout=self._config.kill_delay)
+
+        if len(alive) > 0:
+            params['signal'] = "SIGKILL"
+
+            fmt = "Second attempt: killing process {pid} of user '{username}' on host '{host}'"
+
+            if "{signal}" in p_command_pattern:
+                fmt = fmt + " with signal {signal}"
+
+            self._logger.info(fmt.format(**params))
+
+            self.execute_kill_command(p_params=params, p_command_pattern=p_command_pattern)
+
+        return []
+
+    def start_kill_helper(self):
+
+        socket_path = self._config.kill_helper_socket
+        cmd_array = shlex.split(self._config.sudo_command) + shlex.split(self._config.kill_helper_command)
+
+        # The default command line is the one permitted in the sudoers file. The helper takes the uid allowed to
+        # connect from sudo.
+        if socket_path != kill_helper.DEFAULT_SOCKET_PATH:
+            cmd_array.extend(["--socket", socket_path])
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        self._logger.info(f"Starting kill helper '{' '.join(cmd_array)}'...")
+        self._kill_helper_process = subprocess.Popen(cmd_array)
+        end_time = time.monotonic() + KILL_HELPER_START_TIMEOUT
+
+        while not os.path.exists(socket_path):
+            if self._kill_helper_process.poll() is not None:
+                raise kill_helper.KillHelperException(
+                    f"kill helper terminated with exit code {self._kill_helper_process.returncode}")
+
+            if time.monotonic() > end_time:
+                raise kill_helper.KillHelperException(f"kill helper did not create socket {socket_path}")
+
+            time.sleep(0.05)
+
+        self._kill_helper_client = kill_helper.KillHelperClient(p_socket_path=socket_path)
+
+    def get_kill_helper_client(self):
+
+        if self._kill_helper_client is None and not self._kill_helper_failed:
+            try:
+                self.start_kill_helper()
+
+            except Exception as e:
+                fmt = f"Cannot start kill helper: {e!s} -> using sudo command for every signal"
+                self._logger.warning(fmt)
+                self._kill_helper_failed = True
+                self.stop_kill_helper()
+
+        return self._kill_helper_client
+
+    def stop_kill_helper(self):
+
+        if self._kill_helper_client is not None:
+            self._kill_helper_client.close()
+            self._kill_helper_client = None
+
+        if self._kill_helper_process is not None:
+            self._kill_helper_process.terminate()
+
+            try:
+                self._kill_helper_process.wait(timeout=KILL_HELPER_START_TIMEOUT)
+
+            except subprocess.TimeoutExpired:
+                self._logger.warning("Kill helper did not terminate")
+
+            self._kill_helper_process = None
+
+    def send_signal_by_kill_helper(self, p_params) -> bool:
+
+        kill_helper_client = self.get_kill_helper_client()
+
+        if kill_helper_client is None:
+            return False
+
+        msg = f"Sending signal {p_params['signal']} to process {p_params['pid']} using kill helper..."
+        self._logger.debug(msg)
+
         try:
-            kill_command = self._config.sudo_command + " " + p_command_pattern.format(**params)
+            results = kill_helper_client.send_signals(
+                [{"pid": p_params['pid'], "uid": p_params['uid'], "signal": p_params['signal']}])
+
+        except kill_helper.KillHelperException as e:
+            self._logger.warning(f"{e!s} -> using sudo command")
+            return False
+
+        if results[0]["result"] != kill_helper.RESULT_OK:
+            fmt = "Error while killing process: {message}"
+            self._logger.warning(fmt.format(message=results[0].get("message")))
+
+        return True
+
+    def execute_kill_command(self, p_params, p_command_pattern):
+
+        # The kill helper is only able to send signals. Any other command has to be executed using sudo.
+        if self._config.use_kill_helper and p_command_pattern == DEFAULT_KILL_COMMAND_PATTERN and \
+                self.send_signal_by_kill_helper(p_params=p_params):
+            return
+
+        try:
+            kill_command = self._config.sudo_command + " " + p_command_pattern.format(**p_params)
 
         except Exception as e:
             msg = f"Exception '{e!s}' while generating kill command"
@@ -141,31 +355,115 @@ class ClientProcessHandler(process_handler.ProcessHandler):
             fmt = "Error while killing process: {stderr}"
             self._logger.warning(fmt.format(stderr=completed_process.stderr))
 
-        _gone, alive = psutil.wait_procs([proc], timeout=self._config.kill_delay)
+    def shutdown(self):
 
-        if len(alive) > 0:
-            params['signal'] = "SIGKILL"
+        if self._kill_executor is not None:
+            self._kill_executor.shutdown()
 
-            fmt = "Second attempt: killing process {pid} of user '{username}' on host '{host}'"
+        self.stop_kill_helper()
 
-            if "{signal}" in p_command_pattern:
-                fmt = fmt + " with signal {signal}"
+    def get_attribute_plans(self, p_process_regex_map,
+                            p_prohibited_process_regex_map) -> dict[str, ProcessAttributePlan]:
 
-            self._logger.info(fmt.format(**params))
+        scan_command_line_options = self._config.scan_command_line_options
+        attribute_plans = {}
 
-            kill_command = self._config.sudo_command + " " + p_command_pattern.format(**params)
+        for username in p_process_regex_map.keys():
+            has_prohibited_patterns = p_prohibited_process_regex_map is not None and \
+                                      p_prohibited_process_regex_map.get(username) is not None
+            attribute_plans[username] = ProcessAttributePlan(
+                p_need_name=not scan_command_line_options,
+                p_need_cmdline=scan_command_line_options or has_prohibited_patterns,
+                p_check_prohibited=has_prohibited_patterns)
 
-            fmt = "Executing sudo command '{cmd}'..."
-            self._logger.debug(fmt.format(cmd=kill_command))
+        return attribute_plans
 
-            cmd_array = shlex.split(kill_command)
-            completed_process = subprocess.run(cmd_array)
+    def classify_process(self, p_proc, p_session_context, p_server_group, p_login_mapping, p_host_name,
+                         p_process_regex_map, p_prohibited_process_regex_map,
+                         p_attribute_plans=None) -> ProcessVerdict:
 
-            if completed_process.stderr is not None and len(completed_process.stderr) > 0:
-                fmt = "Error while killing process: {stderr}"
-                self._logger.warning(fmt.format(stderr=completed_process.stderr))
+        uids = p_proc.uids()
 
-        return []
+        # On macOS the process we want to kill has the real user id set to root but the effective user id
+        # set to the actual user.
+        uid = uids.effective
+        username = p_login_mapping.get_login_by_uid(p_session_context=p_session_context,
+                                                    p_server_group=p_server_group, p_uid=uid)
+
+        if username is None or username not in p_process_regex_map:
+            return IGNORED_PROCESS_VERDICT
+
+        if p_attribute_plans is None:
+            p_attribute_plans = self.get_attribute_plans(
+                p_process_regex_map=p_process_regex_map,
+                p_prohibited_process_regex_map=p_prohibited_process_regex_map)
+
+        attribute_plan = p_attribute_plans[username]
+
+        with get_oneshot_context(p_proc):
+            full_cmd_line = ' '.join(p_proc.cmdline()) if attribute_plan.need_cmdline else None
+            name = p_proc.name() if attribute_plan.need_name else None
+
+            if self._config.scan_command_line_options:
+                proc_cmdline = full_cmd_line
+
+            else:
+                # Just take the name of the binary
+                proc_cmdline = name
+
+            if p_process_regex_map[username].match(proc_cmdline):
+                verdict = VERDICT_MONITORED
+
+            elif attribute_plan.check_prohibited and p_prohibited_process_regex_map[username].match(full_cmd_line):
+                verdict = VERDICT_PROHIBITED
+
+            else:
+                return IGNORED_PROCESS_VERDICT
+
+            if name is None:
+                name = p_proc.name()
+
+            start_time = datetime.datetime.fromtimestamp(
+                p_proc.create_time(), datetime.timezone.utc).astimezone().replace(tzinfo=None)
+
+        if verdict == VERDICT_MONITORED:
+            return ProcessVerdict(p_verdict=VERDICT_MONITORED, p_username=username, p_processname=name,
+                                  p_pid=p_proc.pid, p_start_time=start_time,
+                                  p_key=process_info.get_key(p_hostname=p_host_name, p_pid=p_proc.pid,
+                                                             p_start_time=start_time))
+
+        return ProcessVerdict(p_verdict=VERDICT_PROHIBITED, p_username=username, p_processname=name,
+                              p_pid=p_proc.pid, p_start_time=start_time)
+
+    def check_verdict_context(self, p_server_group, p_login_mapping, p_process_regex_map,
+                              p_prohibited_process_regex_map):
+
+        # The cached verdicts are only valid as long as the login mapping and the patterns have not changed.
+        verdict_context = (p_server_group, p_login_mapping, p_login_mapping.version,
+                           None if p_process_regex_map is None else dict(p_process_regex_map),
+                           None if p_prohibited_process_regex_map is None else dict(p_prohibited_process_regex_map),
+                           self._config.scan_command_line_options)
+
+        if verdict_context != self._verdict_context:
+            if self._verdict_context is not None:
+                self._logger.debug("Login mapping or process patterns have changed -> dropping process verdicts")
+
+            self._verdicts = {}
+            self._verdict_context = verdict_context
+
+    @staticmethod
+    def get_monitored_uids(p_session_context, p_server_group, p_login_mapping, p_process_regex_map) -> list[int]:
+
+        uids = []
+
+        for username in p_process_regex_map.keys():
+            uid = p_login_mapping.get_uid_by_login(p_session_context=p_session_context,
+                                                   p_server_group=p_server_group, p_login=username)
+
+            if uid is not None:
+                uids.append(uid)
+
+        return uids
 
     def scan_processes(self, p_session_context, p_reference_time, p_server_group, p_login_mapping, p_host_name,
                        p_process_regex_map, p_prohibited_process_regex_map):
@@ -177,70 +475,98 @@ class ClientProcessHandler(process_handler.ProcessHandler):
         fmt = "Scanning processes for users {users}..."
         self._logger.debug(fmt.format(users=users))
 
-        for proc in self._process_iterator_factory.process_iter():
-            try:
-                uids = proc.uids()
-
-                # On macOS the process we want to kill has the real user id set to root but the effective user id
-                # set to the actual user.
-                uid = uids.effective
-                username = p_login_mapping.get_login_by_uid(p_session_context=p_session_context,
-                                                            p_server_group=p_server_group, p_uid=uid)
+        scan_incrementally = self._config.scan_incrementally
+        attribute_plans = self.get_attribute_plans(p_process_regex_map=p_process_regex_map,
+                                                   p_prohibited_process_regex_map=p_prohibited_process_regex_map)
 
-                if username is not None and username in p_process_regex_map:
+        if scan_incrementally:
+            self.check_verdict_context(p_server_group=p_server_group, p_login_mapping=p_login_mapping,
+                                       p_process_regex_map=p_process_regex_map,
+                                       p_prohibited_process_regex_map=p_prohibited_process_regex_map)
+            verdicts = self._verdicts
+            seen_verdict_keys = set()
+            new_process_count = 0
 
-                    full_cmd_line = ' '.join(proc.cmdline())
+        if self._config.scan_user_slices_only:
+            uids = self.get_monitored_uids(p_session_context=p_session_context, p_server_group=p_server_group,
+                                           p_login_mapping=p_login_mapping, p_process_regex_map=p_process_regex_map)
+            processes = self._process_iterator_factory.process_iter(p_uids=uids)
 
-                    if self._config.scan_command_line_options:
-                        proc_cmdline = full_cmd_line
+        else:
+            processes = self._process_iterator_factory.process_iter()
 
-                    else:
-                        # Just take the name of the binary
-                        proc_cmdline = proc.name()
-
-                    if p_process_regex_map[username].match(proc_cmdline):
-                        start_time = datetime.datetime.fromtimestamp(
-                            proc.create_time(), datetime.timezone.utc).astimezone().replace(tzinfo=None)
-                        key = process_info.get_key(p_hostname=p_host_name, p_pid=proc.pid, p_start_time=start_time)
-                        current_processes[key] = 1
-
-                        if key in self._process_infos:
-                            pinfo = self._process_infos[key]
-
-                            if pinfo.end_time is not None:
-                                event = self.create_admin_event_process_start_from_pinfo(p_pinfo=pinfo)
-                                events.append(event)
-
-                        else:
-                            event = admin_event.AdminEvent(
-                                p_event_type=admin_event.EVENT_TYPE_PROCESS_START,
-                                p_hostname=p_host_name,
-                                p_processhandler=self.id,
-                                p_username=username,
-                                p_processname=proc.name(),
-                                p_process_start_time=start_time,
-                                p_pid=proc.pid)
+        for proc in processes:
+            try:
+                if scan_incrementally:
+                    # psutil determines the create time when the process object is created and caches it
+                    # so that this does not require access to /proc for known processes.
+                    verdict_key = (proc.pid, proc.create_time())
+                    verdict = verdicts.get(verdict_key)
+
+                    if verdict is None:
+                        verdict = self.classify_process(
+                            p_proc=proc, p_session_context=p_session_context, p_server_group=p_server_group,
+                            p_login_mapping=p_login_mapping, p_host_name=p_host_name,
+                            p_process_regex_map=p_process_regex_map,
+                            p_prohibited_process_regex_map=p_prohibited_process_regex_map,
+                            p_attribute_plans=attribute_plans)
+                        verdicts[verdict_key] = verdict
+                        new_process_count += 1
+
+                    seen_verdict_keys.add(verdict_key)
+
+                else:
+                    verdict = self.classify_process(
+                        p_proc=proc, p_session_context=p_session_context, p_server_group=p_server_group,
+                        p_login_mapping=p_login_mapping, p_host_name=p_host_name,
+                        p_process_regex_map=p_process_regex_map,
+                        p_prohibited_process_regex_map=p_prohibited_process_regex_map,
+                        p_attribute_plans=attribute_plans)
+
+                if verdict.verdict == VERDICT_MONITORED:
+                    current_processes[verdict.key] = 1
+
+                    if verdict.key in self._process_infos:
+                        pinfo = self._process_infos[verdict.key]
+
+                        if pinfo.end_time is not None:
+                            event = self.create_admin_event_process_start_from_pinfo(p_pinfo=pinfo)
                             events.append(event)
 
-                    elif p_prohibited_process_regex_map[username] is not None and \
-                            p_prohibited_process_regex_map[username].match(full_cmd_line):
-                        start_time = datetime.datetime.fromtimestamp(
-                            proc.create_time(), datetime.timezone.utc).astimezone().replace(tzinfo=None)
-
+                    else:
                         event = admin_event.AdminEvent(
-                            p_event_type=admin_event.EVENT_TYPE_PROHIBITED_PROCESS,
+                            p_event_type=admin_event.EVENT_TYPE_PROCESS_START,
                             p_hostname=p_host_name,
                             p_processhandler=self.id,
-                            p_username=username,
-                            p_processname=proc.name(),
-                            p_process_start_time=start_time,
-                            p_pid=proc.pid)
+                            p_username=verdict.username,
+                            p_processname=verdict.processname,
+                            p_process_start_time=verdict.start_time,
+                            p_pid=verdict.pid)
                         events.append(event)
 
+                elif verdict.verdict == VERDICT_PROHIBITED:
+                    event = admin_event.AdminEvent(
+                        p_event_type=admin_event.EVENT_TYPE_PROHIBITED_PROCESS,
+                        p_hostname=p_host_name,
+                        p_processhandler=self.id,
+                        p_username=verdict.username,
+                        p_processname=verdict.processname,
+                        p_process_start_time=verdict.start_time,
+                        p_pid=verdict.pid)
+                    events.append(event)
+
             except psutil.NoSuchProcess as e:
                 msg = f"Ignoring exception '{e!s}' because process has disappeared"
                 self._logger.debug(msg)
 
+        if scan_incrementally:
+            # Processes that were not seen anymore have terminated (or their pid has been reused)
+            for verdict_key in verdicts.keys() - seen_verdict_keys:
+                del verdicts[verdict_key]
+
+            fmt = "Incremental scan: {new} new processes, {total} known processes"
+            self._logger.debug(fmt.format(new=new_process_count, total=len(verdicts)))
+
         for (key, pinfo) in self._process_infos.items():
             # If the end time of a current entry is None AND the process was started on the local host AND
             # the process is no longer running THEN send an EVENT_TYPE_PROCESS_END event!
@@ -25,6 +25,28 @@ _ = lambda x:x
 class RuleHandlerRunTimeException(RuntimeError):
     pass
 
+class ContextPredicate(object):
+
+    # Immutable result of compiling the context details of a rule set. The default implementation delegates to the
+    # context rule handler. Handlers may return subclasses which answer is_active without parsing the details again.
+
+    __slots__ = ("_context_rule_handler", "_details")
+
+    def __init__(self, p_context_rule_handler, p_details):
+        object.__setattr__(self, "_context_rule_handler", p_context_rule_handler)
+        object.__setattr__(self, "_details", p_details)
+
+    def __setattr__(self, p_name, p_value):
+        raise AttributeError("context predicates are read-only")
+
+    def is_active(self, p_reference_date):
+        return self._context_rule_handler.is_active(p_reference_date=p_reference_date, p_details=self._details)
+
+    @property
+    def version(self):
+        return self._context_rule_handler.data_version
+
+
 class AbstractContextRuleHandler(object, metaclass=abc.ABCMeta):
 
     def __init__(self, p_context_name, p_locale_helper=None):
@@ -44,6 +66,19 @@ class AbstractContextRuleHandler(object, metaclass=abc.ABCMeta):
     def is_active(self, p_reference_date, p_details):
         pass
 
+    @property
+    def data_version(self):
+        # Version of the run-time data the results of is_active depend on. The rule handler only reuses results
+        # obtained with the same version. Handlers return None while their results must not be cached at all
+        # (e.g. if their data is unavailable).
+        return 0
+
+    def compile_details(self, p_details):
+        # Turns the context details of a rule set into a ContextPredicate. The predicate is cached by the rule
+        # handler as long as the context and the details of the rule set do not change. Handlers should raise
+        # a ConfigurationException for invalid details here.
+        return ContextPredicate(p_context_rule_handler=self, p_details=p_details)
+
     def get_configuration_section_handler(self):
         return None
 
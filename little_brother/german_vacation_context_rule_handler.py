@@ -17,27 +17,32 @@
 
 import collections
 import datetime
-import json
+import functools
+import os.path
 
-import requests
 import wtforms
 
+from little_brother import vacation_calendar
 from little_brother.context_rule_handler import AbstractContextRuleHandler, RuleHandlerRunTimeException
 from python_base_app import configuration
 from python_base_app import log_handling
 
 # Dummy function to trigger extraction by pybabel...
-DECODING_ERROR_FMT = "error {exception} while decoding data from {url}"
 _ = lambda x: x
 
 _("vacation")
 
-DOWNLOAD_ERROR_FMT = "HTTP code {error_code} while downloading {url}"
-
 CALENDAR_CONTEXT_RULE_HANDLER_NAME = _("german-vacation-calendar")
 
 SECTION_NAME = "GermanVacationCalendar"
 
+SNAPSHOT_FILENAME = "german-vacation-calendar.json"
+
+DEFAULT_REFRESH_INTERVAL_IN_DAYS = 7
+DEFAULT_RETRY_INTERVAL = 60 * 60  # seconds
+DEFAULT_REQUEST_TIMEOUT = 30  # seconds
+DEFAULT_CACHE_SIZE = 4096
+
 ENTRY_FILTER = [
     'Herbst',
     'Weihnachten',
@@ -70,10 +75,25 @@ class GermanVacationContextRuleHandlerConfig(configuration.ConfigModel):
         self.vacation_type_url = "https://www.mehr-schulferien.de/api/v2.0/holiday_or_vacation_types"
         self.date_format = "%Y-%m-%d"
 
+        # Directory of the snapshot of the downloaded calendar. Without a directory the calendar is only kept in memory.
+        self.snapshot_dir = configuration.NONE_STRING
+        self.refresh_interval_in_days = DEFAULT_REFRESH_INTERVAL_IN_DAYS
+        self.retry_interval = DEFAULT_RETRY_INTERVAL
+        self.request_timeout = DEFAULT_REQUEST_TIMEOUT
+        self.cache_size = DEFAULT_CACHE_SIZE
+
+    @property
+    def snapshot_filename(self):
+
+        if self.snapshot_dir is None:
+            return None
+
+        return os.path.join(self.snapshot_dir, SNAPSHOT_FILENAME)
+
 
 class GermanVacationContextRuleHandler(AbstractContextRuleHandler):
 
-    def __init__(self):
+    def __init__(self, p_config=None):
 
         super().__init__(p_context_name=CALENDAR_CONTEXT_RULE_HANDLER_NAME)
 
@@ -82,144 +102,192 @@ class GermanVacationContextRuleHandler(AbstractContextRuleHandler):
         self._vacation_data = None
         self._vacation_type_map = None
         self._federal_state_map = None
+        self._vacation_index = None
+
+        if p_config is None:
+            p_config = GermanVacationContextRuleHandlerConfig()
+
+        self._config = p_config
+        self._snapshot = None
+        self._is_vacation_day = None
 
-        self._config = GermanVacationContextRuleHandlerConfig()
-        self._cache = {}
+        # Incremented whenever the vacation data is rebuilt
+        self._data_version = 0
+        self._data_available = False
 
     def get_configuration_section_handler(self):
         return configuration.SimpleConfigurationSectionHandler(p_config_model=self._config)
 
-    def check_vacation_type_map(self):
+    @property
+    def urls(self):
+        return [self._config.vacation_type_url, self._config.locations_url, self._config.vacation_data_url]
 
-        if self._vacation_type_map is None:
+    def get_snapshot(self):
 
-            url = self._config.vacation_type_url
-            request = requests.get(url)
+        if self._snapshot is None:
+            self._snapshot = vacation_calendar.CalendarSnapshot(
+                p_snapshot_filename=self._config.snapshot_filename,
+                p_refresh_interval=self._config.refresh_interval_in_days * 24 * 3600,
+                p_retry_interval=self._config.retry_interval,
+                p_request_timeout=self._config.request_timeout)
 
-            if request.status_code != 200:
-                fmt = DOWNLOAD_ERROR_FMT
-                raise RuleHandlerRunTimeException(fmt.format(error_code=request.status_code, url=url))
+        return self._snapshot
 
-            try:
-                result = json.loads(request.content.decode("UTF-8"))
-                vacation_types = result['data']
-                self._vacation_type_map = {vacation_type['id']: vacation_type['name'] for vacation_type in
-                                           vacation_types}
+    def get_document(self, p_url):
 
-            except Exception as e:
-                fmt = DECODING_ERROR_FMT
-                raise RuleHandlerRunTimeException(fmt.format(exception=str(e), url=url))
+        content = self.get_snapshot().get_content(p_url=p_url)
 
-            fmt = "downloaded index metadata for {count} vacation types"
-            self._logger.info(fmt.format(count=len(self._vacation_type_map)))
+        if content is None:
+            raise RuleHandlerRunTimeException("no calendar data available from {url}".format(url=p_url))
 
-    def check_locations(self):
+        return content
 
-        if self._federal_state_map is None:
+    def build_vacation_type_map(self):
 
-            url = self._config.locations_url
-            request = requests.get(url)
+        url = self._config.vacation_type_url
 
-            if request.status_code != 200:
-                fmt = DOWNLOAD_ERROR_FMT
-                raise RuleHandlerRunTimeException(fmt.format(error_code=request.status_code, url=url))
+        try:
+            vacation_types = self.get_document(p_url=url)['data']
+            self._vacation_type_map = {vacation_type['id']: vacation_type['name'] for vacation_type in
+                                       vacation_types}
 
-            try:
-                result = json.loads(request.content.decode("UTF-8"))
-                locations = result['data']
+        except RuleHandlerRunTimeException:
+            raise
 
-                fmt = "downloaded {count} locations of Germany"
-                self._logger.info(fmt.format(count=len(locations)))
+        except Exception as e:
+            fmt = vacation_calendar.DECODING_ERROR_FMT
+            raise RuleHandlerRunTimeException(fmt.format(exception=str(e), url=url))
 
-                self._federal_state_map = {location['name']: location['id'] for location in locations if
-                                           location['is_federal_state']}
+        fmt = "loaded index metadata for {count} vacation types"
+        self._logger.info(fmt.format(count=len(self._vacation_type_map)))
 
-            except Exception as e:
-                fmt = DECODING_ERROR_FMT
-                raise RuleHandlerRunTimeException(fmt.format(exception=str(e), url=url))
+    def build_locations(self):
+
+        url = self._config.locations_url
+
+        try:
+            locations = self.get_document(p_url=url)['data']
+
+            self._federal_state_map = {location['name']: location['id'] for location in locations if
+                                       location['is_federal_state']}
+
+        except RuleHandlerRunTimeException:
+            raise
+
+        except Exception as e:
+            fmt = vacation_calendar.DECODING_ERROR_FMT
+            raise RuleHandlerRunTimeException(fmt.format(exception=str(e), url=url))
+
+        fmt = "loaded index metadata for {count} federal states of Germany"
+        self._logger.info(fmt.format(count=len(self._federal_state_map)))
+
+    def build_vacation_data(self):
 
-            fmt = "downloaded index metadata for {count} federal states of Germany"
-            self._logger.info(fmt.format(count=len(self._federal_state_map)))
+        url = self._config.vacation_data_url
 
-    def check_vacation_data(self):
+        selected_vacation_types = [type_id for (type_id, type_name) in self._vacation_type_map.items() if
+                                   type_name in ENTRY_FILTER]
 
-        if self._vacation_data is None:
-            url = self._config.vacation_data_url
-            request = requests.get(url)
+        count = 0
 
-            if request.status_code != 200:
-                fmt = DOWNLOAD_ERROR_FMT
-                raise RuleHandlerRunTimeException(fmt.format(error_code=request.status_code, url=url))
+        try:
+            vacation_entries = self.get_document(p_url=url)['data']
+
+            vacation_data = {}
+
+            for (state_name, state_id) in self._federal_state_map.items():
+                entries = [VacationEntry(name=self._vacation_type_map[entry['holiday_or_vacation_type_id']],
+                                         start_date=datetime.datetime.strptime(entry['starts_on'],
+                                                                               self._config.date_format).date(),
+                                         end_date=datetime.datetime.strptime(entry['ends_on'],
+                                                                             self._config.date_format).date())
+                           for entry in vacation_entries if
+                           entry['location_id'] == state_id and
+                           entry['holiday_or_vacation_type_id'] in selected_vacation_types]
+                vacation_data[state_name] = entries
+                count = count + len(entries)
+
+        except RuleHandlerRunTimeException:
+            raise
+
+        except Exception as e:
+            fmt = vacation_calendar.DECODING_ERROR_FMT
+            raise RuleHandlerRunTimeException(fmt.format(exception=str(e), url=url))
+
+        self._vacation_data = vacation_data
+        self._vacation_index = {state_name: vacation_calendar.VacationIntervalIndex(p_vacation_entries=entries)
+                                for state_name, entries in vacation_data.items()}
 
-            selected_vacation_types = [type_id for (type_id, type_name) in self._vacation_type_map.items() if
-                                       type_name in ENTRY_FILTER]
+        # Results of the previous calendar must not be used anymore
+        self._is_vacation_day = functools.lru_cache(maxsize=self._config.cache_size)(self.lookup_vacation_day)
+        self._data_version = self._data_version + 1
 
-            count = 0
+        fmt = "loaded {count} vacation entries for Germany"
+        self._logger.info(fmt.format(count=count))
 
+    def build_data(self):
+
+        self.build_vacation_type_map()
+        self.build_locations()
+        self.build_vacation_data()
+
+    def check_data(self):
+
+        snapshot = self.get_snapshot()
+        reference_time = datetime.datetime.now()
+        changed = False
+
+        if snapshot.is_refresh_due(p_reference_time=reference_time):
             try:
-                result = json.loads(request.content.decode("UTF-8"))
-                vacation_entries = result['data']
-
-                self._vacation_data = {}
-
-                for (state_name, state_id) in self._federal_state_map.items():
-                    entries = [VacationEntry(name=self._vacation_type_map[entry['holiday_or_vacation_type_id']],
-                                             start_date=datetime.datetime.strptime(entry['starts_on'],
-                                                                                   self._config.date_format).date(),
-                                             end_date=datetime.datetime.strptime(entry['ends_on'],
-                                                                                 self._config.date_format).date())
-                               for entry in vacation_entries if
-                               entry['location_id'] == state_id and
-                               entry['holiday_or_vacation_type_id'] in selected_vacation_types]
-                    self._vacation_data[state_name] = entries
-                    count = count + len(entries)
+                changed = snapshot.refresh(p_urls=self.urls, p_reference_time=reference_time)
 
             except Exception as e:
-                fmt = DECODING_ERROR_FMT
-                raise RuleHandlerRunTimeException(fmt.format(exception=str(e), url=url))
+                if not snapshot.has_documents(p_urls=self.urls):
+                    raise
 
-            fmt = "downloaded {count} vacation entries for Germany"
-            self._logger.info(fmt.format(count=count))
+                fmt = "Exception '{msg}' while refreshing calender information -> using data downloaded at {date}"
+                self._logger.warning(fmt.format(msg=str(e), date=snapshot.downloaded_at))
 
-    def check_data(self):
+        if changed or self._vacation_data is None:
+            self.build_data()
 
-        self.check_vacation_type_map()
-        self.check_locations()
-        self.check_vacation_data()
+    @property
+    def data_version(self):
 
-    def is_active(self, p_reference_date, p_details):
+        # Refreshes the calendar when due since cached resolutions do not call is_active. Results obtained while the
+        # calendar is unavailable are only assumptions and must not be cached.
+        try:
+            self.check_data()
+
+        except Exception:
+            # Reported by is_active
+            self._data_available = False
+
+        return self._data_version if self._data_available else None
+
+    def lookup_vacation_day(self, p_reference_date, p_state_name):
 
-        state_name = p_details
+        vacation_index = self._vacation_index.get(p_state_name)
 
-        key = "{date}|{state}".format(date=datetime.datetime.strftime(p_reference_date, "%d%m%Y"), state=state_name)
+        if vacation_index is None:
+            fmt = "unknown federal state name {name}"
+            raise configuration.ConfigurationException(fmt.format(name=p_state_name))
 
-        cached_result = self._cache.get(key)
+        return vacation_index.contains(p_date=p_reference_date)
 
-        if cached_result is not None:
-            return cached_result
+    def is_active(self, p_reference_date, p_details):
 
         try:
             self.check_data()
 
         except Exception as e:
+            self._data_available = False
             msg = "Exception '{msg}' while retrieving calender information. Assuming that {date} is not a vacation day."
             self._logger.error(msg.format(msg=str(e), date=datetime.datetime.strftime(p_reference_date, "%d.%m.%Y")))
-            self._cache[key] = False
             return False
 
-        vacation_entries = self._vacation_data.get(p_details)
-
-        if vacation_entries is None:
-            fmt = "unknown federal state name {name}"
-            raise configuration.ConfigurationException(fmt.format(name=state_name))
-
-        for entry in vacation_entries:
-            if entry.start_date <= p_reference_date <= entry.end_date:
-                self._cache[key] = True
-                return True
-
-        self._cache[key] = False
-        return False
+        self._data_available = True
+        return self._is_vacation_day(p_reference_date, p_details)
 
     def summary(self, p_context_detail):
 
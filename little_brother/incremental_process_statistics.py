@@ -0,0 +1,469 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Incremental version of process_statistics.get_process_statistics(). Instead of sorting the boundaries of all
+# process infos on every call the boundaries are kept in a sorted list per user which is updated by bisection when a
+# process starts, ends or receives a downtime. The activities resulting from the sweep over the boundaries are kept
+# as well. Since an activity only depends on the boundaries up to its end a change only invalidates the activities
+# ending at or after the position of the change. The sweep is resumed from the end of the last valid activity when
+# the statistics are requested the next time. Retrieving the statistics only touches the activities inside the
+# lookback window so that the cost does not depend on the number of historic process infos kept in memory.
+#
+# The result is identical to the one of process_statistics.get_process_statistics() which is kept as the reference
+# implementation.
+#
+# Within one time bucket (usually the check interval) the rule engine, the web views and the API request the same
+# statistics several times. The statistics are therefore cached by (version of the process infos, user settings,
+# lookback, time bucket). Every change of a process info increases the version and clears the cache. A cache hit
+# returns the statistics computed for the reference time of the first request in the bucket. The result is shared
+# and must not be modified by the caller.
+
+import bisect
+import datetime
+import threading
+
+from little_brother import process_statistics
+from little_brother import vectorized_process_statistics
+from python_base_app import log_handling
+
+BOUNDARY_TYPE_START = "START"
+BOUNDARY_TYPE_END = "END"
+
+DEFAULT_CACHE_TIME_BUCKET = 0  # seconds
+
+# Minimum number of boundaries for which the NumPy sweep is used (if available)
+DEFAULT_VECTORIZED_SWEEP_THRESHOLD = 1000
+MAX_CACHE_ENTRIES = 16
+
+
+def get_user_config_signature(p_user_map):
+
+    # Captures all user settings which the statistics depend on
+    return tuple((username, user.process_name_pattern, user.notification_name, user.full_name,
+                  tuple(ruleset.context for ruleset in user.rulesets))
+                 for username, user in sorted(p_user_map.items()))
+
+
+def get_time_bucket(p_reference_time, p_cache_time_bucket):
+
+    # Buckets are aligned to midnight so that a bucket never spans two days
+    midnight = datetime.datetime.combine(p_reference_time.date(), datetime.time.min, tzinfo=p_reference_time.tzinfo)
+    return p_reference_time.date(), int((p_reference_time - midnight).total_seconds()) // p_cache_time_bucket
+
+
+class TimelineEntry(object):
+
+    def __init__(self, p_process_info, p_boundaries):
+        self.process_info = p_process_info
+        self.boundaries = p_boundaries
+
+
+class UserActivityTimeline(object):
+
+    def __init__(self, p_user, p_process_infos, p_vectorized_sweep_threshold=DEFAULT_VECTORIZED_SWEEP_THRESHOLD):
+
+        self._logger = log_handling.get_logger(self.__class__.__name__)
+        self._vectorized_sweep_threshold = p_vectorized_sweep_threshold
+
+        self.process_name_pattern = p_user.process_name_pattern
+        self._regex_process_name_pattern = p_user.regex_process_name_pattern
+
+        # Sorted list of (time, key, type) exactly as ordered by the full sweep
+        self._boundaries = []
+        self._entries: dict[str, TimelineEntry] = {}
+        self._open_process_infos = {}
+
+        # Closed activities and the boundary position at which each of them has been closed
+        self._activities = []
+        self._activity_start_times = []
+        self._activity_end_positions = []
+
+        # State of the sweep after the last boundary
+        self._active_processes = 0
+        self._current_activity = None
+        self._dirty = True
+
+        for pinfo in p_process_infos:
+            if pinfo.matches_process_name_pattern(p_process_name_pattern=self.process_name_pattern,
+                                                  p_regex_process_name_pattern=self._regex_process_name_pattern):
+                entry = TimelineEntry(p_process_info=pinfo, p_boundaries=self.get_boundaries(p_process_info=pinfo))
+                self._entries[pinfo.get_key()] = entry
+                self._boundaries.extend(entry.boundaries)
+
+                if pinfo.end_time is None:
+                    self._open_process_infos[pinfo.get_key()] = pinfo
+
+        self._boundaries.sort()
+
+    @staticmethod
+    def get_boundaries(p_process_info):
+
+        key = p_process_info.get_key()
+
+        if p_process_info.end_time is None:
+            return ((p_process_info.start_time, key, BOUNDARY_TYPE_START),)
+
+        return ((p_process_info.start_time, key, BOUNDARY_TYPE_START),
+                (p_process_info.end_time, key, BOUNDARY_TYPE_END))
+
+    def invalidate_from(self, p_position):
+
+        # Activities closed before the position are not affected by the change
+        count = bisect.bisect_left(self._activity_end_positions, p_position)
+        del self._activities[count:]
+        del self._activity_start_times[count:]
+        del self._activity_end_positions[count:]
+        self._dirty = True
+
+    def update_process_info(self, p_process_info):
+
+        key = p_process_info.get_key()
+        old_entry = self._entries.pop(key, None)
+        positions = []
+
+        if old_entry is not None:
+            for boundary in old_entry.boundaries:
+                position = bisect.bisect_left(self._boundaries, boundary)
+                del self._boundaries[position]
+                positions.append(position)
+
+        if p_process_info.matches_process_name_pattern(p_process_name_pattern=self.process_name_pattern,
+                                                       p_regex_process_name_pattern=self._regex_process_name_pattern):
+            entry = TimelineEntry(p_process_info=p_process_info,
+                                  p_boundaries=self.get_boundaries(p_process_info=p_process_info))
+            self._entries[key] = entry
+
+            for boundary in entry.boundaries:
+                position = bisect.bisect_left(self._boundaries, boundary)
+                self._boundaries.insert(position, boundary)
+                positions.append(position)
+
+        if p_process_info.end_time is None and key in self._entries:
+            if key not in self._open_process_infos:
+                self._open_process_infos[key] = p_process_info
+
+        else:
+            self._open_process_infos.pop(key, None)
+
+        if len(positions) > 0:
+            self.invalidate_from(p_position=min(positions))
+
+    def remove_process_info(self, p_process_info):
+
+        key = p_process_info.get_key()
+        entry = self._entries.pop(key, None)
+        self._open_process_infos.pop(key, None)
+
+        if entry is None:
+            return
+
+        positions = []
+
+        for boundary in entry.boundaries:
+            position = bisect.bisect_left(self._boundaries, boundary)
+            del self._boundaries[position]
+            positions.append(position)
+
+        self.invalidate_from(p_position=min(positions))
+
+    def sweep(self):
+
+        # Resume the sweep behind the last valid activity. At that point no process is active.
+        if len(self._activity_end_positions) > 0:
+            start_position = self._activity_end_positions[-1] + 1
+
+        else:
+            start_position = 0
+
+        if vectorized_process_statistics.is_available() and \
+                len(self._boundaries) - start_position >= self._vectorized_sweep_threshold:
+            self.sweep_vectorized(p_start_position=start_position)
+            return
+
+        active_processes = 0
+        current_activity = None
+
+        for position in range(start_position, len(self._boundaries)):
+            boundary_time, key, boundary_type = self._boundaries[position]
+            pinfo = self._entries[key].process_info
+
+            if boundary_type == BOUNDARY_TYPE_START:
+                if active_processes == 0:
+                    current_activity = process_statistics.Activity(p_start_time=boundary_time)
+
+                current_activity.add_host_process(pinfo.hostlabel, p_percent=pinfo.percent)
+                current_activity.set_downtime(p_downtime=pinfo.downtime)
+                active_processes = active_processes + 1
+
+            else:
+                if active_processes == 0:
+                    fmt = "Active processes less than zero"
+                    self._logger.warning(fmt)
+                    continue
+
+                active_processes = active_processes - 1
+
+                if active_processes == 0:
+                    current_activity.set_end_time(p_end_time=boundary_time)
+                    current_activity.set_downtime(p_downtime=pinfo.downtime)
+
+                    self._activities.append(current_activity)
+                    self._activity_start_times.append(current_activity.start_time)
+                    self._activity_end_positions.append(position)
+                    current_activity = None
+
+        self._active_processes = active_processes
+        self._current_activity = current_activity
+        self._dirty = False
+
+    def sweep_vectorized(self, p_start_position):
+
+        activities, end_positions, active_processes, current_activity = vectorized_process_statistics.sweep(
+            p_boundaries=self._boundaries[p_start_position:], p_start_type=BOUNDARY_TYPE_START,
+            p_get_process_info=lambda key: self._entries[key].process_info)
+
+        for activity, end_position in zip(activities, end_positions):
+            self._activities.append(activity)
+            self._activity_start_times.append(activity.start_time)
+            self._activity_end_positions.append(p_start_position + end_position)
+
+        self._active_processes = active_processes
+        self._current_activity = current_activity
+        self._dirty = False
+
+    def fill_stat_info(self, p_stat_info: process_statistics.ProcessStatisticsInfo):
+
+        if self._dirty:
+            self.sweep()
+
+        min_activity_duration = p_stat_info.min_activity_duration
+
+        # The previous activity is the last closed activity exceeding the minimum duration regardless of its date
+        for activity in reversed(self._activities):
+            if activity.duration > min_activity_duration:
+                p_stat_info.previous_activity = activity
+                p_stat_info.last_inactivity_start_time = activity.end_time
+                break
+
+        first_date = p_stat_info.reference_date - datetime.timedelta(days=p_stat_info.max_lookback_in_days)
+        first_index = 0
+
+        if len(self._activity_start_times) > 0:
+            first_time = datetime.datetime.combine(first_date, datetime.time.min,
+                                                   tzinfo=self._activity_start_times[0].tzinfo)
+            first_index = bisect.bisect_left(self._activity_start_times, first_time)
+
+        for activity in self._activities[first_index:]:
+            if activity.duration > min_activity_duration:
+                lookback = int((p_stat_info.reference_date - activity.start_time.date()).total_seconds() / (24 * 3600))
+                p_stat_info.day_statistics[lookback].add_activity(activity)
+
+        p_stat_info.active_processes = self._active_processes
+        p_stat_info.current_activity = self._current_activity
+
+        # Running processes are registered as candidates to be killed if required
+        for pinfo in self._open_process_infos.values():
+            p_stat_info.add_process_end(p_process_info=pinfo, p_end_time=p_stat_info.reference_time)
+
+
+class IncrementalProcessStatistics(object):
+
+    def __init__(self, p_cache_time_bucket=DEFAULT_CACHE_TIME_BUCKET, p_prometheus_client=None,
+                 p_vectorized_sweep_threshold=DEFAULT_VECTORIZED_SWEEP_THRESHOLD):
+
+        self._logger = log_handling.get_logger(self.__class__.__name__)
+        self._lock = threading.RLock()
+        self._prometheus_client = p_prometheus_client
+        self._vectorized_sweep_threshold = p_vectorized_sweep_threshold
+
+        # All process infos per user regardless of the process name pattern of the user
+        self._process_infos: dict[str, dict] = {}
+
+        # Timelines are created lazily and recreated when the process name pattern of the user changes
+        self._timelines: dict[str, UserActivityTimeline] = {}
+
+        # Statistics computed during the current time bucket. A value of 0 for the bucket disables the cache.
+        self._cache_time_bucket = p_cache_time_bucket
+        self._cache = {}
+        self._version = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # Days (username, date) whose statistics have changed since the last call of pop_changed_days(). None
+        # stands for all days. Initially all days are considered changed.
+        self._changed_days = None
+
+    @property
+    def version(self):
+        return self._version
+
+    def invalidate_cache(self):
+
+        with self._lock:
+            self._version = self._version + 1
+            self._cache = {}
+
+    def add_changed_day(self, p_process_info):
+
+        if self._changed_days is not None and p_process_info.start_time is not None:
+            # The process may also extend an activity which started on the previous day
+            start_date = p_process_info.start_time.date()
+            self._changed_days.add((p_process_info.username, start_date))
+            self._changed_days.add((p_process_info.username, start_date - datetime.timedelta(days=1)))
+
+    def set_all_days_changed(self):
+
+        with self._lock:
+            self._changed_days = None
+
+    def pop_changed_days(self):
+
+        with self._lock:
+            changed_days = self._changed_days
+            self._changed_days = set()
+            return changed_days
+
+    def update_process_info(self, p_process_info):
+
+        with self._lock:
+            self.add_changed_day(p_process_info=p_process_info)
+            user_process_infos = self._process_infos.get(p_process_info.username)
+
+            if user_process_infos is None:
+                user_process_infos = {}
+                self._process_infos[p_process_info.username] = user_process_infos
+
+            user_process_infos[p_process_info.get_key()] = p_process_info
+
+            timeline = self._timelines.get(p_process_info.username)
+
+            if timeline is not None:
+                timeline.update_process_info(p_process_info=p_process_info)
+
+            self.invalidate_cache()
+
+    def remove_process_infos(self, p_process_infos):
+
+        # Process infos which have been evicted from the process handlers
+        with self._lock:
+            for pinfo in p_process_infos:
+                self.add_changed_day(p_process_info=pinfo)
+                user_process_infos = self._process_infos.get(pinfo.username)
+
+                if user_process_infos is not None:
+                    user_process_infos.pop(pinfo.get_key(), None)
+
+                timeline = self._timelines.get(pinfo.username)
+
+                if timeline is not None:
+                    timeline.remove_process_info(p_process_info=pinfo)
+
+            if len(p_process_infos) > 0:
+                self.invalidate_cache()
+
+    def invalidate(self):
+
+        # Process infos have been changed without notification -> rebuild the timelines on the next request
+        with self._lock:
+            self._timelines = {}
+            self._changed_days = None
+            self.invalidate_cache()
+
+    def get_timeline(self, p_user) -> UserActivityTimeline:
+
+        timeline = self._timelines.get(p_user.username)
+
+        if timeline is None or timeline.process_name_pattern != p_user.process_name_pattern:
+            timeline = UserActivityTimeline(p_user=p_user,
+                                            p_process_infos=self._process_infos.get(p_user.username, {}).values(),
+                                            p_vectorized_sweep_threshold=self._vectorized_sweep_threshold)
+            self._timelines[p_user.username] = timeline
+
+        return timeline
+
+    def get_cache_key(self, p_user_map, p_reference_time, p_max_lookback_in_days, p_min_activity_duration):
+
+        return (self._version, get_user_config_signature(p_user_map=p_user_map), p_max_lookback_in_days,
+                p_min_activity_duration,
+                get_time_bucket(p_reference_time=p_reference_time, p_cache_time_bucket=self._cache_time_bucket))
+
+    def count_cache_request(self, p_hit):
+
+        if p_hit:
+            self.cache_hits = self.cache_hits + 1
+
+        else:
+            self.cache_misses = self.cache_misses + 1
+
+        if self._prometheus_client is not None:
+            self._prometheus_client.count_statistics_cache_request(p_hit=p_hit)
+
+    def get_process_statistics(self, p_user_map, p_reference_time, p_max_lookback_in_days, p_min_activity_duration):
+
+        if self._cache_time_bucket <= 0:
+            with self._lock:
+                return self.compute_process_statistics(
+                    p_user_map=p_user_map, p_reference_time=p_reference_time,
+                    p_max_lookback_in_days=p_max_lookback_in_days, p_min_activity_duration=p_min_activity_duration)
+
+        # Concurrent requests wait for the lock and reuse the statistics computed by the first request
+        with self._lock:
+            key = self.get_cache_key(p_user_map=p_user_map, p_reference_time=p_reference_time,
+                                     p_max_lookback_in_days=p_max_lookback_in_days,
+                                     p_min_activity_duration=p_min_activity_duration)
+            users_stat_infos = self._cache.get(key)
+            self.count_cache_request(p_hit=users_stat_infos is not None)
+
+            if users_stat_infos is None:
+                users_stat_infos = self.compute_process_statistics(
+                    p_user_map=p_user_map, p_reference_time=p_reference_time,
+                    p_max_lookback_in_days=p_max_lookback_in_days, p_min_activity_duration=p_min_activity_duration)
+
+                if len(self._cache) >= MAX_CACHE_ENTRIES:
+                    self._cache = {}
+
+                self._cache[key] = users_stat_infos
+
+            return users_stat_infos
+
+    def compute_process_statistics(self, p_user_map, p_reference_time, p_max_lookback_in_days,
+                                   p_min_activity_duration):
+
+        users_stat_infos = process_statistics.get_empty_stat_infos(
+            p_user_map=p_user_map,
+            p_reference_time=p_reference_time,
+            p_max_lookback_in_days=p_max_lookback_in_days,
+            p_min_activity_duration=p_min_activity_duration)
+
+        for username in self._process_infos.keys():
+            user = p_user_map.get(username)
+
+            if user is None:
+                users_stat_infos[username] = {}
+                continue
+
+            timeline = self.get_timeline(p_user=user)
+
+            for stat_info in users_stat_infos[username].values():
+                timeline.fill_stat_info(p_stat_info=stat_info)
+
+        for user_stat_infos in users_stat_infos.values():
+            for stat_info in user_stat_infos.values():
+                process_statistics.add_current_activity(p_stat_info=stat_info,
+                                                        p_max_lookback_in_days=p_max_lookback_in_days)
+
+        return users_stat_infos
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Executor killing processes without blocking the caller. The first signal (SIGHUP) is sent by a pool of worker
+# threads so that all processes of a user are signalled at the same time. Instead of waiting for the processes to
+# terminate a timer is started per process which sends SIGKILL if the process is still running after the kill
+# delay. Pending kills are kept in a table keyed by (pid, start time) so that repeated kill requests for a process
+# which is already being killed are dropped.
+
+import concurrent.futures
+import threading
+
+import psutil
+
+from python_base_app import log_handling
+
+DEFAULT_MAX_WORKERS = 8
+
+FIRST_SIGNAL = "SIGHUP"
+SECOND_SIGNAL = "SIGKILL"
+
+
+class PendingKill(object):
+
+    def __init__(self, p_key, p_proc, p_params, p_command_pattern):
+        self.key = p_key
+        self.proc = p_proc
+        self.params = p_params
+        self.command_pattern = p_command_pattern
+        self.timer = None
+
+
+class KillExecutor(object):
+
+    def __init__(self, p_execute_command, p_kill_delay, p_max_workers=DEFAULT_MAX_WORKERS):
+
+        # p_execute_command(p_params, p_command_pattern) sends a signal to a process
+        self._execute_command = p_execute_command
+        self._kill_delay = p_kill_delay
+        self._logger = log_handling.get_logger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        self._pending_kills: dict[tuple, PendingKill] = {}
+        self._thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=p_max_workers,
+                                                                  thread_name_prefix=self.__class__.__name__)
+        self._shut_down = False
+
+    @property
+    def pending_keys(self):
+        with self._lock:
+            return list(self._pending_kills.keys())
+
+    def is_pending(self, p_key) -> bool:
+        with self._lock:
+            return p_key in self._pending_kills
+
+    def submit(self, p_key, p_proc, p_params, p_command_pattern) -> bool:
+
+        pending_kill = PendingKill(p_key=p_key, p_proc=p_proc, p_params=dict(p_params, signal=FIRST_SIGNAL),
+                                   p_command_pattern=p_command_pattern)
+
+        with self._lock:
+            if self._shut_down or p_key in self._pending_kills:
+                return False
+
+            self._pending_kills[p_key] = pending_kill
+
+        self._thread_pool.submit(self._send_first_signal, pending_kill)
+        return True
+
+    def _execute(self, p_params, p_command_pattern):
+        try:
+            self._execute_command(p_params=p_params, p_command_pattern=p_command_pattern)
+
+        except Exception as e:
+            fmt = f"Exception '{e!s}' while sending signal {p_params['signal']} to process {p_params['pid']}"
+            self._logger.error(fmt)
+
+    def _send_first_signal(self, p_pending_kill: PendingKill):
+
+        self._execute(p_params=p_pending_kill.params, p_command_pattern=p_pending_kill.command_pattern)
+
+        with self._lock:
+            if self._shut_down:
+                return
+
+            timer = threading.Timer(self._kill_delay, self._send_second_signal, args=(p_pending_kill,))
+            timer.daemon = True
+            p_pending_kill.timer = timer
+            timer.start()
+
+    def _send_second_signal(self, p_pending_kill: PendingKill):
+
+        try:
+            # psutil also checks the create time so that a new process having the same pid is not killed
+            if p_pending_kill.proc.is_running():
+                params = dict(p_pending_kill.params, signal=SECOND_SIGNAL)
+
+                fmt = "Second attempt: killing process {pid} of user '{username}' on host '{host}'"
+
+                if "{signal}" in p_pending_kill.command_pattern:
+                    fmt = fmt + " with signal {signal}"
+
+                self._logger.info(fmt.format(**params))
+                self._execute(p_params=params, p_command_pattern=p_pending_kill.command_pattern)
+
+        except psutil.Error as e:
+            self._logger.debug(f"Ignoring exception '{e!s}' because process has disappeared")
+
+        finally:
+            with self._lock:
+                self._pending_kills.pop(p_pending_kill.key, None)
+
+    def shutdown(self):
+
+        with self._lock:
+            self._shut_down = True
+
+            for pending_kill in self._pending_kills.values():
+                if pending_kill.timer is not None:
+                    pending_kill.timer.cancel()
+
+            self._pending_kills = {}
+
+        self._thread_pool.shutdown(wait=True)
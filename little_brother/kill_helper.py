@@ -0,0 +1,397 @@
+#!/usr/bin/python3 -I
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Privileged helper sending signals to processes on behalf of LittleBrother. The helper is started once using sudo
+# and listens on a Unix domain socket so that killing a process does not require a fork/exec of sudo per signal.
+#
+# Protocol: every request and every response is a single line containing a JSON object.
+#
+#   request:  {"requests": [{"pid": 4711, "uid": 1000, "signal": "SIGHUP"}, ...]}
+#   response: {"results": [{"pid": 4711, "result": "ok"}, {"pid": 4712, "result": "error", "message": "..."}]}
+#
+# The helper only accepts connections from the configured client uid and only sends the signals in ALLOWED_SIGNALS
+# to processes whose effective uid matches the expected uid of the request. Processes of root and the processes
+# 0 and 1 are never signalled.
+#
+# When started by sudo the client uid is taken from SUDO_UID and the socket has to be located in SOCKET_DIR. The
+# socket is created in a private directory and only moved to its final location after its owner and mode have been
+# set so that no file operation of root follows a path the client is able to change.
+#
+# The helper only depends on the standard library. It is installed as INSTALLED_COMMAND owned by root outside the
+# virtual environment of LittleBrother which belongs to the user little-brother. Running as root the helper refuses
+# to start if its own files are writable by any other user.
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import tempfile
+import threading
+
+ALLOWED_SIGNALS = {
+    "SIGHUP": signal.SIGHUP,
+    "SIGTERM": signal.SIGTERM,
+    "SIGKILL": signal.SIGKILL,
+}
+
+MIN_PID = 2
+MIN_UID = 1
+MAX_REQUESTS_PER_MESSAGE = 1024
+MAX_MESSAGE_SIZE = 128 * 1024
+
+RESULT_OK = "ok"
+RESULT_ERROR = "error"
+
+DEFAULT_CLIENT_TIMEOUT = 5  # seconds
+
+INSTALLED_COMMAND = "/usr/sbin/little-brother-kill-helper"
+
+SOCKET_DIR = "/run/little-brother"
+DEFAULT_SOCKET_PATH = os.path.join(SOCKET_DIR, "kill-helper.sock")
+
+# Only the owner of the socket (and root) may connect
+SOCKET_UMASK = 0o177
+
+# struct ucred: pid, uid, gid
+UCRED_FORMAT = "3i"
+
+
+class KillHelperException(Exception):
+    pass
+
+
+def get_effective_uid(p_pid):
+
+    # Line "Uid: <real> <effective> <saved> <filesystem>"
+    with open(f"/proc/{p_pid}/status") as status_file:
+        for line in status_file:
+            if line.startswith("Uid:"):
+                return int(line.split()[2])
+
+    raise KillHelperException(f"no uid found for process {p_pid}")
+
+
+def check_not_writable_by_others(p_path):
+
+    # The file and all its parent directories must belong to root and must not be writable by any other user. Sticky
+    # parent directories (e.g. /tmp) are accepted since other users cannot replace the entries of root in them.
+    path = os.path.realpath(p_path)
+    sticky_allowed = False
+
+    while True:
+        status = os.stat(path)
+
+        if status.st_uid != 0:
+            raise KillHelperException(f"{path} is not owned by root")
+
+        if not (sticky_allowed and status.st_mode & stat.S_ISVTX) and \
+                (status.st_mode & stat.S_IWOTH or (status.st_mode & stat.S_IWGRP and status.st_gid != 0)):
+            raise KillHelperException(f"{path} is writable by other users than root")
+
+        sticky_allowed = True
+
+        parent = os.path.dirname(path)
+
+        if parent == path:
+            return
+
+        path = parent
+
+
+def check_installation():
+
+    for path in (__file__, sys.executable):
+        check_not_writable_by_others(p_path=path)
+
+
+def validate_request(p_request):
+
+    if not isinstance(p_request, dict):
+        raise KillHelperException("request is not an object")
+
+    pid = p_request.get("pid")
+    uid = p_request.get("uid")
+    signal_name = p_request.get("signal")
+
+    # bool is a subclass of int...
+    if type(pid) is not int or pid < MIN_PID:
+        raise KillHelperException(f"invalid pid {pid!r}")
+
+    if type(uid) is not int or uid < MIN_UID:
+        raise KillHelperException(f"invalid uid {uid!r}")
+
+    if signal_name not in ALLOWED_SIGNALS:
+        raise KillHelperException(f"signal {signal_name!r} not allowed")
+
+    return pid, uid, ALLOWED_SIGNALS[signal_name]
+
+
+def get_client_uid():
+    # When started by sudo only the invoking user may connect
+    sudo_uid = os.environ.get("SUDO_UID")
+    return os.getuid() if sudo_uid is None else int(sudo_uid)
+
+
+def validate_socket_path(p_socket_path):
+
+    socket_path = os.path.normpath(p_socket_path)
+
+    if not os.path.isabs(socket_path):
+        raise KillHelperException(f"socket path {p_socket_path} is not absolute")
+
+    if "SUDO_UID" in os.environ and os.path.dirname(socket_path) != SOCKET_DIR:
+        raise KillHelperException(f"socket path {p_socket_path} is not located in {SOCKET_DIR}")
+
+    return socket_path
+
+
+def get_peer_uid(p_socket):
+    ucred = p_socket.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize(UCRED_FORMAT))
+    _pid, uid, _gid = struct.unpack(UCRED_FORMAT, ucred)
+    return uid
+
+
+class KillHelper(object):
+
+    def __init__(self, p_kill=os.kill, p_get_effective_uid=get_effective_uid):
+        self._kill = p_kill
+        self._get_effective_uid = p_get_effective_uid
+
+    def handle_request(self, p_request):
+
+        pid = p_request.get("pid") if isinstance(p_request, dict) else None
+
+        try:
+            pid, uid, signal_number = validate_request(p_request=p_request)
+            current_uid = self._get_effective_uid(pid)
+
+            if current_uid != uid:
+                raise KillHelperException(f"uid {current_uid} of process {pid} does not match expected uid {uid}")
+
+            self._kill(pid, signal_number)
+            return {"pid": pid, "result": RESULT_OK}
+
+        except (KillHelperException, OSError, ValueError) as e:
+            return {"pid": pid, "result": RESULT_ERROR, "message": str(e)}
+
+    def handle_message(self, p_message: bytes) -> bytes:
+
+        try:
+            message = json.loads(p_message)
+            requests = message["requests"]
+
+            if not isinstance(requests, list) or len(requests) > MAX_REQUESTS_PER_MESSAGE:
+                raise KillHelperException("invalid list of requests")
+
+            response = {"results": [self.handle_request(p_request=request) for request in requests]}
+
+        except (ValueError, TypeError, KeyError, KillHelperException) as e:
+            response = {"error": f"invalid message: {e!s}"}
+
+        return json.dumps(response).encode() + b"\n"
+
+
+class KillHelperRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+
+        if self.server.client_uid is not None and get_peer_uid(self.request) != self.server.client_uid:
+            return
+
+        while True:
+            message = self.rfile.readline(MAX_MESSAGE_SIZE)
+
+            if not message.endswith(b"\n"):
+                # Connection closed or message too long
+                return
+
+            self.wfile.write(self.server.kill_helper.handle_message(p_message=message))
+
+
+class KillHelperServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, p_socket_path, p_client_uid=None, p_kill_helper=None):
+
+        self.client_uid = p_client_uid
+        self.kill_helper = KillHelper() if p_kill_helper is None else p_kill_helper
+
+        socket_path = validate_socket_path(p_socket_path=p_socket_path)
+        socket_dir, self._socket_name = os.path.split(socket_path)
+
+        # All further operations in the socket directory are relative to this descriptor
+        self._socket_dir_fd = os.open(socket_dir, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+
+        try:
+            self.check_socket_entry()
+            private_dir = tempfile.mkdtemp(dir=os.path.dirname(socket_dir))
+
+            try:
+                private_socket_path = os.path.join(private_dir, self._socket_name)
+                old_umask = os.umask(SOCKET_UMASK)
+
+                try:
+                    super().__init__(private_socket_path, KillHelperRequestHandler)
+
+                finally:
+                    os.umask(old_umask)
+
+                if self.client_uid is not None and os.geteuid() == 0:
+                    os.chown(private_socket_path, self.client_uid, -1)
+
+                os.rename(private_socket_path, self._socket_name, dst_dir_fd=self._socket_dir_fd)
+
+            finally:
+                shutil.rmtree(private_dir, ignore_errors=True)
+
+        except Exception:
+            self.close()
+            raise
+
+    def check_socket_entry(self):
+
+        # Symbolic links and any other files are never replaced
+        try:
+            status = os.stat(self._socket_name, dir_fd=self._socket_dir_fd, follow_symlinks=False)
+
+        except FileNotFoundError:
+            return False
+
+        if not stat.S_ISSOCK(status.st_mode):
+            raise KillHelperException(f"{self._socket_name} exists and is not a socket")
+
+        return True
+
+    def start_in_thread(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True, name=self.__class__.__name__)
+        thread.start()
+        return thread
+
+    def close(self):
+
+        if self._socket_dir_fd is None:
+            return
+
+        # The socket does not exist if the server failed before binding it
+        if getattr(self, "socket", None) is not None:
+            self.server_close()
+
+        try:
+            if self.check_socket_entry():
+                os.unlink(self._socket_name, dir_fd=self._socket_dir_fd)
+
+        except (KillHelperException, OSError):
+            pass
+
+        os.close(self._socket_dir_fd)
+        self._socket_dir_fd = None
+
+    def stop(self):
+        self.shutdown()
+        self.close()
+
+
+class KillHelperClient(object):
+
+    def __init__(self, p_socket_path, p_timeout=DEFAULT_CLIENT_TIMEOUT):
+        self._socket_path = p_socket_path
+        self._timeout = p_timeout
+        self._lock = threading.Lock()
+        self._socket = None
+        self._file = None
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self._timeout)
+        sock.connect(self._socket_path)
+        self._socket = sock
+        self._file = sock.makefile("rb")
+
+    def close(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = None
+            self._file = None
+
+    def send_signals(self, p_requests) -> list[dict]:
+
+        message = json.dumps({"requests": p_requests}).encode() + b"\n"
+
+        with self._lock:
+            try:
+                if self._socket is None:
+                    self._connect()
+
+                self._socket.sendall(message)
+                response = self._file.readline(MAX_MESSAGE_SIZE)
+
+            except OSError as e:
+                self.close()
+                raise KillHelperException(f"communication with kill helper failed: {e!s}")
+
+            if not response.endswith(b"\n"):
+                self.close()
+                raise KillHelperException("kill helper closed connection")
+
+        try:
+            response = json.loads(response)
+
+        except ValueError as e:
+            raise KillHelperException(f"invalid response from kill helper: {e!s}")
+
+        if "error" in response:
+            raise KillHelperException(response["error"])
+
+        return response["results"]
+
+
+def main(p_args=None):
+    parser = argparse.ArgumentParser(description="Privileged helper sending signals on behalf of LittleBrother")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH,
+                        help=f"path of the Unix domain socket (default: {DEFAULT_SOCKET_PATH})")
+    arguments = parser.parse_args(p_args)
+
+    try:
+        if os.geteuid() == 0:
+            check_installation()
+
+        server = KillHelperServer(p_socket_path=arguments.socket, p_client_uid=get_client_uid())
+
+    except (KillHelperException, OSError) as e:
+        parser.exit(status=1, message=f"Cannot start kill helper: {e!s}\n")
+
+    # Terminate together with the client
+    signal.signal(signal.SIGTERM, lambda _signum, _frame: sys.exit(0))
+
+    try:
+        server.serve_forever()
+
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -23,16 +23,24 @@ from python_base_app import log_handling
 
 _ = lambda x, y=None: x
 
+TRANSLATION_DOMAIN = "messages"
+
 
 class Language:
 
-    def __init__(self):
+    def __init__(self, p_preload_locales=None):
 
         self._logger = log_handling.get_logger(self.__class__.__name__)
 
         self.init_labels_and_notifications()
         self._locale_dir = os.path.join(os.path.dirname(__file__), "translations")
 
+        # Translated notification templates by locale and untranslated template
+        self._templates_by_locale = {}
+
+        if p_preload_locales is not None:
+            self.preload(p_locales=p_preload_locales)
+
     def init_labels_and_notifications(self):
 
         self.text_no_time_left = _("{user}, you do not have computer time left today.\nYou will be logged out.")
@@ -56,46 +64,68 @@ class Language:
         self.text_prohibited_process = _("{user}, you are not allowed to use {process_name} with this account. "
                                          "The program will be terminated.")
 
+    def get_notification_templates(self):
+
+        return [value for name, value in vars(self).items() if name.startswith("text_")]
+
+    def get_templates(self, p_locale):
+
+        # The message catalog of a locale is only read once. All notification templates are translated right away
+        # so that issuing a notification does not require any file access.
+        templates = self._templates_by_locale.get(p_locale)
+
+        if templates is None:
+            t = gettext.translation(TRANSLATION_DOMAIN, localedir=self._locale_dir,
+                                    languages=[p_locale], fallback=True)
+            templates = {template: t.gettext(template) for template in self.get_notification_templates()}
+            self._templates_by_locale[p_locale] = templates
+
+        return templates
+
+    def preload(self, p_locales):
+
+        for locale in p_locales:
+            self.get_templates(p_locale=locale)
+
+        fmt = "Preloaded notification templates for locale(s) {locales}"
+        self._logger.debug(fmt.format(locales=", ".join(p_locales)))
+
     def get_text_limited_session_start(self, p_locale, p_variables):
 
-        t = gettext.translation('messages', localedir=self._locale_dir,
-                                languages=[p_locale], fallback=True)
-        return t.gettext(self.text_limited_session_start).format(**p_variables)
+        templates = self.get_templates(p_locale=p_locale)
+        return templates[self.text_limited_session_start].format(**p_variables)
 
     def get_text_unlimited_session_start(self, p_locale, p_variables):
 
-        t = gettext.translation('messages', localedir=self._locale_dir,
-                                languages=[p_locale], fallback=True)
-        return t.gettext(self.text_unlimited_session_start).format(**p_variables)
+        templates = self.get_templates(p_locale=p_locale)
+        return templates[self.text_unlimited_session_start].format(**p_variables)
 
     def get_text_prohibited_process(self, p_locale, p_variables):
 
-        t = gettext.translation('messages', localedir=self._locale_dir,
-                                languages=[p_locale], fallback=True)
-        return t.gettext(self.text_prohibited_process).format(**p_variables)
+        templates = self.get_templates(p_locale=p_locale)
+        return templates[self.text_prohibited_process].format(**p_variables)
 
     def pick_text_for_ruleset(self, p_rule_result_info):
 
-        t = gettext.translation('messages', localedir=self._locale_dir,
-                                languages=[p_rule_result_info.locale], fallback=True)
+        templates = self.get_templates(p_locale=p_rule_result_info.locale)
 
         if p_rule_result_info.applying_rules & rule_result_info.RULE_TIME_PER_DAY:
-            return t.gettext(self.text_no_time_left).format(**p_rule_result_info.args)
+            return templates[self.text_no_time_left].format(**p_rule_result_info.args)
 
         elif p_rule_result_info.applying_rules & rule_result_info.RULE_DAY_BLOCKED:
-            return t.gettext(self.text_no_time_today).format(**p_rule_result_info.args)
+            return templates[self.text_no_time_today].format(**p_rule_result_info.args)
 
         elif p_rule_result_info.applying_rules & rule_result_info.RULE_TOO_EARLY:
-            return t.gettext(self.text_too_early).format(**p_rule_result_info.args)
+            return templates[self.text_too_early].format(**p_rule_result_info.args)
 
         elif p_rule_result_info.applying_rules & rule_result_info.RULE_TOO_LATE:
-            return t.gettext(self.text_too_late).format(**p_rule_result_info.args)
+            return templates[self.text_too_late].format(**p_rule_result_info.args)
 
         elif p_rule_result_info.applying_rules & rule_result_info.RULE_ACTIVITY_DURATION:
-            return t.gettext(self.text_need_break).format(**p_rule_result_info.args)
+            return templates[self.text_need_break].format(**p_rule_result_info.args)
 
         elif p_rule_result_info.applying_rules & rule_result_info.RULE_MIN_BREAK:
-            return t.gettext(self.text_min_break).format(**p_rule_result_info.args)
+            return templates[self.text_min_break].format(**p_rule_result_info.args)
 
         else:
             fmt = "pick_text_for_ruleset(): cannot derive text for rule result %d" % p_rule_result_info.applying_rules
@@ -104,20 +134,19 @@ class Language:
 
     def pick_text_for_approaching_logout(self, p_rule_result_info):
 
-        t = gettext.translation('messages', localedir=self._locale_dir,
-                                languages=[p_rule_result_info.locale], fallback=True)
+        templates = self.get_templates(p_locale=p_rule_result_info.locale)
 
         if p_rule_result_info.approaching_logout_rules & rule_result_info.RULE_ACTIVITY_DURATION:
-            return t.gettext(self.text_need_break_approaching).format(**p_rule_result_info.args)
+            return templates[self.text_need_break_approaching].format(**p_rule_result_info.args)
 
         elif p_rule_result_info.approaching_logout_rules & rule_result_info.RULE_TOO_LATE:
-            return t.gettext(self.text_too_late_approaching).format(**p_rule_result_info.args)
+            return templates[self.text_too_late_approaching].format(**p_rule_result_info.args)
 
         elif p_rule_result_info.approaching_logout_rules & rule_result_info.RULE_TIME_PER_DAY:
-            return t.gettext(self.text_no_time_left_approaching).format(**p_rule_result_info.args)
+            return templates[self.text_no_time_left_approaching].format(**p_rule_result_info.args)
 
         elif p_rule_result_info.approaching_logout_rules & rule_result_info.RULE_TIME_EXTENSION:
-            return t.gettext(self.text_no_time_left_in_time_extension).format(**p_rule_result_info.args)
+            return templates[self.text_no_time_left_in_time_extension].format(**p_rule_result_info.args)
 
         else:
             fmt = "pick_text_for_approaching_logout(): cannot derive text for rule result {mask}"
@@ -67,19 +67,66 @@ class LoginMapping(PersistenceDependencyInjectionMixIn):
 
         self._default_server_group = p_default_server_group
 
-    def get_uid_to_login_mapping(self, p_session_context: SessionContext,
-                                 p_server_group: str = DEFAULT_SERVER_GROUP) -> dict[int, str]:
+        # In-memory index of the uid mappings per server group. The index of a server group is loaded from the
+        # database on first access and kept up to date by add_entry(). The process scan loop resolves the uid of
+        # every process on the host so that lookups must not require a database round trip.
+        self._uid_to_login_index: dict[str, dict[int, str]] = {}
+        self._login_to_uid_index: dict[str, dict[str, int]] = {}
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self):
+
+        self._uid_to_login_index = {}
+        self._login_to_uid_index = {}
+        self._version += 1
+
+    def _load_index(self, p_session_context: SessionContext, p_server_group: str):
 
         uid_mappings = self.uid_mapping_entity_manager.get_by_server_group(p_session_context=p_session_context,
                                                                            p_server_group=p_server_group)
-        return {entry.uid: entry.username for entry in uid_mappings}
 
-    def get_login_to_uid_mapping(self, p_session_context: SessionContext,
+        self._uid_to_login_index[p_server_group] = {entry.uid: entry.username for entry in uid_mappings}
+        self._login_to_uid_index[p_server_group] = {entry.username: entry.uid for entry in uid_mappings}
+
+    def _get_uid_to_login_index(self, p_session_context: SessionContext, p_server_group: str) -> dict[int, str]:
+
+        if p_server_group is None:
+            p_server_group = self._default_server_group
+
+        index = self._uid_to_login_index.get(p_server_group)
+
+        if index is None:
+            self._load_index(p_session_context=p_session_context, p_server_group=p_server_group)
+            index = self._uid_to_login_index[p_server_group]
+
+        return index
+
+    def _get_login_to_uid_index(self, p_session_context: SessionContext, p_server_group: str) -> dict[str, int]:
+
+        if p_server_group is None:
+            p_server_group = self._default_server_group
+
+        index = self._login_to_uid_index.get(p_server_group)
+
+        if index is None:
+            self._load_index(p_session_context=p_session_context, p_server_group=p_server_group)
+            index = self._login_to_uid_index[p_server_group]
+
+        return index
+
+    def get_uid_to_login_mapping(self, p_session_context: SessionContext,
                                  p_server_group: str = DEFAULT_SERVER_GROUP) -> dict[int, str]:
 
-        uid_mappings = self.uid_mapping_entity_manager.get_by_server_group(p_session_context=p_session_context,
-                                                                           p_server_group=p_server_group)
-        return {entry.username: entry.uid for entry in uid_mappings}
+        return dict(self._get_uid_to_login_index(p_session_context=p_session_context, p_server_group=p_server_group))
+
+    def get_login_to_uid_mapping(self, p_session_context: SessionContext,
+                                 p_server_group: str = DEFAULT_SERVER_GROUP) -> dict[str, int]:
+
+        return dict(self._get_login_to_uid_index(p_session_context=p_session_context, p_server_group=p_server_group))
 
     def to_json(self, p_session_context: SessionContext):
 
@@ -111,30 +158,31 @@ class LoginMapping(PersistenceDependencyInjectionMixIn):
         self.uid_mapping_entity_manager.insert_or_update_uid_mapping(p_session_context=p_session_context,
                                                                      p_uid_mapping=uid_mapping)
 
+        uid_to_login = self._uid_to_login_index.get(p_server_group)
+        login_to_uid = self._login_to_uid_index.get(p_server_group)
 
-    def get_login_by_uid(self, p_session_context: SessionContext, p_uid: int,
-                         p_server_group: str = DEFAULT_SERVER_GROUP) -> Optional[str]:
+        if uid_to_login is not None and login_to_uid is not None:
+            old_username = uid_to_login.get(p_uid)
 
-        uid_mapping = self.uid_mapping_entity_manager.get_by_uid_and_server_group(
-            p_session_context=p_session_context, p_uid=p_uid, p_server_group=p_server_group)
+            if old_username is not None and login_to_uid.get(old_username) == p_uid:
+                del login_to_uid[old_username]
 
-        if uid_mapping:
-            return uid_mapping.username
+            uid_to_login[p_uid] = p_username
+            login_to_uid[p_username] = p_uid
 
-        else:
-            return None
+        self._version += 1
 
-    def get_uid_by_login(self, p_session_context: SessionContext,
-                         p_login: str, p_server_group: str = DEFAULT_SERVER_GROUP) -> Optional[int]:
+    def get_login_by_uid(self, p_session_context: SessionContext, p_uid: int,
+                         p_server_group: str = DEFAULT_SERVER_GROUP) -> Optional[str]:
 
-        uid_mapping = self.uid_mapping_entity_manager.get_by_username_and_server_group(
-            p_session_context=p_session_context, p_username=p_login, p_server_group=p_server_group)
+        return self._get_uid_to_login_index(p_session_context=p_session_context,
+                                            p_server_group=p_server_group).get(p_uid)
 
-        if uid_mapping:
-            return uid_mapping.uid
+    def get_uid_by_login(self, p_session_context: SessionContext,
+                         p_login: str, p_server_group: str = DEFAULT_SERVER_GROUP) -> Optional[int]:
 
-        else:
-            return None
+        return self._get_login_to_uid_index(p_session_context=p_session_context,
+                                            p_server_group=p_server_group).get(p_login)
 
     def read_from_configuration(self, p_session_context: SessionContext,
                                 p_login_mapping_section_handler: LoginMappingSectionHandler):
@@ -156,3 +204,5 @@ class LoginMapping(PersistenceDependencyInjectionMixIn):
                     uid_mapping.username = match.group(1)
                     self.uid_mapping_entity_manager.insert_or_update_uid_mapping(p_session_context=p_session_context,
                                                                                  p_uid_mapping=uid_mapping)
+
+        self.invalidate()
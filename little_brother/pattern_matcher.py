@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Matcher for the (prohibited) process name pattern lists of users. A pattern list contains one pattern per line.
+# Historically, the list was turned into a single regular expression '(.*a.*)|(.*b.*)|...' (or 'a|b|...' for
+# lists containing paths) which performs badly for long lists. The matcher has the same semantics but handles
+# patterns without any regular expression meta characters separately:
+#
+# * Substring patterns are searched for simultaneously using an Aho-Corasick automaton.
+# * Prefix patterns (lists containing paths) are checked using str.startswith().
+#
+# Only the remaining "real" regular expressions are combined into a single regular expression as before.
+
+import functools
+import re
+
+REGEX_META_CHARACTERS = frozenset(".^$*+?{}[]\\|()")
+
+MATCH_MODE_SUBSTRING = "substring"
+MATCH_MODE_PREFIX = "prefix"
+
+PATTERN_MATCHER_CACHE_SIZE = 256
+
+
+def normalize_pattern_list(p_pattern_list: str) -> list[str]:
+    pattern_list = p_pattern_list.replace('\r', '').split("\n")
+
+    # Sub patterns having only one character are ignored
+    return [entry.strip() for entry in pattern_list if len(entry.strip()) > 1]
+
+
+def is_literal(p_pattern: str) -> bool:
+    return not any(c in REGEX_META_CHARACTERS for c in p_pattern)
+
+
+def get_match_mode(p_pattern_list: str, p_check_path_component: bool) -> str:
+    if "/" in p_pattern_list and p_check_path_component:
+        return MATCH_MODE_PREFIX
+
+    return MATCH_MODE_SUBSTRING
+
+
+def get_combined_regex(p_patterns: list[str], p_match_mode: str):
+    if len(p_patterns) == 0:
+        return None
+
+    if p_match_mode == MATCH_MODE_PREFIX:
+        return re.compile('|'.join(p_patterns))
+
+    return re.compile('(.*' + '.*)|(.*'.join(p_patterns) + '.*)')
+
+
+class AhoCorasickAutomaton(object):
+
+    def __init__(self, p_keywords):
+
+        # State 0 is the root. The transitions of each state are stored in a dictionary.
+        self._transitions: list[dict[str, int]] = [{}]
+        self._failure: list[int] = [0]
+        self._accepting: list[bool] = [False]
+
+        for keyword in p_keywords:
+            self._add_keyword(p_keyword=keyword)
+
+        self._build_failure_links()
+
+    def _add_keyword(self, p_keyword):
+        state = 0
+
+        for c in p_keyword:
+            next_state = self._transitions[state].get(c)
+
+            if next_state is None:
+                next_state = len(self._transitions)
+                self._transitions.append({})
+                self._failure.append(0)
+                self._accepting.append(False)
+                self._transitions[state][c] = next_state
+
+            state = next_state
+
+        self._accepting[state] = True
+
+    def _build_failure_links(self):
+        queue = list(self._transitions[0].values())
+        index = 0
+
+        while index < len(queue):
+            state = queue[index]
+            index += 1
+
+            for (c, next_state) in self._transitions[state].items():
+                queue.append(next_state)
+                failure = self._failure[state]
+
+                while failure > 0 and c not in self._transitions[failure]:
+                    failure = self._failure[failure]
+
+                failure = self._transitions[failure].get(c, 0)
+
+                if failure == next_state:
+                    failure = 0
+
+                self._failure[next_state] = failure
+
+                # A state is accepting if any of its proper suffixes is a keyword
+                if self._accepting[failure]:
+                    self._accepting[next_state] = True
+
+    def search(self, p_text: str) -> bool:
+        transitions = self._transitions
+        failure = self._failure
+        accepting = self._accepting
+        state = 0
+
+        for c in p_text:
+            while state > 0 and c not in transitions[state]:
+                state = failure[state]
+
+            state = transitions[state].get(c, 0)
+
+            if accepting[state]:
+                return True
+
+        return False
+
+
+class PatternMatcher(object):
+
+    def __init__(self, p_pattern_list: str, p_check_path_component: bool):
+
+        self.pattern = p_pattern_list
+        self._check_path_component = p_check_path_component
+        self._match_mode = get_match_mode(p_pattern_list=p_pattern_list, p_check_path_component=p_check_path_component)
+
+        patterns = normalize_pattern_list(p_pattern_list=p_pattern_list)
+        literals = [pattern for pattern in patterns if is_literal(p_pattern=pattern)]
+        regex_patterns = [pattern for pattern in patterns if not is_literal(p_pattern=pattern)]
+
+        self._automaton = None
+        self._prefixes = None
+
+        if len(literals) > 0:
+            if self._match_mode == MATCH_MODE_PREFIX:
+                self._prefixes = tuple(literals)
+
+            else:
+                self._automaton = AhoCorasickAutomaton(p_keywords=literals)
+
+        self._regex = get_combined_regex(p_patterns=regex_patterns, p_match_mode=self._match_mode)
+
+    def match(self, p_text: str) -> bool:
+
+        if self._prefixes is not None and p_text.startswith(self._prefixes):
+            return True
+
+        if self._automaton is not None:
+            # The leading '.*' of the original regular expression does not match line breaks
+            line_break = p_text.find("\n")
+
+            if self._automaton.search(p_text if line_break < 0 else p_text[:line_break]):
+                return True
+
+        return self._regex is not None and self._regex.match(p_text) is not None
+
+    def __eq__(self, p_other):
+        return isinstance(p_other, PatternMatcher) and self.pattern == p_other.pattern and \
+            self._check_path_component == p_other._check_path_component
+
+    def __hash__(self):
+        return hash((self.pattern, self._check_path_component))
+
+    def __repr__(self):
+        return f"PatternMatcher({self.pattern!r}, mode={self._match_mode})"
+
+
+# Matchers are immutable so that all users (and all copies of a user loaded in different sessions) having the same
+# pattern list share the same compiled matcher. A changed pattern list results in a new matcher.
+@functools.lru_cache(maxsize=PATTERN_MATCHER_CACHE_SIZE)
+def get_pattern_matcher(p_pattern_list: str, p_check_path_component: bool):
+
+    if len(normalize_pattern_list(p_pattern_list=p_pattern_list)) == 0:
+        return None
+
+    return PatternMatcher(p_pattern_list=p_pattern_list, p_check_path_component=p_check_path_component)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+import datetime
+import json
+
+from sqlalchemy import Column, Integer, String, Date, DateTime, UniqueConstraint
+
+from little_brother import process_statistics
+from little_brother.persistence.base_entity import BaseEntity
+from little_brother.persistence.persistence_base import Base
+from little_brother.persistence.session_context import SessionContext
+
+
+def _(x):
+    return x
+
+
+# Totals of a closed day of a user in a context. The rows are written once the day has been closed so that the
+# history does not have to be recomputed from the process infos. Like the process infos the rows refer to the
+# username instead of the user entity.
+class DailyUsageRollup(Base, BaseEntity):
+    __tablename__ = 'daily_usage_rollup'
+
+    id = Column(Integer, primary_key=True)
+    username = Column(String(256), nullable=False)
+    context = Column(String(256), nullable=False)
+    reference_date = Column(Date, nullable=False)
+
+    # Duration and downtime in seconds
+    duration = Column(Integer, nullable=False)
+    downtime = Column(Integer, nullable=False)
+    min_time = Column(DateTime)
+    max_time = Column(DateTime)
+    activity_count = Column(Integer, nullable=False)
+
+    # JSON list of [hostname, count, percent]
+    host_summary = Column(String(1024))
+
+    UniqueConstraint('username', 'context', 'reference_date', name='username_context_reference_date')
+
+    def __init__(self):
+        super(BaseEntity).__init__()
+        self.username = None
+        self.context = None
+        self.reference_date = datetime.date.today()
+        self.duration = 0
+        self.downtime = 0
+        self.min_time = None
+        self.max_time = None
+        self.activity_count = 0
+        self.host_summary = None
+
+    def set_day_statistics(self, p_day_statistics: process_statistics.DayStatistics):
+        self.duration = int(p_day_statistics.duration)
+        self.downtime = int(p_day_statistics.downtime)
+        self.min_time = p_day_statistics.min_time
+        self.max_time = p_day_statistics.max_time
+        self.activity_count = p_day_statistics.activity_count
+        self.host_summary = json.dumps([[host_stat.hostname, host_stat.count, host_stat.percent]
+                                        for host_stat in p_day_statistics.host_stats.values()])
+
+    def get_day_statistics(self) -> process_statistics.DayTotals:
+        host_stats = {}
+
+        if self.host_summary is not None:
+            for hostname, count, percent in json.loads(self.host_summary):
+                host_stats[hostname] = process_statistics.HostStat(p_hostname=hostname, p_count=count,
+                                                                   p_percent=percent)
+
+        return process_statistics.DayTotals(p_duration=self.duration, p_downtime=self.downtime,
+                                            p_min_time=self.min_time, p_max_time=self.max_time,
+                                            p_activity_count=self.activity_count, p_host_stats=host_stats)
+
+    def get_key(self):
+        return get_key(p_username=self.username, p_context=self.context, p_reference_date=self.reference_date)
+
+    def populate_test_data(self, p_session_context: SessionContext):
+        self.username = "willi"
+        self.context = "default"
+        self.reference_date = datetime.date.today() - datetime.timedelta(days=1)
+        self.duration = 3600
+        self.downtime = 60
+        self.min_time = datetime.datetime.combine(self.reference_date, datetime.time(hour=10))
+        self.max_time = datetime.datetime.combine(self.reference_date, datetime.time(hour=11, minute=1))
+        self.activity_count = 1
+        self.host_summary = json.dumps([["host1", 1, 100]])
+
+    def __str__(self):
+        return f"DailyUsageRollup(username='{self.username}', context='{self.context}', " \
+               f"date={self.reference_date}, duration={self.duration})"
+
+
+def get_key(p_username, p_context, p_reference_date):
+    return p_username, p_context, p_reference_date
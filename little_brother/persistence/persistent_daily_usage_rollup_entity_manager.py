@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+import datetime
+
+from sqlalchemy.sql.expression import and_
+
+from little_brother.persistence.base_entity_manager import BaseEntityManager
+from little_brother.persistence.persistent_daily_usage_rollup import DailyUsageRollup
+from little_brother.persistence.session_context import SessionContext
+
+
+class DailyUsageRollupEntityManager(BaseEntityManager):
+
+    def __init__(self):
+        super().__init__(p_entity_class=DailyUsageRollup)
+
+    def get_rollups(self, p_session_context: SessionContext, p_start_date: datetime.date,
+                    p_end_date: datetime.date) -> dict[tuple, DailyUsageRollup]:
+
+        # Returns the rollups of all users and contexts in the date range (including both ends) by their key
+        session = p_session_context.get_session()
+
+        result = session.query(DailyUsageRollup).filter(
+            and_(
+                (DailyUsageRollup.reference_date >= p_start_date),
+                (DailyUsageRollup.reference_date <= p_end_date)
+            )).all()
+
+        return {rollup.get_key(): rollup for rollup in result}
+
+    def write_rollups(self, p_session_context: SessionContext, p_rollups: list[DailyUsageRollup]) -> None:
+
+        session = p_session_context.get_session()
+        existing_rollups = None
+
+        if len(p_rollups) > 0:
+            existing_rollups = self.get_rollups(
+                p_session_context=p_session_context,
+                p_start_date=min(rollup.reference_date for rollup in p_rollups),
+                p_end_date=max(rollup.reference_date for rollup in p_rollups))
+
+        for rollup in p_rollups:
+            existing_rollup = existing_rollups.get(rollup.get_key())
+
+            if existing_rollup is not None:
+                msg = "Replacing {rollup}"
+                self._logger.debug(msg.format(rollup=str(existing_rollup)))
+                session.delete(existing_rollup)
+                session.flush()
+
+            session.add(rollup)
+
+        session.commit()
+
+    def delete_historic_entries(self, p_session_context: SessionContext, p_history_length_in_days: int):
+
+        self.delete_generic_historic_entries(p_session_context=p_session_context,
+                                             p_history_length_in_days=p_history_length_in_days,
+                                             p_reference_time_column=DailyUsageRollup.reference_date)
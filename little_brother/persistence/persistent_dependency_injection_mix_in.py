@@ -19,6 +19,7 @@ from little_brother import dependency_injection
 from little_brother.persistence.persistence import Persistence
 from little_brother.persistence.persistent_admin_event_entity_manager import AdminEventEntityManager
 from little_brother.persistence.persistent_blacklisted_token_entity_manager import BlacklistedTokenEntityManager
+from little_brother.persistence.persistent_daily_usage_rollup_entity_manager import DailyUsageRollupEntityManager
 from little_brother.persistence.persistent_daily_user_status_entity_manager import DailyUserStatusEntityManager
 from little_brother.persistence.persistent_device_entity_manager import DeviceEntityManager
 from little_brother.persistence.persistent_process_info_entity_manager import ProcessInfoEntityManager
@@ -50,6 +51,7 @@ class PersistenceDependencyInjectionMixIn:
         self._user_status_entity_manager = None
         self._blacklisted_token_entity_manager = None
         self._uid_mapping_entity_manager = None
+        self._daily_usage_rollup_entity_manager = None
 
     @property
     def persistence(self):
@@ -145,3 +147,11 @@ class PersistenceDependencyInjectionMixIn:
             self._uid_mapping_entity_manager = dependency_injection.container[UidMappingEntityManager]
 
         return self._uid_mapping_entity_manager
+
+    @property
+    def daily_usage_rollup_entity_manager(self) -> DailyUsageRollupEntityManager:
+
+        if self._daily_usage_rollup_entity_manager is None:
+            self._daily_usage_rollup_entity_manager = dependency_injection.container[DailyUsageRollupEntityManager]
+
+        return self._daily_usage_rollup_entity_manager
@@ -25,7 +25,6 @@ from little_brother.persistence import base_entity_manager
 from little_brother.persistence.persistent_device_entity_manager import DeviceEntityManager
 from little_brother.persistence.persistent_process_info import ProcessInfo
 from little_brother.persistence.session_context import SessionContext
-from python_base_app import tools
 
 
 class ProcessInfoEntityManager(base_entity_manager.BaseEntityManager):
@@ -68,12 +67,22 @@ class ProcessInfoEntityManager(base_entity_manager.BaseEntityManager):
     def write_process_info(self, p_session_context: SessionContext, p_process_info: process_info.ProcessInfo):
 
         session = p_session_context.get_session()
-        exists = session.query(sqlalchemy.exists().where(
-            ProcessInfo.key == p_process_info.get_key())).scalar()
+        key = process_info.get_key_string(p_key=p_process_info.get_key())
+        exists = session.query(sqlalchemy.exists().where(ProcessInfo.key == key)).scalar()
 
         if not exists:
-            pinfo = tools.create_class_instance(ProcessInfo, p_initial_values=p_process_info)
-            pinfo.key = p_process_info.get_key()
+            # The slotted process info cannot be copied generically
+            pinfo = ProcessInfo()
+            pinfo.key = key
+            pinfo.hostname = p_process_info.hostname
+            pinfo.username = p_process_info.username
+            pinfo.pid = p_process_info.pid
+            pinfo.processhandler = p_process_info.processhandler
+            pinfo.processname = p_process_info.processname
+            pinfo.start_time = p_process_info.start_time
+            pinfo.end_time = p_process_info.end_time
+            pinfo.downtime = p_process_info.downtime
+            pinfo.percent = p_process_info.percent
             session.add(pinfo)
 
         session.commit()
@@ -82,7 +91,7 @@ class ProcessInfoEntityManager(base_entity_manager.BaseEntityManager):
 
         session = p_session_context.get_session()
         pinfo = session.query(ProcessInfo).filter(
-            ProcessInfo.key == p_process_info.get_key()).one()
+            ProcessInfo.key == process_info.get_key_string(p_key=p_process_info.get_key())).one()
         pinfo.end_time = p_process_info.end_time
         pinfo.downtime = p_process_info.downtime
         session.commit()
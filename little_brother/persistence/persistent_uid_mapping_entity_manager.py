@@ -48,7 +48,8 @@ class UidMappingEntityManager(BaseEntityManager):
                                     p_server_group: str = DEFAULT_SERVER_GROUP) -> Optional[UidMapping]:
 
         session = p_session_context.get_session()
-        query = session.query(UidMapping).filter(UidMapping.uid == p_uid and UidMapping.server_group == p_server_group)
+        query = session.query(UidMapping).filter(UidMapping.uid == p_uid,
+                                                 UidMapping.server_group == p_server_group)
 
         if query.count() == 1:
             return query.one()
@@ -76,7 +77,7 @@ class UidMappingEntityManager(BaseEntityManager):
                                          p_server_group: str = DEFAULT_SERVER_GROUP) -> Optional[UidMapping]:
 
         session = p_session_context.get_session()
-        query = session.query(UidMapping).filter(UidMapping.username == p_username and
+        query = session.query(UidMapping).filter(UidMapping.username == p_username,
                                                  UidMapping.server_group == p_server_group)
 
         if query.count() == 1:
@@ -15,14 +15,13 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-import re
-
 import sqlalchemy.orm
 from sqlalchemy import Column, Integer, String, Boolean
 from sqlalchemy.orm import relationship
 from typing_extensions import deprecated
 
 from little_brother import constants
+from little_brother import pattern_matcher
 from little_brother.persistence.base_entity import BaseEntity
 from little_brother.persistence.persistence_base import Base
 from little_brother.persistence.session_context import SessionContext
@@ -66,20 +65,9 @@ class User(Base, BaseEntity):
     @classmethod
     def get_regex_from_pattern_list(cls, p_pattern_list:str, p_check_path_component:bool):
 
-        pattern_list = p_pattern_list.replace('\r', '').split("\n")
-        normalized_pattern_list = [ entry.strip() for entry in pattern_list if len(entry.strip()) > 1 ]
-
-        if len(normalized_pattern_list) == 0:
-            # Return if none of the sub patterns contains more than one character
-            return None
-
-        if "/" in p_pattern_list and p_check_path_component:
-            expanded_patterns = '|'.join(normalized_pattern_list)
-
-        else:
-            expanded_patterns = '(.*' + '.*)|(.*'.join(normalized_pattern_list) + '.*)'
-
-        return re.compile(expanded_patterns)
+        # Returns a shared matcher object providing the method match() just like a compiled regular expression
+        return pattern_matcher.get_pattern_matcher(p_pattern_list=p_pattern_list,
+                                                   p_check_path_component=p_check_path_component)
 
     def populate_test_data(self, p_session_context: SessionContext):
 
@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Event driven process source based on the Linux kernel proc connector (see linux/cn_proc.h). Instead of reading
+# the complete process table on every scan, the kernel notifies about fork, exec, uid changes, and exits of processes.
+# Subscribing to the proc connector requires the capability CAP_NET_ADMIN. If the socket is not available the
+# factory falls back to polling the process table.
+
+import errno
+import os
+import select
+import socket
+import struct
+import threading
+
+import psutil
+
+from python_base_app import log_handling
+
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+
+NLMSG_NOOP = 1
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+PROC_CN_MCAST_LISTEN = 1
+PROC_CN_MCAST_IGNORE = 2
+
+PROC_EVENT_NONE = 0x00000000
+PROC_EVENT_FORK = 0x00000001
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_UID = 0x00000004
+PROC_EVENT_EXIT = 0x80000000
+
+# struct nlmsghdr: length, type, flags, sequence, port id
+NLMSGHDR_FORMAT = "=IHHII"
+NLMSGHDR_SIZE = struct.calcsize(NLMSGHDR_FORMAT)
+
+# struct cn_msg: idx, val, sequence, ack, length, flags
+CN_MSG_FORMAT = "=IIIIHH"
+CN_MSG_SIZE = struct.calcsize(CN_MSG_FORMAT)
+
+# struct proc_event (header): what, cpu, timestamp_ns
+PROC_EVENT_HEADER_FORMAT = "=IIQ"
+PROC_EVENT_HEADER_SIZE = struct.calcsize(PROC_EVENT_HEADER_FORMAT)
+
+# Event data following the header (only the first fields are relevant)
+PROC_EVENT_DATA_FORMATS = {
+    PROC_EVENT_FORK: "=IIII",  # parent_pid, parent_tgid, child_pid, child_tgid
+    PROC_EVENT_EXEC: "=II",  # process_pid, process_tgid
+    PROC_EVENT_UID: "=IIII",  # process_pid, process_tgid, ruid, euid
+    PROC_EVENT_EXIT: "=IIII",  # process_pid, process_tgid, exit_code, exit_signal
+}
+
+RECEIVE_BUFFER_SIZE = 65536
+DEFAULT_READ_TIMEOUT = 1.0  # seconds
+
+
+class ProcessEvent(object):
+
+    def __init__(self, p_event_type, p_pid, p_tgid, p_parent_pid=None, p_parent_tgid=None):
+        self.event_type = p_event_type
+        self.pid = p_pid
+        self.tgid = p_tgid
+        self.parent_pid = p_parent_pid
+        self.parent_tgid = p_parent_tgid
+
+    @property
+    def is_thread_event(self):
+        # The kernel reports threads just like processes. Only the main thread (pid == tgid) represents the process.
+        return self.pid != self.tgid
+
+    def __str__(self):
+        return f"ProcessEvent(type={self.event_type:#x}, pid={self.pid}, tgid={self.tgid})"
+
+
+# Raised by an event source if events have been lost and the process table has to be read again
+class ResyncRequired(Exception):
+    pass
+
+
+def build_subscription_message(p_port_id, p_operation=PROC_CN_MCAST_LISTEN):
+    payload = struct.pack("=I", p_operation)
+    cn_msg = struct.pack(CN_MSG_FORMAT, CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(payload), 0) + payload
+    header = struct.pack(NLMSGHDR_FORMAT, NLMSGHDR_SIZE + len(cn_msg), NLMSG_DONE, 0, 0, p_port_id)
+    return header + cn_msg
+
+
+def build_proc_event_message(p_event: ProcessEvent, p_timestamp_ns=0):
+    if p_event.event_type == PROC_EVENT_FORK:
+        data = struct.pack(PROC_EVENT_DATA_FORMATS[PROC_EVENT_FORK],
+                           p_event.parent_pid, p_event.parent_tgid, p_event.pid, p_event.tgid)
+
+    elif p_event.event_type == PROC_EVENT_EXEC:
+        data = struct.pack(PROC_EVENT_DATA_FORMATS[PROC_EVENT_EXEC], p_event.pid, p_event.tgid)
+
+    else:
+        data = struct.pack(PROC_EVENT_DATA_FORMATS[PROC_EVENT_EXIT], p_event.pid, p_event.tgid, 0, 0)
+
+    proc_event = struct.pack(PROC_EVENT_HEADER_FORMAT, p_event.event_type, 0, p_timestamp_ns) + data
+    cn_msg = struct.pack(CN_MSG_FORMAT, CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(proc_event), 0) + proc_event
+    header = struct.pack(NLMSGHDR_FORMAT, NLMSGHDR_SIZE + len(cn_msg), NLMSG_DONE, 0, 0, 0)
+    return header + cn_msg
+
+
+def parse_proc_connector_message(p_data) -> list[ProcessEvent]:
+    events = []
+    offset = 0
+
+    while offset + NLMSGHDR_SIZE <= len(p_data):
+        (length, msg_type, _flags, _seq, _port_id) = struct.unpack_from(NLMSGHDR_FORMAT, p_data, offset)
+
+        if length < NLMSGHDR_SIZE:
+            break
+
+        if msg_type not in (NLMSG_NOOP, NLMSG_ERROR):
+            cn_offset = offset + NLMSGHDR_SIZE
+            (idx, val, _seq, _ack, cn_length, _flags) = struct.unpack_from(CN_MSG_FORMAT, p_data, cn_offset)
+
+            if idx == CN_IDX_PROC and val == CN_VAL_PROC and cn_length >= PROC_EVENT_HEADER_SIZE:
+                event = parse_proc_event(p_data, cn_offset + CN_MSG_SIZE)
+
+                if event is not None:
+                    events.append(event)
+
+        # netlink messages are aligned to 4 bytes
+        offset += (length + 3) & ~3
+
+    return events
+
+
+def parse_proc_event(p_data, p_offset):
+    (what, _cpu, _timestamp_ns) = struct.unpack_from(PROC_EVENT_HEADER_FORMAT, p_data, p_offset)
+    data_format = PROC_EVENT_DATA_FORMATS.get(what)
+
+    if data_format is None:
+        return None
+
+    values = struct.unpack_from(data_format, p_data, p_offset + PROC_EVENT_HEADER_SIZE)
+
+    if what == PROC_EVENT_FORK:
+        return ProcessEvent(p_event_type=what, p_parent_pid=values[0], p_parent_tgid=values[1],
+                            p_pid=values[2], p_tgid=values[3])
+
+    return ProcessEvent(p_event_type=what, p_pid=values[0], p_tgid=values[1])
+
+
+class NetlinkProcessEventSource(object):
+
+    def __init__(self):
+        self._socket = None
+        self._logger = log_handling.get_logger(self.__class__.__name__)
+
+    def open(self):
+        # Raises OSError if the proc connector is not available (e.g. missing capability CAP_NET_ADMIN)
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+
+        try:
+            sock.bind((os.getpid(), CN_IDX_PROC))
+            sock.send(build_subscription_message(p_port_id=sock.getsockname()[0]))
+
+        except OSError:
+            sock.close()
+            raise
+
+        self._socket = sock
+
+    def close(self):
+        if self._socket is not None:
+            try:
+                self._socket.send(build_subscription_message(p_port_id=self._socket.getsockname()[0],
+                                                             p_operation=PROC_CN_MCAST_IGNORE))
+
+            except OSError as e:
+                self._logger.debug(f"Ignoring exception '{e!s}' while unsubscribing from proc connector")
+
+            self._socket.close()
+            self._socket = None
+
+    def read_events(self, p_timeout) -> list[ProcessEvent]:
+        readable, _, _ = select.select([self._socket], [], [], p_timeout)
+
+        if not readable:
+            return []
+
+        try:
+            data = self._socket.recv(RECEIVE_BUFFER_SIZE)
+
+        except OSError as e:
+            if e.errno == errno.ENOBUFS:
+                # The socket buffer has overflown and the kernel has dropped events
+                raise ResyncRequired(str(e))
+
+            raise
+
+        return parse_proc_connector_message(data)
+
+
+class ProcessSnapshot(object):
+    # Snapshot of the process attributes required by the ClientProcessHandler. The attributes are read right after
+    # the kernel has reported the process so that even processes are noticed which terminate before the next scan.
+
+    def __init__(self, p_pid, p_uids, p_name, p_cmdline, p_create_time):
+        self.pid = p_pid
+        self._uids = p_uids
+        self._name = p_name
+        self._cmdline = p_cmdline
+        self._create_time = p_create_time
+
+    def uids(self):
+        return self._uids
+
+    def name(self):
+        return self._name
+
+    def cmdline(self):
+        return self._cmdline
+
+    def create_time(self):
+        return self._create_time
+
+
+def create_process_snapshot(p_proc) -> ProcessSnapshot:
+    if not isinstance(p_proc, psutil.Process):
+        p_proc = psutil.Process(pid=p_proc)
+
+    with p_proc.oneshot():
+        return ProcessSnapshot(p_pid=p_proc.pid, p_uids=p_proc.uids(), p_name=p_proc.name(),
+                               p_cmdline=p_proc.cmdline(), p_create_time=p_proc.create_time())
+
+
+class ProcConnectorProcessIteratorFactory(object):
+
+    def __init__(self, p_event_source=None, p_process_iter=psutil.process_iter,
+                 p_snapshot_factory=create_process_snapshot):
+
+        self._logger = log_handling.get_logger(self.__class__.__name__)
+
+        if p_event_source is None:
+            p_event_source = NetlinkProcessEventSource()
+
+        self._event_source = p_event_source
+        self._process_iter = p_process_iter
+        self._snapshot_factory = p_snapshot_factory
+        self._lock = threading.Lock()
+        self._processes: dict[int, ProcessSnapshot] = {}
+
+        # Processes which have terminated since the last call of process_iter(). They are returned one last time
+        # so that short-lived processes are noticed, too.
+        self._terminated_processes: dict[int, ProcessSnapshot] = {}
+
+        # Changes reported while the process table is being reread (None: process has terminated). They are applied
+        # to the new table since it may have been read before the changes.
+        self._resync_changes: dict[int, ProcessSnapshot | None] | None = None
+
+        self._active = False
+        self._resync_required = False
+        self._stop_requested = False
+        self._thread = None
+
+    @property
+    def active(self):
+        return self._active
+
+    def start(self, p_use_thread=True):
+
+        try:
+            self._event_source.open()
+
+        except OSError as e:
+            fmt = f"Proc connector not available ('{e!s}') -> falling back to polling of the process table"
+            self._logger.warning(fmt)
+            return
+
+        self._active = True
+        self._stop_requested = False
+        self.resync()
+
+        if p_use_thread:
+            self._thread = threading.Thread(target=self.run, name=self.__class__.__name__, daemon=True)
+            self._thread.start()
+
+        self._logger.info("Listening to process events of proc connector")
+
+    def stop(self):
+        self._stop_requested = True
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        if self._active:
+            self._event_source.close()
+            self._active = False
+
+    def run(self):
+        while not self._stop_requested:
+            self.read_events(p_timeout=DEFAULT_READ_TIMEOUT)
+
+    def read_events(self, p_timeout):
+        try:
+            events = self._event_source.read_events(p_timeout=p_timeout)
+
+        except ResyncRequired as e:
+            self._logger.warning(f"Lost process events ('{e!s}') -> rereading process table")
+            self._resync_required = True
+            return
+
+        except Exception as e:
+            self._logger.error(f"Exception '{e!s}' while reading process events -> falling back to polling")
+            self._stop_requested = True
+            self._active = False
+            self._event_source.close()
+            return
+
+        self.handle_events(p_events=events)
+
+    def resync(self):
+        with self._lock:
+            self._terminated_processes = {}
+            self._resync_changes = {}
+
+        processes = {}
+
+        for proc in self._process_iter():
+            snapshot = self._get_snapshot(p_proc=proc)
+
+            if snapshot is not None:
+                processes[snapshot.pid] = snapshot
+
+        with self._lock:
+            # No further exit event will arrive for processes which have terminated in the meantime
+            for pid, snapshot in self._resync_changes.items():
+                if snapshot is None:
+                    processes.pop(pid, None)
+
+                else:
+                    processes[pid] = snapshot
+
+            self._processes = processes
+            self._resync_changes = None
+            self._resync_required = False
+
+    def _get_snapshot(self, p_proc):
+        try:
+            return self._snapshot_factory(p_proc)
+
+        except psutil.Error as e:
+            self._logger.debug(f"Ignoring exception '{e!s}' while reading process attributes")
+            return None
+
+    def handle_events(self, p_events: list[ProcessEvent]):
+
+        for event in p_events:
+            if event.is_thread_event:
+                continue
+
+            if event.event_type == PROC_EVENT_EXIT:
+                with self._lock:
+                    snapshot = self._processes.pop(event.pid, None)
+
+                    if self._resync_changes is not None:
+                        self._resync_changes[event.pid] = None
+
+                    if snapshot is not None:
+                        self._terminated_processes[event.pid] = snapshot
+
+            elif event.event_type in (PROC_EVENT_FORK, PROC_EVENT_EXEC, PROC_EVENT_UID):
+                snapshot = self._get_snapshot(p_proc=event.pid)
+
+                if snapshot is not None:
+                    with self._lock:
+                        self._processes[event.pid] = snapshot
+
+                        if self._resync_changes is not None:
+                            self._resync_changes[event.pid] = snapshot
+
+    def process_iter(self):
+
+        if not self._active:
+            return self._process_iter()
+
+        if self._resync_required:
+            self.resync()
+
+        with self._lock:
+            processes = list(self._processes.values())
+
+            # A pid of a terminated process may have been reused already
+            processes.extend(snapshot for (pid, snapshot) in self._terminated_processes.items()
+                             if pid not in self._processes)
+            self._terminated_processes = {}
+
+        return iter(processes)
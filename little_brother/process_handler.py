@@ -19,6 +19,7 @@ import abc
 import datetime
 
 from little_brother import admin_event  #
+from little_brother import process_info_store
 from little_brother.persistence.session_context import SessionContext
 from python_base_app import base_app
 from python_base_app import configuration
@@ -41,7 +42,7 @@ class ProcessHandler(object, metaclass=abc.ABCMeta):
 
         self._logger = log_handling.get_logger(self.__class__.__name__)
 
-        self._process_infos = {}
+        self._process_infos = process_info_store.ProcessInfoStore()
 
 
     @property
@@ -75,6 +76,7 @@ class ProcessHandler(object, metaclass=abc.ABCMeta):
 
             pinfo = self._process_infos[key]
             pinfo.end_time = None
+            self._process_infos.mark_changed()
             updated = True
 
         else:
@@ -98,6 +100,7 @@ class ProcessHandler(object, metaclass=abc.ABCMeta):
 
             pinfo = self._process_infos[key]
             pinfo.downtime = p_event.downtime
+            self._process_infos.mark_changed()
             updated = True
 
         else:
@@ -118,6 +121,7 @@ class ProcessHandler(object, metaclass=abc.ABCMeta):
 
         pinfo = self._process_infos[key]
         pinfo.end_time = p_event.event_time
+        self._process_infos.mark_changed()
 
         fmt = "TERMINATED %s" % str(pinfo)
         self._logger.debug(fmt)
@@ -130,9 +134,15 @@ class ProcessHandler(object, metaclass=abc.ABCMeta):
         if self.can_kill_processes():
             raise NotImplementedError("handle_event_kill_process not implemented although handler can kill processes")
 
+    def shutdown(self):
+        pass
+
     def add_historic_process(self, p_process_info):
         self._process_infos[p_process_info.get_key()] = p_process_info
 
+    def evict_process_infos(self, p_reference_time, p_lookback_in_days):
+        return self._process_infos.evict(p_reference_time=p_reference_time, p_lookback_in_days=p_lookback_in_days)
+
     def get_artificial_termination_events(self):
         events = [self.create_admin_event_process_end_from_pinfo(p_pinfo=pinfo) for pinfo in
                   self._process_infos.values() if pinfo.is_active()]
@@ -226,6 +236,7 @@ class ProcessHandler(object, metaclass=abc.ABCMeta):
         for pinfo in self._process_infos.values():
             if pinfo.is_active():
                 pinfo.downtime += p_downtime
+                self._process_infos.mark_changed()
 
                 fmt = "Correcting active process owned by {user} by {seconds} seconds"
                 self._logger.info(fmt.format(user=pinfo.username, seconds=p_downtime))
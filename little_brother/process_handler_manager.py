@@ -21,7 +21,9 @@ import socket
 
 from little_brother import admin_event
 from little_brother import dependency_injection
+from little_brother import incremental_process_statistics
 from little_brother import process_info
+from little_brother import process_info_store
 from little_brother.admin_data_handler import AdminDataHandler
 from little_brother.admin_event import AdminEvent
 from little_brother.api.master_connector import MasterConnector
@@ -72,7 +74,10 @@ class ProcessHandlerManager(PersistenceDependencyInjectionMixIn):
                  p_is_master,
                  p_login_mapping,
                  p_language:Language,
-                 p_process_handlers=None):
+                 p_process_handlers=None,
+                 p_adaptive_scheduler=None,
+                 p_prometheus_client=None,
+                 p_rule_evaluation_scheduler=None):
 
         super().__init__()
 
@@ -83,11 +88,13 @@ class ProcessHandlerManager(PersistenceDependencyInjectionMixIn):
         self._process_handlers = p_process_handlers
         self._login_mapping = p_login_mapping
         self._language = p_language
+        self._adaptive_scheduler = p_adaptive_scheduler
+        self._rule_evaluation_scheduler = p_rule_evaluation_scheduler
 
         self._event_handler = None
         self._rule_handler = None
         self._master_connector = None
-        self._prometheus_client = None
+        self._prometheus_client = p_prometheus_client
         self._user_manager = None
 
         self._user_locale_handler = UserLocaleHandler()
@@ -101,11 +108,16 @@ class ProcessHandlerManager(PersistenceDependencyInjectionMixIn):
 
         self._process_regex_map = None
         self._prohibited_process_regex_map = None
+        self.set_rule_evaluation_due()
 
         self._locale_dir = os.path.join(os.path.dirname(__file__), "translations")
 
         self._logout_warnings = {}
 
+        # Activity statistics maintained incrementally from the process events
+        self._process_statistics = incremental_process_statistics.IncrementalProcessStatistics(
+            p_cache_time_bucket=self._config.statistics_cache_time_bucket, p_prometheus_client=p_prometheus_client)
+
     @property
     def admin_data_handler(self) -> AdminDataHandler:
 
@@ -175,6 +187,9 @@ class ProcessHandlerManager(PersistenceDependencyInjectionMixIn):
         self._process_regex_map = None
         self._prohibited_process_regex_map = None
 
+        # The statistics of all days may have changed with the settings of the users
+        self._process_statistics.set_all_days_changed()
+
     def register_events(self):
         self.event_handler.register_event_handler(
             p_event_type=admin_event.EVENT_TYPE_PROHIBITED_PROCESS, p_handler=self.handle_event_prohibited_process)
@@ -197,10 +212,19 @@ class ProcessHandlerManager(PersistenceDependencyInjectionMixIn):
 
         return handler
 
+    def set_rule_evaluation_due(self, p_username=None):
+
+        if self._rule_evaluation_scheduler is not None:
+            self._rule_evaluation_scheduler.set_due(p_username=p_username)
+
     def handle_event_process_downtime(self, p_event):
 
         pinfo, updated = self.get_process_handler(p_id=p_event.processhandler).handle_event_process_downtime(p_event)
 
+        if updated:
+            self._process_statistics.update_process_info(p_process_info=pinfo)
+            self.set_rule_evaluation_due(p_username=pinfo.username)
+
         if self.persistence is not None and updated:
             with SessionContext(p_persistence=self.persistence) as session_context:
                 self.process_info_entity_manager.update_process_info(
@@ -216,6 +240,8 @@ class ProcessHandlerManager(PersistenceDependencyInjectionMixIn):
             return
 
         pinfo, updated = process_handler.handle_event_process_start(p_event)
+        self._process_statistics.update_process_info(p_process_info=pinfo)
+        self.set_rule_evaluation_due(p_username=pinfo.username)
 
         if updated:
             if self.persistence is not None:
@@ -232,7 +258,7 @@ class ProcessHandlerManager(PersistenceDependencyInjectionMixIn):
         if self._is_master:
             rule_result_info = self.admin_data_handler.get_current_rule_result_info(
                 p_reference_time=datetime.datetime.now(), p_process_infos=self.get_process_infos(),
-                p_username=p_event.username)
+                p_username=p_event.username, p_process_statistics=self._process_statistics)
 
             if rule_result_info is not None and rule_result_info.activity_allowed():
                 with SessionContext(p_persistence=self.persistence) as session_context:
@@ -262,7 +288,7 @@ class ProcessHandlerManager(PersistenceDependencyInjectionMixIn):
         if self._is_master:
             rule_result_info = self.admin_data_handler.get_current_rule_result_info(
                 p_reference_time=datetime.datetime.now(), p_process_infos=self.get_process_infos(),
-                p_username=p_event.username)
+                p_username=p_event.username, p_process_statistics=self._process_statistics)
 
             if rule_result_info is not None and rule_result_info.activity_allowed():
                 with SessionContext(p_persistence=self.persistence) as session_context:
@@ -291,6 +317,9 @@ class ProcessHandlerManager(PersistenceDependencyInjectionMixIn):
         if pinfo is None:
             return
 
+        self._process_statistics.update_process_info(p_process_info=pinfo)
+        self.set_rule_evaluation_due(p_username=pinfo.username)
+
         if self.persistence is not None:
             with SessionContext(p_persistence=self.persistence) as session_context:
                 self.process_info_entity_manager.update_process_info(
@@ -316,20 +345,59 @@ class ProcessHandlerManager(PersistenceDependencyInjectionMixIn):
                 p_prohibited_process_regex_map=self.prohibited_process_regex_map,
                 p_reference_time=p_reference_time)
 
+            if self._adaptive_scheduler is not None:
+                self._adaptive_scheduler.set_activity(
+                    p_source=p_process_handler.id,
+                    p_active=any(pinfo.end_time is None for pinfo in p_process_handler.process_infos.values()))
+
             if p_queue_events:
                 self.event_handler.queue_events(p_events=events, p_to_master=True)
 
                 if not self._is_master:
                     self.event_handler.queue_events_locally(p_events=events)
 
-    def get_process_infos(self):
+    def get_process_infos(self) -> process_info_store.MergedProcessInfoView:
+
+        return process_info_store.MergedProcessInfoView(
+            p_stores=[handler.process_infos for handler in self._process_handlers.values()])
 
-        process_infos = {}
+    def evict_process_infos(self, p_reference_time=None):
+
+        if p_reference_time is None:
+            p_reference_time = datetime.datetime.now()
 
         for handler in self._process_handlers.values():
-            process_infos.update(handler.process_infos)
+            evicted_pinfos = handler.evict_process_infos(p_reference_time=p_reference_time,
+                                                         p_lookback_in_days=self._config.process_lookback_in_days)
+            self._process_statistics.remove_process_infos(p_process_infos=evicted_pinfos)
+
+            if len(evicted_pinfos) > 0:
+                fmt = "Evicted {count} process infos from handler {handler_id}"
+                self._logger.info(fmt.format(count=len(evicted_pinfos), handler_id=handler.id))
+
+            if self._prometheus_client is not None:
+                self._prometheus_client.count_evicted_process_infos(p_process_handler=handler.id,
+                                                                    p_count=len(evicted_pinfos))
+                self._prometheus_client.set_stored_process_infos(
+                    p_process_handler=handler.id, p_count=len(handler.process_infos),
+                    p_active_count=handler.process_infos.active_count)
+
+    @property
+    def process_statistics(self) -> incremental_process_statistics.IncrementalProcessStatistics:
 
-        return process_infos
+        return self._process_statistics
+
+    def get_process_statistics(self, p_user_map, p_reference_time, p_max_lookback_in_days, p_min_activity_duration):
+
+        return self._process_statistics.get_process_statistics(
+            p_user_map=p_user_map,
+            p_reference_time=p_reference_time,
+            p_max_lookback_in_days=p_max_lookback_in_days,
+            p_min_activity_duration=p_min_activity_duration)
+
+    def pop_changed_statistics_days(self):
+
+        return self._process_statistics.pop_changed_days()
 
     def load_historic_process_infos(self):
 
@@ -371,6 +439,7 @@ class ProcessHandlerManager(PersistenceDependencyInjectionMixIn):
 
             if process_handler is not None:
                 process_handler.add_historic_process(p_process_info=new_pinfo)
+                self._process_statistics.update_process_info(p_process_info=new_pinfo)
 
         fmt = "Loaded %d historic process infos from database looking back %s days (%d of which had no end time)" % (
             len(pinfos), self._config.process_lookback_in_days, counter_open_end_time)
@@ -438,6 +507,10 @@ class ProcessHandlerManager(PersistenceDependencyInjectionMixIn):
 
             self.event_handler.queue_events(p_events=events, p_to_master=True)
 
+        # The downtimes of the process infos have been corrected in place
+        self._process_statistics.invalidate()
+        self.set_rule_evaluation_due()
+
     def check_issue_logout_warning(self, p_username, p_rule_result_info: RuleResultInfo):
 
         issue_warning = False
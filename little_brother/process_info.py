@@ -15,35 +15,116 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+import sys
+
 from python_base_app import tools
 
+# Replaces a missing PID in the keys so that keys can always be compared with each other
+NO_PID = -1
+
+
+def get_epoch(p_time):
+
+    # Same value as p_time.strftime("%s") (i.e. the time is interpreted as local time) but considerably faster
+    if p_time.tzinfo is not None:
+        p_time = p_time.replace(tzinfo=None)
+
+    return int(p_time.timestamp())
+
 
 def get_key(p_hostname, p_pid, p_start_time):
-    if p_pid is not None:
-        return "%s|%d|%s" % (p_hostname, p_pid, p_start_time.strftime("%s"))
+
+    return p_hostname, NO_PID if p_pid is None else p_pid, get_epoch(p_start_time)
+
+
+def get_key_string(p_key):
+
+    # Textual representation of a key as stored in the database
+    hostname, pid, epoch = p_key
+
+    if pid != NO_PID:
+        return "%s|%d|%d" % (hostname, pid, epoch)
 
     else:
-        return "%s|NONE|%s" % (p_hostname, p_start_time.strftime("%s"))
+        return "%s|NONE|%d" % (hostname, epoch)
+
+
+def intern_string(p_string):
+
+    return sys.intern(p_string) if type(p_string) is str else p_string
 
 
 class ProcessInfo(object):
 
+    # Process infos are kept for all processes of the lookback period so they are slotted. Host, user
+    # and process handler names are shared by many processes and are therefore interned.
+    __slots__ = ("id", "_hostname", "hostlabel", "username", "processhandler", "processname", "_pid", "_start_time",
+                 "start_epoch", "_end_time", "end_epoch", "downtime", "percent", "cmd_line", "_key",
+                 "_matched_process_name_pattern", "_matches_process_name_pattern")
+
     def __init__(self, p_hostname=None, p_username=None, p_processhandler=None, p_processname=None, p_pid=None,
                  p_start_time=None, p_end_time=None, p_downtime=0, p_percent=100, p_hostlabel=None,
                  p_cmd_line=None):
+        # The slots behind the properties are set directly since process infos are created in large numbers
         self.id = None
-        self.hostname = p_hostname
-        self.hostlabel = p_hostlabel if p_hostlabel is not None else p_hostname
-        self.username = p_username
-        self.processhandler = p_processhandler
+        self._key = None
+        self._hostname = intern_string(p_hostname)
+        self.hostlabel = intern_string(p_hostlabel) if p_hostlabel is not None else self._hostname
+        self.username = intern_string(p_username)
+        self.processhandler = intern_string(p_processhandler)
         self.processname = p_processname
-        self.pid = p_pid
-        self.start_time = p_start_time
-        self.end_time = p_end_time
+        self._pid = p_pid
+        self._start_time = p_start_time
+        self.start_epoch = None if p_start_time is None else get_epoch(p_start_time)
+        self._end_time = p_end_time
+        self.end_epoch = None if p_end_time is None else get_epoch(p_end_time)
         self.downtime = p_downtime
         self.percent = p_percent
         self.cmd_line = p_cmd_line
 
+        # Result of the last match against the process name pattern of the user and the pattern it refers to
+        self._matched_process_name_pattern = None
+        self._matches_process_name_pattern = None
+
+    # The attributes making up the key reset the cached key when they are changed
+
+    @property
+    def hostname(self):
+        return self._hostname
+
+    @hostname.setter
+    def hostname(self, p_hostname):
+        self._hostname = intern_string(p_hostname)
+        self._key = None
+
+    @property
+    def pid(self):
+        return self._pid
+
+    @pid.setter
+    def pid(self, p_pid):
+        self._pid = p_pid
+        self._key = None
+
+    @property
+    def start_time(self):
+        return self._start_time
+
+    @start_time.setter
+    def start_time(self, p_start_time):
+        self._start_time = p_start_time
+        self.start_epoch = None if p_start_time is None else get_epoch(p_start_time)
+        self._key = None
+
+    @property
+    def end_time(self):
+        return self._end_time
+
+    @end_time.setter
+    def end_time(self, p_end_time):
+        self._end_time = p_end_time
+        self.end_epoch = None if p_end_time is None else get_epoch(p_end_time)
+
     def is_active(self):
         return self.end_time is None
 
@@ -60,11 +141,27 @@ class ProcessInfo(object):
                  self.end_time is not None and self.end_time >= self.start_time)
         )
 
+    def matches_process_name_pattern(self, p_process_name_pattern, p_regex_process_name_pattern):
+
+        # The regular expression is only evaluated again when the pattern of the user has changed
+        if self._matches_process_name_pattern is None or \
+                self._matched_process_name_pattern != p_process_name_pattern:
+            # The matcher returns a bool (PatternMatcher) or an optional match object (compiled regular expression)
+            self._matches_process_name_pattern = (self.processname is None or
+                                                  bool(p_regex_process_name_pattern.match(self.processname)))
+            self._matched_process_name_pattern = p_process_name_pattern
+
+        return self._matches_process_name_pattern
+
     def get_key(self):
-        return get_key(p_hostname=self.hostname, p_pid=self.pid, p_start_time=self.start_time)
+
+        if self._key is None:
+            self._key = (self._hostname, NO_PID if self._pid is None else self._pid, self.start_epoch)
+
+        return self._key
 
     def __str__(self):
 
         fmt = "ProcessInfo (host={host}, user={user}, process={process}, PID={pid}, epoch={epoch})"
         return fmt.format(host=self.hostname, user=self.username, process=self.processname,
-                          pid=tools.int_to_string(self.pid), epoch=self.start_time.strftime("%s"))
+                          pid=tools.int_to_string(self.pid), epoch=self.start_epoch)
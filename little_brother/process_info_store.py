@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import collections.abc
+import datetime
+
+
+def get_eviction_cutoff(p_reference_time, p_lookback_in_days):
+
+    # Process infos are loaded from the database looking back one day more than the statistics do (see
+    # ProcessHandlerManager.load_historic_process_infos). Evicting with the same margin keeps the store of a long
+    # running instance identical to the one of a freshly started instance.
+    return p_reference_time - datetime.timedelta(days=p_lookback_in_days + 1)
+
+
+class ProcessInfoStore(dict):
+
+    # Process infos of a process handler by their key. Without eviction the store of a long running instance would
+    # grow by every process ever seen although the statistics only look back a limited number of days.
+    #
+    # The version is increased on every change so that caches can detect changes without comparing contents. The
+    # store remains a dict for its callers, so every mutating method of dict is overridden; the C implementations
+    # of dict do not call __setitem__ or __delitem__. Changes of the process infos themselves have to be reported by
+    # calling mark_changed().
+
+    def __init__(self):
+
+        super().__init__()
+
+        self.version = 0
+
+    def __setitem__(self, p_key, p_process_info):
+
+        super().__setitem__(p_key, p_process_info)
+        self.version = self.version + 1
+
+    def __delitem__(self, p_key):
+
+        super().__delitem__(p_key)
+        self.version = self.version + 1
+
+    def __ior__(self, p_other):
+
+        self.update(p_other)
+        return self
+
+    def update(self, *p_args, **p_kwargs):
+
+        super().update(*p_args, **p_kwargs)
+        self.version = self.version + 1
+
+    def setdefault(self, p_key, p_default=None):
+
+        if p_key not in self:
+            self[p_key] = p_default
+
+        return self[p_key]
+
+    def pop(self, p_key, *p_default):
+
+        if p_key not in self:
+            return super().pop(p_key, *p_default)
+
+        self.version = self.version + 1
+        return super().pop(p_key)
+
+    def popitem(self):
+
+        item = super().popitem()
+        self.version = self.version + 1
+        return item
+
+    def clear(self):
+
+        super().clear()
+        self.version = self.version + 1
+
+    def mark_changed(self):
+
+        self.version = self.version + 1
+
+    @property
+    def active_count(self):
+
+        return sum(1 for pinfo in self.values() if pinfo.end_time is None)
+
+    def evict(self, p_reference_time, p_lookback_in_days):
+
+        # Removes all closed process infos which ended before the lookback period and returns them. Running
+        # processes are kept regardless of their age.
+        cutoff = get_eviction_cutoff(p_reference_time=p_reference_time, p_lookback_in_days=p_lookback_in_days)
+
+        evicted_keys = [key for key, pinfo in self.items() if pinfo.end_time is not None and pinfo.end_time < cutoff]
+        evicted_pinfos = [self.pop(key) for key in evicted_keys]
+
+        return evicted_pinfos
+
+
+class MergedProcessInfoView(collections.abc.Mapping):
+
+    # Read-only view of the process infos of several process handlers. Lookups and iterations are passed on to the
+    # stores so that the process infos are never copied. As with merging the stores into a single dictionary, a key
+    # found in several stores refers to the process info of the last one.
+
+    def __init__(self, p_stores):
+
+        self._stores = p_stores
+
+    @property
+    def version(self):
+
+        # The versions of the stores never decrease so their sum changes whenever any of the stores changes
+        return sum(store.version for store in self._stores)
+
+    def iterate_items(self):
+
+        for index, store in enumerate(self._stores):
+            later_stores = self._stores[index + 1:]
+
+            for key, pinfo in store.items():
+                if not any(key in later_store for later_store in later_stores):
+                    yield key, pinfo
+
+    def __getitem__(self, p_key):
+
+        for store in reversed(self._stores):
+            pinfo = store.get(p_key)
+
+            if pinfo is not None:
+                return pinfo
+
+        raise KeyError(p_key)
+
+    def __contains__(self, p_key):
+
+        return any(p_key in store for store in self._stores)
+
+    def __iter__(self):
+
+        return (key for key, _ in self.iterate_items())
+
+    def __len__(self):
+
+        return sum(1 for _ in self.iterate_items())
+
+    def values(self):
+
+        return MergedProcessInfoValuesView(self)
+
+    def items(self):
+
+        return MergedProcessInfoItemsView(self)
+
+
+class MergedProcessInfoValuesView(collections.abc.ValuesView):
+
+    def __iter__(self):
+
+        return (pinfo for _, pinfo in self._mapping.iterate_items())
+
+
+class MergedProcessInfoItemsView(collections.abc.ItemsView):
+
+    def __iter__(self):
+
+        return self._mapping.iterate_items()
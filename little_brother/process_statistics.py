@@ -183,6 +183,11 @@ class DayStatistics(object):
 
         return seconds
 
+    @property
+    def activity_count(self):
+
+        return len(self.activities)
+
     @property
     def host_infos(self):
 
@@ -207,6 +212,37 @@ class DayStatistics(object):
             return self.max_time.isoformat(timespec='seconds')
 
 
+class DayTotals(DayStatistics):
+
+    # Statistics of a closed day restored from its rollup. Only the totals are known, the activities are not.
+
+    def __init__(self, p_duration, p_downtime, p_min_time, p_max_time, p_activity_count, p_host_stats):
+
+        super().__init__()
+
+        self._duration = p_duration
+        self._downtime = p_downtime
+        self._activity_count = p_activity_count
+        self.min_time = p_min_time
+        self.max_time = p_max_time
+        self.host_stats = p_host_stats
+
+    @property
+    def duration(self):
+
+        return self._duration
+
+    @property
+    def downtime(self):
+
+        return self._downtime
+
+    @property
+    def activity_count(self):
+
+        return self._activity_count
+
+
 class ProcessStatisticsInfo(object):
 
     def __init__(self, p_username, p_reference_time, p_max_lookback_in_days, p_min_activity_duration,
@@ -465,9 +501,10 @@ def get_process_statistics(
                 user = p_user_map[pinfo.username]
                 for ruleset in user.rulesets:
 
-                    if (pinfo.processname is None or
-                            (pinfo.processname is not None and user.regex_process_name_pattern.match(
-                                pinfo.processname))):
+                    # The result of the match is cached in the process info
+                    if pinfo.matches_process_name_pattern(
+                            p_process_name_pattern=user.process_name_pattern,
+                            p_regex_process_name_pattern=user.regex_process_name_pattern):
                         stat_info = user_stat_infos.get(ruleset.context)
 
                         if boundary_type == "START":
@@ -479,22 +516,26 @@ def get_process_statistics(
     # Add statistics entries for current entries
     for user_stat_infos in users_stat_infos.values():
         for user_stat_info in user_stat_infos.values():
-            if user_stat_info.current_activity is not None:
-                login_date = user_stat_info.current_activity.start_time.date()
-                lookback = int((user_stat_info.reference_date - login_date).total_seconds() / (24 * 3600))
+            add_current_activity(p_stat_info=user_stat_info, p_max_lookback_in_days=p_max_lookback_in_days)
+
+    return users_stat_infos
 
-                # If there's an activity more than lookback days back enlarge the stat array accordingly...
-                if lookback >= len(user_stat_info.day_statistics):
-                    for i in range(len(user_stat_info.day_statistics), lookback + 1):
-                        user_stat_info.day_statistics.append(DayStatistics())
 
-                user_stat_info.day_statistics[lookback].add_activity(user_stat_info.current_activity)
+def add_current_activity(p_stat_info: ProcessStatisticsInfo, p_max_lookback_in_days):
+    if p_stat_info.current_activity is not None:
+        login_date = p_stat_info.current_activity.start_time.date()
+        lookback = int((p_stat_info.reference_date - login_date).total_seconds() / (24 * 3600))
 
-            user_stat_info.has_downtime = False
+        # If there's an activity more than lookback days back enlarge the stat array accordingly...
+        if lookback >= len(p_stat_info.day_statistics):
+            for i in range(len(p_stat_info.day_statistics), lookback + 1):
+                p_stat_info.day_statistics.append(DayStatistics())
 
-            for i in range(p_max_lookback_in_days):
-                if user_stat_info.day_statistics[i].downtime:
-                    user_stat_info.has_downtime = True
-                    break
+        p_stat_info.day_statistics[lookback].add_activity(p_stat_info.current_activity)
 
-    return users_stat_infos
+    p_stat_info.has_downtime = False
+
+    for i in range(p_max_lookback_in_days):
+        if p_stat_info.day_statistics[i].downtime:
+            p_stat_info.has_downtime = True
+            break
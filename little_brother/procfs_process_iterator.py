@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Process iterator reading the Linux /proc file system directly. Instead of creating a psutil.Process object
+# per process and calling its accessor methods (each one reading a file) the files 'stat' and 'status' of each
+# process are read exactly once. The command line is only read on demand, i.e. for processes of monitored users.
+
+import collections
+import os
+
+import psutil
+
+from python_base_app import log_handling
+
+DEFAULT_PROC_DIR = "/proc"
+
+# Length of the process name in /proc/<pid>/stat (TASK_COMM_LEN - 1). Longer names are truncated by the kernel.
+MAX_COMM_LENGTH = 15
+
+# Index of the field 'starttime' in /proc/<pid>/stat counted from the field 'state' (see proc(5))
+STAT_STARTTIME_INDEX = 19
+
+uids_tuple = collections.namedtuple('uids', ['real', 'effective'])
+process_tuple = collections.namedtuple('process', ['pid', 'uids', 'comm', 'starttime'])
+
+
+def read_boot_time(p_proc_dir=DEFAULT_PROC_DIR):
+    with open(os.path.join(p_proc_dir, "stat"), "rb") as f:
+        for line in f:
+            if line.startswith(b"btime"):
+                return float(line.split()[1])
+
+    raise RuntimeError(f"cannot find boot time in {p_proc_dir}/stat")
+
+
+def read_process_tuple(p_proc_dir, p_pid):
+    # Raises OSError if the process has terminated in the meantime
+    with open(f"{p_proc_dir}/{p_pid}/stat", "rb") as f:
+        stat = f.read()
+
+    # The name may contain blanks and parentheses so that the last closing parenthesis has to be found
+    comm_end = stat.rfind(b")")
+    comm = stat[stat.find(b"(") + 1:comm_end].decode(errors="replace")
+    starttime = int(stat[comm_end + 2:].split()[STAT_STARTTIME_INDEX])
+
+    uids = None
+
+    with open(f"{p_proc_dir}/{p_pid}/status", "rb") as f:
+        for line in f:
+            if line.startswith(b"Uid:"):
+                fields = line.split()
+                uids = uids_tuple(real=int(fields[1]), effective=int(fields[2]))
+                break
+
+    if uids is None:
+        raise ValueError(f"cannot find uids in {p_proc_dir}/{p_pid}/status")
+
+    return process_tuple(pid=p_pid, uids=uids, comm=comm, starttime=starttime)
+
+
+class ProcFsProcess(object):
+    # Provides the same interface as psutil.Process (as far as required by the ClientProcessHandler)
+
+    __slots__ = ("_process_tuple", "_factory", "_cmdline")
+
+    def __init__(self, p_process_tuple, p_factory):
+        self._process_tuple = p_process_tuple
+        self._factory = p_factory
+        self._cmdline = None
+
+    @property
+    def pid(self):
+        return self._process_tuple.pid
+
+    def uids(self):
+        return self._process_tuple.uids
+
+    def name(self):
+        name = self._process_tuple.comm
+
+        # Same as psutil: try to retrieve the complete name from the command line if the name has been truncated
+        if len(name) >= MAX_COMM_LENGTH:
+            cmdline = self.cmdline()
+
+            if cmdline:
+                extended_name = os.path.basename(cmdline[0])
+
+                if extended_name.startswith(name):
+                    name = extended_name
+
+        return name
+
+    def cmdline(self):
+        if self._cmdline is None:
+            self._cmdline = self._factory.read_cmdline(p_pid=self.pid)
+
+        return self._cmdline
+
+    def create_time(self):
+        return self._factory.get_create_time(p_starttime=self._process_tuple.starttime)
+
+
+class ProcFsProcessIteratorFactory(object):
+
+    def __init__(self, p_proc_dir=DEFAULT_PROC_DIR):
+        self._proc_dir = p_proc_dir
+        self._logger = log_handling.get_logger(self.__class__.__name__)
+        self._boot_time = read_boot_time(p_proc_dir=p_proc_dir)
+        self._clock_ticks = os.sysconf("SC_CLK_TCK")
+
+    def get_create_time(self, p_starttime):
+        return self._boot_time + p_starttime / self._clock_ticks
+
+    def read_cmdline(self, p_pid):
+        try:
+            with open(f"{self._proc_dir}/{p_pid}/cmdline", "rb") as f:
+                data = f.read()
+
+        except (FileNotFoundError, ProcessLookupError):
+            raise psutil.NoSuchProcess(pid=p_pid)
+
+        if data.endswith(b"\0"):
+            data = data[:-1]
+
+        if not data:
+            return []
+
+        return data.decode(errors="replace").split("\0")
+
+    def read_process_tuples(self):
+        process_tuples = []
+
+        with os.scandir(self._proc_dir) as entries:
+            for entry in entries:
+                if not entry.name.isdigit():
+                    continue
+
+                try:
+                    process_tuples.append(read_process_tuple(p_proc_dir=self._proc_dir, p_pid=int(entry.name)))
+
+                except (FileNotFoundError, ProcessLookupError):
+                    # The process has terminated in the meantime
+                    pass
+
+                except (OSError, ValueError, IndexError) as e:
+                    self._logger.debug(f"Ignoring exception '{e!s}' while reading process {entry.name}")
+
+        return process_tuples
+
+    def process_iter(self):
+        return iter([ProcFsProcess(p_process_tuple=process_tuple, p_factory=self)
+                     for process_tuple in self.read_process_tuples()])
@@ -85,6 +85,21 @@ class PrometheusClient(object):
             self._gauge_uptime = prometheus_client.Gauge(self._config.prefix + "uptime",
                                                          "uptime in seconds", ["hostname"])
 
+            self._gauge_effective_check_interval = prometheus_client.Gauge(
+                self._config.prefix + "effective_check_interval",
+                "effective interval of recurring task in seconds", ["taskname"])
+
+            self._counter_statistics_cache_requests = prometheus_client.Counter(
+                self._config.prefix + "statistics_cache_requests",
+                "number of requests of the process statistics cache", ["result"])
+
+            self._gauge_stored_process_infos = prometheus_client.Gauge(
+                self._config.prefix + "stored_process_infos",
+                "number of process infos kept in memory by a process handler", ["processhandler", "state"])
+            self._counter_evicted_process_infos = prometheus_client.Counter(
+                self._config.prefix + "evicted_process_infos",
+                "number of process infos evicted from memory by a process handler", ["processhandler"])
+
             self._resident_memory_bytes_metric = prometheus_client.Gauge(
                 'node_process_resident_memory_bytes',
                 'resident memory in bytes on node', ['hostname'])
@@ -120,6 +135,10 @@ class PrometheusClient(object):
             prometheus_client.REGISTRY.unregister(self._gauge_active_users)
             prometheus_client.REGISTRY.unregister(self._gauge_device_moving_average_response_time)
             prometheus_client.REGISTRY.unregister(self._gauge_uptime)
+            prometheus_client.REGISTRY.unregister(self._gauge_effective_check_interval)
+            prometheus_client.REGISTRY.unregister(self._counter_statistics_cache_requests)
+            prometheus_client.REGISTRY.unregister(self._gauge_stored_process_infos)
+            prometheus_client.REGISTRY.unregister(self._counter_evicted_process_infos)
             prometheus_client.REGISTRY.unregister(self._info_system)
             prometheus_client.REGISTRY.unregister(self._resident_memory_bytes_metric)
 #            prometheus_client.REGISTRY.unregister(self._start_time_seconds_metric)
@@ -136,6 +155,20 @@ class PrometheusClient(object):
         def set_uptime(self, p_hostname, p_uptime):
             self._gauge_uptime.labels(hostname=p_hostname).set(p_uptime)
 
+        def set_effective_check_interval(self, p_task_name, p_interval):
+            self._gauge_effective_check_interval.labels(taskname=p_task_name).set(p_interval)
+
+        def count_statistics_cache_request(self, p_hit):
+            self._counter_statistics_cache_requests.labels(result="hit" if p_hit else "miss").inc()
+
+        def set_stored_process_infos(self, p_process_handler, p_count, p_active_count):
+            self._gauge_stored_process_infos.labels(processhandler=p_process_handler, state="total").set(p_count)
+            self._gauge_stored_process_infos.labels(processhandler=p_process_handler, state="active").set(
+                p_active_count)
+
+        def count_evicted_process_infos(self, p_process_handler, p_count):
+            self._counter_evicted_process_infos.labels(processhandler=p_process_handler).inc(p_count)
+
         def set_user_active(self, p_username, p_is_active):
 
             self._gauge_active_users.labels(username=p_username).set(1 if p_is_active else 0)
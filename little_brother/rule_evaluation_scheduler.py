@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import heapq
+import threading
+
+from little_brother import rule_handler
+
+
+def get_rule_set_settings_signature(p_rule_set):
+
+    # Captures the settings of a rule set which the rule result depends on. Edits of these settings are not signalled
+    # to the scheduler.
+    return (p_rule_set.id, p_rule_set.context, p_rule_set.context_details, p_rule_set.priority,
+            p_rule_set.max_time_per_day, p_rule_set.min_time_of_day, p_rule_set.max_time_of_day,
+            p_rule_set.min_break, p_rule_set.free_play, p_rule_set.max_activity_duration)
+
+
+def get_signature(p_rule_sets, p_active_rule_set, p_rule_override, p_active_time_extension, p_locale):
+
+    # Captures all settings apart from the process infos which the rule result of a user depends on
+    if p_rule_override is None:
+        override_signature = None
+
+    else:
+        override_signature = (p_rule_override.max_time_per_day, p_rule_override.min_time_of_day,
+                              p_rule_override.max_time_of_day, p_rule_override.min_break,
+                              p_rule_override.free_play, p_rule_override.max_activity_duration)
+
+    if p_active_time_extension is None:
+        time_extension_signature = None
+
+    else:
+        time_extension_signature = (p_active_time_extension.start_datetime, p_active_time_extension.end_datetime)
+
+    return (rule_handler.get_rule_sets_signature(p_rule_sets=p_rule_sets),
+            get_rule_set_settings_signature(p_rule_set=p_active_rule_set), override_signature,
+            time_extension_signature, p_locale)
+
+
+class ScheduledEvaluation(object):
+
+    def __init__(self, p_next_change_time, p_signature, p_result):
+        self.next_change_time = p_next_change_time
+        self.signature = p_signature
+        self.result = p_result
+
+
+class RuleEvaluationScheduler(object):
+
+    # Keeps the rule results of the users until the time at which they may change next. The times are kept in a
+    # priority queue so that only the users whose time has come have to be looked at. Process events and changes of
+    # the settings make the result of a user due immediately.
+
+    def __init__(self):
+
+        self._lock = threading.RLock()
+
+        # Heap of (next change time, username). Entries superseded by a later evaluation are skipped when popped.
+        self._queue = []
+        self._evaluations: dict[str, ScheduledEvaluation] = {}
+
+    def set_due(self, p_username=None):
+
+        # Without a username the results of all users become due
+        with self._lock:
+            if p_username is None:
+                self._queue = []
+                self._evaluations = {}
+
+            else:
+                self._evaluations.pop(p_username, None)
+
+    def update_due_users(self, p_reference_time):
+
+        with self._lock:
+            while len(self._queue) > 0 and self._queue[0][0] <= p_reference_time:
+                next_change_time, username = heapq.heappop(self._queue)
+                evaluation = self._evaluations.get(username)
+
+                if evaluation is not None and evaluation.next_change_time <= p_reference_time:
+                    del self._evaluations[username]
+
+    def get_result(self, p_username, p_signature):
+
+        # Returns the result of the last evaluation if it is still valid or None if the user is due
+        with self._lock:
+            evaluation = self._evaluations.get(p_username)
+
+            if evaluation is None or evaluation.signature != p_signature:
+                return None
+
+            return evaluation.result
+
+    def schedule(self, p_username, p_next_change_time, p_signature, p_result):
+
+        with self._lock:
+            self._evaluations[p_username] = ScheduledEvaluation(p_next_change_time=p_next_change_time,
+                                                                p_signature=p_signature, p_result=p_result)
+            heapq.heappush(self._queue, (p_next_change_time, p_username))
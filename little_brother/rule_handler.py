@@ -38,6 +38,12 @@ REGEX_TIME_OF_DAY = re.compile("([0-9]+)(:([0-9]+))?")
 
 DEFAULT_RULESET_LABEL = "default"
 
+MAX_ACTIVE_RULESET_CACHE_ENTRIES = 1024
+MAX_CONTEXT_PREDICATE_CACHE_ENTRIES = 1024
+
+# The minutes left change every minute while a user is active
+ACTIVE_USER_REEVALUATION_INTERVAL = 60  # seconds
+
 # Dummy function to trigger extraction by pybabel...
 _ = lambda x: x
 
@@ -182,6 +188,13 @@ class RuleSetSectionHandler(configuration.ConfigurationSectionHandler):
         return datetime.time(hour=hours, minute=minutes)
 
 
+def get_rule_sets_signature(p_rule_sets):
+
+    # Captures all rule set settings which the resolution of the active rule set depends on. Since the signature
+    # changes whenever a rule set is edited, it serves as version stamp of the rule sets of a user.
+    return tuple((ruleset.id, ruleset.context, ruleset.context_details, ruleset.priority) for ruleset in p_rule_sets)
+
+
 class RuleHandler(object):
 
     def __init__(self, p_config, p_persistence):
@@ -191,17 +204,30 @@ class RuleHandler(object):
         self._context_rule_handlers = {}
         self._default_context_rule_handler_name = None
 
+        # Index of the active rule set by rule set signature and reference date
+        self._active_ruleset_cache = {}
+
+        # Compiled context predicates by context name and context details
+        self._context_predicate_cache = {}
+
         self._logger = log_handling.get_logger(self.__class__.__name__)
 
-    def register_rule_context_handlers(self):
+    @property
+    def config(self):
+        return self._config
+
+    def register_rule_context_handlers(self, p_german_vacation_calendar_config=None):
         self.register_context_rule_handler(DefaultContextRuleHandler(), p_default=True)
         self.register_context_rule_handler(WeekplanContextRuleHandler())
 
         if self._config.support_german_vacation_context_rule_handler:
-            self.register_context_rule_handler(GermanVacationContextRuleHandler())
+            self.register_context_rule_handler(
+                GermanVacationContextRuleHandler(p_config=p_german_vacation_calendar_config))
 
     def register_context_rule_handler(self, p_context_rule_handler, p_default=False):
         self._context_rule_handlers[p_context_rule_handler.context_name] = p_context_rule_handler
+        self._active_ruleset_cache = {}
+        self._context_predicate_cache = {}
 
         if p_default:
             self._default_context_rule_handler_name = p_context_rule_handler.context_name
@@ -232,24 +258,79 @@ class RuleHandler(object):
 
     def get_active_ruleset(self, p_rule_sets, p_reference_date) ->  RuleSet:
 
-        active_ruleset = None
-        max_priority = None
+        return self.get_active_rulesets(p_rule_sets=p_rule_sets, p_reference_dates=[p_reference_date])[0]
+
+    def get_active_rulesets(self, p_rule_sets, p_reference_dates) -> list[RuleSet]:
+
+        # Returns the active rule set for each of the reference dates. The resolution is cached since it is requested
+        # several times per user and check interval and once for every day of the admin lookahead. The versions of
+        # the context data are part of the key so that e.g. a reloaded calendar yields new resolutions.
+        signature = get_rule_sets_signature(p_rule_sets=p_rule_sets)
+        versions = self.get_context_data_versions(p_rule_sets=p_rule_sets)
+        active_rulesets = []
+
+        for reference_date in p_reference_dates:
+            if isinstance(reference_date, datetime.datetime):
+                reference_date = reference_date.date()
 
-        for ruleset in p_rule_sets:
-            context_name = ruleset.context or self._default_context_rule_handler_name
+            index = self._active_ruleset_cache.get((signature, reference_date, versions))
+
+            if index is None:
+                index = self.find_active_ruleset_index(p_rule_sets=p_rule_sets, p_reference_date=reference_date)
+                versions = self.get_context_data_versions(p_rule_sets=p_rule_sets)
+
+                # Resolutions based on unavailable context data are not cached
+                if None not in versions:
+                    if len(self._active_ruleset_cache) >= MAX_ACTIVE_RULESET_CACHE_ENTRIES:
+                        self._active_ruleset_cache = {}
+
+                    self._active_ruleset_cache[(signature, reference_date, versions)] = index
+
+            active_rulesets.append(p_rule_sets[index] if index >= 0 else None)
+
+        return active_rulesets
+
+    def get_context_predicate(self, p_rule_set):
+
+        # The context details are compiled once per context and details so that editing a rule set yields a new
+        # predicate while reloaded rule sets with unchanged settings share the cached one.
+        context_name = p_rule_set.context or self._default_context_rule_handler_name
+        key = (context_name, p_rule_set.context_details)
+        context_predicate = self._context_predicate_cache.get(key)
+
+        if context_predicate is None:
             context_rule_handler = self._context_rule_handlers.get(context_name)
 
             if context_rule_handler is None:
-                raise configuration.ConfigurationException("invalid rule set context '%s'" % ruleset.context)
+                raise configuration.ConfigurationException("invalid rule set context '%s'" % p_rule_set.context)
+
+            context_predicate = context_rule_handler.compile_details(p_details=p_rule_set.context_details)
+
+            if len(self._context_predicate_cache) >= MAX_CONTEXT_PREDICATE_CACHE_ENTRIES:
+                self._context_predicate_cache = {}
+
+            self._context_predicate_cache[key] = context_predicate
+
+        return context_predicate
+
+    def get_context_data_versions(self, p_rule_sets):
 
-            active = context_rule_handler.is_active(p_reference_date=p_reference_date,
-                                                    p_details=ruleset.context_details)
+        return tuple(self.get_context_predicate(p_rule_set=ruleset).version for ruleset in p_rule_sets)
+
+    def find_active_ruleset_index(self, p_rule_sets, p_reference_date):
+
+        active_index = -1
+        max_priority = None
+
+        for index, ruleset in enumerate(p_rule_sets):
+            context_predicate = self.get_context_predicate(p_rule_set=ruleset)
+            active = context_predicate.is_active(p_reference_date=p_reference_date)
 
             if active and (max_priority is None or ruleset.priority > max_priority):
                 max_priority = ruleset.priority
-                active_ruleset = ruleset
+                active_index = index
 
-        return active_ruleset
+        return active_index
 
     def check_free_play(self, p_rule_set: RuleSetConfigModel, p_rule_result_info: RuleResultInfo):
 
@@ -441,31 +522,92 @@ class RuleHandler(object):
 
         rule_result_info.locale = p_locale
 
-        if active_rule_set is not None:
-            rule_result_info.add_time_extension_meta_data(p_active_time_extension=p_active_time_extension,
-                                                          p_reference_time=p_reference_time)
+        self.evaluate_rule_set(p_rule_result_info=rule_result_info, p_stat_info=p_stat_info,
+                               p_active_time_extension=p_active_time_extension, p_reference_time=p_reference_time)
+
+        return rule_result_info
+
+    def evaluate_rule_set(self, p_rule_result_info: RuleResultInfo, p_stat_info, p_active_time_extension,
+                          p_reference_time):
+
+        # Applies the checks to the effective rule set of p_rule_result_info. Only plain attributes of the rule set,
+        # the statistics and the time extension are read so that picklable records may be passed instead.
+        rule_set = p_rule_result_info.effective_rule_set
+
+        if rule_set is not None:
+            p_rule_result_info.add_time_extension_meta_data(p_active_time_extension=p_active_time_extension,
+                                                            p_reference_time=p_reference_time)
 
             # Rules granting playtime
-            self.check_free_play(p_rule_set=rule_result_info.effective_rule_set, p_rule_result_info=rule_result_info)
+            self.check_free_play(p_rule_set=rule_set, p_rule_result_info=p_rule_result_info)
 
             # Rules denying playtime
-            self.check_time_of_day(p_rule_set=rule_result_info.effective_rule_set, p_stat_info=p_stat_info,
-                                   p_rule_result_info=rule_result_info)
-            self.check_time_per_day(p_rule_set=rule_result_info.effective_rule_set, p_stat_info=p_stat_info,
-                                    p_rule_result_info=rule_result_info)
-            self.check_activity_duration(p_rule_set=rule_result_info.effective_rule_set, p_stat_info=p_stat_info,
-                                         p_rule_result_info=rule_result_info)
-            self.check_min_break(p_rule_set=rule_result_info.effective_rule_set, p_stat_info=p_stat_info,
-                                 p_rule_result_info=rule_result_info)
+            self.check_time_of_day(p_rule_set=rule_set, p_stat_info=p_stat_info,
+                                   p_rule_result_info=p_rule_result_info)
+            self.check_time_per_day(p_rule_set=rule_set, p_stat_info=p_stat_info,
+                                    p_rule_result_info=p_rule_result_info)
+            self.check_activity_duration(p_rule_set=rule_set, p_stat_info=p_stat_info,
+                                         p_rule_result_info=p_rule_result_info)
+            self.check_min_break(p_rule_set=rule_set, p_stat_info=p_stat_info,
+                                 p_rule_result_info=p_rule_result_info)
 
             # This check must be the last in the set because it uses results stored into rule_result_info
             # by the other checks!
-            self.check_info_rules(p_rule_set=rule_result_info.effective_rule_set, p_stat_info=p_stat_info,
-                                  p_rule_result_info=rule_result_info)
+            self.check_info_rules(p_rule_set=rule_set, p_stat_info=p_stat_info,
+                                  p_rule_result_info=p_rule_result_info)
 
-        if not rule_result_info.activity_allowed():
+        if not p_rule_result_info.activity_allowed():
             fmt = "Activity prohibited for user %s: applying rules(s) %d" % (
-                p_stat_info.username, rule_result_info.applying_rules)
+                p_stat_info.username, p_rule_result_info.applying_rules)
             self._logger.debug(fmt)
 
-        return rule_result_info
+    @staticmethod
+    def get_next_change_time(p_rule_result_info: RuleResultInfo,
+                             p_stat_info: process_statistics.ProcessStatisticsInfo, p_reference_time):
+
+        # Returns the earliest time at which the rule result of a user may change unless processes of the user are
+        # started or stopped or the settings of the user are changed.
+        rule_set = p_rule_result_info.effective_rule_set
+
+        if rule_set is None or (p_stat_info.current_activity is not None and not p_rule_result_info.activity_allowed()):
+            # Processes of the user still have to be terminated
+            return p_reference_time
+
+        candidates = [datetime.datetime.combine(p_reference_time.date() + datetime.timedelta(days=1), datetime.time.min,
+                                                tzinfo=p_reference_time.tzinfo)]
+
+        if p_stat_info.current_activity is not None or p_rule_result_info.approaching_logout_rules > 0 or \
+                p_rule_result_info.applying_rules & rule_result_info.RULE_MIN_BREAK > 0:
+            candidates.append(p_reference_time + datetime.timedelta(seconds=ACTIVE_USER_REEVALUATION_INTERVAL))
+
+        if p_stat_info.current_activity is not None:
+            if rule_set.max_time_per_day is not None:
+                candidates.append(p_reference_time + datetime.timedelta(
+                    seconds=rule_set.max_time_per_day - p_stat_info.todays_activity_duration))
+
+            current_activity_duration = p_stat_info.current_activity_duration
+
+            if rule_set.max_activity_duration is not None and current_activity_duration is not None:
+                candidates.append(p_reference_time + datetime.timedelta(
+                    seconds=rule_set.max_activity_duration - current_activity_duration))
+
+        # Activity is prohibited before the minimum and after the maximum time of day
+        if rule_set.min_time_of_day is not None:
+            min_time = datetime.datetime.combine(p_reference_time.date(), rule_set.min_time_of_day,
+                                                 tzinfo=p_reference_time.tzinfo)
+
+            if min_time > p_reference_time:
+                candidates.append(min_time)
+
+        if rule_set.max_time_of_day is not None:
+            max_time = datetime.datetime.combine(p_reference_time.date(), rule_set.max_time_of_day,
+                                                 tzinfo=p_reference_time.tzinfo)
+
+            if max_time >= p_reference_time:
+                candidates.append(max_time)
+
+        if p_rule_result_info.time_extension_end_datetime is not None and \
+                p_rule_result_info.time_extension_end_datetime > p_reference_time:
+            candidates.append(p_rule_result_info.time_extension_end_datetime)
+
+        return max(min(candidates), p_reference_time)
@@ -15,7 +15,6 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-import copy
 import datetime
 
 from little_brother import constants
@@ -54,37 +53,109 @@ INFO_MASK = INFO_REMAINING_PLAYTIME | INFO_REMAINING_PLAYTIME_THIS_SESSION
 _ = lambda x: x
 
 
-def apply_override(p_rule_set, p_rule_override):
-    rule_set = p_rule_set
+class EffectiveRuleSet(object):
+
+    # Immutable view of a rule set with the fields of a rule override layered on top of it. Nothing is copied: fields
+    # which are not overridden and all other attributes are read from the underlying rule set.
+
+    __slots__ = ("_rule_set", "_rule_override")
+
+    def __init__(self, p_rule_set, p_rule_override):
+        object.__setattr__(self, "_rule_set", p_rule_set)
+        object.__setattr__(self, "_rule_override", p_rule_override)
+
+    def __setattr__(self, p_name, p_value):
+        raise AttributeError("effective rule set is read-only")
+
+    def __getattr__(self, p_name):
 
-    if p_rule_override is not None:
-        rule_set = copy.copy(p_rule_set)
+        if p_name in EffectiveRuleSet.__slots__:
+            raise AttributeError(p_name)
 
-        if p_rule_override.max_time_per_day is not None:
-            rule_set.max_time_per_day = p_rule_override.max_time_per_day
-            rule_set.max_time_per_day_class = constants.CSS_CLASS_EMPHASIZE_RULE_OVERRIDE
+        return getattr(self._rule_set, p_name)
 
-        if p_rule_override.min_time_of_day is not None:
-            rule_set.min_time_of_day = p_rule_override.min_time_of_day
-            rule_set.min_time_of_day_class = constants.CSS_CLASS_EMPHASIZE_RULE_OVERRIDE
+    def __reduce__(self):
+        return EffectiveRuleSet, (self._rule_set, self._rule_override)
 
-        if p_rule_override.max_time_of_day is not None:
-            rule_set.max_time_of_day = p_rule_override.max_time_of_day
-            rule_set.max_time_of_day_class = constants.CSS_CLASS_EMPHASIZE_RULE_OVERRIDE
+    def __str__(self):
+        return "EffectiveRuleSet(%s, override=%s)" % (str(self._rule_set), str(self._rule_override))
 
-        if p_rule_override.min_break is not None:
-            rule_set.min_break = p_rule_override.min_break
-            rule_set.min_break_class = constants.CSS_CLASS_EMPHASIZE_RULE_OVERRIDE
+    @property
+    def rule_set(self):
+        return self._rule_set
+
+    @property
+    def rule_override(self):
+        return self._rule_override
 
-        if p_rule_override.free_play:
-            rule_set.free_play = True
-            rule_set.free_play_class = constants.CSS_CLASS_EMPHASIZE_RULE_OVERRIDE
+    def _get_css_class(self, p_overridden, p_name):
 
-        if p_rule_override.max_activity_duration is not None:
-            rule_set.max_activity_duration = p_rule_override.max_activity_duration
-            rule_set.max_activity_duration_class = constants.CSS_CLASS_EMPHASIZE_RULE_OVERRIDE
+        if p_overridden:
+            return constants.CSS_CLASS_EMPHASIZE_RULE_OVERRIDE
 
-    return rule_set
+        return getattr(self._rule_set, p_name, "")
+
+    @property
+    def min_time_of_day(self):
+        value = self._rule_override.min_time_of_day
+        return value if value is not None else self._rule_set.min_time_of_day
+
+    @property
+    def min_time_of_day_class(self):
+        return self._get_css_class(self._rule_override.min_time_of_day is not None, "min_time_of_day_class")
+
+    @property
+    def max_time_of_day(self):
+        value = self._rule_override.max_time_of_day
+        return value if value is not None else self._rule_set.max_time_of_day
+
+    @property
+    def max_time_of_day_class(self):
+        return self._get_css_class(self._rule_override.max_time_of_day is not None, "max_time_of_day_class")
+
+    @property
+    def max_time_per_day(self):
+        value = self._rule_override.max_time_per_day
+        return value if value is not None else self._rule_set.max_time_per_day
+
+    @property
+    def max_time_per_day_class(self):
+        return self._get_css_class(self._rule_override.max_time_per_day is not None, "max_time_per_day_class")
+
+    @property
+    def min_break(self):
+        value = self._rule_override.min_break
+        return value if value is not None else self._rule_set.min_break
+
+    @property
+    def min_break_class(self):
+        return self._get_css_class(self._rule_override.min_break is not None, "min_break_class")
+
+    @property
+    def max_activity_duration(self):
+        value = self._rule_override.max_activity_duration
+        return value if value is not None else self._rule_set.max_activity_duration
+
+    @property
+    def max_activity_duration_class(self):
+        return self._get_css_class(self._rule_override.max_activity_duration is not None,
+                                   "max_activity_duration_class")
+
+    @property
+    def free_play(self):
+        return True if self._rule_override.free_play else self._rule_set.free_play
+
+    @property
+    def free_play_class(self):
+        return self._get_css_class(self._rule_override.free_play, "free_play_class")
+
+
+def apply_override(p_rule_set, p_rule_override):
+
+    if p_rule_override is None:
+        return p_rule_set
+
+    return EffectiveRuleSet(p_rule_set=p_rule_set, p_rule_override=p_rule_override)
 
 
 class RuleResultInfo(object):
@@ -163,6 +234,19 @@ class RuleResultInfo(object):
 
         return max(self.minutes_left_in_session, self.minutes_left_in_time_extension)
 
+    def get_minutes_left(self):
+
+        if self.free_play:
+            return None
+
+        minutes_left = [minutes for minutes in (self.get_minutes_left_in_session(), self.minutes_left_today)
+                        if minutes is not None]
+
+        if len(minutes_left) == 0:
+            return None
+
+        return min(minutes_left)
+
     def activity_granted(self):
 
         return self.applying_rules & RULE_GRANT_PLAYTIME_MASK > 0
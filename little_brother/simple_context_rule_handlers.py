@@ -17,7 +17,7 @@
 
 import wtforms
 
-from little_brother.context_rule_handler import AbstractContextRuleHandler
+from little_brother.context_rule_handler import AbstractContextRuleHandler, ContextPredicate
 from python_base_app import configuration
 
 # Dummy function to trigger extraction by pybabel...
@@ -42,6 +42,42 @@ WEEKPLAN_PREDEFINED_DETAILS = {
 }
 
 
+class ConstantContextPredicate(ContextPredicate):
+
+    __slots__ = ("_active",)
+
+    def __init__(self, p_active):
+        object.__setattr__(self, "_active", p_active)
+
+    def is_active(self, p_reference_date):
+        return self._active
+
+    @property
+    def version(self):
+        return 0
+
+
+class WeekdayMaskContextPredicate(ContextPredicate):
+
+    # Bit n of the mask is set if the context is active on weekday n (Monday = 0)
+
+    __slots__ = ("_mask",)
+
+    def __init__(self, p_mask):
+        object.__setattr__(self, "_mask", p_mask)
+
+    @property
+    def mask(self):
+        return self._mask
+
+    def is_active(self, p_reference_date):
+        return (self._mask >> p_reference_date.weekday()) & 1 == 1
+
+    @property
+    def version(self):
+        return 0
+
+
 class DefaultContextRuleHandler(AbstractContextRuleHandler):
 
     def __init__(self):
@@ -50,6 +86,9 @@ class DefaultContextRuleHandler(AbstractContextRuleHandler):
     def is_active(self, p_reference_date, p_details):
         return True
 
+    def compile_details(self, p_details):
+        return ConstantContextPredicate(p_active=True)
+
 
 class WeekplanContextRuleHandler(AbstractContextRuleHandler):
 
@@ -59,24 +98,32 @@ class WeekplanContextRuleHandler(AbstractContextRuleHandler):
 
     def is_active(self, p_reference_date, p_details):
 
+        return self.compile_details(p_details=p_details).is_active(p_reference_date=p_reference_date)
+
+    def compile_details(self, p_details):
+
         if p_details is None:
             raise configuration.ConfigurationException("Weekday context without context details")
 
-        p_details = p_details.lower()
+        details = p_details.lower()
 
-        if p_details in WEEKPLAN_PREDEFINED_DETAILS:
-            weekday_string = WEEKPLAN_PREDEFINED_DETAILS[p_details]
+        if details in WEEKPLAN_PREDEFINED_DETAILS:
+            weekday_string = WEEKPLAN_PREDEFINED_DETAILS[details]
 
-        elif len(p_details) == 7:
-            weekday_string = p_details
+        elif len(details) == 7:
+            weekday_string = details
 
         else:
             fmt = "invalid context details '{details}' for context {name}"
-            raise configuration.ConfigurationException(fmt.format(details=p_details, name=self.context_name))
+            raise configuration.ConfigurationException(fmt.format(details=details, name=self.context_name))
+
+        mask = 0
 
-        time_tuple = p_reference_date.timetuple()
+        for weekday, c in enumerate(weekday_string.upper()):
+            if c in VALID_ACTIVE_DAY_CHARACTERS:
+                mask |= 1 << weekday
 
-        return weekday_string.upper()[time_tuple.tm_wday] in VALID_ACTIVE_DAY_CHARACTERS
+        return WeekdayMaskContextPredicate(p_mask=mask)
 
     def get_choices(self):
 
@@ -0,0 +1,58 @@
+#    Copyright (C) 2019-2024  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from little_brother import proc_connector
+from little_brother.proc_connector import ProcessEvent
+
+
+class ReplayProcessEventSource(object):
+
+    # Replays batches of process events. Each batch is encoded as netlink message as it would be sent by the kernel
+    # so that parsing is covered, too. A batch may also be an exception, e.g. an instance of ResyncRequired to simulate
+    # lost events.
+
+    def __init__(self, p_batches, p_open_exception=None):
+        self._batches = p_batches
+        self._open_exception = p_open_exception
+        self._index = 0
+        self.is_open = False
+
+    def open(self):
+        if self._open_exception is not None:
+            raise self._open_exception
+
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def replay(self):
+        self._index = 0
+
+    def read_events(self, p_timeout) -> list[ProcessEvent]:
+        if self._index >= len(self._batches):
+            return []
+
+        batch = self._batches[self._index]
+        self._index += 1
+
+        if isinstance(batch, Exception):
+            raise batch
+
+        data = b"".join(proc_connector.build_proc_event_message(p_event=event) for event in batch)
+        return proc_connector.parse_proc_connector_message(data)
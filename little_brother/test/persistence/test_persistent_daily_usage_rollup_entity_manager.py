@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2019-2024  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import datetime
+
+from little_brother import dependency_injection
+from little_brother import process_statistics
+from little_brother.persistence.base_entity_manager import BaseEntityManager
+from little_brother.persistence.persistence import Persistence
+from little_brother.persistence.persistent_daily_usage_rollup import DailyUsageRollup
+from little_brother.persistence.persistent_daily_usage_rollup_entity_manager import DailyUsageRollupEntityManager
+from little_brother.persistence.session_context import SessionContext
+from little_brother.test import test_data
+from little_brother.test.persistence.base_test_case_persistent_entity_manager import BaseTestCasePersistentEntityManager
+from little_brother.test.persistence.test_persistence import TestPersistence
+
+CONTEXT = "default"
+
+
+def create_rollup(p_reference_date, p_duration):
+    rollup = DailyUsageRollup()
+    rollup.username = test_data.USER_1
+    rollup.context = CONTEXT
+    rollup.reference_date = p_reference_date
+
+    activity = process_statistics.Activity(
+        p_start_time=datetime.datetime.combine(p_reference_date, datetime.time(hour=10)))
+    activity.add_host_process("host1", p_percent=50)
+    activity.set_end_time(p_end_time=activity.start_time + datetime.timedelta(seconds=2 * p_duration))
+    day_statistics = process_statistics.DayStatistics()
+    day_statistics.add_activity(activity)
+    rollup.set_day_statistics(p_day_statistics=day_statistics)
+
+    return rollup
+
+
+class TestDailyUsageRollupEntityManager(BaseTestCasePersistentEntityManager):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._entity_manager: BaseEntityManager = DailyUsageRollupEntityManager()
+
+    def setUp(self):
+        dependency_injection.reset()
+
+    def test_write_rollups(self):
+
+        TestPersistence.create_dummy_persistence(self._logger)
+
+        a_persistence = dependency_injection.container[Persistence]
+        self.assertIsNotNone(a_persistence)
+
+        daily_usage_rollup_entity_manager: DailyUsageRollupEntityManager = \
+            dependency_injection.container[DailyUsageRollupEntityManager]
+
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        day_before_yesterday = yesterday - datetime.timedelta(days=1)
+
+        with SessionContext(p_persistence=a_persistence) as session_context:
+            daily_usage_rollup_entity_manager.write_rollups(
+                p_session_context=session_context,
+                p_rollups=[create_rollup(p_reference_date=yesterday, p_duration=600),
+                           create_rollup(p_reference_date=day_before_yesterday, p_duration=1200)])
+
+        with SessionContext(p_persistence=a_persistence) as session_context:
+            rollups = daily_usage_rollup_entity_manager.get_rollups(
+                p_session_context=session_context, p_start_date=yesterday, p_end_date=yesterday)
+
+            self.check_list_length(p_list=list(rollups.values()), p_length=1)
+
+            day_statistics = rollups[(test_data.USER_1, CONTEXT, yesterday)].get_day_statistics()
+
+            self.assertEqual(600, day_statistics.duration)
+            self.assertEqual(1, day_statistics.activity_count)
+            self.assertEqual("host1(1, 50%)", day_statistics.host_infos)
+            self.assertEqual(datetime.datetime.combine(yesterday, datetime.time(hour=10)), day_statistics.min_time)
+
+        # Writing the rollup of a day again replaces the existing one
+        with SessionContext(p_persistence=a_persistence) as session_context:
+            daily_usage_rollup_entity_manager.write_rollups(
+                p_session_context=session_context,
+                p_rollups=[create_rollup(p_reference_date=yesterday, p_duration=900)])
+
+        with SessionContext(p_persistence=a_persistence) as session_context:
+            rollups = daily_usage_rollup_entity_manager.get_rollups(
+                p_session_context=session_context, p_start_date=day_before_yesterday, p_end_date=yesterday)
+
+            self.check_list_length(p_list=list(rollups.values()), p_length=2)
+            self.assertEqual(900, rollups[(test_data.USER_1, CONTEXT, yesterday)].duration)
+            self.assertEqual(1200, rollups[(test_data.USER_1, CONTEXT, day_before_yesterday)].duration)
+
+    def test_delete_history(self):
+        TestPersistence.create_dummy_persistence(self._logger)
+
+        a_persistence = dependency_injection.container[Persistence]
+        self.assertIsNotNone(a_persistence)
+
+        age = 30  # days
+
+        with SessionContext(p_persistence=a_persistence) as session_context:
+            self._entity_manager.write_rollups(
+                p_session_context=session_context,
+                p_rollups=[create_rollup(p_reference_date=datetime.date.today() - datetime.timedelta(days=age),
+                                         p_duration=600)])
+
+        self.shorten_and_check_history(p_persistence=a_persistence,
+                                       p_reference_time_column=DailyUsageRollup.reference_date,
+                                       p_age_in_days=age)
@@ -22,6 +22,8 @@ import unittest
 
 from little_brother.test.persistence.test_persistence import TestPersistence
 from little_brother.test.persistence.test_persistent_admin_event_entity_manager import TestAdminEventEntityManager
+from little_brother.test.persistence.test_persistent_daily_usage_rollup_entity_manager import \
+    TestDailyUsageRollupEntityManager
 from little_brother.test.persistence.test_persistent_daily_user_status_entity_manager import \
     TestDailyUserStatusEntityManager
 from little_brother.test.persistence.test_persistent_device import TestDevice
@@ -86,6 +88,10 @@ def add_test_cases(p_test_suite, p_config_filename=None):
         p_test_suite=p_test_suite, p_test_unit_class=TestUidMappingEntityManager,
         p_config_filename=p_config_filename)
 
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite, p_test_unit_class=TestDailyUsageRollupEntityManager,
+        p_config_filename=p_config_filename)
+
 
 def main():
     log_handling.start_logging(p_use_filter=False)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2019-2024  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import datetime
+import unittest
+
+import prometheus_client
+
+from little_brother import adaptive_scheduler
+from little_brother import prometheus
+from little_brother.rule_result_info import RuleResultInfo
+from python_base_app import configuration
+from python_base_app.test import base_test
+
+TASK_NAME = "some_task"
+BASE_INTERVAL = 5
+
+
+class TestAdaptiveScheduler(base_test.BaseTestCase):
+
+    @staticmethod
+    def create_scheduler(p_prometheus_client=None):
+        config = adaptive_scheduler.AdaptiveSchedulerConfigModel()
+        config.min_check_interval = 1
+        config.max_check_interval = 30
+        config.approaching_limit_in_minutes = 3
+        return adaptive_scheduler.AdaptiveScheduler(p_config=config, p_prometheus_client=p_prometheus_client)
+
+    def test_invalid_config(self):
+        config = adaptive_scheduler.AdaptiveSchedulerConfigModel()
+        config.min_check_interval = 10
+        config.max_check_interval = 5
+
+        with self.assertRaises(configuration.ConfigurationException):
+            adaptive_scheduler.AdaptiveScheduler(p_config=config)
+
+    def test_active_user(self):
+        scheduler = self.create_scheduler()
+        scheduler.set_activity(p_source="ClientProcessHandler", p_active=True)
+
+        self.assertEqual(BASE_INTERVAL, scheduler.get_interval(p_task_name=TASK_NAME, p_base_interval=BASE_INTERVAL))
+        self.assertEqual(1, scheduler.get_interval(p_task_name=TASK_NAME, p_base_interval=0))
+
+    def test_idle_backoff(self):
+        scheduler = self.create_scheduler()
+        scheduler.set_activity(p_source="ClientProcessHandler", p_active=False)
+
+        intervals = [scheduler.get_interval(p_task_name=TASK_NAME, p_base_interval=BASE_INTERVAL) for _ in range(4)]
+        self.assertListEqual([10, 20, 30, 30], intervals)
+
+        # Any activity returns to the configured interval at once
+        scheduler.set_activity(p_source=adaptive_scheduler.ACTIVITY_SOURCE_RULES, p_active=True)
+        self.assertEqual(BASE_INTERVAL, scheduler.get_interval(p_task_name=TASK_NAME, p_base_interval=BASE_INTERVAL))
+
+    def test_approaching_limit(self):
+        scheduler = self.create_scheduler()
+        scheduler.set_activity(p_source=adaptive_scheduler.ACTIVITY_SOURCE_RULES, p_active=True)
+
+        scheduler.set_minutes_left(p_minutes_left=10)
+        self.assertEqual(BASE_INTERVAL, scheduler.get_interval(p_task_name=TASK_NAME, p_base_interval=BASE_INTERVAL))
+
+        scheduler.set_minutes_left(p_minutes_left=3)
+        self.assertEqual(1, scheduler.get_interval(p_task_name=TASK_NAME, p_base_interval=BASE_INTERVAL))
+
+        scheduler.set_minutes_left(p_minutes_left=None)
+        self.assertEqual(BASE_INTERVAL, scheduler.get_interval(p_task_name=TASK_NAME, p_base_interval=BASE_INTERVAL))
+
+    def test_recurring_task(self):
+        scheduler = self.create_scheduler()
+        scheduler.set_activity(p_source="ClientProcessHandler", p_active=False)
+
+        task = adaptive_scheduler.AdaptiveRecurringTask(p_name=TASK_NAME, p_handler_method=lambda: None,
+                                                        p_scheduler=scheduler, p_interval=BASE_INTERVAL)
+
+        # The first execution is scheduled immediately
+        task.compute_next_execution_time()
+        self.assertEqual(BASE_INTERVAL, task.interval)
+
+        before = datetime.datetime.utcnow()
+        task.compute_next_execution_time()
+        self.assertEqual(10, task.interval)
+        self.assertGreaterEqual(task.next_execution, before + datetime.timedelta(seconds=10))
+
+    def test_metric(self):
+        # Reset Prometheus
+        prometheus_client.registry.REGISTRY = prometheus_client.CollectorRegistry(auto_describe=True)
+
+        config = prometheus.PrometheusClientConfigModel()
+        config.port = 8889
+        client = prometheus.PrometheusClient(p_logger=self._logger, p_config=config)
+
+        try:
+            scheduler = self.create_scheduler(p_prometheus_client=client)
+            scheduler.get_interval(p_task_name=TASK_NAME, p_base_interval=BASE_INTERVAL)
+
+            value = prometheus_client.REGISTRY.get_sample_value(
+                config.prefix + "effective_check_interval", {"taskname": TASK_NAME})
+            self.assertEqual(10, value)
+
+        finally:
+            client.stop()
+
+    def test_rule_result_info_minutes_left(self):
+        rule_result_info = RuleResultInfo()
+        self.assertIsNone(rule_result_info.get_minutes_left())
+
+        rule_result_info.set_minutes_left_today(p_minutes_left=20)
+        self.assertEqual(20, rule_result_info.get_minutes_left())
+
+        rule_result_info.set_minutes_left_in_session(p_minutes_left=7)
+        self.assertEqual(7, rule_result_info.get_minutes_left())
+
+        rule_result_info.free_play = True
+        self.assertIsNone(rule_result_info.get_minutes_left())
+
+
+if __name__ == "__main__":
+    unittest.main()
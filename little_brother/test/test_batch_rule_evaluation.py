@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import datetime
+import os
+import pickle
+import time
+import unittest
+
+from little_brother import batch_rule_evaluation
+from little_brother import process_info
+from little_brother import process_statistics
+from little_brother import rule_handler
+from little_brother import rule_override
+from python_base_app.test import base_test
+
+HOSTNAME = "hostname"
+MIN_ACTIVITY_DURATION = 60
+MAX_LOOKBACK_IN_DAYS = 10
+LOCALE = "en_US"
+
+BENCHMARK_USER_COUNT = 5000
+BENCHMARK_WORKER_COUNTS = (1, 2, 4, 8)
+
+
+class DummyUser(object):
+
+    def __init__(self, p_username):
+        self.username = p_username
+
+
+class DummyTimeExtension(object):
+
+    def __init__(self, p_start_datetime, p_end_datetime):
+        self.start_datetime = p_start_datetime
+        self.end_datetime = p_end_datetime
+
+
+def create_user_evaluation(p_index, p_reference_time):
+
+    # Varies the rule sets and the activities of the users so that all checks are exercised
+    username = "user%d" % p_index
+
+    rule_set = rule_handler.RuleSetConfigModel()
+    rule_set.min_time_of_day = datetime.time(hour=8 + p_index % 3)
+    rule_set.max_time_of_day = datetime.time(hour=18 + p_index % 5)
+    rule_set.max_time_per_day = 600 * (p_index % 7)
+    rule_set.max_activity_duration = 1800 + 60 * (p_index % 11)
+    rule_set.min_break = 900
+    rule_set.free_play = p_index % 13 == 0
+
+    stat_info = process_statistics.ProcessStatisticsInfo(p_username=username, p_reference_time=p_reference_time,
+                                                         p_min_activity_duration=MIN_ACTIVITY_DURATION,
+                                                         p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS)
+
+    start_time = p_reference_time - datetime.timedelta(seconds=120 * (p_index % 23) + 300)
+    pinfo = process_info.ProcessInfo(p_hostname=HOSTNAME, p_username=username, p_pid=p_index,
+                                     p_start_time=start_time)
+    stat_info.add_process_start(p_process_info=pinfo, p_start_time=start_time)
+
+    if p_index % 2 == 0:
+        end_time = start_time + datetime.timedelta(seconds=200)
+        pinfo.end_time = end_time
+        stat_info.add_process_end(p_process_info=pinfo, p_end_time=end_time)
+
+    override = None
+
+    if p_index % 5 == 0:
+        override = rule_override.RuleOverride(p_username=username, p_reference_date=p_reference_time.date(),
+                                              p_max_time_per_day=3600)
+
+    time_extension = None
+
+    if p_index % 7 == 0:
+        time_extension = DummyTimeExtension(p_start_datetime=p_reference_time - datetime.timedelta(minutes=10),
+                                            p_end_datetime=p_reference_time + datetime.timedelta(minutes=20))
+
+    return batch_rule_evaluation.UserRuleEvaluation(
+        p_user=DummyUser(p_username=username), p_stat_info=stat_info, p_rule_set=rule_set,
+        p_rule_override=override, p_active_time_extension=time_extension, p_locale=LOCALE)
+
+
+def get_result_summary(p_rule_result_info):
+
+    return (p_rule_result_info.applying_rules, p_rule_result_info.approaching_logout_rules,
+            p_rule_result_info.minutes_left_today, p_rule_result_info.minutes_left_in_session,
+            p_rule_result_info.minutes_left_in_time_extension, p_rule_result_info.break_minutes_left,
+            p_rule_result_info.session_end_datetime, p_rule_result_info.applying_rule_text_templates)
+
+
+class TestBatchRuleEvaluation(base_test.BaseTestCase):
+
+    def setUp(self):
+
+        self._reference_time = datetime.datetime.combine(datetime.date.today(), datetime.time(hour=15))
+        self._config = rule_handler.RuleHandlerConfigModel()
+        self._rule_handler = rule_handler.RuleHandler(p_config=self._config, p_persistence=None)
+
+    def create_user_evaluations(self, p_count):
+
+        return [create_user_evaluation(p_index=index, p_reference_time=self._reference_time)
+                for index in range(p_count)]
+
+    def get_expected_results(self, p_user_evaluations):
+
+        results = []
+
+        for user_evaluation in p_user_evaluations:
+            a_rule_result_info = rule_handler.RuleResultInfo(p_default_rule_set=user_evaluation.rule_set,
+                                                             p_rule_override=user_evaluation.rule_override,
+                                                             p_locale=LOCALE)
+            self._rule_handler.evaluate_rule_set(p_rule_result_info=a_rule_result_info,
+                                                 p_stat_info=user_evaluation.stat_info,
+                                                 p_active_time_extension=user_evaluation.active_time_extension,
+                                                 p_reference_time=self._reference_time)
+            results.append(get_result_summary(a_rule_result_info))
+
+        return results
+
+    def test_evaluate_records(self):
+
+        user_evaluations = self.create_user_evaluations(p_count=200)
+        records = [user_evaluation.create_record(p_reference_time=self._reference_time)
+                   for user_evaluation in user_evaluations]
+
+        # The records have to survive the transfer to the worker processes
+        records = pickle.loads(pickle.dumps(records))
+        results = pickle.loads(pickle.dumps(batch_rule_evaluation.evaluate_records(p_config=self._config,
+                                                                                   p_records=records)))
+
+        for user_evaluation, a_rule_result_info in zip(user_evaluations, results):
+            user_evaluation.merge_result(p_rule_result_info=a_rule_result_info)
+
+        self.assertListEqual(self.get_expected_results(p_user_evaluations=user_evaluations),
+                             [get_result_summary(user_evaluation.rule_result_info)
+                              for user_evaluation in user_evaluations])
+
+        user_evaluation = user_evaluations[5]
+        self.assertIs(user_evaluation.rule_set, user_evaluation.rule_result_info.default_rule_set)
+        self.assertEqual(3600, user_evaluation.rule_result_info.effective_rule_set.max_time_per_day)
+
+    def test_get_chunks(self):
+
+        evaluator = batch_rule_evaluation.BatchRuleEvaluator(p_config=self._config, p_max_workers=4)
+
+        records = list(range(batch_rule_evaluation.MIN_RECORDS_PER_WORKER))
+        self.assertEqual(1, len(evaluator.get_chunks(p_records=records)))
+
+        records = list(range(10 * batch_rule_evaluation.MIN_RECORDS_PER_WORKER + 1))
+        chunks = evaluator.get_chunks(p_records=records)
+        self.assertEqual(4, len(chunks))
+        self.assertListEqual(records, [record for chunk in chunks for record in chunk])
+
+    def test_evaluate_in_process_pool(self):
+
+        user_evaluations = self.create_user_evaluations(p_count=4 * batch_rule_evaluation.MIN_RECORDS_PER_WORKER)
+        records = [user_evaluation.create_record(p_reference_time=self._reference_time)
+                   for user_evaluation in user_evaluations]
+        evaluator = batch_rule_evaluation.BatchRuleEvaluator(p_config=self._config, p_max_workers=2)
+
+        try:
+            results = evaluator.evaluate(p_records=records)
+
+        finally:
+            evaluator.shutdown()
+
+        self.assertListEqual(self.get_expected_results(p_user_evaluations=user_evaluations),
+                             [get_result_summary(a_rule_result_info) for a_rule_result_info in results])
+
+    def test_benchmark_batch_evaluation(self):
+
+        user_evaluations = self.create_user_evaluations(p_count=BENCHMARK_USER_COUNT)
+        serial_duration = None
+
+        for worker_count in BENCHMARK_WORKER_COUNTS:
+            evaluator = batch_rule_evaluation.BatchRuleEvaluator(p_config=self._config, p_max_workers=worker_count)
+
+            try:
+                # The first call starts the worker processes
+                evaluator.evaluate(p_records=[user_evaluation.create_record(p_reference_time=self._reference_time)
+                                              for user_evaluation in user_evaluations[:1000]])
+
+                start = time.perf_counter()
+                records = [user_evaluation.create_record(p_reference_time=self._reference_time)
+                           for user_evaluation in user_evaluations]
+                results = evaluator.evaluate(p_records=records)
+                duration = time.perf_counter() - start
+
+            finally:
+                evaluator.shutdown()
+
+            self.assertEqual(BENCHMARK_USER_COUNT, len(results))
+
+            if serial_duration is None:
+                serial_duration = duration
+
+            # The speedup is limited by the number of CPUs
+            fmt = "Evaluating the rules of {count} users with {workers} worker(s) on {cpus} CPU(s): " \
+                  "{duration:.3f}s (speedup {speedup:.2f})"
+            self._logger.info(fmt.format(count=BENCHMARK_USER_COUNT, workers=worker_count, cpus=os.cpu_count(),
+                                         duration=duration, speedup=serial_duration / duration))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -21,9 +21,14 @@
 import copy
 import datetime
 import os
+import re
 import signal
+import time
 from multiprocessing import Process
 from time import sleep
+from unittest.mock import patch
+
+import psutil
 
 from little_brother import admin_event
 from little_brother import client_process_handler
@@ -33,6 +38,7 @@ from little_brother.login_mapping import LoginMapping
 from little_brother.persistence.persistence import Persistence
 from little_brother.persistence.persistent_uid_mapping import DEFAULT_SERVER_GROUP
 from little_brother.persistence.session_context import SessionContext
+from little_brother.process_info import ProcessInfo
 from little_brother.test import dummy_process_iterator
 from little_brother.test import test_data
 from little_brother.test.persistence import test_persistence
@@ -475,3 +481,266 @@ class TestClientProcessHandler(base_test.BaseTestCase):
 
             self.assertIsNotNone(admin_events)
             self.assertEqual(0, len(admin_events))
+
+    def test_handle_event_kill_process_asynchronously(self):
+        config = client_process_handler.ClientProcessHandlerConfigModel()
+        config.sudo_command = ""
+        config.scan_command_line_options = False
+        config.kill_asynchronously = True
+        config.kill_delay = 1
+
+        process = create_dummy_process(p_mask_sigterm=True)
+
+        test_persistence.TestPersistence.create_dummy_persistence(self._logger, p_delete=True)
+        dummy_persistence: test_persistence.TestPersistence = dependency_injection.container[Persistence]
+
+        process_handler = None
+
+        try:
+            with SessionContext(p_persistence=dummy_persistence) as session_context:
+                login_mapping = LoginMapping()
+                login_mapping.add_entry(p_session_context=session_context, p_uid=os.getuid(), p_username="dummy")
+
+                process_handler = self.get_dummy_process_handler(p_processes=test_data.PROCESSES_CMD_LINE_1,
+                                                                 p_config=config, p_login_mapping=login_mapping)
+
+                event = AdminEvent(p_hostname="localhost", p_processname="sh", p_username="dummy",
+                                   p_processhandler=process_handler.id,
+                                   p_process_start_time=tools.get_current_time(),
+                                   p_event_type=EVENT_TYPE_KILL_PROCESS, p_pid=process.pid)
+
+                start = time.perf_counter()
+                admin_events = process_handler.handle_event_kill_process(
+                    p_session_context=session_context, p_event=event, p_login_mapping=login_mapping)
+
+                # The call does not wait for the kill delay
+                self.assertLess(time.perf_counter() - start, config.kill_delay)
+                self.assertEqual(0, len(admin_events))
+
+                # Repeated events are dropped while the kill is pending
+                with patch.object(psutil, "Process", side_effect=psutil.Process) as process_class:
+                    admin_events = process_handler.handle_event_kill_process(
+                        p_session_context=session_context, p_event=event, p_login_mapping=login_mapping)
+
+                    self.assertEqual(0, len(admin_events))
+                    self.assertEqual(0, process_class.call_count)
+
+                # The process ignores SIGHUP and is killed by SIGKILL after the kill delay
+                process.join(timeout=10 * config.kill_delay)
+                self.assertEqual(-signal.SIGKILL, process.exitcode)
+
+        finally:
+            if process_handler is not None:
+                process_handler.shutdown()
+
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    @staticmethod
+    def scan(p_process_handler, p_session_context, p_login_mapping, p_process_regex_map, p_reference_time=None,
+             p_prohibited_process_regex_map=None):
+
+        if p_reference_time is None:
+            p_reference_time = datetime.datetime.now()
+
+        if p_prohibited_process_regex_map is None:
+            p_prohibited_process_regex_map = test_data.get_prohibited_process_regex_map_1()
+
+        return p_process_handler.scan_processes(
+            p_session_context=p_session_context,
+            p_server_group=DEFAULT_SERVER_GROUP,
+            p_login_mapping=p_login_mapping,
+            p_host_name=test_data.HOSTNAME_1,
+            p_process_regex_map=p_process_regex_map,
+            p_prohibited_process_regex_map=p_prohibited_process_regex_map,
+            p_reference_time=p_reference_time)
+
+    def test_get_attribute_plans(self):
+
+        config = client_process_handler.ClientProcessHandlerConfigModel()
+        process_handler = client_process_handler.ClientProcessHandler(p_config=config,
+                                                                      p_process_iterator_factory=None)
+
+        process_regex_map = test_data.get_process_regex_map_1()
+        plans = process_handler.get_attribute_plans(
+            p_process_regex_map=process_regex_map,
+            p_prohibited_process_regex_map={test_data.USER_1: None})
+        self.assertEqual(client_process_handler.ProcessAttributePlan(
+            p_need_name=True, p_need_cmdline=False, p_check_prohibited=False), plans[test_data.USER_1])
+
+        plans = process_handler.get_attribute_plans(
+            p_process_regex_map=process_regex_map,
+            p_prohibited_process_regex_map={test_data.USER_1: re.compile("forbidden")})
+        self.assertEqual(client_process_handler.ProcessAttributePlan(
+            p_need_name=True, p_need_cmdline=True, p_check_prohibited=True), plans[test_data.USER_1])
+
+        config.scan_command_line_options = True
+        plans = process_handler.get_attribute_plans(p_process_regex_map=process_regex_map,
+                                                    p_prohibited_process_regex_map=None)
+        self.assertEqual(client_process_handler.ProcessAttributePlan(
+            p_need_name=False, p_need_cmdline=True, p_check_prohibited=False), plans[test_data.USER_1])
+
+    def test_scan_reads_command_line_only_if_required(self):
+
+        test_persistence.TestPersistence.create_dummy_persistence(self._logger, p_delete=True)
+        dummy_persistence: test_persistence.TestPersistence = dependency_injection.container[Persistence]
+
+        with SessionContext(p_persistence=dummy_persistence) as session_context:
+            login_mapping = test_data.get_login_mapping(p_session_context=session_context)
+
+            for (prohibited_process_regex_map, expected_cmdline_call_count) in (
+                    ({test_data.USER_1: None}, 0),
+                    ({test_data.USER_1: re.compile("forbidden")}, 1)):
+                process_iterator_factory = dummy_process_iterator.DummyProcessFactory(
+                    p_processes=test_data.PROCESSES_1, p_login_mapping=login_mapping,
+                    p_session_context=session_context)
+                process_iterator_factory.set_reference_time(
+                    p_reference_time=test_data.START_TIME_1 + datetime.timedelta(seconds=1))
+
+                config = client_process_handler.ClientProcessHandlerConfigModel()
+                process_handler = client_process_handler.ClientProcessHandler(
+                    p_config=config, p_process_iterator_factory=process_iterator_factory)
+
+                with patch.object(dummy_process_iterator.DummyProcess, "cmdline", autospec=True,
+                                  side_effect=dummy_process_iterator.DummyProcess.cmdline) as cmdline:
+                    events = self.scan(p_process_handler=process_handler, p_session_context=session_context,
+                                       p_login_mapping=login_mapping,
+                                       p_process_regex_map=test_data.get_process_regex_map_1(),
+                                       p_prohibited_process_regex_map=prohibited_process_regex_map)
+
+                    self.check_list_has_n_elements(p_list=events, p_n=1)
+                    self.check_default_data(p_event=events[0])
+                    self.assertEqual(expected_cmdline_call_count, cmdline.call_count)
+
+    def test_get_oneshot_context(self):
+
+        with client_process_handler.get_oneshot_context(psutil.Process(os.getpid())) as proc_context:
+            self.assertIsNone(proc_context)
+
+        dummy_process = dummy_process_iterator.DummyProcess(p_pinfo=test_data.PROCESSES_1[0], p_uid=test_data.UID_1)
+
+        with client_process_handler.get_oneshot_context(dummy_process):
+            self.assertEqual(test_data.PROCESS_NAME_1, dummy_process.name())
+
+    def test_incremental_scan(self):
+
+        test_persistence.TestPersistence.create_dummy_persistence(self._logger, p_delete=True)
+        dummy_persistence: test_persistence.TestPersistence = dependency_injection.container[Persistence]
+
+        with SessionContext(p_persistence=dummy_persistence) as session_context:
+            processes = copy.deepcopy(test_data.PROCESSES_1)
+
+            login_mapping = test_data.get_login_mapping(p_session_context=session_context)
+            process_iterator_factory = dummy_process_iterator.DummyProcessFactory(
+                p_processes=processes, p_login_mapping=login_mapping, p_session_context=session_context)
+
+            config = client_process_handler.ClientProcessHandlerConfigModel()
+            config.scan_incrementally = True
+            process_handler = client_process_handler.ClientProcessHandler(
+                p_config=config, p_process_iterator_factory=process_iterator_factory)
+            process_iterator_factory.set_reference_time(
+                p_reference_time=test_data.START_TIME_1 + datetime.timedelta(seconds=1))
+
+            with patch.object(dummy_process_iterator.DummyProcess, "uids", autospec=True,
+                              side_effect=dummy_process_iterator.DummyProcess.uids) as uids:
+                events = self.scan(p_process_handler=process_handler, p_session_context=session_context,
+                                   p_login_mapping=login_mapping,
+                                   p_process_regex_map=test_data.get_process_regex_map_1())
+
+                self.check_list_has_n_elements(p_list=events, p_n=1)
+                self.assertEqual(events[0].event_type, admin_event.EVENT_TYPE_PROCESS_START)
+                self.check_default_data(p_event=events[0])
+                self.assertEqual(1, uids.call_count)
+
+                process_handler.handle_event_process_start(p_event=events[0])
+
+                # The process is known already -> no further inspection and no events
+                events = self.scan(p_process_handler=process_handler, p_session_context=session_context,
+                                   p_login_mapping=login_mapping,
+                                   p_process_regex_map=test_data.get_process_regex_map_1())
+
+                self.check_list_has_n_elements(p_list=events, p_n=0)
+                self.assertEqual(1, uids.call_count)
+
+                # Changing the patterns requires a new inspection
+                events = self.scan(p_process_handler=process_handler, p_session_context=session_context,
+                                   p_login_mapping=login_mapping,
+                                   p_process_regex_map=test_data.get_process_path_regex_map_1())
+
+                self.check_list_has_n_elements(p_list=events, p_n=1)
+                self.assertEqual(events[0].event_type, admin_event.EVENT_TYPE_PROCESS_END)
+                self.assertEqual(2, uids.call_count)
+
+                # Changing the login mapping requires a new inspection
+                login_mapping.add_entry(p_session_context=session_context, p_uid=test_data.UID_1 + 1,
+                                        p_username="other-user")
+                self.scan(p_process_handler=process_handler, p_session_context=session_context,
+                          p_login_mapping=login_mapping,
+                          p_process_regex_map=test_data.get_process_path_regex_map_1())
+
+                self.assertEqual(3, uids.call_count)
+
+            processes[0].end_time = test_data.END_TIME_1
+            process_iterator_factory.set_reference_time(
+                p_reference_time=test_data.END_TIME_1 + datetime.timedelta(seconds=1))
+
+            now = datetime.datetime.now()
+            events = self.scan(p_process_handler=process_handler, p_session_context=session_context,
+                               p_login_mapping=login_mapping,
+                               p_process_regex_map=test_data.get_process_regex_map_1(), p_reference_time=now)
+
+            self.check_list_has_n_elements(p_list=events, p_n=1)
+            self.assertEqual(events[0].event_type, admin_event.EVENT_TYPE_PROCESS_END)
+            self.assertEqual(events[0].event_time, now)
+            self.check_default_data(p_event=events[0])
+
+    def test_benchmark_incremental_scan(self):
+
+        test_persistence.TestPersistence.create_dummy_persistence(self._logger, p_delete=True)
+        dummy_persistence: test_persistence.TestPersistence = dependency_injection.container[Persistence]
+
+        process_count = 10000
+        monitored_process_count = 100
+
+        processes = [
+            ProcessInfo(p_username=test_data.USER_1,
+                        p_processname=test_data.PROCESS_NAME_1 if i < monitored_process_count else "daemon%d" % i,
+                        p_pid=1000 + i, p_start_time=test_data.START_TIME_1)
+            for i in range(process_count)]
+
+        with SessionContext(p_persistence=dummy_persistence) as session_context:
+            login_mapping = test_data.get_login_mapping(p_session_context=session_context)
+            process_regex_map = test_data.get_process_regex_map_1()
+            durations = {}
+
+            for scan_incrementally in (False, True):
+                process_iterator_factory = dummy_process_iterator.DummyProcessFactory(
+                    p_processes=processes, p_login_mapping=login_mapping, p_session_context=session_context)
+                process_iterator_factory.set_reference_time(
+                    p_reference_time=test_data.START_TIME_1 + datetime.timedelta(seconds=1))
+
+                config = client_process_handler.ClientProcessHandlerConfigModel()
+                config.scan_incrementally = scan_incrementally
+                process_handler = client_process_handler.ClientProcessHandler(
+                    p_config=config, p_process_iterator_factory=process_iterator_factory)
+
+                events = self.scan(p_process_handler=process_handler, p_session_context=session_context,
+                                   p_login_mapping=login_mapping, p_process_regex_map=process_regex_map)
+                self.check_list_has_n_elements(p_list=events, p_n=monitored_process_count)
+
+                for event in events:
+                    process_handler.handle_event_process_start(p_event=event)
+
+                with patch.object(dummy_process_iterator.DummyProcess, "uids", autospec=True,
+                                  side_effect=dummy_process_iterator.DummyProcess.uids) as uids:
+                    start = time.perf_counter()
+                    events = self.scan(p_process_handler=process_handler, p_session_context=session_context,
+                                       p_login_mapping=login_mapping, p_process_regex_map=process_regex_map)
+                    durations[scan_incrementally] = time.perf_counter() - start
+
+                    self.check_list_has_n_elements(p_list=events, p_n=0)
+                    self.assertEqual(0 if scan_incrementally else process_count, uids.call_count)
+
+            fmt = "Scan of {count} unchanged processes: full scan {full:.3f}s, incremental scan {incremental:.3f}s"
+            self._logger.info(fmt.format(count=process_count, full=durations[False], incremental=durations[True]))
@@ -0,0 +1,441 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2019-2024  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import datetime
+import random
+import threading
+import time
+import unittest
+
+from little_brother import incremental_process_statistics
+from little_brother import pattern_matcher
+from little_brother import process_info
+from little_brother import process_statistics
+from python_base_app.test import base_test
+
+USER_1 = "user1"
+USER_2 = "user2"
+UNKNOWN_USER = "unknown"
+PROCESS_NAMES = ["game", "browser", "editor"]
+HOSTNAMES = ["host1", "host2", "host3"]
+CONTEXTS = ["default", "weekplan"]
+MAX_LOOKBACK_IN_DAYS = 7
+MIN_ACTIVITY_DURATION = 60  # seconds
+RANDOM_PROCESS_COUNT = 300
+BENCHMARK_HISTORIC_PROCESS_COUNT = 20000
+BENCHMARK_TICK_COUNT = 20
+
+
+class DummyRuleSet(object):
+
+    def __init__(self, p_context):
+        self.context = p_context
+
+
+class DummyUser(object):
+
+    # Provides the attributes of persistent_user.User used by the statistics
+    def __init__(self, p_username, p_process_name_pattern):
+        self.username = p_username
+        self.notification_name = p_username
+        self.full_name = p_username
+        self.process_name_pattern = p_process_name_pattern
+        self.regex_process_name_pattern = pattern_matcher.get_pattern_matcher(
+            p_pattern_list=p_process_name_pattern, p_check_path_component=True)
+        self.rulesets = [DummyRuleSet(p_context=context) for context in CONTEXTS]
+
+
+class RecordingPrometheusClient(object):
+
+    def __init__(self):
+        self.cache_requests = []
+
+    def count_statistics_cache_request(self, p_hit):
+        self.cache_requests.append(p_hit)
+
+
+def create_user(p_username, p_process_name_pattern="game|browser"):
+    return DummyUser(p_username=p_username, p_process_name_pattern=p_process_name_pattern)
+
+
+def create_user_map():
+    return {username: create_user(p_username=username) for username in (USER_1, USER_2)}
+
+
+def create_random_process_infos(p_random, p_reference_time, p_count, p_days=MAX_LOOKBACK_IN_DAYS + 3,
+                                p_open_ratio=0.1):
+    pinfos = []
+
+    for pid in range(p_count):
+        start_time = p_reference_time - datetime.timedelta(seconds=p_random.randint(0, p_days * 24 * 3600))
+
+        if p_random.random() < p_open_ratio:
+            end_time = None
+
+        else:
+            end_time = start_time + datetime.timedelta(seconds=p_random.randint(0, 3 * 3600))
+
+        pinfos.append(process_info.ProcessInfo(
+            p_hostname=p_random.choice(HOSTNAMES), p_username=p_random.choice((USER_1, USER_2, UNKNOWN_USER)),
+            p_processhandler="ClientProcessHandler", p_processname=p_random.choice(PROCESS_NAMES + [None]),
+            p_pid=pid, p_start_time=start_time, p_end_time=end_time,
+            p_downtime=p_random.choice((0, 0, 0, 120)), p_percent=p_random.choice((100, 100, 50))))
+
+    return pinfos
+
+
+def get_activity_summary(p_activity):
+    if p_activity is None:
+        return None
+
+    return (p_activity.start_time, p_activity.end_time, p_activity.downtime, p_activity.host_infos)
+
+
+def get_stat_info_summary(p_stat_info: process_statistics.ProcessStatisticsInfo):
+    return {
+        "active_processes": p_stat_info.active_processes,
+        "current_activity": get_activity_summary(p_stat_info.current_activity),
+        "previous_activity": get_activity_summary(p_stat_info.previous_activity),
+        "last_inactivity_start_time": p_stat_info.last_inactivity_start_time,
+        "has_downtime": p_stat_info.has_downtime,
+        "todays_activity_duration": p_stat_info.todays_activity_duration,
+        "day_statistics": [(day.duration, day.downtime, day.min_time, day.max_time, day.host_infos,
+                            [get_activity_summary(activity) for activity in day.activities])
+                           for day in p_stat_info.day_statistics],
+        # The order of the candidates is irrelevant
+        "currently_active_host_processes": {hostname: sorted(processes) for hostname, processes
+                                            in p_stat_info.currently_active_host_processes.items()}
+    }
+
+
+def get_summary(p_users_stat_infos):
+    return {username: {context: get_stat_info_summary(p_stat_info=stat_info)
+                       for context, stat_info in user_stat_infos.items()}
+            for username, user_stat_infos in p_users_stat_infos.items()}
+
+
+class TestIncrementalProcessStatistics(base_test.BaseTestCase):
+
+    def assert_consistent(self, p_statistics, p_user_map, p_process_infos, p_reference_time,
+                          p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS):
+
+        # The full re-sweep is the reference
+        expected = process_statistics.get_process_statistics(
+            p_user_map=p_user_map, p_process_infos=p_process_infos, p_reference_time=p_reference_time,
+            p_max_lookback_in_days=p_max_lookback_in_days, p_min_activity_duration=MIN_ACTIVITY_DURATION)
+
+        result = p_statistics.get_process_statistics(
+            p_user_map=p_user_map, p_reference_time=p_reference_time,
+            p_max_lookback_in_days=p_max_lookback_in_days, p_min_activity_duration=MIN_ACTIVITY_DURATION)
+
+        self.assertDictEqual(get_summary(p_users_stat_infos=expected), get_summary(p_users_stat_infos=result))
+
+    def test_empty(self):
+        statistics = incremental_process_statistics.IncrementalProcessStatistics()
+
+        self.assert_consistent(p_statistics=statistics, p_user_map=create_user_map(), p_process_infos={},
+                               p_reference_time=datetime.datetime.now())
+
+    def test_historic_process_infos(self):
+        random_generator = random.Random(4711)
+        reference_time = datetime.datetime(2024, 5, 17, 18, 30)
+        user_map = create_user_map()
+        pinfos = create_random_process_infos(p_random=random_generator, p_reference_time=reference_time,
+                                             p_count=RANDOM_PROCESS_COUNT)
+        statistics = incremental_process_statistics.IncrementalProcessStatistics()
+
+        for pinfo in pinfos:
+            statistics.update_process_info(p_process_info=pinfo)
+
+        process_infos = {pinfo.get_key(): pinfo for pinfo in pinfos}
+
+        for max_lookback_in_days in (1, MAX_LOOKBACK_IN_DAYS):
+            for hours in (0, 5, 30):
+                self.assert_consistent(p_statistics=statistics, p_user_map=user_map, p_process_infos=process_infos,
+                                       p_reference_time=reference_time + datetime.timedelta(hours=hours),
+                                       p_max_lookback_in_days=max_lookback_in_days)
+
+    def test_process_events(self):
+        random_generator = random.Random(42)
+        reference_time = datetime.datetime(2024, 5, 17, 18, 30)
+        user_map = create_user_map()
+        pinfos = create_random_process_infos(p_random=random_generator, p_reference_time=reference_time,
+                                             p_count=RANDOM_PROCESS_COUNT)
+        statistics = incremental_process_statistics.IncrementalProcessStatistics()
+        process_infos = {}
+
+        # Replay the processes as start, downtime and end events in random order
+        events = [(pinfo.start_time, "START", pinfo) for pinfo in pinfos]
+        random_generator.shuffle(events)
+
+        for pinfo in pinfos:
+            end_time = pinfo.end_time
+            pinfo.end_time = None
+            events.append((end_time, "END", pinfo))
+
+            if pinfo.downtime > 0:
+                downtime = pinfo.downtime
+                pinfo.downtime = 0
+                events.append((downtime, "DOWNTIME", pinfo))
+
+        # Query the statistics before each event to trigger partial sweeps
+        for index, (value, event_type, pinfo) in enumerate(events):
+            if index % 10 == 0:
+                self.assert_consistent(p_statistics=statistics, p_user_map=user_map, p_process_infos=process_infos,
+                                       p_reference_time=reference_time)
+
+            if event_type == "START":
+                process_infos[pinfo.get_key()] = pinfo
+
+            elif event_type == "END":
+                pinfo.end_time = value
+
+            else:
+                pinfo.downtime = value
+
+            statistics.update_process_info(p_process_info=pinfo)
+
+        self.assert_consistent(p_statistics=statistics, p_user_map=user_map, p_process_infos=process_infos,
+                               p_reference_time=reference_time)
+
+        # Restarted process
+        pinfo = next(pinfo for pinfo in pinfos if pinfo.end_time is not None and pinfo.username == USER_1)
+        pinfo.end_time = None
+        statistics.update_process_info(p_process_info=pinfo)
+
+        self.assert_consistent(p_statistics=statistics, p_user_map=user_map, p_process_infos=process_infos,
+                               p_reference_time=reference_time)
+
+    def test_change_of_process_name_pattern(self):
+        random_generator = random.Random(1)
+        reference_time = datetime.datetime(2024, 5, 17, 18, 30)
+        pinfos = create_random_process_infos(p_random=random_generator, p_reference_time=reference_time,
+                                             p_count=RANDOM_PROCESS_COUNT)
+        statistics = incremental_process_statistics.IncrementalProcessStatistics()
+
+        for pinfo in pinfos:
+            statistics.update_process_info(p_process_info=pinfo)
+
+        process_infos = {pinfo.get_key(): pinfo for pinfo in pinfos}
+
+        self.assert_consistent(p_statistics=statistics, p_user_map=create_user_map(), p_process_infos=process_infos,
+                               p_reference_time=reference_time)
+
+        user_map = create_user_map()
+        user_map[USER_1] = create_user(p_username=USER_1, p_process_name_pattern="editor")
+
+        self.assert_consistent(p_statistics=statistics, p_user_map=user_map, p_process_infos=process_infos,
+                               p_reference_time=reference_time)
+
+    def test_remove_process_infos(self):
+        random_generator = random.Random(17)
+        reference_time = datetime.datetime(2024, 5, 17, 18, 30)
+        user_map = create_user_map()
+        pinfos = create_random_process_infos(p_random=random_generator, p_reference_time=reference_time,
+                                             p_count=RANDOM_PROCESS_COUNT)
+        statistics = incremental_process_statistics.IncrementalProcessStatistics()
+
+        for pinfo in pinfos:
+            statistics.update_process_info(p_process_info=pinfo)
+
+        process_infos = {pinfo.get_key(): pinfo for pinfo in pinfos}
+
+        self.assert_consistent(p_statistics=statistics, p_user_map=user_map, p_process_infos=process_infos,
+                               p_reference_time=reference_time)
+
+        # Remove processes from everywhere in the timelines including open ones
+        removed_pinfos = random_generator.sample(pinfos, RANDOM_PROCESS_COUNT // 3)
+        statistics.remove_process_infos(p_process_infos=removed_pinfos)
+
+        for pinfo in removed_pinfos:
+            del process_infos[pinfo.get_key()]
+
+        self.assert_consistent(p_statistics=statistics, p_user_map=user_map, p_process_infos=process_infos,
+                               p_reference_time=reference_time)
+
+    def test_changed_days(self):
+        reference_time = datetime.datetime(2024, 5, 17, 18, 30)
+        statistics = incremental_process_statistics.IncrementalProcessStatistics()
+
+        # Initially all days are considered changed
+        self.assertIsNone(statistics.pop_changed_days())
+        self.assertSetEqual(set(), statistics.pop_changed_days())
+
+        pinfo = process_info.ProcessInfo(
+            p_hostname="host1", p_username=USER_1, p_processhandler="ClientProcessHandler", p_processname="game",
+            p_pid=1, p_start_time=reference_time - datetime.timedelta(days=3))
+        statistics.update_process_info(p_process_info=pinfo)
+
+        # The activity of the process may have started on the previous day
+        start_date = pinfo.start_time.date()
+        self.assertSetEqual({(USER_1, start_date), (USER_1, start_date - datetime.timedelta(days=1))},
+                            statistics.pop_changed_days())
+        self.assertSetEqual(set(), statistics.pop_changed_days())
+
+        statistics.remove_process_infos(p_process_infos=[pinfo])
+        self.assertSetEqual({(USER_1, start_date), (USER_1, start_date - datetime.timedelta(days=1))},
+                            statistics.pop_changed_days())
+
+        statistics.invalidate()
+        self.assertIsNone(statistics.pop_changed_days())
+
+        statistics.set_all_days_changed()
+        self.assertIsNone(statistics.pop_changed_days())
+
+    def get_statistics(self, p_statistics, p_user_map, p_reference_time):
+        return p_statistics.get_process_statistics(p_user_map=p_user_map, p_reference_time=p_reference_time,
+                                                   p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS,
+                                                   p_min_activity_duration=MIN_ACTIVITY_DURATION)
+
+    def test_cache(self):
+        random_generator = random.Random(5)
+        reference_time = datetime.datetime(2024, 5, 17, 18, 30)
+        user_map = create_user_map()
+        pinfos = create_random_process_infos(p_random=random_generator, p_reference_time=reference_time,
+                                             p_count=RANDOM_PROCESS_COUNT)
+        prometheus_client = RecordingPrometheusClient()
+        statistics = incremental_process_statistics.IncrementalProcessStatistics(
+            p_cache_time_bucket=5, p_prometheus_client=prometheus_client)
+
+        for pinfo in pinfos:
+            statistics.update_process_info(p_process_info=pinfo)
+
+        stat_infos = self.get_statistics(p_statistics=statistics, p_user_map=user_map,
+                                         p_reference_time=reference_time)
+
+        # Same time bucket
+        self.assertIs(stat_infos, self.get_statistics(p_statistics=statistics, p_user_map=user_map,
+                                                      p_reference_time=reference_time + datetime.timedelta(seconds=4)))
+
+        # Next time bucket
+        stat_infos = self.get_statistics(p_statistics=statistics, p_user_map=user_map,
+                                         p_reference_time=reference_time + datetime.timedelta(seconds=5))
+
+        # Other lookback
+        statistics.get_process_statistics(p_user_map=user_map, p_reference_time=reference_time,
+                                          p_max_lookback_in_days=1, p_min_activity_duration=MIN_ACTIVITY_DURATION)
+
+        # Changed user settings
+        other_user_map = create_user_map()
+        other_user_map[USER_1] = create_user(p_username=USER_1, p_process_name_pattern="editor")
+        self.assertIsNot(stat_infos, self.get_statistics(p_statistics=statistics, p_user_map=other_user_map,
+                                                         p_reference_time=reference_time))
+
+        # Changed process info
+        version = statistics.version
+        statistics.update_process_info(p_process_info=pinfos[0])
+        self.assertGreater(statistics.version, version)
+        self.get_statistics(p_statistics=statistics, p_user_map=user_map, p_reference_time=reference_time)
+
+        self.assertListEqual([False, True, False, False, False, False], prometheus_client.cache_requests)
+        self.assertEqual(1, statistics.cache_hits)
+        self.assertEqual(5, statistics.cache_misses)
+
+    def test_cache_disabled(self):
+        statistics = incremental_process_statistics.IncrementalProcessStatistics(p_cache_time_bucket=0)
+        user_map = create_user_map()
+        reference_time = datetime.datetime.now()
+
+        self.assertIsNot(self.get_statistics(p_statistics=statistics, p_user_map=user_map,
+                                             p_reference_time=reference_time),
+                         self.get_statistics(p_statistics=statistics, p_user_map=user_map,
+                                             p_reference_time=reference_time))
+        self.assertEqual(0, statistics.cache_hits + statistics.cache_misses)
+
+    def test_cache_concurrent_requests(self):
+        random_generator = random.Random(6)
+        reference_time = datetime.datetime(2024, 5, 17, 18, 30)
+        user_map = create_user_map()
+        statistics = incremental_process_statistics.IncrementalProcessStatistics(p_cache_time_bucket=5)
+
+        for pinfo in create_random_process_infos(p_random=random_generator, p_reference_time=reference_time,
+                                                 p_count=RANDOM_PROCESS_COUNT):
+            statistics.update_process_info(p_process_info=pinfo)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.get_statistics(
+            p_statistics=statistics, p_user_map=user_map, p_reference_time=reference_time))) for _ in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, statistics.cache_misses)
+        self.assertEqual(7, statistics.cache_hits)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_benchmark_tick(self):
+        random_generator = random.Random(3)
+        reference_time = datetime.datetime(2024, 5, 17, 18, 30)
+        user_map = create_user_map()
+        pinfos = create_random_process_infos(p_random=random_generator, p_reference_time=reference_time,
+                                             p_count=BENCHMARK_HISTORIC_PROCESS_COUNT, p_days=180, p_open_ratio=0)
+        process_infos = {pinfo.get_key(): pinfo for pinfo in pinfos}
+        statistics = incremental_process_statistics.IncrementalProcessStatistics()
+
+        for pinfo in pinfos:
+            statistics.update_process_info(p_process_info=pinfo)
+
+        # Initial sweep
+        statistics.get_process_statistics(p_user_map=user_map, p_reference_time=reference_time,
+                                          p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS,
+                                          p_min_activity_duration=MIN_ACTIVITY_DURATION)
+
+        durations = {}
+
+        for incremental in (False, True):
+            start = time.perf_counter()
+
+            for tick in range(BENCHMARK_TICK_COUNT):
+                tick_time = reference_time + datetime.timedelta(seconds=tick)
+
+                # One new process per tick
+                pinfo = process_info.ProcessInfo(
+                    p_hostname=HOSTNAMES[0], p_username=USER_1, p_processhandler="ClientProcessHandler",
+                    p_processname=PROCESS_NAMES[0], p_pid=-tick - 1 if incremental else -tick - 1000,
+                    p_start_time=tick_time)
+                process_infos[pinfo.get_key()] = pinfo
+
+                if incremental:
+                    statistics.update_process_info(p_process_info=pinfo)
+                    statistics.get_process_statistics(p_user_map=user_map, p_reference_time=tick_time,
+                                                      p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS,
+                                                      p_min_activity_duration=MIN_ACTIVITY_DURATION)
+
+                else:
+                    process_statistics.get_process_statistics(p_user_map=user_map, p_process_infos=process_infos,
+                                                              p_reference_time=tick_time,
+                                                              p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS,
+                                                              p_min_activity_duration=MIN_ACTIVITY_DURATION)
+
+            durations[incremental] = (time.perf_counter() - start) / BENCHMARK_TICK_COUNT
+
+        fmt = "Statistics per tick with {count} historic process infos: full sweep {full:.2f}ms, " \
+              "incremental {incremental:.2f}ms"
+        self._logger.info(fmt.format(count=BENCHMARK_HISTORIC_PROCESS_COUNT, full=1000 * durations[False],
+                                     incremental=1000 * durations[True]))
+
+        self.assertLess(durations[True], durations[False])
+
+
+if __name__ == "__main__":
+    unittest.main()
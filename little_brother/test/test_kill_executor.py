@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2019-2024  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import threading
+import time
+import unittest
+
+from little_brother import kill_executor
+from python_base_app.test import base_test
+
+KILL_DELAY = 0.2  # seconds
+COMMAND_DURATION = 0.05  # seconds
+PROCESS_COUNT = 40
+
+
+class DummyProc(object):
+
+    def __init__(self, p_running):
+        self.running = p_running
+
+    def is_running(self):
+        return self.running
+
+
+class CommandRecorder(object):
+
+    def __init__(self, p_duration=0.0):
+        self._duration = p_duration
+        self._lock = threading.Lock()
+        self.signals = []
+
+    def execute_command(self, p_params, p_command_pattern):
+        time.sleep(self._duration)
+
+        with self._lock:
+            self.signals.append((p_params["pid"], p_params["signal"]))
+
+    def get_signals(self, p_signal):
+        with self._lock:
+            return sorted(pid for (pid, signal) in self.signals if signal == p_signal)
+
+
+def get_params(p_pid):
+    return {'pid': p_pid, 'username': "user", 'uid': 1000, 'signal': None, 'host': "localhost"}
+
+
+class TestKillExecutor(base_test.BaseTestCase):
+
+    def wait_until_done(self, p_executor, p_timeout=5.0):
+        end = time.monotonic() + p_timeout
+
+        while len(p_executor.pending_keys) > 0 and time.monotonic() < end:
+            time.sleep(0.01)
+
+        self.assertListEqual([], p_executor.pending_keys)
+
+    def test_escalation(self):
+        recorder = CommandRecorder()
+        executor = kill_executor.KillExecutor(p_execute_command=recorder.execute_command, p_kill_delay=KILL_DELAY)
+
+        try:
+            # Process 1 terminates on SIGHUP, process 2 ignores it
+            procs = {1: DummyProc(p_running=False), 2: DummyProc(p_running=True)}
+
+            for pid, proc in procs.items():
+                self.assertTrue(executor.submit(p_key=(pid, 0), p_proc=proc, p_params=get_params(p_pid=pid),
+                                                p_command_pattern="kill -{signal} {pid}"))
+
+            self.wait_until_done(p_executor=executor)
+
+            self.assertListEqual([1, 2], recorder.get_signals(p_signal=kill_executor.FIRST_SIGNAL))
+            self.assertListEqual([2], recorder.get_signals(p_signal=kill_executor.SECOND_SIGNAL))
+
+        finally:
+            executor.shutdown()
+
+    def test_deduplication(self):
+        recorder = CommandRecorder()
+        executor = kill_executor.KillExecutor(p_execute_command=recorder.execute_command, p_kill_delay=KILL_DELAY)
+
+        try:
+            proc = DummyProc(p_running=True)
+
+            self.assertTrue(executor.submit(p_key=(1, 0), p_proc=proc, p_params=get_params(p_pid=1),
+                                            p_command_pattern="kill -{signal} {pid}"))
+            self.assertTrue(executor.is_pending(p_key=(1, 0)))
+
+            # Same process -> dropped
+            self.assertFalse(executor.submit(p_key=(1, 0), p_proc=proc, p_params=get_params(p_pid=1),
+                                             p_command_pattern="kill -{signal} {pid}"))
+
+            # Reused pid with different start time -> new process
+            self.assertTrue(executor.submit(p_key=(1, 1), p_proc=proc, p_params=get_params(p_pid=1),
+                                            p_command_pattern="kill -{signal} {pid}"))
+
+            self.wait_until_done(p_executor=executor)
+
+            self.assertEqual(2, len(recorder.get_signals(p_signal=kill_executor.FIRST_SIGNAL)))
+            self.assertEqual(2, len(recorder.get_signals(p_signal=kill_executor.SECOND_SIGNAL)))
+
+            # After the kill has been completed the process may be killed again
+            self.assertTrue(executor.submit(p_key=(1, 0), p_proc=DummyProc(p_running=False),
+                                            p_params=get_params(p_pid=1), p_command_pattern="kill -{signal} {pid}"))
+            self.wait_until_done(p_executor=executor)
+
+        finally:
+            executor.shutdown()
+
+    def test_shutdown(self):
+        recorder = CommandRecorder()
+        executor = kill_executor.KillExecutor(p_execute_command=recorder.execute_command, p_kill_delay=60)
+
+        executor.submit(p_key=(1, 0), p_proc=DummyProc(p_running=True), p_params=get_params(p_pid=1),
+                        p_command_pattern="kill -{signal} {pid}")
+        executor.shutdown()
+
+        self.assertListEqual([], executor.pending_keys)
+        self.assertListEqual([], recorder.get_signals(p_signal=kill_executor.SECOND_SIGNAL))
+        self.assertFalse(executor.submit(p_key=(2, 0), p_proc=DummyProc(p_running=True),
+                                         p_params=get_params(p_pid=2), p_command_pattern="kill -{signal} {pid}"))
+
+    def test_benchmark_parallel_kill(self):
+        recorder = CommandRecorder(p_duration=COMMAND_DURATION)
+        executor = kill_executor.KillExecutor(p_execute_command=recorder.execute_command, p_kill_delay=KILL_DELAY)
+
+        try:
+            start = time.perf_counter()
+
+            for pid in range(PROCESS_COUNT):
+                executor.submit(p_key=(pid, 0), p_proc=DummyProc(p_running=False), p_params=get_params(p_pid=pid),
+                                p_command_pattern="kill -{signal} {pid}")
+
+            submit_duration = time.perf_counter() - start
+            self.wait_until_done(p_executor=executor)
+            total_duration = time.perf_counter() - start
+
+            # Sequential execution would take PROCESS_COUNT * (COMMAND_DURATION + waiting for termination)
+            sequential_duration = PROCESS_COUNT * COMMAND_DURATION
+
+            fmt = "Killing {count} processes: submit {submit:.3f}s, total {total:.3f}s " \
+                  "(sequential signalling alone: {sequential:.3f}s)"
+            self._logger.info(fmt.format(count=PROCESS_COUNT, submit=submit_duration, total=total_duration,
+                                         sequential=sequential_duration))
+
+            self.assertEqual(PROCESS_COUNT, len(recorder.get_signals(p_signal=kill_executor.FIRST_SIGNAL)))
+            self.assertLess(submit_duration, COMMAND_DURATION)
+
+        finally:
+            executor.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2019-2024  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import shutil
+import signal
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from little_brother import client_process_handler
+from little_brother import kill_helper
+from python_base_app.test import base_test
+
+UID = 1000
+OTHER_UID = 1001
+BENCHMARK_PROCESS_COUNT = 10
+
+# The helper never signals processes of root. When running as root the target processes are started as 'nobody'.
+NOBODY_UID = 65534
+
+
+def get_target_uid():
+    return NOBODY_UID if os.getuid() == 0 else os.getuid()
+
+
+def create_target_process():
+    if os.getuid() == 0:
+        return subprocess.Popen(["sleep", "60"], user=NOBODY_UID)
+
+    return subprocess.Popen(["sleep", "60"])
+
+
+class StandInKill(object):
+
+    def __init__(self):
+        self.signals = []
+
+    def kill(self, p_pid, p_signal):
+        self.signals.append((p_pid, p_signal))
+
+
+class TestKillHelper(base_test.BaseTestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._socket_path = os.path.join(self._tmp_dir.name, "kill-helper.sock")
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def create_stand_in_server(self, p_client_uid=None):
+        # Stand-in helper running in a thread of the test process using a recording kill function
+        stand_in_kill = StandInKill()
+        helper = kill_helper.KillHelper(p_kill=stand_in_kill.kill, p_get_effective_uid=lambda pid: UID)
+        server = kill_helper.KillHelperServer(p_socket_path=self._socket_path, p_client_uid=p_client_uid,
+                                              p_kill_helper=helper)
+        server.start_in_thread()
+        return server, stand_in_kill
+
+    def test_validate_request(self):
+        self.assertEqual((4711, UID, signal.SIGHUP), kill_helper.validate_request(
+            p_request={"pid": 4711, "uid": UID, "signal": "SIGHUP"}))
+
+        for request in ({"pid": 1, "uid": UID, "signal": "SIGHUP"},
+                        {"pid": "4711", "uid": UID, "signal": "SIGHUP"},
+                        {"pid": True, "uid": UID, "signal": "SIGHUP"},
+                        {"pid": 4711, "uid": 0, "signal": "SIGHUP"},
+                        {"pid": 4711, "signal": "SIGHUP"},
+                        {"pid": 4711, "uid": UID, "signal": "SIGSTOP"},
+                        {"pid": 4711, "uid": UID, "signal": 9},
+                        [4711, UID, "SIGHUP"]):
+            with self.assertRaises(kill_helper.KillHelperException):
+                kill_helper.validate_request(p_request=request)
+
+    def test_handle_request(self):
+        stand_in_kill = StandInKill()
+        helper = kill_helper.KillHelper(p_kill=stand_in_kill.kill, p_get_effective_uid=lambda pid: UID)
+
+        result = helper.handle_request(p_request={"pid": 4711, "uid": UID, "signal": "SIGKILL"})
+        self.assertEqual(kill_helper.RESULT_OK, result["result"])
+
+        # The process belongs to a different user
+        result = helper.handle_request(p_request={"pid": 4712, "uid": OTHER_UID, "signal": "SIGKILL"})
+        self.assertEqual(kill_helper.RESULT_ERROR, result["result"])
+        self.assertEqual(4712, result["pid"])
+
+        self.assertListEqual([(4711, signal.SIGKILL)], stand_in_kill.signals)
+
+    def test_batched_requests(self):
+        server, stand_in_kill = self.create_stand_in_server(p_client_uid=os.getuid())
+        client = kill_helper.KillHelperClient(p_socket_path=self._socket_path)
+
+        try:
+            results = client.send_signals([{"pid": 100, "uid": UID, "signal": "SIGHUP"},
+                                           {"pid": 101, "uid": UID, "signal": "SIGSTOP"},
+                                           {"pid": 102, "uid": UID, "signal": "SIGKILL"}])
+
+            self.assertListEqual([kill_helper.RESULT_OK, kill_helper.RESULT_ERROR, kill_helper.RESULT_OK],
+                                 [result["result"] for result in results])
+            self.assertListEqual([(100, signal.SIGHUP), (102, signal.SIGKILL)], stand_in_kill.signals)
+
+            # The connection is kept open
+            client.send_signals([{"pid": 103, "uid": UID, "signal": "SIGTERM"}])
+            self.assertEqual(3, len(stand_in_kill.signals))
+
+            with self.assertRaises(kill_helper.KillHelperException):
+                client.send_signals("SIGKILL")
+
+        finally:
+            client.close()
+            server.stop()
+
+    def test_foreign_client_uid(self):
+        server, stand_in_kill = self.create_stand_in_server(p_client_uid=os.getuid() + 1)
+        client = kill_helper.KillHelperClient(p_socket_path=self._socket_path)
+
+        try:
+            with self.assertRaises(kill_helper.KillHelperException):
+                client.send_signals([{"pid": 100, "uid": UID, "signal": "SIGHUP"}])
+
+            self.assertListEqual([], stand_in_kill.signals)
+
+        finally:
+            client.close()
+            server.stop()
+
+    def test_socket_permissions(self):
+        server, _stand_in_kill = self.create_stand_in_server(p_client_uid=os.getuid())
+
+        try:
+            status = os.stat(self._socket_path, follow_symlinks=False)
+            self.assertTrue(stat.S_ISSOCK(status.st_mode))
+            self.assertEqual(0o600, stat.S_IMODE(status.st_mode))
+            self.assertEqual(os.getuid(), status.st_uid)
+
+        finally:
+            server.stop()
+
+        self.assertFalse(os.path.exists(self._socket_path))
+
+    def test_refuse_existing_entries(self):
+        target_path = os.path.join(self._tmp_dir.name, "target")
+
+        with open(target_path, "w") as target_file:
+            target_file.write("content")
+
+        for create_entry in (lambda: os.symlink(target_path, self._socket_path),
+                             lambda: os.link(target_path, self._socket_path),
+                             lambda: os.mkdir(self._socket_path)):
+            create_entry()
+
+            with self.assertRaises(kill_helper.KillHelperException):
+                kill_helper.KillHelperServer(p_socket_path=self._socket_path)
+
+            self.assertTrue(os.path.lexists(self._socket_path))
+
+            if os.path.isdir(self._socket_path) and not os.path.islink(self._socket_path):
+                os.rmdir(self._socket_path)
+
+            else:
+                os.unlink(self._socket_path)
+
+        with open(target_path) as target_file:
+            self.assertEqual("content", target_file.read())
+
+        self.assertListEqual(["target"], os.listdir(self._tmp_dir.name))
+
+    def test_started_by_sudo(self):
+        with mock.patch.dict(os.environ, {"SUDO_UID": str(UID)}):
+            self.assertEqual(UID, kill_helper.get_client_uid())
+            self.assertEqual(kill_helper.DEFAULT_SOCKET_PATH,
+                             kill_helper.validate_socket_path(p_socket_path=kill_helper.DEFAULT_SOCKET_PATH))
+
+            for socket_path in (self._socket_path, "/run/little-brother/../kill-helper.sock",
+                                "/run/little-brother/sub/kill-helper.sock", "kill-helper.sock"):
+                with self.assertRaises(kill_helper.KillHelperException):
+                    kill_helper.validate_socket_path(p_socket_path=socket_path)
+
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertEqual(os.getuid(), kill_helper.get_client_uid())
+            self.assertEqual(self._socket_path, kill_helper.validate_socket_path(p_socket_path=self._socket_path))
+
+    def test_get_effective_uid(self):
+        process = create_target_process()
+
+        try:
+            self.assertEqual(get_target_uid(), kill_helper.get_effective_uid(process.pid))
+
+        finally:
+            process.kill()
+            process.wait()
+
+        with self.assertRaises(OSError):
+            kill_helper.get_effective_uid(process.pid)
+
+    @unittest.skipIf(os.getuid() != 0, "requires root")
+    def test_check_installation(self):
+        # Files of root in directories of root are accepted
+        helper_path = os.path.join(self._tmp_dir.name, "little-brother-kill-helper")
+
+        with open(helper_path, "w") as helper_file:
+            helper_file.write("# helper")
+
+        kill_helper.check_not_writable_by_others(p_path=helper_path)
+
+        for change_permissions in (lambda: os.chmod(helper_path, 0o666),
+                                   lambda: os.chown(helper_path, UID, -1),
+                                   lambda: os.chown(self._tmp_dir.name, UID, -1)):
+            change_permissions()
+
+            with self.assertRaises(kill_helper.KillHelperException):
+                kill_helper.check_not_writable_by_others(p_path=helper_path)
+
+            os.chmod(helper_path, 0o644)
+            os.chown(helper_path, 0, -1)
+            os.chown(self._tmp_dir.name, 0, -1)
+
+        # A helper writable by another user does not start
+        shutil.copy(kill_helper.__file__, helper_path)
+        os.chown(helper_path, UID, -1)
+        result = subprocess.run([sys.executable, "-I", helper_path, "--socket", self._socket_path],
+                                capture_output=True, timeout=10)
+
+        self.assertEqual(1, result.returncode)
+        self.assertIn(b"not owned by root", result.stderr)
+        self.assertFalse(os.path.exists(self._socket_path))
+
+    def test_missing_helper(self):
+        client = kill_helper.KillHelperClient(p_socket_path=self._socket_path)
+
+        with self.assertRaises(kill_helper.KillHelperException):
+            client.send_signals([{"pid": 100, "uid": UID, "signal": "SIGHUP"}])
+
+    def create_process_handler(self):
+        config = client_process_handler.ClientProcessHandlerConfigModel()
+        config.sudo_command = ""
+        config.use_kill_helper = True
+        config.kill_helper_socket = self._socket_path
+        # The package is not necessarily installed, so the helper is started by its file in isolated mode
+        config.kill_helper_command = f"{sys.executable} -I {kill_helper.__file__}"
+
+        # Started without sudo the helper accepts the current user
+        environment = mock.patch.dict(os.environ)
+        environment.start()
+        self.addCleanup(environment.stop)
+        os.environ.pop("SUDO_UID", None)
+
+        return client_process_handler.ClientProcessHandler(p_config=config, p_process_iterator_factory=None)
+
+    def test_client_process_handler_starts_helper(self):
+        # Without sudo the helper runs as the current user which is sufficient to kill own processes
+        process_handler = self.create_process_handler()
+        process = create_target_process()
+
+        try:
+            process_handler.execute_kill_command(
+                p_params={'pid': process.pid, 'uid': get_target_uid(), 'signal': "SIGHUP", 'username': "dummy",
+                          'host': "localhost"},
+                p_command_pattern=client_process_handler.DEFAULT_KILL_COMMAND_PATTERN)
+
+            self.assertEqual(-signal.SIGHUP, process.wait(timeout=5))
+            self.assertIsNotNone(process_handler._kill_helper_process)
+
+        finally:
+            process_handler.shutdown()
+
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+        self.assertFalse(os.path.exists(self._socket_path))
+
+    def test_benchmark_kill_helper(self):
+        process_handler = self.create_process_handler()
+        processes = [create_target_process() for _ in range(2 * BENCHMARK_PROCESS_COUNT)]
+        durations = {}
+
+        try:
+            for use_kill_helper in (False, True):
+                process_handler._config.use_kill_helper = use_kill_helper
+
+                if use_kill_helper:
+                    # Exclude the start of the helper
+                    process_handler.get_kill_helper_client()
+                    targets = processes[BENCHMARK_PROCESS_COUNT:]
+
+                else:
+                    targets = processes[:BENCHMARK_PROCESS_COUNT]
+
+                start = time.perf_counter()
+
+                for process in targets:
+                    process_handler.execute_kill_command(
+                        p_params={'pid': process.pid, 'uid': get_target_uid(), 'signal': "SIGKILL", 'username': "dummy",
+                                  'host': "localhost"},
+                        p_command_pattern=client_process_handler.DEFAULT_KILL_COMMAND_PATTERN)
+
+                durations[use_kill_helper] = (time.perf_counter() - start) / len(targets)
+
+            for process in processes:
+                self.assertEqual(-signal.SIGKILL, process.wait(timeout=5))
+
+            # The latencies are only reported since they depend on the load of the host
+            fmt = "Latency per signal: subprocess {subprocess:.2f}ms, kill helper {helper:.2f}ms"
+            self._logger.info(fmt.format(subprocess=1000 * durations[False], helper=1000 * durations[True]))
+
+        finally:
+            process_handler.shutdown()
+
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -18,7 +18,9 @@
 #    with this program; if not, write to the Free Software Foundation, Inc.,
 #    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+import gettext
 import unittest
+from unittest import mock
 
 from little_brother import rule_result_info
 from little_brother.language import Language
@@ -127,6 +129,33 @@ class TestLanguage(base_test.BaseTestCase):
         text = language.pick_text_for_approaching_logout(result_info)
         self.assertIn("minutes left in your time extension", text)
 
+    def test_translation_cache(self):
+        language = Language(p_preload_locales=["en", "de"])
+
+        result_info = RuleResultInfo(p_locale="de")
+        result_info.applying_rules = rule_result_info.RULE_TOO_LATE
+
+        # Preloaded locales do not read the message catalogs again
+        with mock.patch.object(gettext, "translation", side_effect=AssertionError("catalog read")):
+            self.assertIsNotNone(language.pick_text_for_ruleset(result_info))
+            text = language.get_text_unlimited_session_start(p_locale="en", p_variables=result_info.args)
+
+        self.assertIn('unlimited playtime in this session', text)
+
+        # Other locales are read on first use only
+        with mock.patch.object(gettext, "translation", wraps=gettext.translation) as translation:
+            language.get_text_limited_session_start(p_locale="fr", p_variables=result_info.args)
+            language.get_text_limited_session_start(p_locale="fr", p_variables=result_info.args)
+
+        self.assertEqual(1, translation.call_count)
+
+    def test_notification_templates(self):
+        language = Language()
+
+        templates = language.get_notification_templates()
+        self.assertIn(language.text_prohibited_process, templates)
+        self.assertEqual(set(templates), set(language.get_templates(p_locale="en_US").keys()))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2019  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import unittest
+from unittest.mock import patch
+
+from little_brother import dependency_injection
+from little_brother.login_mapping import LoginMapping
+from little_brother.persistence.persistence import Persistence
+from little_brother.persistence.persistent_uid_mapping import UidMapping, DEFAULT_SERVER_GROUP
+from little_brother.persistence.persistent_uid_mapping_entity_manager import UidMappingEntityManager
+from little_brother.persistence.session_context import SessionContext
+from little_brother.test.persistence.test_persistence import TestPersistence
+from python_base_app.test import base_test
+
+OTHER_SERVER_GROUP = "other-server-group"
+
+
+class TestLoginMapping(base_test.BaseTestCase):
+
+    def setUp(self):
+        dependency_injection.reset()
+        TestPersistence.create_dummy_persistence(self._logger)
+        self._persistence = dependency_injection.container[Persistence]
+
+    def test_add_entry(self):
+
+        with SessionContext(p_persistence=self._persistence) as session_context:
+            login_mapping = LoginMapping()
+            login_mapping.add_entry(p_session_context=session_context, p_uid=1, p_username="willi")
+
+            self.assertEqual("willi", login_mapping.get_login_by_uid(p_session_context=session_context, p_uid=1))
+            self.assertEqual(1, login_mapping.get_uid_by_login(p_session_context=session_context, p_login="willi"))
+            self.assertIsNone(login_mapping.get_login_by_uid(p_session_context=session_context, p_uid=2))
+            self.assertIsNone(login_mapping.get_uid_by_login(p_session_context=session_context, p_login="lumpi"))
+
+    def test_lookup_without_database_access(self):
+
+        with SessionContext(p_persistence=self._persistence) as session_context:
+            login_mapping = LoginMapping()
+            login_mapping.add_entry(p_session_context=session_context, p_uid=1, p_username="willi")
+
+            # load index
+            login_mapping.get_login_by_uid(p_session_context=session_context, p_uid=1)
+
+            with patch.object(UidMappingEntityManager, "get_by_server_group", side_effect=AssertionError), \
+                    patch.object(UidMappingEntityManager, "get_by_uid_and_server_group", side_effect=AssertionError):
+                for uid in range(0, 1000):
+                    login_mapping.get_login_by_uid(p_session_context=session_context, p_uid=uid)
+
+                self.assertEqual("willi", login_mapping.get_login_by_uid(p_session_context=session_context, p_uid=1))
+
+    def test_replace_entry(self):
+
+        with SessionContext(p_persistence=self._persistence) as session_context:
+            login_mapping = LoginMapping()
+            login_mapping.add_entry(p_session_context=session_context, p_uid=1, p_username="willi")
+            login_mapping.get_login_by_uid(p_session_context=session_context, p_uid=1)
+            login_mapping.add_entry(p_session_context=session_context, p_uid=1, p_username="lumpi")
+
+            self.assertEqual("lumpi", login_mapping.get_login_by_uid(p_session_context=session_context, p_uid=1))
+            self.assertEqual(1, login_mapping.get_uid_by_login(p_session_context=session_context, p_login="lumpi"))
+            self.assertIsNone(login_mapping.get_uid_by_login(p_session_context=session_context, p_login="willi"))
+
+    def test_server_groups(self):
+
+        with SessionContext(p_persistence=self._persistence) as session_context:
+            login_mapping = LoginMapping()
+            login_mapping.add_entry(p_session_context=session_context, p_uid=1, p_username="willi")
+            login_mapping.add_entry(p_session_context=session_context, p_uid=1, p_username="lumpi",
+                                    p_server_group=OTHER_SERVER_GROUP)
+
+            self.assertEqual("willi", login_mapping.get_login_by_uid(p_session_context=session_context, p_uid=1))
+            self.assertEqual("lumpi", login_mapping.get_login_by_uid(p_session_context=session_context, p_uid=1,
+                                                                     p_server_group=OTHER_SERVER_GROUP))
+
+    def test_invalidate(self):
+
+        with SessionContext(p_persistence=self._persistence) as session_context:
+            login_mapping = LoginMapping()
+            self.assertIsNone(login_mapping.get_login_by_uid(p_session_context=session_context, p_uid=1))
+
+            # Bypass the login mapping so that the index does not know about the new entry
+            uid_mapping = UidMapping()
+            uid_mapping.uid = 1
+            uid_mapping.username = "willi"
+            uid_mapping.server_group = DEFAULT_SERVER_GROUP
+            login_mapping.uid_mapping_entity_manager.insert_or_update_uid_mapping(
+                p_session_context=session_context, p_uid_mapping=uid_mapping)
+
+            self.assertIsNone(login_mapping.get_login_by_uid(p_session_context=session_context, p_uid=1))
+
+            version = login_mapping.version
+            login_mapping.invalidate()
+
+            self.assertGreater(login_mapping.version, version)
+            self.assertEqual("willi", login_mapping.get_login_by_uid(p_session_context=session_context, p_uid=1))
+
+    def test_from_json(self):
+
+        with SessionContext(p_persistence=self._persistence) as session_context:
+            login_mapping = LoginMapping()
+            version = login_mapping.version
+            login_mapping.from_json(p_session_context=session_context,
+                                    p_json=[(DEFAULT_SERVER_GROUP, [("willi", 1), ("lumpi", 2)]),
+                                            (OTHER_SERVER_GROUP, [("lumpi", 3)])])
+
+            self.assertGreater(login_mapping.version, version)
+            self.assertEqual("lumpi", login_mapping.get_login_by_uid(p_session_context=session_context, p_uid=2))
+            self.assertEqual(3, login_mapping.get_uid_by_login(p_session_context=session_context, p_login="lumpi",
+                                                               p_server_group=OTHER_SERVER_GROUP))
+            self.assertEqual({1: "willi", 2: "lumpi"},
+                             login_mapping.get_uid_to_login_mapping(p_session_context=session_context))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2019-2024  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import random
+import re
+import string
+import time
+import unittest
+
+from little_brother import pattern_matcher
+from little_brother.pattern_matcher import PatternMatcher, AhoCorasickAutomaton
+from little_brother.test import test_data
+from python_base_app.test import base_test
+
+PATTERN_LISTS = [
+    "minecraft\nsteam",
+    "minecraft\r\n  steam  \n\nx\n",
+    "/usr/games/\nminecraft",
+    "/usr/bin/.*craft\nsteam",
+    "mine.*craft\nsteam\n[Ss]olitaire",
+    "java.*Minecraft|tlauncher\nsupertux",
+    "she\nhe\nhers\nhis",
+    "^start\nend$\nmiddle",
+    "a\nb",
+]
+
+TEXTS = [
+    "", "minecraft", "/usr/bin/minecraft", "/usr/games/minecraft", "steam", "Steam", "steamwebhelper",
+    "/opt/mine-craft", "mineXcraft", "java -jar Minecraft.jar", "tlauncher", "supertux2", "Solitaire", "solitaire",
+    "ushers", "ahishers", "start", "restart", "the end", "endless", "middle", "line\nminecraft", "minecraft\nline",
+    "mine\ncraft", "xabx", "she", "sh",
+]
+
+
+def get_reference_regex(p_pattern_list, p_check_path_component):
+    # Former implementation of User.get_regex_from_pattern_list()
+    pattern_list = p_pattern_list.replace('\r', '').split("\n")
+    normalized_pattern_list = [entry.strip() for entry in pattern_list if len(entry.strip()) > 1]
+
+    if len(normalized_pattern_list) == 0:
+        return None
+
+    if "/" in p_pattern_list and p_check_path_component:
+        expanded_patterns = '|'.join(normalized_pattern_list)
+
+    else:
+        expanded_patterns = '(.*' + '.*)|(.*'.join(normalized_pattern_list) + '.*)'
+
+    return re.compile(expanded_patterns)
+
+
+def get_long_pattern_list(p_random):
+    patterns = []
+
+    while sum(len(pattern) + 1 for pattern in patterns) < 4000:
+        pattern = "".join(p_random.choice(string.ascii_lowercase) for _ in range(p_random.randint(4, 16)))
+
+        if p_random.random() < 0.05:
+            pattern = pattern[:2] + ".*" + pattern[2:]
+
+        patterns.append(pattern)
+
+    return "\n".join(patterns)
+
+
+class TestPatternMatcher(base_test.BaseTestCase):
+
+    def check_equivalence(self, p_pattern_list, p_texts):
+
+        for check_path_component in (True, False):
+            reference_regex = get_reference_regex(p_pattern_list=p_pattern_list,
+                                                  p_check_path_component=check_path_component)
+            matcher = pattern_matcher.get_pattern_matcher(p_pattern_list=p_pattern_list,
+                                                          p_check_path_component=check_path_component)
+
+            if reference_regex is None:
+                self.assertIsNone(matcher)
+                continue
+
+            for text in p_texts:
+                self.assertEqual(reference_regex.match(text) is not None, matcher.match(text),
+                                 f"pattern list {p_pattern_list!r}, text {text!r}, "
+                                 f"check_path_component={check_path_component}")
+
+    def test_equivalence(self):
+
+        for pattern_list in PATTERN_LISTS:
+            self.check_equivalence(p_pattern_list=pattern_list, p_texts=TEXTS)
+
+    def test_equivalence_random(self):
+
+        a_random = random.Random(4711)
+        alphabet = "abc/"
+
+        for _i in range(200):
+            patterns = ["".join(a_random.choice(alphabet) for _ in range(a_random.randint(1, 4)))
+                        for _ in range(a_random.randint(1, 5))]
+            texts = ["".join(a_random.choice(alphabet + "\n") for _ in range(a_random.randint(0, 10)))
+                     for _ in range(20)]
+            self.check_equivalence(p_pattern_list="\n".join(patterns), p_texts=texts)
+
+    def test_empty_pattern_list(self):
+
+        self.assertIsNone(pattern_matcher.get_pattern_matcher(p_pattern_list="", p_check_path_component=False))
+        self.assertIsNone(pattern_matcher.get_pattern_matcher(p_pattern_list="a\n \nb", p_check_path_component=False))
+
+    def test_automaton(self):
+
+        automaton = AhoCorasickAutomaton(p_keywords=["he", "she", "his", "hers"])
+
+        self.assertTrue(automaton.search("ushers"))
+        self.assertTrue(automaton.search("ahis"))
+        self.assertTrue(automaton.search("xxhe"))
+        self.assertFalse(automaton.search("hs"))
+        self.assertFalse(automaton.search(""))
+
+        automaton = AhoCorasickAutomaton(p_keywords=["abcd", "bce"])
+
+        self.assertTrue(automaton.search("abce"))
+        self.assertFalse(automaton.search("abcx"))
+
+    def test_shared_matcher(self):
+
+        user_1 = test_data.get_user_object_1()
+        user_2 = test_data.get_user_object_1()
+
+        self.assertIs(user_1.regex_process_name_pattern, user_2.regex_process_name_pattern)
+
+        user_2 = test_data.get_user_object_2()
+
+        self.assertIsNot(user_1.regex_process_name_pattern, user_2.regex_process_name_pattern)
+        self.assertNotEqual(user_1.regex_process_name_pattern, user_2.regex_process_name_pattern)
+
+    def test_benchmark(self):
+
+        a_random = random.Random(42)
+        pattern_list = get_long_pattern_list(p_random=a_random)
+        texts = ["".join(a_random.choice(string.ascii_lowercase + "/-") for _ in range(a_random.randint(5, 60)))
+                 for _ in range(1000)]
+        texts.extend(pattern.replace(".*", "xyz") for pattern in pattern_list.split("\n")[:100])
+
+        self.assertGreater(len(pattern_list), 3900)
+        self.check_equivalence(p_pattern_list=pattern_list, p_texts=texts)
+
+        reference_regex = get_reference_regex(p_pattern_list=pattern_list, p_check_path_component=False)
+        matcher = PatternMatcher(p_pattern_list=pattern_list, p_check_path_component=False)
+
+        start = time.perf_counter()
+        reference_matches = [reference_regex.match(text) is not None for text in texts]
+        reference_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matches = [matcher.match(text) for text in texts]
+        duration = time.perf_counter() - start
+
+        self.assertEqual(reference_matches, matches)
+
+        fmt = "Matching {count} texts against {length} characters of patterns: " \
+              "combined regex {reference:.3f}s, pattern matcher {duration:.3f}s"
+        self._logger.info(fmt.format(count=len(texts), length=len(pattern_list),
+                                     reference=reference_duration, duration=duration))
+
+
+if __name__ == "__main__":
+    unittest.main()
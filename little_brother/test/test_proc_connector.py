@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2019-2024  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import datetime
+import unittest
+
+from little_brother import admin_event
+from little_brother import client_process_handler
+from little_brother import dependency_injection
+from little_brother import proc_connector
+from little_brother.persistence.persistence import Persistence
+from little_brother.persistence.persistent_uid_mapping import DEFAULT_SERVER_GROUP
+from little_brother.persistence.session_context import SessionContext
+from little_brother.proc_connector import ProcConnectorProcessIteratorFactory, ProcessEvent, ProcessSnapshot, \
+    ResyncRequired, PROC_EVENT_FORK, PROC_EVENT_EXEC, PROC_EVENT_EXIT
+from little_brother.test import test_data
+from little_brother.test.dummy_process_event_source import ReplayProcessEventSource
+from little_brother.test.dummy_process_iterator import uids_tuple
+from little_brother.test.persistence import test_persistence
+from python_base_app.test import base_test
+
+PARENT_PID = 1000
+PID_1 = 1001
+PID_2 = 1002
+THREAD_ID = 1003
+
+
+def fork(p_pid, p_tgid=None):
+    return ProcessEvent(p_event_type=PROC_EVENT_FORK, p_pid=p_pid, p_tgid=p_pid if p_tgid is None else p_tgid,
+                        p_parent_pid=PARENT_PID, p_parent_tgid=PARENT_PID)
+
+
+def execute(p_pid):
+    return ProcessEvent(p_event_type=PROC_EVENT_EXEC, p_pid=p_pid, p_tgid=p_pid)
+
+
+def terminate(p_pid, p_tgid=None):
+    return ProcessEvent(p_event_type=PROC_EVENT_EXIT, p_pid=p_pid, p_tgid=p_pid if p_tgid is None else p_tgid)
+
+
+class TestProcConnector(base_test.BaseTestCase):
+
+    def setUp(self):
+        dependency_injection.reset()
+
+        # Simulated process table
+        self._processes = {}
+        self.add_process(p_pid=PARENT_PID, p_name="bash")
+
+    def add_process(self, p_pid, p_name, p_uid=test_data.UID_1):
+        self._processes[p_pid] = ProcessSnapshot(p_pid=p_pid, p_uids=uids_tuple(real=p_uid, effective=p_uid),
+                                                 p_name=p_name, p_cmdline=[p_name],
+                                                 p_create_time=test_data.START_TIME_1.timestamp() + p_pid)
+
+    def process_iter(self):
+        return iter(list(self._processes.values()))
+
+    def get_snapshot(self, p_proc):
+        if isinstance(p_proc, ProcessSnapshot):
+            return p_proc
+
+        snapshot = self._processes.get(p_proc)
+
+        if snapshot is None:
+            raise proc_connector.psutil.NoSuchProcess(pid=p_proc)
+
+        return snapshot
+
+    def create_factory(self, p_batches, p_open_exception=None):
+        event_source = ReplayProcessEventSource(p_batches=p_batches, p_open_exception=p_open_exception)
+        factory = ProcConnectorProcessIteratorFactory(p_event_source=event_source, p_process_iter=self.process_iter,
+                                                      p_snapshot_factory=self.get_snapshot)
+        factory.start(p_use_thread=False)
+        return factory
+
+    @staticmethod
+    def get_pids(p_factory):
+        return sorted(proc.pid for proc in p_factory.process_iter())
+
+    def test_parse_messages(self):
+
+        events = [fork(p_pid=PID_1), execute(p_pid=PID_1), terminate(p_pid=PID_1)]
+        data = b"".join(proc_connector.build_proc_event_message(p_event=event) for event in events)
+
+        parsed_events = proc_connector.parse_proc_connector_message(data)
+
+        self.assertEqual(3, len(parsed_events))
+
+        for (event, parsed_event) in zip(events, parsed_events):
+            self.assertEqual(event.event_type, parsed_event.event_type)
+            self.assertEqual(event.pid, parsed_event.pid)
+            self.assertEqual(event.tgid, parsed_event.tgid)
+
+        self.assertEqual(PARENT_PID, parsed_events[0].parent_pid)
+
+    def test_fallback_to_polling(self):
+
+        factory = self.create_factory(p_batches=[], p_open_exception=PermissionError("Operation not permitted"))
+
+        self.assertFalse(factory.active)
+
+        self.add_process(p_pid=PID_1, p_name="process1")
+
+        self.assertEqual([PARENT_PID, PID_1], self.get_pids(p_factory=factory))
+
+    def test_process_events(self):
+
+        factory = self.create_factory(p_batches=[
+            [fork(p_pid=PID_1), fork(p_pid=THREAD_ID, p_tgid=PID_1)],
+            [execute(p_pid=PID_1)],
+            [terminate(p_pid=THREAD_ID, p_tgid=PID_1), terminate(p_pid=PID_1)]
+        ])
+
+        self.assertTrue(factory.active)
+        self.assertEqual([PARENT_PID], self.get_pids(p_factory=factory))
+
+        self.add_process(p_pid=PID_1, p_name="bash")
+        factory.read_events(p_timeout=0)
+
+        # The process table is not read again: only the reported process is new
+        self.add_process(p_pid=PID_2, p_name="unreported")
+        self.assertEqual([PARENT_PID, PID_1], self.get_pids(p_factory=factory))
+
+        self.add_process(p_pid=PID_1, p_name="process1")
+        factory.read_events(p_timeout=0)
+
+        names = {proc.pid: proc.name() for proc in factory.process_iter()}
+        self.assertEqual("process1", names[PID_1])
+
+        del self._processes[PID_1]
+        factory.read_events(p_timeout=0)
+
+        # A terminated process is reported one last time...
+        self.assertEqual([PARENT_PID, PID_1], self.get_pids(p_factory=factory))
+
+        # ...and then disappears
+        self.assertEqual([PARENT_PID], self.get_pids(p_factory=factory))
+
+        factory.stop()
+
+    def test_resync(self):
+
+        factory = self.create_factory(p_batches=[ResyncRequired("No buffer space available")])
+
+        self.add_process(p_pid=PID_1, p_name="process1")
+        self.assertEqual([PARENT_PID], self.get_pids(p_factory=factory))
+
+        factory.read_events(p_timeout=0)
+
+        self.assertEqual([PARENT_PID, PID_1], self.get_pids(p_factory=factory))
+
+    def test_events_during_resync(self):
+
+        factory = self.create_factory(p_batches=[ResyncRequired("No buffer space available")])
+        self.add_process(p_pid=PID_1, p_name="process1")
+        factory.read_events(p_timeout=0)
+
+        def process_iter():
+            # The process table is read before the reader thread reports the termination of PID_1 and a new process
+            processes = self.process_iter()
+            del self._processes[PID_1]
+            self.add_process(p_pid=PID_2, p_name="process2")
+            factory.handle_events(p_events=[terminate(p_pid=PID_1), fork(p_pid=PID_2)])
+            return processes
+
+        factory._process_iter = process_iter
+
+        self.assertEqual([PARENT_PID, PID_2], self.get_pids(p_factory=factory))
+
+        factory.stop()
+
+    def test_read_error(self):
+
+        factory = self.create_factory(p_batches=[OSError("Bad file descriptor")])
+        event_source = factory._event_source
+
+        factory.read_events(p_timeout=0)
+
+        self.assertFalse(factory.active)
+        self.assertFalse(event_source.is_open)
+
+        factory.stop()
+
+    def test_short_lived_process(self):
+
+        test_persistence.TestPersistence.create_dummy_persistence(self._logger, p_delete=True)
+        dummy_persistence: test_persistence.TestPersistence = dependency_injection.container[Persistence]
+
+        factory = self.create_factory(p_batches=[[fork(p_pid=PID_1), execute(p_pid=PID_1)], [terminate(p_pid=PID_1)]])
+
+        with SessionContext(p_persistence=dummy_persistence) as session_context:
+            login_mapping = test_data.get_login_mapping(p_session_context=session_context)
+            process_handler = client_process_handler.ClientProcessHandler(
+                p_config=client_process_handler.ClientProcessHandlerConfigModel(),
+                p_process_iterator_factory=factory)
+
+            # The process is started and terminates between two scans
+            self.add_process(p_pid=PID_1, p_name=test_data.PROCESS_NAME_1)
+            factory.read_events(p_timeout=0)
+            del self._processes[PID_1]
+            factory.read_events(p_timeout=0)
+
+            events = []
+
+            for i in range(2):
+                events.extend(process_handler.scan_processes(
+                    p_session_context=session_context,
+                    p_server_group=DEFAULT_SERVER_GROUP,
+                    p_login_mapping=login_mapping,
+                    p_host_name=test_data.HOSTNAME_1,
+                    p_process_regex_map=test_data.get_process_regex_map_1(),
+                    p_prohibited_process_regex_map=test_data.get_prohibited_process_regex_map_1(),
+                    p_reference_time=datetime.datetime.now()))
+
+                for event in events:
+                    if event.event_type == admin_event.EVENT_TYPE_PROCESS_START:
+                        process_handler.handle_event_process_start(p_event=event)
+
+            self.assertEqual([admin_event.EVENT_TYPE_PROCESS_START, admin_event.EVENT_TYPE_PROCESS_END],
+                             [event.event_type for event in events])
+            self.assertEqual(PID_1, events[0].pid)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -22,6 +22,7 @@ import logging
 import unittest
 
 from little_brother import dependency_injection, db_migrations
+from little_brother import process_info
 from little_brother.admin_data_handler import AdminDataHandler
 from little_brother.admin_event import AdminEvent, EVENT_TYPE_PROCESS_START
 from little_brother.app import ProcessIteratorFactory
@@ -185,6 +186,25 @@ class TestProcessHandlerManager(base_test.BaseTestCase):
 
         self.assertEqual(1, len(self._client_process_handler._process_infos))
 
+    def test_evict_process_infos(self):
+        self.create_default_process_handler_manager()
+
+        reference_time = datetime.datetime.now()
+        start_time = reference_time - datetime.timedelta(days=self._config.process_lookback_in_days + 2)
+
+        for pid, end_time in ((1, start_time + datetime.timedelta(hours=1)), (2, None)):
+            pinfo = process_info.ProcessInfo(p_hostname=HOSTNAME, p_username=TEST_USER,
+                                             p_processhandler=self._client_process_handler.id,
+                                             p_pid=pid, p_start_time=start_time, p_end_time=end_time)
+            self._client_process_handler.add_historic_process(p_process_info=pinfo)
+            self._manager.process_statistics.update_process_info(p_process_info=pinfo)
+
+        self._manager.evict_process_infos(p_reference_time=reference_time)
+
+        # Only the running process is kept
+        self.assertEqual(1, len(self._client_process_handler.process_infos))
+        self.assertEqual(1, self._client_process_handler.process_infos.active_count)
+
 
 if __name__ == "__main__":
     unittest.main()
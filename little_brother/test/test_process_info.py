@@ -19,15 +19,31 @@
 #    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 import datetime
+import re
+import time
+import tracemalloc
 import unittest
 
 import little_brother.process_info as process_info
+from little_brother import pattern_matcher
 from python_base_app.test import base_test
 
 HOSTNAME = "hostname"
 USERNAME = "username"
 PROCESS_NAME = "processname"
 PID = 123
+BENCHMARK_PROCESS_COUNT = 100000
+
+
+class CountingMatcher(object):
+
+    def __init__(self, p_pattern):
+        self._matcher = pattern_matcher.PatternMatcher(p_pattern_list=p_pattern, p_check_path_component=True)
+        self.count = 0
+
+    def match(self, p_string):
+        self.count = self.count + 1
+        return self._matcher.match(p_string)
 
 
 class TestProcessInfo(base_test.BaseTestCase):
@@ -43,6 +59,116 @@ class TestProcessInfo(base_test.BaseTestCase):
 
         self.assertEqual(pi.hostname, HOSTNAME)
 
+    def test_matches_process_name_pattern(self):
+        pi = process_info.ProcessInfo(p_hostname=HOSTNAME, p_username=USERNAME, p_processname=PROCESS_NAME,
+                                      p_pid=PID, p_start_time=datetime.datetime.now())
+        matcher = CountingMatcher(p_pattern="process")
+
+        for _ in range(3):
+            self.assertTrue(pi.matches_process_name_pattern(p_process_name_pattern="process",
+                                                            p_regex_process_name_pattern=matcher))
+
+        self.assertEqual(1, matcher.count)
+
+        # Changed pattern of the user
+        other_matcher = CountingMatcher(p_pattern="game")
+        self.assertFalse(pi.matches_process_name_pattern(p_process_name_pattern="game",
+                                                         p_regex_process_name_pattern=other_matcher))
+        self.assertFalse(pi.matches_process_name_pattern(p_process_name_pattern="game",
+                                                         p_regex_process_name_pattern=other_matcher))
+        self.assertEqual(1, other_matcher.count)
+
+        # Names not matching any of the patterns
+        for processname in ("firefox", "thunderbird"):
+            pi = process_info.ProcessInfo(p_hostname=HOSTNAME, p_username=USERNAME, p_processname=processname,
+                                          p_pid=PID, p_start_time=datetime.datetime.now())
+            self.assertFalse(pi.matches_process_name_pattern(
+                p_process_name_pattern="bash|steam", p_regex_process_name_pattern=pattern_matcher.PatternMatcher(
+                    p_pattern_list="bash|steam", p_check_path_component=True)))
+
+        pi = process_info.ProcessInfo(p_hostname=HOSTNAME, p_username=USERNAME, p_processname="steam",
+                                      p_pid=PID, p_start_time=datetime.datetime.now())
+        self.assertTrue(pi.matches_process_name_pattern(
+            p_process_name_pattern="bash|steam", p_regex_process_name_pattern=pattern_matcher.PatternMatcher(
+                p_pattern_list="bash|steam", p_check_path_component=True)))
+
+        # Compiled regular expressions are supported as well
+        pi = process_info.ProcessInfo(p_hostname=HOSTNAME, p_username=USERNAME, p_processname="firefox",
+                                      p_pid=PID, p_start_time=datetime.datetime.now())
+        self.assertFalse(pi.matches_process_name_pattern(p_process_name_pattern="bash|steam",
+                                                         p_regex_process_name_pattern=re.compile("bash|steam")))
+
+        # Processes without name always match
+        pi = process_info.ProcessInfo(p_hostname=HOSTNAME, p_username=USERNAME, p_pid=PID,
+                                      p_start_time=datetime.datetime.now())
+        self.assertTrue(pi.matches_process_name_pattern(p_process_name_pattern="game",
+                                                        p_regex_process_name_pattern=other_matcher))
+        self.assertEqual(1, other_matcher.count)
+
+    def test_key(self):
+        start_time = datetime.datetime(2024, 5, 17, 18, 30, 12)
+        pi = process_info.ProcessInfo(p_hostname=HOSTNAME, p_username=USERNAME, p_processname=PROCESS_NAME,
+                                      p_pid=PID, p_start_time=start_time)
+
+        self.assertTupleEqual((HOSTNAME, PID, int(start_time.strftime("%s"))), pi.get_key())
+        self.assertIs(pi.get_key(), pi.get_key())
+        self.assertEqual(process_info.get_key(p_hostname=HOSTNAME, p_pid=PID, p_start_time=start_time), pi.get_key())
+        self.assertEqual("%s|%d|%s" % (HOSTNAME, PID, start_time.strftime("%s")),
+                         process_info.get_key_string(p_key=pi.get_key()))
+
+        # Changing an attribute of the key resets the key
+        pi.start_time = start_time + datetime.timedelta(seconds=1)
+        self.assertEqual(int(start_time.strftime("%s")) + 1, pi.get_key()[2])
+
+        pi.pid = None
+        self.assertEqual("%s|NONE|%s" % (HOSTNAME, pi.start_time.strftime("%s")),
+                         process_info.get_key_string(p_key=pi.get_key()))
+
+    def test_benchmark_process_infos(self):
+        start_time = datetime.datetime(2024, 5, 17, 18, 30, 12)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+
+        pinfos = [process_info.ProcessInfo(p_hostname="host%d" % (i % 10), p_username="user%d" % (i % 5),
+                                           p_processhandler="ClientProcessHandler", p_processname=PROCESS_NAME,
+                                           p_pid=i, p_start_time=start_time + datetime.timedelta(seconds=i),
+                                           p_end_time=start_time + datetime.timedelta(seconds=i + 60))
+                  for i in range(BENCHMARK_PROCESS_COUNT)]
+
+        creation_duration = time.perf_counter() - start
+        memory, _peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.assertFalse(hasattr(pinfos[0], "__dict__"))
+        self.assertIs(pinfos[0].username, pinfos[5].username)
+
+        start = time.perf_counter()
+
+        for pinfo in pinfos:
+            "%s|%d|%s" % (pinfo.hostname, pinfo.pid, pinfo.start_time.strftime("%s"))
+
+        string_key_duration = time.perf_counter() - start
+
+        # The first call creates the key
+        keys = {pinfo.get_key(): pinfo for pinfo in pinfos}
+        start = time.perf_counter()
+
+        for pinfo in pinfos:
+            pinfo.get_key()
+
+        key_duration = time.perf_counter() - start
+
+        self.assertEqual(BENCHMARK_PROCESS_COUNT, len(keys))
+
+        fmt = "{count} process infos: creation {creation:.0f}ms, {memory} bytes per entry, " \
+              "string keys {string_keys:.1f}ms, cached keys {keys:.1f}ms"
+        self._logger.info(fmt.format(count=BENCHMARK_PROCESS_COUNT, creation=1000 * creation_duration,
+                                     memory=memory // BENCHMARK_PROCESS_COUNT, string_keys=1000 * string_key_duration,
+                                     keys=1000 * key_duration))
+
+        self.assertLess(key_duration, string_key_duration)
+
 
 if __name__ == "__main__":
     unittest.main()
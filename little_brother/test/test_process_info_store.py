@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2019-2024  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import datetime
+import random
+import time
+import unittest
+
+from little_brother import incremental_process_statistics
+from little_brother import process_info
+from little_brother import process_info_store
+from little_brother import process_statistics
+from little_brother.test import test_incremental_process_statistics
+from python_base_app.test import base_test
+
+MAX_LOOKBACK_IN_DAYS = test_incremental_process_statistics.MAX_LOOKBACK_IN_DAYS
+REFERENCE_TIME = datetime.datetime(2024, 5, 17, 18, 30)
+BENCHMARK_PROCESS_COUNT = 20000
+BENCHMARK_REQUEST_COUNT = 100
+
+
+def create_process_info(p_pid, p_start_time, p_end_time=None):
+    return process_info.ProcessInfo(p_hostname="host1", p_username=test_incremental_process_statistics.USER_1,
+                                    p_processhandler="ClientProcessHandler", p_processname="game", p_pid=p_pid,
+                                    p_start_time=p_start_time, p_end_time=p_end_time)
+
+
+def create_store(p_process_infos):
+    store = process_info_store.ProcessInfoStore()
+
+    for pinfo in p_process_infos:
+        store[pinfo.get_key()] = pinfo
+
+    return store
+
+
+class TestProcessInfoStore(base_test.BaseTestCase):
+
+    def test_evict(self):
+        old_start_time = REFERENCE_TIME - datetime.timedelta(days=MAX_LOOKBACK_IN_DAYS + 3)
+        cutoff = process_info_store.get_eviction_cutoff(p_reference_time=REFERENCE_TIME,
+                                                        p_lookback_in_days=MAX_LOOKBACK_IN_DAYS)
+
+        old_pinfo = create_process_info(p_pid=1, p_start_time=old_start_time,
+                                        p_end_time=cutoff - datetime.timedelta(seconds=1))
+        overlapping_pinfo = create_process_info(p_pid=2, p_start_time=old_start_time,
+                                                p_end_time=cutoff + datetime.timedelta(seconds=1))
+        running_pinfo = create_process_info(p_pid=3, p_start_time=old_start_time)
+        recent_pinfo = create_process_info(p_pid=4, p_start_time=REFERENCE_TIME - datetime.timedelta(hours=2),
+                                           p_end_time=REFERENCE_TIME - datetime.timedelta(hours=1))
+
+        store = create_store(p_process_infos=[old_pinfo, overlapping_pinfo, running_pinfo, recent_pinfo])
+
+        self.assertEqual(4, len(store))
+        self.assertEqual(1, store.active_count)
+
+        evicted_pinfos = store.evict(p_reference_time=REFERENCE_TIME, p_lookback_in_days=MAX_LOOKBACK_IN_DAYS)
+
+        self.assertListEqual([old_pinfo], evicted_pinfos)
+        self.assertEqual(3, len(store))
+        self.assertNotIn(old_pinfo.get_key(), store)
+        self.assertIn(running_pinfo.get_key(), store)
+
+        # Evicting again does not find anything anymore
+        self.assertListEqual([], store.evict(p_reference_time=REFERENCE_TIME,
+                                             p_lookback_in_days=MAX_LOOKBACK_IN_DAYS))
+
+    def test_evict_keeps_statistics(self):
+        user_map = test_incremental_process_statistics.create_user_map()
+        pinfos = test_incremental_process_statistics.create_random_process_infos(
+            p_random=random.Random(31), p_reference_time=REFERENCE_TIME, p_count=1000,
+            p_days=3 * MAX_LOOKBACK_IN_DAYS)
+        store = create_store(p_process_infos=pinfos)
+        statistics = incremental_process_statistics.IncrementalProcessStatistics()
+
+        for pinfo in pinfos:
+            statistics.update_process_info(p_process_info=pinfo)
+
+        # Days before the lookback period only appear due to long running processes and are not covered
+        def get_day_statistics_summary(p_users_stat_infos):
+            return {username: {context: [(day.duration, day.downtime, day.min_time, day.max_time, day.host_infos)
+                                         for day in stat_info.day_statistics[:MAX_LOOKBACK_IN_DAYS + 1]]
+                               for context, stat_info in stat_infos.items()}
+                    for username, stat_infos in p_users_stat_infos.items()}
+
+        expected = process_statistics.get_process_statistics(
+            p_user_map=user_map, p_process_infos=store, p_reference_time=REFERENCE_TIME,
+            p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS,
+            p_min_activity_duration=test_incremental_process_statistics.MIN_ACTIVITY_DURATION)
+
+        evicted_pinfos = store.evict(p_reference_time=REFERENCE_TIME, p_lookback_in_days=MAX_LOOKBACK_IN_DAYS)
+        statistics.remove_process_infos(p_process_infos=evicted_pinfos)
+
+        self.assertGreater(len(evicted_pinfos), 0)
+
+        result = statistics.get_process_statistics(
+            p_user_map=user_map, p_reference_time=REFERENCE_TIME, p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS,
+            p_min_activity_duration=test_incremental_process_statistics.MIN_ACTIVITY_DURATION)
+
+        self.assertDictEqual(get_day_statistics_summary(p_users_stat_infos=expected),
+                             get_day_statistics_summary(p_users_stat_infos=result))
+
+    def test_version(self):
+        store = process_info_store.ProcessInfoStore()
+        pinfo = create_process_info(p_pid=1, p_start_time=REFERENCE_TIME - datetime.timedelta(days=30),
+                                    p_end_time=REFERENCE_TIME - datetime.timedelta(days=29))
+        versions = [store.version]
+
+        store[pinfo.get_key()] = pinfo
+        versions.append(store.version)
+
+        store.mark_changed()
+        versions.append(store.version)
+
+        store.evict(p_reference_time=REFERENCE_TIME, p_lookback_in_days=MAX_LOOKBACK_IN_DAYS)
+        versions.append(store.version)
+
+        self.assertEqual(0, len(store))
+
+        # Every mutating method of a mapping changes the version
+        pinfos = [create_process_info(p_pid=pid, p_start_time=REFERENCE_TIME) for pid in range(2, 5)]
+
+        store.update({pinfos[0].get_key(): pinfos[0]})
+        versions.append(store.version)
+
+        self.assertIs(pinfos[1], store.setdefault(pinfos[1].get_key(), pinfos[1]))
+        versions.append(store.version)
+
+        store.update([(pinfos[2].get_key(), pinfos[2])])
+        versions.append(store.version)
+
+        store |= {pinfos[2].get_key(): pinfos[2]}
+        versions.append(store.version)
+
+        self.assertEqual(3, len(store))
+
+        store.popitem()
+        versions.append(store.version)
+
+        store.clear()
+        versions.append(store.version)
+
+        self.assertEqual(0, len(store))
+        self.assertListEqual(sorted(set(versions)), versions)
+
+        # Reading, failed removals and setdefault of an existing key leave the version unchanged
+        store[pinfos[0].get_key()] = pinfos[0]
+        version = store.version
+        self.assertIsNone(store.pop(pinfos[1].get_key(), None))
+        self.assertIs(pinfos[0], store.setdefault(pinfos[0].get_key(), pinfos[1]))
+        self.assertIs(pinfos[0], store.get(pinfos[0].get_key()))
+        self.assertListEqual([(pinfos[0].get_key(), pinfos[0])], list(store.items()))
+        self.assertEqual(version, store.version)
+
+    def test_merged_view(self):
+        pinfos = [create_process_info(p_pid=pid, p_start_time=REFERENCE_TIME) for pid in range(4)]
+        shadowing_pinfo = create_process_info(p_pid=1, p_start_time=REFERENCE_TIME)
+        store1 = create_store(p_process_infos=pinfos[:2])
+        store2 = create_store(p_process_infos=[shadowing_pinfo] + pinfos[2:])
+        view = process_info_store.MergedProcessInfoView(p_stores=[store1, store2])
+
+        expected = {}
+        expected.update(store1)
+        expected.update(store2)
+
+        self.assertEqual(4, len(view))
+        self.assertDictEqual(expected, dict(view))
+        self.assertDictEqual(expected, dict(view.items()))
+        self.assertListEqual(list(expected.keys()), list(view))
+        self.assertListEqual(list(expected.values()), list(view.values()))
+
+        # The process infos are not copied and the process info of the last store wins
+        self.assertIs(shadowing_pinfo, view[pinfos[1].get_key()])
+        self.assertIn(pinfos[0].get_key(), view)
+        self.assertIsNone(view.get(("other.host", 1, 0)))
+
+        with self.assertRaises(KeyError):
+            _ = view[("other.host", 1, 0)]
+
+        # The view reflects changes of the stores
+        version = view.version
+        new_pinfo = create_process_info(p_pid=5, p_start_time=REFERENCE_TIME)
+        store1[new_pinfo.get_key()] = new_pinfo
+
+        self.assertGreater(view.version, version)
+        self.assertIs(new_pinfo, view[new_pinfo.get_key()])
+        self.assertEqual(5, len(view))
+
+    def test_benchmark_merged_view(self):
+        stores = [create_store(p_process_infos=[
+            create_process_info(p_pid=pid, p_start_time=REFERENCE_TIME - datetime.timedelta(days=store_index))
+            for pid in range(BENCHMARK_PROCESS_COUNT)]) for store_index in range(2)]
+        key = next(iter(stores[1]))
+
+        start_time = time.perf_counter()
+
+        for _ in range(BENCHMARK_REQUEST_COUNT):
+            process_infos = {}
+
+            for store in stores:
+                process_infos.update(store)
+
+            _ = process_infos[key]
+
+        copy_duration = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+
+        for _ in range(BENCHMARK_REQUEST_COUNT):
+            process_infos = process_info_store.MergedProcessInfoView(p_stores=stores)
+            _ = process_infos[key]
+
+        view_duration = time.perf_counter() - start_time
+
+        fmt = "{count} requests with lookup of {entries} process infos: merged copy {copy:.1f}ms, view {view:.1f}ms"
+        self._logger.info(fmt.format(count=BENCHMARK_REQUEST_COUNT, entries=2 * BENCHMARK_PROCESS_COUNT,
+                                     copy=1000 * copy_duration, view=1000 * view_duration))
+
+        self.assertLess(view_duration, copy_duration)
+
+
+if __name__ == "__main__":
+    unittest.main()
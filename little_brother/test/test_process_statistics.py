@@ -19,6 +19,8 @@
 #    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 import datetime
+import random
+import time
 import unittest
 
 import little_brother.persistence.session_context
@@ -29,6 +31,7 @@ from little_brother import process_statistics
 from little_brother.persistence import persistent_user_entity_manager
 from little_brother.persistence.persistence import Persistence
 from little_brother.test import test_data
+from little_brother.test import test_incremental_process_statistics
 from little_brother.test.persistence import test_persistence
 from python_base_app.test import base_test
 
@@ -40,6 +43,21 @@ PID = 123
 MIN_ACTIVITY_DURATION = 60
 MAX_LOOKBACK_IN_DAYS = 10
 DURATION = 55  # seconds
+BENCHMARK_USER_COUNT = 50
+BENCHMARK_PROCESSES_PER_USER_AND_DAY = 20
+BENCHMARK_LOOKBACK_IN_DAYS = 7
+BENCHMARK_CALL_COUNT = 5
+
+
+class CountingMatcher(object):
+
+    def __init__(self, p_matcher):
+        self._matcher = p_matcher
+        self.count = 0
+
+    def match(self, p_string):
+        self.count = self.count + 1
+        return self._matcher.match(p_string)
 
 
 class TestProcessStatistics(base_test.BaseTestCase):
@@ -297,6 +315,63 @@ class TestProcessStatistics(base_test.BaseTestCase):
 
         self.assertIsNotNone(pss)
 
+    def test_benchmark_process_name_matching(self):
+        random_generator = random.Random(50)
+        reference_time = datetime.datetime(2024, 5, 17, 18, 30)
+        user_map = {}
+        process_infos = {}
+
+        for i in range(BENCHMARK_USER_COUNT):
+            user = test_incremental_process_statistics.create_user(p_username="user%d" % i)
+            user.regex_process_name_pattern = CountingMatcher(p_matcher=user.regex_process_name_pattern)
+            user_map[user.username] = user
+
+            for pinfo in test_incremental_process_statistics.create_random_process_infos(
+                    p_random=random_generator, p_reference_time=reference_time,
+                    p_count=BENCHMARK_PROCESSES_PER_USER_AND_DAY * BENCHMARK_LOOKBACK_IN_DAYS,
+                    p_days=BENCHMARK_LOOKBACK_IN_DAYS):
+                pinfo.username = user.username
+                pinfo.processname = random_generator.choice(test_incremental_process_statistics.PROCESS_NAMES)
+                pinfo.pid = pinfo.pid + 1000 * i
+                process_infos[pinfo.get_key()] = pinfo
+
+        durations = []
+
+        for _ in range(BENCHMARK_CALL_COUNT):
+            start = time.perf_counter()
+            process_statistics.get_process_statistics(
+                p_user_map=user_map, p_process_infos=process_infos, p_reference_time=reference_time,
+                p_max_lookback_in_days=BENCHMARK_LOOKBACK_IN_DAYS, p_min_activity_duration=MIN_ACTIVITY_DURATION)
+            durations.append(time.perf_counter() - start)
+
+        matches = sum(user.regex_process_name_pattern.count for user in user_map.values())
+
+        # Without caching the name is matched for each boundary (start and end) and rule set on every call
+        uncached_matches = BENCHMARK_CALL_COUNT * 2 * len(process_infos) * len(
+            test_incremental_process_statistics.CONTEXTS)
+
+        fmt = "Process statistics for {users} users and {count} process infos: first call {first:.1f}ms, " \
+              "following calls {following:.1f}ms, {matches} matches of process names instead of {uncached}"
+        self._logger.info(fmt.format(users=BENCHMARK_USER_COUNT, count=len(process_infos),
+                                     first=1000 * durations[0],
+                                     following=1000 * sum(durations[1:]) / (len(durations) - 1),
+                                     matches=matches, uncached=uncached_matches))
+
+        # Each process name is matched only once regardless of the number of boundaries, rule sets and calls
+        self.assertEqual(len(process_infos), matches)
+
+        # A change of the pattern of a user only requires the process infos of that user to be matched again
+        user = test_incremental_process_statistics.create_user(p_username="user0", p_process_name_pattern="editor")
+        user.regex_process_name_pattern = CountingMatcher(p_matcher=user.regex_process_name_pattern)
+        user_map[user.username] = user
+
+        process_statistics.get_process_statistics(
+            p_user_map=user_map, p_process_infos=process_infos, p_reference_time=reference_time,
+            p_max_lookback_in_days=BENCHMARK_LOOKBACK_IN_DAYS, p_min_activity_duration=MIN_ACTIVITY_DURATION)
+
+        self.assertEqual(BENCHMARK_PROCESSES_PER_USER_AND_DAY * BENCHMARK_LOOKBACK_IN_DAYS,
+                         user.regex_process_name_pattern.count)
+
 
 if __name__ == "__main__":
     unittest.main()
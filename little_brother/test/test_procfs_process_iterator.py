@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2019-2024  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import tempfile
+import time
+import unittest
+
+import psutil
+
+from little_brother import procfs_process_iterator
+from little_brother.procfs_process_iterator import ProcFsProcessIteratorFactory
+from python_base_app.test import base_test
+
+BOOT_TIME = 1700000000
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+FIRST_PID = 100
+BENCHMARK_PROCESS_COUNT = 2000
+
+
+def create_process(p_proc_dir, p_pid, p_comm, p_cmdline, p_uid, p_starttime):
+    process_dir = os.path.join(p_proc_dir, str(p_pid))
+    os.mkdir(process_dir)
+
+    # See proc(5): starttime is the 22nd field
+    fields = ["S", "1", str(p_pid), str(p_pid)] + ["0"] * 15 + [str(p_starttime)] + ["0"] * 30
+
+    with open(os.path.join(process_dir, "stat"), "w") as f:
+        f.write(f"{p_pid} ({p_comm}) {' '.join(fields)}\n")
+
+    with open(os.path.join(process_dir, "status"), "w") as f:
+        f.write(f"Name:\t{p_comm}\nState:\tS (sleeping)\nTgid:\t{p_pid}\nPid:\t{p_pid}\nPPid:\t1\n"
+                f"Uid:\t{p_uid}\t{p_uid}\t{p_uid}\t{p_uid}\nGid:\t{p_uid}\t{p_uid}\t{p_uid}\t{p_uid}\n")
+
+    with open(os.path.join(process_dir, "cmdline"), "w") as f:
+        f.write("\0".join(p_cmdline) + "\0")
+
+
+def create_proc_dir(p_proc_dir, p_process_count):
+    with open(os.path.join(p_proc_dir, "stat"), "w") as f:
+        f.write(f"cpu  1 2 3 4 5 6 7 0 0 0\nbtime {BOOT_TIME}\nprocesses 1000\n")
+
+    for i in range(p_process_count):
+        pid = FIRST_PID + i
+        create_process(p_proc_dir=p_proc_dir, p_pid=pid, p_comm=f"process{i}",
+                       p_cmdline=[f"/usr/bin/process{i}", "--option"], p_uid=1000 + i % 10,
+                       p_starttime=CLOCK_TICKS * i)
+
+
+class TestProcFsProcessIterator(base_test.BaseTestCase):
+
+    def test_read_processes(self):
+
+        with tempfile.TemporaryDirectory() as proc_dir:
+            create_proc_dir(p_proc_dir=proc_dir, p_process_count=2)
+            create_process(p_proc_dir=proc_dir, p_pid=42, p_comm="a (strange) name", p_cmdline=["strange"],
+                           p_uid=0, p_starttime=CLOCK_TICKS * 10)
+            create_process(p_proc_dir=proc_dir, p_pid=43, p_comm="very-long-proce",
+                           p_cmdline=["/usr/bin/very-long-process-name"], p_uid=0, p_starttime=0)
+            os.mkdir(os.path.join(proc_dir, "self"))
+
+            factory = ProcFsProcessIteratorFactory(p_proc_dir=proc_dir)
+            processes = {proc.pid: proc for proc in factory.process_iter()}
+
+            self.assertEqual({42, 43, FIRST_PID, FIRST_PID + 1}, set(processes.keys()))
+
+            proc = processes[FIRST_PID + 1]
+            self.assertEqual("process1", proc.name())
+            self.assertEqual(1001, proc.uids().effective)
+            self.assertEqual(1001, proc.uids().real)
+            self.assertEqual(BOOT_TIME + 1, proc.create_time())
+            self.assertEqual(["/usr/bin/process1", "--option"], proc.cmdline())
+
+            self.assertEqual("a (strange) name", processes[42].name())
+            self.assertEqual(BOOT_TIME + 10, processes[42].create_time())
+
+            # Truncated names are completed using the command line just like psutil does
+            self.assertEqual("very-long-process-name", processes[43].name())
+
+    def test_terminated_process(self):
+
+        with tempfile.TemporaryDirectory() as proc_dir:
+            create_proc_dir(p_proc_dir=proc_dir, p_process_count=1)
+            factory = ProcFsProcessIteratorFactory(p_proc_dir=proc_dir)
+            proc = next(factory.process_iter())
+
+            for filename in ("stat", "status", "cmdline"):
+                os.unlink(os.path.join(proc_dir, str(FIRST_PID), filename))
+
+            with self.assertRaises(psutil.NoSuchProcess):
+                proc.cmdline()
+
+            self.assertEqual([], list(factory.process_iter()))
+
+    def test_benchmark(self):
+
+        with tempfile.TemporaryDirectory() as proc_dir:
+            create_proc_dir(p_proc_dir=proc_dir, p_process_count=BENCHMARK_PROCESS_COUNT)
+
+            start = time.perf_counter()
+            factory = ProcFsProcessIteratorFactory(p_proc_dir=proc_dir)
+            procfs_result = {proc.pid: (proc.uids().effective, proc.name(), proc.create_time() - BOOT_TIME)
+                             for proc in factory.process_iter()}
+            procfs_duration = time.perf_counter() - start
+
+            old_procfs_path = psutil.PROCFS_PATH
+
+            try:
+                psutil.PROCFS_PATH = proc_dir
+                start = time.perf_counter()
+                psutil_result = {}
+
+                for pid in psutil.pids():
+                    proc = psutil.Process(pid=pid)
+                    psutil_result[pid] = (proc.uids().effective, proc.name(), proc.create_time())
+
+                psutil_duration = time.perf_counter() - start
+
+            finally:
+                psutil.PROCFS_PATH = old_procfs_path
+
+            # psutil caches the boot time of the real system so that only the offsets can be compared
+            psutil_boot_time = min(create_time for (_uid, _name, create_time) in psutil_result.values())
+            psutil_result = {pid: (uid, name, create_time - psutil_boot_time)
+                             for (pid, (uid, name, create_time)) in psutil_result.items()}
+
+            self.assertEqual(BENCHMARK_PROCESS_COUNT, len(procfs_result))
+            self.assertEqual(psutil_result, procfs_result)
+
+            fmt = "Reading {count} processes: psutil {psutil:.3f}s, {module} {procfs:.3f}s"
+            self._logger.info(fmt.format(count=BENCHMARK_PROCESS_COUNT, psutil=psutil_duration,
+                                         module=procfs_process_iterator.__name__, procfs=procfs_duration))
+
+
+if __name__ == "__main__":
+    unittest.main()
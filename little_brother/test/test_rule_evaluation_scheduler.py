@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import datetime
+import unittest
+
+from little_brother import rule_evaluation_scheduler
+from little_brother import rule_handler
+from little_brother import rule_override
+from python_base_app.test import base_test
+
+USERNAME = "username"
+OTHER_USERNAME = "other_username"
+RESULT = "result"
+OTHER_RESULT = "other_result"
+LOCALE = "en_US"
+
+
+class TestRuleEvaluationScheduler(base_test.BaseTestCase):
+
+    @staticmethod
+    def create_rule_set():
+
+        rule_set = rule_handler.RuleSetConfigModel()
+        rule_set.id = 1
+
+        return rule_set
+
+    @staticmethod
+    def create_signature(p_rule_set=None, p_rule_override=None):
+
+        if p_rule_set is None:
+            p_rule_set = TestRuleEvaluationScheduler.create_rule_set()
+
+        return rule_evaluation_scheduler.get_signature(p_rule_sets=[p_rule_set], p_active_rule_set=p_rule_set,
+                                                       p_rule_override=p_rule_override,
+                                                       p_active_time_extension=None, p_locale=LOCALE)
+
+    def test_schedule(self):
+
+        reference_time = datetime.datetime.now()
+        signature = self.create_signature()
+        scheduler = rule_evaluation_scheduler.RuleEvaluationScheduler()
+
+        self.assertIsNone(scheduler.get_result(p_username=USERNAME, p_signature=signature))
+
+        scheduler.schedule(p_username=USERNAME, p_next_change_time=reference_time + datetime.timedelta(seconds=60),
+                           p_signature=signature, p_result=RESULT)
+        scheduler.schedule(p_username=OTHER_USERNAME,
+                           p_next_change_time=reference_time + datetime.timedelta(seconds=120),
+                           p_signature=signature, p_result=OTHER_RESULT)
+
+        scheduler.update_due_users(p_reference_time=reference_time)
+        self.assertEqual(RESULT, scheduler.get_result(p_username=USERNAME, p_signature=signature))
+        self.assertEqual(OTHER_RESULT, scheduler.get_result(p_username=OTHER_USERNAME, p_signature=signature))
+
+        # Only the first user is due after a minute
+        scheduler.update_due_users(p_reference_time=reference_time + datetime.timedelta(seconds=60))
+        self.assertIsNone(scheduler.get_result(p_username=USERNAME, p_signature=signature))
+        self.assertEqual(OTHER_RESULT, scheduler.get_result(p_username=OTHER_USERNAME, p_signature=signature))
+
+    def test_reschedule(self):
+
+        reference_time = datetime.datetime.now()
+        signature = self.create_signature()
+        scheduler = rule_evaluation_scheduler.RuleEvaluationScheduler()
+
+        scheduler.schedule(p_username=USERNAME, p_next_change_time=reference_time,
+                           p_signature=signature, p_result=RESULT)
+        scheduler.schedule(p_username=USERNAME, p_next_change_time=reference_time + datetime.timedelta(seconds=60),
+                           p_signature=signature, p_result=OTHER_RESULT)
+
+        # The superseded queue entry does not make the new result due
+        scheduler.update_due_users(p_reference_time=reference_time)
+        self.assertEqual(OTHER_RESULT, scheduler.get_result(p_username=USERNAME, p_signature=signature))
+
+    def test_set_due(self):
+
+        reference_time = datetime.datetime.now()
+        signature = self.create_signature()
+        scheduler = rule_evaluation_scheduler.RuleEvaluationScheduler()
+
+        for username in (USERNAME, OTHER_USERNAME):
+            scheduler.schedule(p_username=username, p_next_change_time=reference_time + datetime.timedelta(days=1),
+                               p_signature=signature, p_result=RESULT)
+
+        scheduler.set_due(p_username=USERNAME)
+        self.assertIsNone(scheduler.get_result(p_username=USERNAME, p_signature=signature))
+        self.assertEqual(RESULT, scheduler.get_result(p_username=OTHER_USERNAME, p_signature=signature))
+
+        scheduler.set_due()
+        self.assertIsNone(scheduler.get_result(p_username=OTHER_USERNAME, p_signature=signature))
+
+    def test_changed_signature(self):
+
+        reference_time = datetime.datetime.now()
+        signature = self.create_signature()
+        scheduler = rule_evaluation_scheduler.RuleEvaluationScheduler()
+
+        scheduler.schedule(p_username=USERNAME, p_next_change_time=reference_time + datetime.timedelta(days=1),
+                           p_signature=signature, p_result=RESULT)
+
+        override = rule_override.RuleOverride(p_username=USERNAME, p_reference_date=reference_time.date(),
+                                              p_max_time_per_day=3600)
+        other_signature = self.create_signature(p_rule_override=override)
+
+        self.assertNotEqual(signature, other_signature)
+        self.assertIsNone(scheduler.get_result(p_username=USERNAME, p_signature=other_signature))
+
+    def test_edited_rule_set(self):
+
+        rule_set = self.create_rule_set()
+        signature = self.create_signature(p_rule_set=rule_set)
+
+        for name, value in (("max_time_per_day", 3600), ("min_time_of_day", datetime.time(hour=8)),
+                            ("max_time_of_day", datetime.time(hour=20)), ("min_break", 900),
+                            ("free_play", True), ("max_activity_duration", 1800)):
+            edited_rule_set = self.create_rule_set()
+            setattr(edited_rule_set, name, value)
+
+            self.assertNotEqual(signature, self.create_signature(p_rule_set=edited_rule_set), name)
+
+        self.assertEqual(signature, self.create_signature(p_rule_set=self.create_rule_set()))
+
+
+if __name__ == "__main__":
+    unittest.main()
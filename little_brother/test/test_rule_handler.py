@@ -18,11 +18,14 @@
 #    with this program; if not, write to the Free Software Foundation, Inc.,
 #    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+import copy
 import datetime
 import os.path
+import time
 
 import little_brother.persistence.session_context
 from little_brother import constants
+from little_brother import context_rule_handler
 from little_brother import db_migrations
 from little_brother import dependency_injection
 from little_brother import german_vacation_context_rule_handler
@@ -32,6 +35,7 @@ from little_brother import rule_handler
 from little_brother import rule_override
 from little_brother import rule_result_info
 from little_brother import simple_context_rule_handlers
+from little_brother.persistence import persistent_rule_set
 from little_brother.persistence import persistent_user, persistent_user_entity_manager
 from little_brother.persistence.persistence import Persistence
 from little_brother.test.persistence import test_persistence
@@ -60,6 +64,52 @@ MIN_ACTIVITY_DURATION = 60
 MAX_LOOKBACK_IN_DAYS = 10
 DURATION = 55  # seconds
 
+BENCHMARK_EVALUATION_COUNT = 20000
+
+
+class CountingWeekplanContextRuleHandler(context_rule_handler.AbstractContextRuleHandler):
+
+    # Handler without a compile step of its own, i.e. it is called through the default context predicate
+
+    def __init__(self):
+        super().__init__(p_context_name=simple_context_rule_handlers.WEEKPLAN_CONTEXT_RULE_HANDLER_NAME)
+        self._weekplan_context_rule_handler = simple_context_rule_handlers.WeekplanContextRuleHandler()
+        self.call_count = 0
+
+    def is_active(self, p_reference_date, p_details):
+        self.call_count = self.call_count + 1
+        return self._weekplan_context_rule_handler.is_active(p_reference_date=p_reference_date, p_details=p_details)
+
+
+class CompileCountingWeekplanContextRuleHandler(simple_context_rule_handlers.WeekplanContextRuleHandler):
+
+    def __init__(self):
+        super().__init__()
+        self.compile_count = 0
+
+    def compile_details(self, p_details):
+        self.compile_count = self.compile_count + 1
+        return super().compile_details(p_details=p_details)
+
+
+class VersionedContextRuleHandler(context_rule_handler.AbstractContextRuleHandler):
+
+    # Stand-in for a handler depending on run-time data such as the vacation calendar
+
+    def __init__(self):
+        super().__init__(p_context_name="versioned")
+        self.version = None
+        self.active = False
+        self.call_count = 0
+
+    def is_active(self, p_reference_date, p_details):
+        self.call_count = self.call_count + 1
+        return self.active
+
+    @property
+    def data_version(self):
+        return self.version
+
 
 class TestRuleHandler(base_test.BaseTestCase):
 
@@ -110,6 +160,114 @@ class TestRuleHandler(base_test.BaseTestCase):
         self.assertIsNotNone(active_rule_set)
         self.assertEqual(active_rule_set.context, simple_context_rule_handlers.WEEKPLAN_CONTEXT_RULE_HANDLER_NAME)
 
+    def test_active_ruleset_cache(self):
+        a_rule_handler = self.create_dummy_rule_handler(p_persistence=None, p_create_complex_handlers=False)
+        weekplan_context_rule_handler = CountingWeekplanContextRuleHandler()
+        a_rule_handler.register_context_rule_handler(p_context_rule_handler=weekplan_context_rule_handler)
+
+        default_rule_set = persistent_rule_set.RuleSet()
+        default_rule_set.context = simple_context_rule_handlers.DEFAULT_CONTEXT_RULE_HANDLER_NAME
+
+        weekend_rule_set = persistent_rule_set.RuleSet()
+        weekend_rule_set.context = simple_context_rule_handlers.WEEKPLAN_CONTEXT_RULE_HANDLER_NAME
+        weekend_rule_set.context_details = simple_context_rule_handlers.WEEKPLAN_PREDEFINED_DETAILS["weekend"]
+        weekend_rule_set.priority = 3
+
+        rule_sets = [default_rule_set, weekend_rule_set]
+        reference_dates = [NORMAL_DAY_1 + datetime.timedelta(days=i) for i in range(7)]
+
+        active_rule_sets = a_rule_handler.get_active_rulesets(p_rule_sets=rule_sets,
+                                                              p_reference_dates=reference_dates)
+
+        self.assertListEqual([default_rule_set, default_rule_set, default_rule_set, weekend_rule_set,
+                              weekend_rule_set, default_rule_set, default_rule_set], active_rule_sets)
+        self.assertEqual(7, weekplan_context_rule_handler.call_count)
+
+        # Resolutions are taken from the cache also when passing the time of day
+        self.assertIs(weekend_rule_set, a_rule_handler.get_active_ruleset(
+            p_rule_sets=rule_sets, p_reference_date=datetime.datetime.combine(WEEKEND_DAY_1, datetime.time(12))))
+        self.assertEqual(7, weekplan_context_rule_handler.call_count)
+
+        # Editing a rule set changes the signature of the rule sets
+        weekend_rule_set.priority = 0
+
+        self.assertIs(default_rule_set, a_rule_handler.get_active_ruleset(p_rule_sets=rule_sets,
+                                                                          p_reference_date=WEEKEND_DAY_1))
+        self.assertEqual(8, weekplan_context_rule_handler.call_count)
+
+    def test_active_ruleset_cache_data_version(self):
+        a_rule_handler = self.create_dummy_rule_handler(p_persistence=None, p_create_complex_handlers=False)
+        versioned_context_rule_handler = VersionedContextRuleHandler()
+        a_rule_handler.register_context_rule_handler(p_context_rule_handler=versioned_context_rule_handler)
+
+        default_rule_set = persistent_rule_set.RuleSet()
+        default_rule_set.context = simple_context_rule_handlers.DEFAULT_CONTEXT_RULE_HANDLER_NAME
+
+        versioned_rule_set = persistent_rule_set.RuleSet()
+        versioned_rule_set.context = versioned_context_rule_handler.context_name
+        versioned_rule_set.priority = 3
+
+        rule_sets = [default_rule_set, versioned_rule_set]
+
+        # Resolutions are not cached while the data of a context is unavailable
+        for i in range(2):
+            self.assertIs(default_rule_set, a_rule_handler.get_active_ruleset(p_rule_sets=rule_sets,
+                                                                              p_reference_date=NORMAL_DAY_1))
+
+        self.assertEqual(2, versioned_context_rule_handler.call_count)
+
+        versioned_context_rule_handler.version = 1
+        versioned_context_rule_handler.active = True
+
+        for i in range(2):
+            self.assertIs(versioned_rule_set, a_rule_handler.get_active_ruleset(p_rule_sets=rule_sets,
+                                                                                p_reference_date=NORMAL_DAY_1))
+
+        self.assertEqual(3, versioned_context_rule_handler.call_count)
+
+        # New data yields new resolutions
+        versioned_context_rule_handler.version = 2
+        versioned_context_rule_handler.active = False
+
+        self.assertIs(default_rule_set, a_rule_handler.get_active_ruleset(p_rule_sets=rule_sets,
+                                                                          p_reference_date=NORMAL_DAY_1))
+        self.assertEqual(4, versioned_context_rule_handler.call_count)
+
+    def test_context_predicate_cache(self):
+        a_rule_handler = self.create_dummy_rule_handler(p_persistence=None, p_create_complex_handlers=False)
+        weekplan_context_rule_handler = CompileCountingWeekplanContextRuleHandler()
+        a_rule_handler.register_context_rule_handler(p_context_rule_handler=weekplan_context_rule_handler)
+
+        weekend_rule_set = rule_handler.RuleSetConfigModel()
+        weekend_rule_set.context = simple_context_rule_handlers.WEEKPLAN_CONTEXT_RULE_HANDLER_NAME
+        weekend_rule_set.context_details = "weekend"
+
+        predicate = a_rule_handler.get_context_predicate(p_rule_set=weekend_rule_set)
+        self.assertTrue(predicate.is_active(p_reference_date=WEEKEND_DAY_1))
+        self.assertFalse(predicate.is_active(p_reference_date=NORMAL_DAY_1))
+
+        # Rule sets with the same context and details share the compiled predicate
+        other_rule_set = copy.copy(weekend_rule_set)
+        self.assertIs(predicate, a_rule_handler.get_context_predicate(p_rule_set=other_rule_set))
+        self.assertEqual(1, weekplan_context_rule_handler.compile_count)
+
+        # Editing the details compiles a new predicate
+        other_rule_set.context_details = "weekdays"
+        other_predicate = a_rule_handler.get_context_predicate(p_rule_set=other_rule_set)
+        self.assertFalse(other_predicate.is_active(p_reference_date=WEEKEND_DAY_1))
+        self.assertEqual(2, weekplan_context_rule_handler.compile_count)
+
+        default_rule_set = rule_handler.RuleSetConfigModel()
+        default_rule_set.context = None
+        self.assertTrue(a_rule_handler.get_context_predicate(p_rule_set=default_rule_set).is_active(
+            p_reference_date=NORMAL_DAY_1))
+
+        invalid_rule_set = rule_handler.RuleSetConfigModel()
+        invalid_rule_set.context = "invalid_context"
+
+        with self.assertRaises(configuration.ConfigurationException):
+            a_rule_handler.get_context_predicate(p_rule_set=invalid_rule_set)
+
     @staticmethod
     def create_dummy_ruleset_config():
 
@@ -521,6 +679,56 @@ class TestRuleHandler(base_test.BaseTestCase):
 
         self.assertEqual(a_rule_result_info.applying_rules & rule_result_info.RULE_TIME_PER_DAY, 0)
 
+    def test_next_change_time(self):
+
+        reference_time = datetime.datetime.combine(NORMAL_DAY_1, datetime.time(hour=10))
+
+        rule_set = persistent_rule_set.RuleSet()
+        rule_set.min_time_of_day = datetime.time(hour=8)
+        rule_set.max_time_of_day = datetime.time(hour=20)
+
+        stat_info = process_statistics.ProcessStatisticsInfo(p_username=USERNAME, p_reference_time=reference_time,
+                                                             p_min_activity_duration=MIN_ACTIVITY_DURATION,
+                                                             p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS)
+
+        # Without any effective rule set the user is due immediately
+        self.assertEqual(reference_time, rule_handler.RuleHandler.get_next_change_time(
+            p_rule_result_info=rule_handler.RuleResultInfo(), p_stat_info=stat_info, p_reference_time=reference_time))
+
+        # An inactive user is not affected before the maximum time of day
+        a_rule_result_info = rule_handler.RuleResultInfo(p_default_rule_set=rule_set)
+
+        self.assertEqual(datetime.datetime.combine(NORMAL_DAY_1, datetime.time(hour=20)),
+                         rule_handler.RuleHandler.get_next_change_time(
+                             p_rule_result_info=a_rule_result_info, p_stat_info=stat_info,
+                             p_reference_time=reference_time))
+
+        # Without restrictions the result only changes at midnight
+        a_rule_result_info = rule_handler.RuleResultInfo(p_default_rule_set=persistent_rule_set.RuleSet())
+
+        self.assertEqual(datetime.datetime.combine(NORMAL_DAY_1 + datetime.timedelta(days=1), datetime.time.min),
+                         rule_handler.RuleHandler.get_next_change_time(
+                             p_rule_result_info=a_rule_result_info, p_stat_info=stat_info,
+                             p_reference_time=reference_time))
+
+        # An active user is looked at again once a minute at the latest...
+        stat_info.current_activity = process_statistics.Activity(
+            p_start_time=reference_time + datetime.timedelta(seconds=-600))
+
+        self.assertEqual(reference_time + datetime.timedelta(seconds=rule_handler.ACTIVE_USER_REEVALUATION_INTERVAL),
+                         rule_handler.RuleHandler.get_next_change_time(
+                             p_rule_result_info=a_rule_result_info, p_stat_info=stat_info,
+                             p_reference_time=reference_time))
+
+        # ...and when the time left for the day runs out
+        rule_set.max_time_per_day = 630
+        a_rule_result_info = rule_handler.RuleResultInfo(p_default_rule_set=rule_set)
+
+        self.assertEqual(reference_time + datetime.timedelta(seconds=30),
+                         rule_handler.RuleHandler.get_next_change_time(
+                             p_rule_result_info=a_rule_result_info, p_stat_info=stat_info,
+                             p_reference_time=reference_time))
+
 
 class TestRuleOverride(base_test.BaseTestCase):
 
@@ -662,6 +870,80 @@ class TestRuleSetConfigModel(base_test.BaseTestCase):
         self.assertEqual(new_rule_set.min_break, "1m")
         self.assertEqual(new_rule_set.free_play, True)
 
+    def test_effective_rule_set(self):
+        rule_set = persistent_rule_set.RuleSet()
+        rule_set.context = simple_context_rule_handlers.DEFAULT_CONTEXT_RULE_HANDLER_NAME
+        rule_set.max_time_per_day = 3600
+        rule_set.min_break = 600
+
+        override = rule_override.RuleOverride(p_max_time_per_day=7200)
+
+        effective_rule_set = rule_result_info.apply_override(p_rule_set=rule_set, p_rule_override=override)
+
+        self.assertIs(rule_set, effective_rule_set.rule_set)
+        self.assertEqual(7200, effective_rule_set.max_time_per_day)
+        self.assertEqual(constants.CSS_CLASS_EMPHASIZE_RULE_OVERRIDE, effective_rule_set.max_time_per_day_class)
+        self.assertEqual("", effective_rule_set.min_break_class)
+        self.assertEqual(simple_context_rule_handlers.DEFAULT_CONTEXT_RULE_HANDLER_NAME, effective_rule_set.context)
+
+        # The view is not a copy...
+        rule_set.min_break = 300
+        self.assertEqual(300, effective_rule_set.min_break)
+
+        # ...and cannot be modified
+        with self.assertRaises(AttributeError):
+            effective_rule_set.min_break = 900
+
+        self.assertIs(rule_set, rule_result_info.apply_override(p_rule_set=rule_set, p_rule_override=None))
+
+    def test_benchmark_apply_override(self):
+        reference_time = datetime.datetime.combine(NORMAL_DAY_1, datetime.time(hour=15))
+        a_rule_handler = rule_handler.RuleHandler(p_config=rule_handler.RuleHandlerConfigModel(), p_persistence=None)
+
+        rule_set = persistent_rule_set.RuleSet()
+        rule_set.min_time_of_day = datetime.time(hour=8)
+        rule_set.max_time_of_day = datetime.time(hour=20)
+        rule_set.max_time_per_day = 3600
+        rule_set.max_activity_duration = 1800
+        rule_set.min_break = 600
+
+        override = rule_override.RuleOverride(p_max_time_per_day=7200, p_min_break=300)
+
+        stat_info = process_statistics.ProcessStatisticsInfo(p_username=USERNAME, p_reference_time=reference_time,
+                                                             p_min_activity_duration=MIN_ACTIVITY_DURATION,
+                                                             p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS)
+        stat_info.current_activity = process_statistics.Activity(
+            p_start_time=reference_time - datetime.timedelta(seconds=600))
+
+        def evaluate(p_rule_override):
+            start = time.perf_counter()
+
+            for _i in range(BENCHMARK_EVALUATION_COUNT):
+                a_rule_result_info = rule_handler.RuleResultInfo(p_default_rule_set=rule_set,
+                                                                 p_rule_override=p_rule_override)
+                a_rule_handler.evaluate_rule_set(p_rule_result_info=a_rule_result_info, p_stat_info=stat_info,
+                                                 p_active_time_extension=None, p_reference_time=reference_time)
+
+            return time.perf_counter() - start
+
+        without_override = evaluate(p_rule_override=None)
+        with_override = evaluate(p_rule_override=override)
+
+        # Cost of the former copy of the mapped rule set per evaluation
+        start = time.perf_counter()
+
+        for _i in range(BENCHMARK_EVALUATION_COUNT):
+            copy.copy(rule_set)
+
+        copy_duration = time.perf_counter() - start
+
+        fmt = "{count} evaluations: {without:.0f}/s without override, {with_override:.0f}/s with override " \
+              "(copying the rule set alone: {copy:.0f}/s)"
+        self._logger.info(fmt.format(count=BENCHMARK_EVALUATION_COUNT,
+                                     without=BENCHMARK_EVALUATION_COUNT / without_override,
+                                     with_override=BENCHMARK_EVALUATION_COUNT / with_override,
+                                     copy=BENCHMARK_EVALUATION_COUNT / copy_duration))
+
 
 class TestRulesectionHandler(base_test.BaseTestCase):
 
@@ -104,6 +104,26 @@ class TestWeekDayContextRuleHandler(base_test.BaseTestCase):
         self.assertFalse(rule_handler.is_active(p_reference_date=SUNDAY, p_details="WEEKDAYS"))
         self.assertFalse(rule_handler.is_active(p_reference_date=SATURDAY, p_details="WEEKDAYS"))
 
+    def test_compile_details(self):
+
+        rule_handler = simple_context_rule_handlers.WeekplanContextRuleHandler()
+
+        self.assertEqual(0b1100000, rule_handler.compile_details(p_details="weekend").mask)
+        self.assertEqual(0b0011111, rule_handler.compile_details(p_details="WEEKDAYS").mask)
+        self.assertEqual(0b0001011, rule_handler.compile_details(p_details="1y-x-0n").mask)
+
+        predicate = rule_handler.compile_details(p_details="-1----1")
+
+        for day in range(0, 7):
+            self.assertEqual(day in (1, 6), predicate.is_active(p_reference_date=DAYS[day]))
+            self.assertEqual(day in (1, 6), predicate.is_active(p_reference_date=DAYS[day].date()))
+
+        with self.assertRaises(AttributeError):
+            predicate._mask = 0
+
+        with self.assertRaises(configuration.ConfigurationException):
+            rule_handler.compile_details(p_details="X-----")
+
     def test_is_active_without_details(self):
 
         rule_handler = simple_context_rule_handlers.WeekplanContextRuleHandler()
@@ -21,19 +21,34 @@
 import unittest
 
 from little_brother.test import test_app, test_client_info, test_pytest, test_token_handler
+from little_brother.test import test_adaptive_scheduler
 from little_brother.test import test_app_control
+from little_brother.test import test_batch_rule_evaluation
 from little_brother.test import test_client_device_handler
 from little_brother.test import test_client_process_handler
 from little_brother.test import test_german_vacation_context_rule_handler
+from little_brother.test import test_incremental_process_statistics
+from little_brother.test import test_kill_executor
+from little_brother.test import test_kill_helper
 from little_brother.test import test_language
+from little_brother.test import test_login_mapping
+from little_brother.test import test_pattern_matcher
 from little_brother.test import test_process_handler
 from little_brother.test import test_process_handler_manager
+from little_brother.test import test_proc_connector
 from little_brother.test import test_process_info
+from little_brother.test import test_process_info_store
+from little_brother.test import test_rule_evaluation_scheduler
+from little_brother.test import test_vacation_calendar
+from little_brother.test import test_procfs_process_iterator
 from little_brother.test import test_process_statistics
 from little_brother.test import test_prometheus
 from little_brother.test import test_rule_handler
 from little_brother.test import test_simple_weekday_context_rule_handler
+from little_brother.test import test_user_slice_process_iterator
+from little_brother.test import test_usage_rollup_handler
 from little_brother.test import test_user_status
+from little_brother.test import test_vectorized_process_statistics
 from little_brother.test.api import test_suite as api_test_suite
 from little_brother.test.persistence import test_suite as persistence_test_suite
 from little_brother.test.web import test_suite as web_test_suite
@@ -43,6 +58,53 @@ from python_base_app.test import base_test
 
 
 def add_test_cases(p_test_suite, p_config_filename=None):
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_vacation_calendar.TestVacationCalendar,
+        p_config_filename=p_config_filename)
+
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_batch_rule_evaluation.TestBatchRuleEvaluation,
+        p_config_filename=p_config_filename)
+
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_rule_evaluation_scheduler.TestRuleEvaluationScheduler,
+        p_config_filename=p_config_filename)
+
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_process_info_store.TestProcessInfoStore,
+        p_config_filename=p_config_filename)
+
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_usage_rollup_handler.TestUsageRollupHandler,
+        p_config_filename=p_config_filename)
+
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_vectorized_process_statistics.TestVectorizedProcessStatistics,
+        p_config_filename=p_config_filename)
+
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_incremental_process_statistics.TestIncrementalProcessStatistics,
+        p_config_filename=p_config_filename)
+
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_kill_executor.TestKillExecutor, p_config_filename=p_config_filename)
+
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_kill_helper.TestKillHelper, p_config_filename=p_config_filename)
+
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_adaptive_scheduler.TestAdaptiveScheduler, p_config_filename=p_config_filename)
+
     base_test.add_tests_in_test_unit(
         p_test_suite=p_test_suite,
         p_test_unit_class=test_token_handler.TestTokenHandler, p_config_filename=p_config_filename)
@@ -55,6 +117,28 @@ def add_test_cases(p_test_suite, p_config_filename=None):
         p_test_suite=p_test_suite,
         p_test_unit_class=test_process_info.TestProcessInfo, p_config_filename=p_config_filename)
 
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_login_mapping.TestLoginMapping, p_config_filename=p_config_filename)
+
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_pattern_matcher.TestPatternMatcher, p_config_filename=p_config_filename)
+
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_proc_connector.TestProcConnector, p_config_filename=p_config_filename)
+
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_procfs_process_iterator.TestProcFsProcessIterator,
+        p_config_filename=p_config_filename)
+
+    base_test.add_tests_in_test_unit(
+        p_test_suite=p_test_suite,
+        p_test_unit_class=test_user_slice_process_iterator.TestUserSliceProcessIterator,
+        p_config_filename=p_config_filename)
+
     base_test.add_tests_in_test_unit(
         p_test_suite=p_test_suite,
         p_test_unit_class=test_process_statistics.TestProcessStatistics, p_config_filename=p_config_filename)
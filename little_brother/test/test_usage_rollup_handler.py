@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2019-2024  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import datetime
+import random
+import unittest
+
+from little_brother import app_control_config_model
+from little_brother import dependency_injection
+from little_brother import process_info
+from little_brother import process_statistics
+from little_brother import usage_rollup_handler
+from little_brother.persistence.persistence import Persistence
+from little_brother.persistence.persistent_daily_usage_rollup_entity_manager import DailyUsageRollupEntityManager
+from little_brother.persistence.session_context import SessionContext
+from little_brother.test import test_incremental_process_statistics
+from little_brother.test.persistence.test_persistence import TestPersistence
+from python_base_app.test import base_test
+
+MAX_LOOKBACK_IN_DAYS = test_incremental_process_statistics.MAX_LOOKBACK_IN_DAYS
+MIN_ACTIVITY_DURATION = test_incremental_process_statistics.MIN_ACTIVITY_DURATION
+REFERENCE_TIME = datetime.datetime(2024, 5, 17, 18, 30)
+
+
+def get_users_stat_infos(p_process_infos, p_max_lookback_in_days):
+    return process_statistics.get_process_statistics(
+        p_user_map=test_incremental_process_statistics.create_user_map(),
+        p_process_infos={pinfo.get_key(): pinfo for pinfo in p_process_infos},
+        p_reference_time=REFERENCE_TIME, p_max_lookback_in_days=p_max_lookback_in_days,
+        p_min_activity_duration=MIN_ACTIVITY_DURATION)
+
+
+def get_day_summaries(p_users_stat_infos):
+    # The rollups store whole seconds
+    return {username: {context: [(int(day.duration), int(day.downtime), day.min_time, day.max_time, day.host_infos,
+                                  day.activity_count) for day in stat_info.day_statistics]
+                       for context, stat_info in stat_infos.items()}
+            for username, stat_infos in p_users_stat_infos.items()}
+
+
+class TestUsageRollupHandler(base_test.BaseTestCase):
+
+    def setUp(self):
+        dependency_injection.reset()
+
+    def create_handler(self):
+        TestPersistence.create_dummy_persistence(self._logger)
+        dependency_injection.container[DailyUsageRollupEntityManager] = DailyUsageRollupEntityManager()
+
+        config = app_control_config_model.AppControlConfigModel()
+        config.process_lookback_in_days = MAX_LOOKBACK_IN_DAYS
+
+        return usage_rollup_handler.UsageRollupHandler(p_config=config)
+
+    def test_get_closed_lookbacks(self):
+        pinfo = process_info.ProcessInfo(
+            p_hostname="host1", p_username=test_incremental_process_statistics.USER_1,
+            p_processhandler="ClientProcessHandler", p_processname="game", p_pid=1,
+            p_start_time=REFERENCE_TIME - datetime.timedelta(days=2))
+
+        stat_info = get_users_stat_infos(
+            p_process_infos=[pinfo],
+            p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS)[test_incremental_process_statistics.USER_1]["default"]
+
+        # The day of the running activity and the following day are still open
+        self.assertListEqual([3, 4, 5, 6, 7], usage_rollup_handler.get_closed_lookbacks(p_stat_info=stat_info))
+
+    def test_add_rollups(self):
+        handler = self.create_handler()
+        pinfos = test_incremental_process_statistics.create_random_process_infos(
+            p_random=random.Random(15), p_reference_time=REFERENCE_TIME, p_count=300, p_open_ratio=0)
+
+        full_users_stat_infos = get_users_stat_infos(p_process_infos=pinfos,
+                                                     p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS)
+        recent_users_stat_infos = get_users_stat_infos(p_process_infos=pinfos, p_max_lookback_in_days=1)
+
+        with SessionContext(p_persistence=dependency_injection.container[Persistence]) as session_context:
+            # Nothing has been rolled up yet
+            self.assertIsNone(handler.add_rollups(
+                p_session_context=session_context, p_users_stat_infos=recent_users_stat_infos,
+                p_reference_time=REFERENCE_TIME, p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS))
+
+            handler.write_rollups(p_session_context=session_context, p_users_stat_infos=full_users_stat_infos,
+                                  p_reference_time=REFERENCE_TIME)
+
+        with SessionContext(p_persistence=dependency_injection.container[Persistence]) as session_context:
+            users_stat_infos = handler.add_rollups(
+                p_session_context=session_context, p_users_stat_infos=recent_users_stat_infos,
+                p_reference_time=REFERENCE_TIME, p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS)
+
+        self.assertDictEqual(get_day_summaries(p_users_stat_infos=full_users_stat_infos),
+                             get_day_summaries(p_users_stat_infos=users_stat_infos))
+
+        # The statistics passed in are left unchanged
+        for stat_infos in recent_users_stat_infos.values():
+            for stat_info in stat_infos.values():
+                self.assertEqual(1, stat_info.max_lookback_in_days)
+                self.assertEqual(2, len(stat_info.day_statistics))
+
+    def test_write_rollups_once(self):
+        handler = self.create_handler()
+        pinfos = test_incremental_process_statistics.create_random_process_infos(
+            p_random=random.Random(16), p_reference_time=REFERENCE_TIME, p_count=100, p_open_ratio=0)
+        users_stat_infos = get_users_stat_infos(p_process_infos=pinfos, p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS)
+        entity_manager = dependency_injection.container[DailyUsageRollupEntityManager]
+
+        with SessionContext(p_persistence=dependency_injection.container[Persistence]) as session_context:
+            handler.write_rollups(p_session_context=session_context, p_users_stat_infos=users_stat_infos,
+                                  p_reference_time=REFERENCE_TIME)
+            rollups = entity_manager.get_rollups(
+                p_session_context=session_context,
+                p_start_date=REFERENCE_TIME.date() - datetime.timedelta(days=MAX_LOOKBACK_IN_DAYS),
+                p_end_date=REFERENCE_TIME.date())
+
+            # One rollup per user, context and closed day
+            self.assertEqual(2 * len(test_incremental_process_statistics.CONTEXTS) * MAX_LOOKBACK_IN_DAYS,
+                             len(rollups))
+
+            ids = sorted(rollup.id for rollup in rollups.values())
+
+            handler.write_rollups(p_session_context=session_context, p_users_stat_infos=users_stat_infos,
+                                  p_reference_time=REFERENCE_TIME)
+            rollups = entity_manager.get_rollups(
+                p_session_context=session_context,
+                p_start_date=REFERENCE_TIME.date() - datetime.timedelta(days=MAX_LOOKBACK_IN_DAYS),
+                p_end_date=REFERENCE_TIME.date())
+
+            self.assertListEqual(ids, sorted(rollup.id for rollup in rollups.values()))
+
+    def test_rewrite_changed_rollups(self):
+        handler = self.create_handler()
+        pinfos = test_incremental_process_statistics.create_random_process_infos(
+            p_random=random.Random(18), p_reference_time=REFERENCE_TIME, p_count=100, p_open_ratio=0)
+        entity_manager = dependency_injection.container[DailyUsageRollupEntityManager]
+        changed_date = REFERENCE_TIME.date() - datetime.timedelta(days=3)
+        written_keys = []
+        write_rollups = entity_manager.write_rollups
+
+        def record_rollups(p_session_context, p_rollups):
+            written_keys.extend(rollup.get_key() for rollup in p_rollups)
+            write_rollups(p_session_context=p_session_context, p_rollups=p_rollups)
+
+        entity_manager.write_rollups = record_rollups
+
+        with SessionContext(p_persistence=dependency_injection.container[Persistence]) as session_context:
+            handler.write_rollups(
+                p_session_context=session_context,
+                p_users_stat_infos=get_users_stat_infos(p_process_infos=pinfos,
+                                                        p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS),
+                p_reference_time=REFERENCE_TIME, p_changed_days=None)
+            all_keys = set(written_keys)
+            written_keys.clear()
+
+            # A process of a closed day is reported late, e.g. by a client replaying its events
+            pinfos.append(process_info.ProcessInfo(
+                p_hostname="host1", p_username=test_incremental_process_statistics.USER_1,
+                p_processhandler="ClientProcessHandler", p_processname="game", p_pid=1000,
+                p_start_time=datetime.datetime.combine(changed_date, datetime.time(3, 0)),
+                p_end_time=datetime.datetime.combine(changed_date, datetime.time(4, 0))))
+            users_stat_infos = get_users_stat_infos(p_process_infos=pinfos,
+                                                    p_max_lookback_in_days=MAX_LOOKBACK_IN_DAYS)
+
+            handler.write_rollups(
+                p_session_context=session_context, p_users_stat_infos=users_stat_infos,
+                p_reference_time=REFERENCE_TIME,
+                p_changed_days={(test_incremental_process_statistics.USER_1, changed_date)})
+
+            # Only the rollups of the changed day are rewritten
+            self.assertSetEqual({(test_incremental_process_statistics.USER_1, context, changed_date)
+                                 for context in test_incremental_process_statistics.CONTEXTS},
+                                set(written_keys))
+            rollups = entity_manager.get_rollups(p_session_context=session_context, p_start_date=changed_date,
+                                                 p_end_date=changed_date)
+
+            for (username, context, _reference_date), rollup in rollups.items():
+                self.assertEqual(int(users_stat_infos[username][context].day_statistics[3].duration),
+                                 rollup.duration)
+
+            written_keys.clear()
+
+            # Nothing is rewritten without changes
+            handler.write_rollups(p_session_context=session_context, p_users_stat_infos=users_stat_infos,
+                                  p_reference_time=REFERENCE_TIME)
+            self.assertListEqual([], written_keys)
+
+            # All rollups are rewritten if all days may have changed
+            handler.write_rollups(p_session_context=session_context, p_users_stat_infos=users_stat_infos,
+                                  p_reference_time=REFERENCE_TIME, p_changed_days=None)
+            self.assertSetEqual(all_keys, set(written_keys))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2019-2024  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import datetime
+import os
+import tempfile
+import unittest
+
+import psutil
+
+from little_brother import admin_event
+from little_brother import client_process_handler
+from little_brother import dependency_injection
+from little_brother.persistence.persistence import Persistence
+from little_brother.persistence.persistent_uid_mapping import DEFAULT_SERVER_GROUP
+from little_brother.persistence.session_context import SessionContext
+from little_brother.proc_connector import ProcessSnapshot
+from little_brother.test import test_data
+from little_brother.test.dummy_process_iterator import uids_tuple
+from little_brother.test.persistence import test_persistence
+from little_brother.user_slice_process_iterator import UserSliceProcessIteratorFactory
+from python_base_app.test import base_test
+
+CGROUP_DIR = os.path.join(os.path.dirname(__file__), "resources/cgroup")
+
+OTHER_UID = 124
+SYSTEM_PID = 500
+GAME_PID = 1003
+
+
+def get_snapshot(p_pid, p_uid, p_name):
+    return ProcessSnapshot(p_pid=p_pid, p_uids=uids_tuple(real=p_uid, effective=p_uid), p_name=p_name,
+                           p_cmdline=[p_name], p_create_time=test_data.START_TIME_1.timestamp())
+
+
+class TestUserSliceProcessIterator(base_test.BaseTestCase):
+
+    def setUp(self):
+        dependency_injection.reset()
+
+        self._processes = {
+            SYSTEM_PID: get_snapshot(p_pid=SYSTEM_PID, p_uid=0, p_name="cron"),
+            1001: get_snapshot(p_pid=1001, p_uid=test_data.UID_1, p_name="bash"),
+            1002: get_snapshot(p_pid=1002, p_uid=test_data.UID_1, p_name="sleep"),
+            GAME_PID: get_snapshot(p_pid=GAME_PID, p_uid=test_data.UID_1, p_name=test_data.PROCESS_NAME_1),
+            2001: get_snapshot(p_pid=2001, p_uid=OTHER_UID, p_name="bash"),
+        }
+
+    def get_process(self, p_pid):
+        process = self._processes.get(p_pid)
+
+        if process is None:
+            raise psutil.NoSuchProcess(pid=p_pid)
+
+        return process
+
+    def process_iter(self):
+        return iter(self._processes.values())
+
+    def create_factory(self, p_cgroup_dir=CGROUP_DIR):
+        return UserSliceProcessIteratorFactory(p_cgroup_dir=p_cgroup_dir, p_process_iter=self.process_iter,
+                                               p_process_factory=self.get_process)
+
+    def test_get_pids_of_user(self):
+
+        factory = self.create_factory()
+
+        self.assertTrue(factory.cgroup_v2_available)
+        self.assertEqual({1001, 1002, GAME_PID}, factory.get_pids_of_user(p_uid=test_data.UID_1))
+        self.assertEqual({2001}, factory.get_pids_of_user(p_uid=OTHER_UID))
+        self.assertEqual(set(), factory.get_pids_of_user(p_uid=999))
+
+    def test_process_iter(self):
+
+        factory = self.create_factory()
+
+        # The process has terminated in the meantime
+        del self._processes[1002]
+
+        pids = [proc.pid for proc in factory.process_iter(p_uids=[test_data.UID_1])]
+        self.assertEqual([1001, GAME_PID], pids)
+
+        pids = [proc.pid for proc in factory.process_iter(p_uids=[test_data.UID_1, OTHER_UID])]
+        self.assertEqual([1001, GAME_PID, 2001], pids)
+
+        self.assertEqual([], list(factory.process_iter(p_uids=[])))
+
+        # Without uids all processes are returned
+        self.assertEqual(4, len(list(factory.process_iter())))
+
+    def test_fallback_without_cgroup_v2(self):
+
+        with tempfile.TemporaryDirectory() as cgroup_dir:
+            factory = self.create_factory(p_cgroup_dir=cgroup_dir)
+
+            self.assertFalse(factory.cgroup_v2_available)
+            self.assertEqual(len(self._processes), len(list(factory.process_iter(p_uids=[test_data.UID_1]))))
+
+    def test_scan_processes(self):
+
+        test_persistence.TestPersistence.create_dummy_persistence(self._logger, p_delete=True)
+        dummy_persistence: test_persistence.TestPersistence = dependency_injection.container[Persistence]
+
+        config = client_process_handler.ClientProcessHandlerConfigModel()
+        config.scan_user_slices_only = True
+        process_handler = client_process_handler.ClientProcessHandler(
+            p_config=config, p_process_iterator_factory=self.create_factory())
+
+        with SessionContext(p_persistence=dummy_persistence) as session_context:
+            login_mapping = test_data.get_login_mapping(p_session_context=session_context)
+
+            events = process_handler.scan_processes(
+                p_session_context=session_context,
+                p_server_group=DEFAULT_SERVER_GROUP,
+                p_login_mapping=login_mapping,
+                p_host_name=test_data.HOSTNAME_1,
+                p_process_regex_map=test_data.get_process_regex_map_1(),
+                p_prohibited_process_regex_map=test_data.get_prohibited_process_regex_map_1(),
+                p_reference_time=datetime.datetime.now())
+
+        self.assertEqual(1, len(events))
+        self.assertEqual(admin_event.EVENT_TYPE_PROCESS_START, events[0].event_type)
+        self.assertEqual(GAME_PID, events[0].pid)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import copy
+import datetime
+import hashlib
+import http.server
+import json
+import os.path
+import tempfile
+import threading
+import unittest
+
+from little_brother import german_vacation_context_rule_handler
+from little_brother import rule_handler
+from little_brother import simple_context_rule_handlers
+from little_brother import vacation_calendar
+from python_base_app import configuration
+from python_base_app.test import base_test
+
+VALID_STATE_NAME = "Nordrhein-Westfalen"
+INVALID_STATE_NAME = "INVALID_STATE_NAME"
+
+VACATION_TYPES_PATH = "/holiday_or_vacation_types"
+LOCATIONS_PATH = "/locations"
+PERIODS_PATH = "/periods"
+
+DEFAULT_REFRESH_INTERVAL_IN_DAYS = german_vacation_context_rule_handler.DEFAULT_REFRESH_INTERVAL_IN_DAYS
+
+DOCUMENTS = {
+    VACATION_TYPES_PATH: {"data": [{"id": 1, "name": "Herbst"}, {"id": 2, "name": "Sonstiges"}]},
+    LOCATIONS_PATH: {"data": [{"id": 10, "name": VALID_STATE_NAME, "is_federal_state": True},
+                              {"id": 11, "name": "Köln", "is_federal_state": False}]},
+    PERIODS_PATH: {"data": [
+        {"location_id": 10, "holiday_or_vacation_type_id": 1, "starts_on": "2020-10-12", "ends_on": "2020-10-24"},
+        {"location_id": 10, "holiday_or_vacation_type_id": 2, "starts_on": "2020-11-01", "ends_on": "2020-11-02"},
+        {"location_id": 11, "holiday_or_vacation_type_id": 1, "starts_on": "2020-12-01", "ends_on": "2020-12-02"}]}
+}
+
+
+def to_date(p_string):
+    return datetime.datetime.strptime(p_string, "%d.%m.%Y").date()
+
+
+class CalendarRequestHandler(http.server.BaseHTTPRequestHandler):
+
+    # Local stand-in for the calendar service supporting conditional requests with ETags
+
+    def do_GET(self):
+
+        server = self.server
+        server.request_count += 1
+
+        if server.failing or self.path not in server.documents:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        content = json.dumps(server.documents[self.path]).encode("UTF-8")
+        etag = '"%s"' % hashlib.sha1(content).hexdigest()
+
+        if self.headers.get("If-None-Match") == etag:
+            server.not_modified_count += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, p_format, *p_args):
+        pass
+
+
+class TestVacationCalendar(base_test.BaseTestCase):
+
+    def setUp(self):
+
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), CalendarRequestHandler)
+        self._server.request_count = 0
+        self._server.not_modified_count = 0
+        self._server.failing = False
+        self._server.documents = copy.deepcopy(DOCUMENTS)
+        self._server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._server_thread.start()
+
+        self._snapshot_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+
+        self._server.shutdown()
+        self._server.server_close()
+        self._snapshot_dir.cleanup()
+
+    def create_handler(self, p_refresh_interval_in_days=DEFAULT_REFRESH_INTERVAL_IN_DAYS,
+                       p_retry_interval=german_vacation_context_rule_handler.DEFAULT_RETRY_INTERVAL):
+
+        base_url = "http://127.0.0.1:%d" % self._server.server_address[1]
+
+        config = german_vacation_context_rule_handler.GermanVacationContextRuleHandlerConfig()
+        config.vacation_type_url = base_url + VACATION_TYPES_PATH
+        config.locations_url = base_url + LOCATIONS_PATH
+        config.vacation_data_url = base_url + PERIODS_PATH
+        config.snapshot_dir = self._snapshot_dir.name
+        config.refresh_interval_in_days = p_refresh_interval_in_days
+        config.retry_interval = p_retry_interval
+
+        return german_vacation_context_rule_handler.GermanVacationContextRuleHandler(p_config=config)
+
+    def test_interval_index(self):
+
+        entries = [german_vacation_context_rule_handler.VacationEntry(
+            name="", start_date=to_date(start), end_date=to_date(end)) for start, end in (
+            ("10.10.2020", "20.10.2020"), ("01.10.2020", "12.10.2020"), ("21.10.2020", "22.10.2020"),
+            ("01.12.2020", "01.12.2020"))]
+
+        index = vacation_calendar.VacationIntervalIndex(p_vacation_entries=entries)
+
+        # Overlapping and adjacent intervals are merged
+        self.assertEqual(2, len(index))
+
+        self.assertFalse(index.contains(p_date=to_date("30.09.2020")))
+        self.assertTrue(index.contains(p_date=to_date("01.10.2020")))
+        self.assertTrue(index.contains(p_date=to_date("22.10.2020")))
+        self.assertFalse(index.contains(p_date=to_date("23.10.2020")))
+        self.assertTrue(index.contains(p_date=to_date("01.12.2020")))
+        self.assertFalse(index.contains(p_date=to_date("02.12.2020")))
+
+    def test_is_active(self):
+
+        handler = self.create_handler()
+
+        self.assertFalse(handler.is_active(p_reference_date=to_date("11.10.2020"), p_details=VALID_STATE_NAME))
+        self.assertTrue(handler.is_active(p_reference_date=to_date("12.10.2020"), p_details=VALID_STATE_NAME))
+        self.assertTrue(handler.is_active(p_reference_date=to_date("24.10.2020"), p_details=VALID_STATE_NAME))
+        self.assertFalse(handler.is_active(p_reference_date=to_date("25.10.2020"), p_details=VALID_STATE_NAME))
+
+        # Vacation types not contained in the filter are ignored
+        self.assertFalse(handler.is_active(p_reference_date=to_date("01.11.2020"), p_details=VALID_STATE_NAME))
+
+        with self.assertRaises(configuration.ConfigurationException):
+            handler.is_active(p_reference_date=to_date("12.10.2020"), p_details=INVALID_STATE_NAME)
+
+        # The calendar is downloaded only once
+        self.assertEqual(3, self._server.request_count)
+        self.assertTrue(os.path.exists(os.path.join(self._snapshot_dir.name,
+                                                    german_vacation_context_rule_handler.SNAPSHOT_FILENAME)))
+
+    def test_conditional_refresh(self):
+
+        handler = self.create_handler(p_refresh_interval_in_days=0)
+
+        self.assertTrue(handler.is_active(p_reference_date=to_date("12.10.2020"), p_details=VALID_STATE_NAME))
+        self.assertEqual(0, self._server.not_modified_count)
+
+        # Every lookup is due for a refresh but the unchanged documents are not transferred again
+        self.assertTrue(handler.is_active(p_reference_date=to_date("13.10.2020"), p_details=VALID_STATE_NAME))
+        self.assertEqual(6, self._server.request_count)
+        self.assertEqual(3, self._server.not_modified_count)
+
+    def test_offline_with_snapshot(self):
+
+        self.create_handler().check_data()
+
+        self._server.failing = True
+
+        # A new handler (e.g. after a restart) uses the snapshot while the service is unavailable
+        handler = self.create_handler(p_refresh_interval_in_days=0)
+
+        self.assertTrue(handler.is_active(p_reference_date=to_date("12.10.2020"), p_details=VALID_STATE_NAME))
+        self.assertFalse(handler.is_active(p_reference_date=to_date("25.10.2020"), p_details=VALID_STATE_NAME))
+
+    def test_offline_without_snapshot(self):
+
+        self._server.failing = True
+
+        handler = self.create_handler()
+
+        self.assertFalse(handler.is_active(p_reference_date=to_date("12.10.2020"), p_details=VALID_STATE_NAME))
+        request_count = self._server.request_count
+
+        # The download is not retried before the retry interval has passed
+        self.assertFalse(handler.is_active(p_reference_date=to_date("12.10.2020"), p_details=VALID_STATE_NAME))
+        self.assertEqual(request_count, self._server.request_count)
+
+    def test_active_ruleset_resolution(self):
+
+        self._server.failing = True
+
+        handler = self.create_handler(p_refresh_interval_in_days=0, p_retry_interval=0)
+        a_rule_handler = rule_handler.RuleHandler(p_config=rule_handler.RuleHandlerConfigModel(), p_persistence=None)
+        a_rule_handler.register_context_rule_handler(simple_context_rule_handlers.DefaultContextRuleHandler(),
+                                                     p_default=True)
+        a_rule_handler.register_context_rule_handler(handler)
+
+        default_rule_set = rule_handler.RuleSetConfigModel()
+        default_rule_set.id = 1
+
+        vacation_rule_set = rule_handler.RuleSetConfigModel()
+        vacation_rule_set.id = 2
+        vacation_rule_set.context = german_vacation_context_rule_handler.CALENDAR_CONTEXT_RULE_HANDLER_NAME
+        vacation_rule_set.context_details = VALID_STATE_NAME
+        vacation_rule_set.priority = 3
+
+        rule_sets = [default_rule_set, vacation_rule_set]
+        reference_date = to_date("12.10.2020")
+
+        # The assumption made while the calendar is unavailable is not cached
+        self.assertIs(default_rule_set, a_rule_handler.get_active_ruleset(p_rule_sets=rule_sets,
+                                                                          p_reference_date=reference_date))
+
+        self._server.failing = False
+        self.assertIs(vacation_rule_set, a_rule_handler.get_active_ruleset(p_rule_sets=rule_sets,
+                                                                           p_reference_date=reference_date))
+
+        # Changed calendar data yields a new resolution
+        self._server.documents[PERIODS_PATH]["data"][0]["starts_on"] = "2020-10-13"
+        self.assertIs(default_rule_set, a_rule_handler.get_active_ruleset(p_rule_sets=rule_sets,
+                                                                          p_reference_date=reference_date))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2019-2024  Marcus Rickert
+#
+#    See https://github.com/marcus67/little_brother
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import datetime
+import random
+import time
+import unittest
+
+from little_brother import incremental_process_statistics
+from little_brother import process_info
+from little_brother import process_statistics
+from little_brother import vectorized_process_statistics
+from little_brother.test import test_incremental_process_statistics
+from python_base_app.test import base_test
+
+PROPERTY_TEST_COUNT = 200
+MAX_PROCESS_COUNT = 30
+BENCHMARK_PROCESS_COUNT = 20000
+HISTORY_LENGTH_IN_DAYS = 180
+MIN_ACTIVITY_DURATION = 60  # seconds
+
+
+def create_process_infos(p_random, p_reference_time, p_count):
+
+    # Coarse start and end times produce many boundaries with identical times including processes without duration
+    pinfos = []
+
+    for pid in range(p_count):
+        start_time = p_reference_time - datetime.timedelta(minutes=p_random.randint(0, 3 * 24 * 60 // 15) * 15)
+
+        if p_random.random() < 0.1:
+            end_time = None
+
+        else:
+            end_time = start_time + datetime.timedelta(minutes=p_random.choice((0, 0, 15, 30, 60, 240)))
+
+        pinfos.append(process_info.ProcessInfo(
+            p_hostname=p_random.choice(test_incremental_process_statistics.HOSTNAMES),
+            p_username=p_random.choice((test_incremental_process_statistics.USER_1,
+                                        test_incremental_process_statistics.USER_2)),
+            p_processhandler="ClientProcessHandler",
+            p_processname=p_random.choice(test_incremental_process_statistics.PROCESS_NAMES),
+            p_pid=pid, p_start_time=start_time, p_end_time=end_time,
+            p_downtime=p_random.choice((0, 0, 60, 120)), p_percent=p_random.choice((100, 50, 25))))
+
+    return pinfos
+
+
+def get_statistics(p_process_infos, p_user_map, p_reference_time, p_vectorized_sweep_threshold):
+
+    statistics = incremental_process_statistics.IncrementalProcessStatistics(
+        p_vectorized_sweep_threshold=p_vectorized_sweep_threshold)
+
+    for pinfo in p_process_infos:
+        statistics.update_process_info(p_process_info=pinfo)
+
+    return statistics, statistics.get_process_statistics(
+        p_user_map=p_user_map, p_reference_time=p_reference_time,
+        p_max_lookback_in_days=test_incremental_process_statistics.MAX_LOOKBACK_IN_DAYS,
+        p_min_activity_duration=MIN_ACTIVITY_DURATION)
+
+
+@unittest.skipIf(not vectorized_process_statistics.is_available(), "NumPy is not installed")
+class TestVectorizedProcessStatistics(base_test.BaseTestCase):
+
+    def test_empty(self):
+        self.assertTupleEqual(([], [], 0, None), vectorized_process_statistics.sweep(
+            p_boundaries=[], p_start_type=incremental_process_statistics.BOUNDARY_TYPE_START,
+            p_get_process_info=None))
+
+    def test_equivalence(self):
+        reference_time = datetime.datetime(2024, 5, 17, 18, 30)
+        user_map = test_incremental_process_statistics.create_user_map()
+
+        for seed in range(PROPERTY_TEST_COUNT):
+            random_generator = random.Random(seed)
+            pinfos = create_process_infos(p_random=random_generator, p_reference_time=reference_time,
+                                          p_count=random_generator.randint(1, MAX_PROCESS_COUNT))
+            process_infos = {pinfo.get_key(): pinfo for pinfo in pinfos}
+
+            expected = process_statistics.get_process_statistics(
+                p_user_map=user_map, p_process_infos=process_infos, p_reference_time=reference_time,
+                p_max_lookback_in_days=test_incremental_process_statistics.MAX_LOOKBACK_IN_DAYS,
+                p_min_activity_duration=MIN_ACTIVITY_DURATION)
+
+            _statistics, result = get_statistics(p_process_infos=pinfos, p_user_map=user_map,
+                                                 p_reference_time=reference_time, p_vectorized_sweep_threshold=0)
+
+            self.assertDictEqual(test_incremental_process_statistics.get_summary(p_users_stat_infos=expected),
+                                 test_incremental_process_statistics.get_summary(p_users_stat_infos=result),
+                                 "seed {seed}".format(seed=seed))
+
+    def test_incremental_update_after_vectorized_sweep(self):
+        random_generator = random.Random(11)
+        reference_time = datetime.datetime(2024, 5, 17, 18, 30)
+        user_map = test_incremental_process_statistics.create_user_map()
+        pinfos = create_process_infos(p_random=random_generator, p_reference_time=reference_time, p_count=500)
+
+        statistics, _result = get_statistics(p_process_infos=pinfos, p_user_map=user_map,
+                                             p_reference_time=reference_time, p_vectorized_sweep_threshold=0)
+
+        # The boundary positions of the activities have to be correct for the partial sweeps
+        for pinfo in pinfos[:50]:
+            if pinfo.end_time is None:
+                pinfo.end_time = reference_time
+
+            else:
+                pinfo.downtime = pinfo.downtime + 30
+
+            statistics.update_process_info(p_process_info=pinfo)
+
+        result = statistics.get_process_statistics(
+            p_user_map=user_map, p_reference_time=reference_time,
+            p_max_lookback_in_days=test_incremental_process_statistics.MAX_LOOKBACK_IN_DAYS,
+            p_min_activity_duration=MIN_ACTIVITY_DURATION)
+
+        expected = process_statistics.get_process_statistics(
+            p_user_map=user_map, p_process_infos={pinfo.get_key(): pinfo for pinfo in pinfos},
+            p_reference_time=reference_time,
+            p_max_lookback_in_days=test_incremental_process_statistics.MAX_LOOKBACK_IN_DAYS,
+            p_min_activity_duration=MIN_ACTIVITY_DURATION)
+
+        self.assertDictEqual(test_incremental_process_statistics.get_summary(p_users_stat_infos=expected),
+                             test_incremental_process_statistics.get_summary(p_users_stat_infos=result))
+
+    def test_benchmark_history(self):
+        random_generator = random.Random(180)
+        reference_time = datetime.datetime(2024, 5, 17, 18, 30)
+        user = test_incremental_process_statistics.create_user(p_username=test_incremental_process_statistics.USER_1)
+        pinfos = test_incremental_process_statistics.create_random_process_infos(
+            p_random=random_generator, p_reference_time=reference_time, p_count=BENCHMARK_PROCESS_COUNT,
+            p_days=HISTORY_LENGTH_IN_DAYS, p_open_ratio=0)
+        durations = {}
+        activities = {}
+
+        for vectorized in (False, True):
+            # Only the sweep over the complete history is measured
+            timeline = incremental_process_statistics.UserActivityTimeline(
+                p_user=user, p_process_infos=pinfos,
+                p_vectorized_sweep_threshold=0 if vectorized else 2 * len(pinfos))
+
+            start = time.perf_counter()
+            timeline.sweep()
+            durations[vectorized] = time.perf_counter() - start
+            activities[vectorized] = [test_incremental_process_statistics.get_activity_summary(p_activity=activity)
+                                      for activity in timeline._activities]
+
+        self.assertListEqual(activities[False], activities[True])
+
+        fmt = "Sweep over {days} days with {count} process infos: Python {python:.0f}ms, NumPy {numpy:.0f}ms"
+        self._logger.info(fmt.format(days=HISTORY_LENGTH_IN_DAYS, count=BENCHMARK_PROCESS_COUNT,
+                                     python=1000 * durations[False], numpy=1000 * durations[True]))
+
+if __name__ == "__main__":
+    unittest.main()
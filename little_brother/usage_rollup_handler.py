@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import copy
+import datetime
+
+from little_brother import process_statistics
+from little_brother.persistence import persistent_daily_usage_rollup
+from little_brother.persistence.persistent_daily_usage_rollup import DailyUsageRollup
+from little_brother.persistence.persistent_dependency_injection_mix_in import PersistenceDependencyInjectionMixIn
+from python_base_app import log_handling
+
+
+def get_closed_lookbacks(p_stat_info: process_statistics.ProcessStatisticsInfo):
+
+    # A day is closed when it lies before the reference date and no activity started on it is still running since
+    # activities are accounted on the day they started.
+    lookbacks = []
+
+    for lookback in range(1, p_stat_info.max_lookback_in_days + 1):
+        reference_date = p_stat_info.reference_date - datetime.timedelta(days=lookback)
+
+        if p_stat_info.current_activity is not None and \
+                p_stat_info.current_activity.start_time.date() <= reference_date:
+            continue
+
+        lookbacks.append(lookback)
+
+    return lookbacks
+
+
+class UsageRollupHandler(PersistenceDependencyInjectionMixIn):
+
+    def __init__(self, p_config):
+
+        super().__init__()
+
+        self._config = p_config
+        self._logger = log_handling.get_logger(self.__class__.__name__)
+
+        # Keys of the rollups known to be in the database and the reference date they have been loaded for
+        self._rollup_keys = set()
+        self._rollup_keys_reference_date = None
+
+    def write_rollups(self, p_session_context, p_users_stat_infos, p_reference_time, p_changed_days=frozenset()):
+
+        # Writes the rollups of all closed days in the statistics which have not been written yet, typically the
+        # previous day after midnight. Rollups of closed days whose statistics have changed since they were written
+        # (e.g. by process events replayed by a client) are rewritten. p_changed_days contains the changed days as
+        # (username, date) or is None if all days may have changed (e.g. at startup or after a downtime correction).
+        reference_date = p_reference_time.date()
+
+        if self._rollup_keys_reference_date != reference_date:
+            rollups = self.daily_usage_rollup_entity_manager.get_rollups(
+                p_session_context=p_session_context,
+                p_start_date=reference_date - datetime.timedelta(days=self._config.process_lookback_in_days),
+                p_end_date=reference_date - datetime.timedelta(days=1))
+            self._rollup_keys = set(rollups.keys())
+            self._rollup_keys_reference_date = reference_date
+
+        if p_changed_days is None:
+            self._rollup_keys = set()
+
+        elif len(p_changed_days) > 0:
+            self._rollup_keys = {(username, context, day_reference_date)
+                                 for username, context, day_reference_date in self._rollup_keys
+                                 if (username, day_reference_date) not in p_changed_days}
+
+        new_rollups = []
+
+        for username, stat_infos in p_users_stat_infos.items():
+            for context, stat_info in stat_infos.items():
+                for lookback in get_closed_lookbacks(p_stat_info=stat_info):
+                    day_reference_date = reference_date - datetime.timedelta(days=lookback)
+                    key = persistent_daily_usage_rollup.get_key(p_username=username, p_context=context,
+                                                                p_reference_date=day_reference_date)
+
+                    if key in self._rollup_keys:
+                        continue
+
+                    rollup = DailyUsageRollup()
+                    rollup.username = username
+                    rollup.context = context
+                    rollup.reference_date = day_reference_date
+                    rollup.set_day_statistics(p_day_statistics=stat_info.day_statistics[lookback])
+                    new_rollups.append(rollup)
+
+        if len(new_rollups) > 0:
+            self.daily_usage_rollup_entity_manager.write_rollups(p_session_context=p_session_context,
+                                                                 p_rollups=new_rollups)
+            self._rollup_keys.update(rollup.get_key() for rollup in new_rollups)
+
+            fmt = "Wrote {count} daily usage rollup(s)"
+            self._logger.info(fmt.format(count=len(new_rollups)))
+
+    def add_rollups(self, p_session_context, p_users_stat_infos, p_reference_time, p_max_lookback_in_days):
+
+        # Extends statistics of the recent days by the rollups of the closed days up to the lookback. The statistics
+        # may be shared with other callers so copies are returned. Returns None if a closed day has not been rolled
+        # up yet.
+        reference_date = p_reference_time.date()
+        rollups = self.daily_usage_rollup_entity_manager.get_rollups(
+            p_session_context=p_session_context,
+            p_start_date=reference_date - datetime.timedelta(days=p_max_lookback_in_days),
+            p_end_date=reference_date - datetime.timedelta(days=1))
+
+        users_stat_infos = {}
+
+        for username, stat_infos in p_users_stat_infos.items():
+            users_stat_infos[username] = {}
+
+            for context, stat_info in stat_infos.items():
+                day_statistics = [stat_info.day_statistics[0]]
+
+                for lookback in range(1, p_max_lookback_in_days + 1):
+                    rollup = rollups.get(persistent_daily_usage_rollup.get_key(
+                        p_username=username, p_context=context,
+                        p_reference_date=reference_date - datetime.timedelta(days=lookback)))
+
+                    if rollup is not None:
+                        day_statistics.append(rollup.get_day_statistics())
+
+                    elif lookback <= stat_info.max_lookback_in_days:
+                        day_statistics.append(stat_info.day_statistics[lookback])
+
+                    else:
+                        return None
+
+                extended_stat_info = copy.copy(stat_info)
+                extended_stat_info.day_statistics = day_statistics
+                extended_stat_info.max_lookback_in_days = p_max_lookback_in_days
+                users_stat_infos[username][context] = extended_stat_info
+
+        return users_stat_infos
+
@@ -89,6 +89,9 @@ class UserManager(PersistenceDependencyInjectionMixIn):
 
     def handle_event_update_login_mapping(self, p_event):
 
+        # The payload replaces the mapping known so far -> drop the in-memory index and rebuild it on demand
+        self._login_mapping.invalidate()
+
         with SessionContext(p_persistence=self.persistence) as session_context:
             self._login_mapping.from_json(p_session_context=session_context, p_json=p_event.payload)
             server_group_names = ', '.join(self._login_mapping.get_server_group_names(
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Process iterator enumerating only the processes of given users. systemd places all processes of a user session
+# into the cgroup user.slice/user-<uid>.slice so that the pids can be read from the files cgroup.procs of that
+# cgroup and its descendants without walking the complete process table. Requires the unified cgroup hierarchy
+# (cgroup v2). Otherwise, all processes are enumerated.
+
+import os
+
+import psutil
+
+from python_base_app import log_handling
+
+DEFAULT_CGROUP_DIR = "/sys/fs/cgroup"
+USER_SLICE_DIR = "user.slice"
+USER_SLICE_PATTERN = "user-{uid}.slice"
+CGROUP_PROCS_FILENAME = "cgroup.procs"
+
+# This file only exists in the root of a cgroup v2 hierarchy
+CGROUP_V2_INDICATOR_FILENAME = "cgroup.controllers"
+
+
+class UserSliceProcessIteratorFactory(object):
+
+    def __init__(self, p_cgroup_dir=DEFAULT_CGROUP_DIR, p_process_iter=psutil.process_iter,
+                 p_process_factory=psutil.Process):
+        self._cgroup_dir = p_cgroup_dir
+        self._process_iter = p_process_iter
+        self._process_factory = p_process_factory
+        self._logger = log_handling.get_logger(self.__class__.__name__)
+        self._cgroup_v2_available = os.path.exists(os.path.join(p_cgroup_dir, CGROUP_V2_INDICATOR_FILENAME))
+
+        if not self._cgroup_v2_available:
+            fmt = f"No cgroup v2 hierarchy found at {p_cgroup_dir} -> scanning all processes"
+            self._logger.warning(fmt)
+
+    @property
+    def cgroup_v2_available(self):
+        return self._cgroup_v2_available
+
+    def get_pids_of_user(self, p_uid) -> set[int]:
+        pids = set()
+        slice_dir = os.path.join(self._cgroup_dir, USER_SLICE_DIR, USER_SLICE_PATTERN.format(uid=p_uid))
+
+        # The slice only exists while the user is logged in
+        for (dir_path, _dir_names, file_names) in os.walk(slice_dir):
+            if CGROUP_PROCS_FILENAME in file_names:
+                try:
+                    with open(os.path.join(dir_path, CGROUP_PROCS_FILENAME)) as f:
+                        pids.update(int(line) for line in f if line.strip())
+
+                except FileNotFoundError:
+                    # The cgroup has been removed in the meantime
+                    pass
+
+        return pids
+
+    def process_iter(self, p_uids=None):
+
+        if p_uids is None or not self._cgroup_v2_available:
+            return self._process_iter()
+
+        pids = set()
+
+        for uid in p_uids:
+            pids.update(self.get_pids_of_user(p_uid=uid))
+
+        processes = []
+
+        for pid in sorted(pids):
+            try:
+                processes.append(self._process_factory(pid))
+
+            except psutil.NoSuchProcess:
+                pass
+
+        return iter(processes)
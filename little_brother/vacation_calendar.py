@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Building blocks of the vacation calendar: a snapshot of the documents downloaded from a calendar service which
+# survives restarts and is refreshed with conditional requests, and an index of vacation intervals answering lookups
+# in O(log n).
+
+import bisect
+import datetime
+import json
+import os
+import os.path
+
+import requests
+
+from little_brother.context_rule_handler import RuleHandlerRunTimeException
+from python_base_app import log_handling
+
+DOWNLOAD_ERROR_FMT = "HTTP code {error_code} while downloading {url}"
+DECODING_ERROR_FMT = "error {exception} while decoding data from {url}"
+
+SNAPSHOT_VERSION = 1
+
+HTTP_OK = 200
+HTTP_NOT_MODIFIED = 304
+
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+class CalendarDocument(object):
+
+    def __init__(self, p_url, p_content, p_etag=None, p_last_modified=None):
+        self.url = p_url
+        self.content = p_content
+        self.etag = p_etag
+        self.last_modified = p_last_modified
+
+    def get_request_headers(self):
+
+        # Validators of the stored document turning the download into a conditional request
+        headers = {}
+
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+    def to_json(self):
+        return {"url": self.url, "content": self.content, "etag": self.etag, "last_modified": self.last_modified}
+
+    @staticmethod
+    def from_json(p_json):
+        return CalendarDocument(p_url=p_json["url"], p_content=p_json["content"],
+                                p_etag=p_json.get("etag"), p_last_modified=p_json.get("last_modified"))
+
+
+class CalendarSnapshot(object):
+
+    # Keeps the JSON documents downloaded from the calendar service. The documents are saved to a snapshot file (if
+    # given) so that the calendar is available after a restart without network access. The documents are refreshed
+    # every p_refresh_interval seconds. Failed refreshes are retried after p_retry_interval seconds while the
+    # documents of the last successful download are still being used.
+
+    def __init__(self, p_snapshot_filename, p_refresh_interval, p_retry_interval, p_request_timeout):
+
+        self._logger = log_handling.get_logger(self.__class__.__name__)
+
+        self._snapshot_filename = p_snapshot_filename
+        self._refresh_interval = datetime.timedelta(seconds=p_refresh_interval)
+        self._retry_interval = datetime.timedelta(seconds=p_retry_interval)
+        self._request_timeout = p_request_timeout
+
+        self._documents: dict[str, CalendarDocument] = {}
+        self._downloaded_at = None
+        self._next_refresh_time = None
+        self._loaded = False
+
+    @property
+    def downloaded_at(self):
+        return self._downloaded_at
+
+    def has_documents(self, p_urls):
+        return all(url in self._documents for url in p_urls)
+
+    def get_content(self, p_url):
+
+        document = self._documents.get(p_url)
+
+        if document is None:
+            return None
+
+        return document.content
+
+    def load(self):
+
+        self._loaded = True
+
+        if self._snapshot_filename is None or not os.path.exists(self._snapshot_filename):
+            return
+
+        try:
+            with open(self._snapshot_filename, encoding="UTF-8") as snapshot_file:
+                snapshot = json.load(snapshot_file)
+
+            if snapshot.get("version") != SNAPSHOT_VERSION:
+                fmt = "Ignoring vacation calendar snapshot '{filename}' having version {version}"
+                self._logger.warning(fmt.format(filename=self._snapshot_filename, version=snapshot.get("version")))
+                return
+
+            self._documents = {document["url"]: CalendarDocument.from_json(document)
+                               for document in snapshot["documents"]}
+            self._downloaded_at = datetime.datetime.strptime(snapshot["downloaded_at"], DATETIME_FORMAT)
+            self._next_refresh_time = self._downloaded_at + self._refresh_interval
+
+        except Exception as e:
+            fmt = "Exception '{msg}' while reading vacation calendar snapshot '{filename}' -> ignoring snapshot"
+            self._logger.warning(fmt.format(msg=str(e), filename=self._snapshot_filename))
+            return
+
+        fmt = "Read vacation calendar snapshot '{filename}' downloaded at {downloaded_at}"
+        self._logger.info(fmt.format(filename=self._snapshot_filename, downloaded_at=self._downloaded_at))
+
+    def save(self):
+
+        if self._snapshot_filename is None:
+            return
+
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "downloaded_at": self._downloaded_at.strftime(DATETIME_FORMAT),
+            "documents": [document.to_json() for document in self._documents.values()]
+        }
+
+        # Write to a temporary file first so that an interrupted write does not destroy the previous snapshot
+        tmp_filename = self._snapshot_filename + ".tmp"
+
+        with open(tmp_filename, "w", encoding="UTF-8") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+
+        os.replace(tmp_filename, self._snapshot_filename)
+
+    def is_refresh_due(self, p_reference_time):
+
+        if not self._loaded:
+            self.load()
+
+        return self._next_refresh_time is None or p_reference_time >= self._next_refresh_time
+
+    def download(self, p_url):
+
+        # Returns a new document or None if the stored document has not been modified
+        document = self._documents.get(p_url)
+        headers = document.get_request_headers() if document is not None else {}
+
+        request = requests.get(p_url, headers=headers, timeout=self._request_timeout)
+
+        if request.status_code == HTTP_NOT_MODIFIED and document is not None:
+            return None
+
+        if request.status_code != HTTP_OK:
+            fmt = DOWNLOAD_ERROR_FMT
+            raise RuleHandlerRunTimeException(fmt.format(error_code=request.status_code, url=p_url))
+
+        try:
+            content = json.loads(request.content.decode("UTF-8"))
+
+        except Exception as e:
+            fmt = DECODING_ERROR_FMT
+            raise RuleHandlerRunTimeException(fmt.format(exception=str(e), url=p_url))
+
+        return CalendarDocument(p_url=p_url, p_content=content, p_etag=request.headers.get("ETag"),
+                                p_last_modified=request.headers.get("Last-Modified"))
+
+    def refresh(self, p_urls, p_reference_time):
+
+        # Returns True if any of the documents has changed. The documents are only replaced if all downloads
+        # succeed so that the stored documents are always consistent.
+        try:
+            new_documents = {}
+
+            for url in p_urls:
+                document = self.download(p_url=url)
+
+                if document is not None:
+                    new_documents[url] = document
+
+        except Exception:
+            self._next_refresh_time = p_reference_time + self._retry_interval
+            raise
+
+        self._documents.update(new_documents)
+        self._downloaded_at = p_reference_time
+        self._next_refresh_time = p_reference_time + self._refresh_interval
+
+        fmt = "Refreshed vacation calendar: {changed} of {count} documents changed"
+        self._logger.info(fmt.format(changed=len(new_documents), count=len(p_urls)))
+
+        try:
+            self.save()
+
+        except Exception as e:
+            fmt = "Exception '{msg}' while writing vacation calendar snapshot '{filename}'"
+            self._logger.error(fmt.format(msg=str(e), filename=self._snapshot_filename))
+
+        return len(new_documents) > 0
+
+
+class VacationIntervalIndex(object):
+
+    # Sorted list of disjoint vacation intervals (as day ordinals). Overlapping and adjacent entries are merged so
+    # that a single binary search answers whether a date is a vacation day.
+
+    def __init__(self, p_vacation_entries):
+
+        intervals = sorted((entry.start_date.toordinal(), entry.end_date.toordinal())
+                           for entry in p_vacation_entries)
+
+        self._starts = []
+        self._ends = []
+
+        for start, end in intervals:
+            if len(self._ends) > 0 and start <= self._ends[-1] + 1:
+                self._ends[-1] = max(self._ends[-1], end)
+
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def contains(self, p_date):
+
+        ordinal = p_date.toordinal()
+        index = bisect.bisect_right(self._starts, ordinal) - 1
+
+        return index >= 0 and ordinal <= self._ends[index]
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2019-2024  Marcus Rickert
+#
+# See https://github.com/marcus67/little_brother
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Optional NumPy implementation of the sweep over the sorted process boundaries of a user. It is used for long sweeps,
+# e.g. when the timeline of a user is built from the process infos of the complete lookback period. The result is
+# identical to the sweep of process_statistics.ProcessStatisticsInfo:
+#
+# * The number of active processes after each boundary is the cumulated sum of +1 (start) and -1 (end) reflected
+#   at zero since an end without active processes is ignored.
+# * An activity starts at a start boundary without active processes and ends at an end boundary bringing the number
+#   of active processes down to zero.
+# * The percentage per host and the downtime of an activity are the maxima over the processes started during the
+#   activity. The downtime of the process ending the activity is also taken into account.
+#
+# NumPy is not a mandatory dependency of LittleBrother. If it is not installed the Python sweep is used.
+
+from little_brother import process_statistics
+from python_base_app import log_handling
+
+try:
+    import numpy
+
+except ImportError:
+    numpy = None
+
+_logger = log_handling.get_logger(__name__)
+
+
+def is_available():
+    return numpy is not None
+
+
+def sweep(p_boundaries, p_start_type, p_get_process_info):
+
+    # p_boundaries is the sorted list of (time, key, type) tuples of a user, p_get_process_info returns the process
+    # info for a key. Returns the closed activities, the boundary indexes at which they have been closed, the number of
+    # active processes after the last boundary and the current activity (or None).
+
+    if len(p_boundaries) == 0:
+        return [], [], 0, None
+
+    times, keys, types = zip(*p_boundaries)
+    is_start = numpy.array(types) == p_start_type
+    sums = numpy.cumsum(numpy.where(is_start, 1, -1))
+    active_processes = sums - numpy.minimum(numpy.minimum.accumulate(sums), 0)
+    active_processes_before = numpy.concatenate(([0], active_processes[:-1]))
+
+    is_activity_start = is_start & (active_processes_before == 0)
+    is_ignored_end = ~is_start & (active_processes_before == 0)
+    activity_ends = numpy.flatnonzero(~is_start & ~is_ignored_end & (active_processes == 0))
+    activity_starts = numpy.flatnonzero(is_activity_start)
+    activity_count = len(activity_starts)
+
+    for _i in range(int(numpy.count_nonzero(is_ignored_end))):
+        _logger.warning("Active processes less than zero")
+
+    if activity_count == 0:
+        return [], [], 0, None
+
+    # Index of the activity of each boundary (-1 for ignored ends before the first activity)
+    activities_of_boundaries = numpy.cumsum(is_activity_start) - 1
+
+    start_indexes = numpy.flatnonzero(is_start)
+    start_activities = activities_of_boundaries[start_indexes]
+    start_process_infos = [p_get_process_info(keys[i]) for i in start_indexes.tolist()]
+    percents = numpy.array([pinfo.percent for pinfo in start_process_infos])
+    downtimes = numpy.array([pinfo.downtime for pinfo in start_process_infos])
+
+    max_downtimes = numpy.zeros(activity_count, dtype=downtimes.dtype)
+    numpy.maximum.at(max_downtimes, start_activities, downtimes)
+
+    end_downtimes = numpy.array([p_get_process_info(keys[i]).downtime for i in activity_ends.tolist()],
+                                dtype=downtimes.dtype)
+    numpy.maximum.at(max_downtimes, activities_of_boundaries[activity_ends], end_downtimes)
+
+    # Host statistics per activity in the order of the first occurrence of the host within the activity
+    host_labels, host_indexes = numpy.unique(numpy.array([pinfo.hostlabel for pinfo in start_process_infos]),
+                                             return_inverse=True)
+    host_keys = start_activities * len(host_labels) + host_indexes.reshape(-1)
+    unique_host_keys, first_occurrences, host_key_indexes = numpy.unique(host_keys, return_index=True,
+                                                                         return_inverse=True)
+    max_percents = numpy.full(len(unique_host_keys), -1, dtype=percents.dtype)
+    numpy.maximum.at(max_percents, host_key_indexes.reshape(-1), percents)
+
+    activities = [process_statistics.Activity(p_start_time=times[i]) for i in activity_starts.tolist()]
+
+    for index in numpy.argsort(first_occurrences, kind="stable").tolist():
+        activity = activities[int(unique_host_keys[index]) // len(host_labels)]
+        hostname = start_process_infos[int(first_occurrences[index])].hostlabel
+        activity.host_stats[hostname] = process_statistics.HostStat(p_hostname=hostname,
+                                                                    p_percent=max_percents[index].item())
+
+    for activity, downtime in zip(activities, max_downtimes.tolist()):
+        activity.set_downtime(p_downtime=downtime)
+
+    end_positions = activity_ends.tolist()
+
+    for activity, end_position in zip(activities, end_positions):
+        activity.set_end_time(p_end_time=times[end_position])
+
+    if len(end_positions) < activity_count:
+        current_activity = activities[-1]
+        activities = activities[:-1]
+
+    else:
+        current_activity = None
+
+    return activities, end_positions, int(active_processes[-1]), current_activity
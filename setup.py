@@ -113,6 +113,8 @@ extended_setup_params = {
     "debian_extra_files": [
         ("etc/client.config", "etc/little-brother/client.config"),
         ("etc/master.config", "etc/little-brother/master.config"),
+        # Executed as root by sudo, so it must not live in the virtual environment owned by little-brother
+        ("little_brother/kill_helper.py", "usr/sbin/little-brother-kill-helper"),
     ],
     "debian_templates": [
         ("/etc/little-brother/master.config", "/etc/little-brother/little-brother.config")